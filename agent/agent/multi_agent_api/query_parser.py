@@ -2,7 +2,7 @@ import json
 
 from agent.utils.constants import AGENT_STATUS, AgentResponse, INPUT_TOOL_ARG_DESCRIPTION
 from agent.agent.sujin_multi_agent_api.base_agent import BaseAPI
-from agent.tools.type_check import type_check
+from agent.tools.type_check import type_check_many
 
 
 SYSTEM_PROMPT = """ \
@@ -94,9 +94,11 @@ class QueryParserAPI(BaseAPI):
                     wrong_dict[input_type] = values
                 
                 else:
-                    for value in values:
+                    # Check all values of the same type at once
+                    errors = type_check_many("None", values, input_type, self.tool_manager.out_dir)
+                    for value, error in zip(values, errors):
                         # If the value is not valid
-                        if type_check("None", value, input_type, self.tool_manager.out_dir) is not None:
+                        if error is not None:
                             wrong_dict[input_type] = wrong_dict.get(input_type, []) + [value]
                         
                         else:
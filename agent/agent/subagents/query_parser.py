@@ -3,7 +3,7 @@ import json_repair
 
 from agent.utils.constants import AGENT_STATUS, INPUT_FLOW_ARG_DESCRIPTION, OUTPUT_FLOW_ARG_DESCRIPTION, TOOL_SPECIFIC_ARG_DESCRIPTION, CONFIGURATIVE_ARG_DESCRIPTION, AgentResponse
 from agent.agent.subagents.base_agent import BaseAPI
-from agent.tools.type_check import type_check
+from agent.tools.type_check import type_check_many
 
 
 SYSTEM_PROMPT = """ \
@@ -191,9 +191,11 @@ class QueryParser(BaseAPI):
                             pass
                         
                         else:
-                            for value in values:
+                            # Check all values of the same type at once
+                            errors = type_check_many("None", values, input_type, self.tool_manager.out_dir)
+                            for value, error in zip(values, errors):
                                 # If the value is not valid
-                                if type_check("None", value, input_type, self.tool_manager.out_dir) is not None:
+                                if error is not None:
                                     wrong_dict[entity][input_type] = wrong_dict[entity].get(input_type, []) + [value]
                                 
                                 else:
@@ -210,7 +210,7 @@ class ToolConnector(BaseAPI):
                 if msg.get("sender", None) == "tool_executor":
                     tool = msg["content"]["tool_name"]
                     executed_step_id = msg["content"]["current_step"]
-                    arg_doc = self.tool_manager.get_tool(tool).config["document"]
+                    arg_doc = self.tool_manager.specs[tool].config["document"]
                     for name, value in msg["content"].get("results", {}).items():
                         # update parameter name to detailed type
                         for arg in arg_doc["return_values"]:
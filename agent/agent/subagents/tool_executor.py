@@ -1,5 +1,7 @@
 import json
+import uuid
 
+from collections import deque
 from typing import List, Dict
 
 import streamingjson
@@ -86,6 +88,14 @@ class ToolExecutor(BaseAPI):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        # Owner of the tool jobs of this executor, so that stopping its chat leaves other jobs running
+        self.job_owner = f"tool_executor-{uuid.uuid4().hex[:8]}"
+
+    def cancel_jobs(self):
+        """
+        Cancel the unfinished tool jobs started by this executor
+        """
+        self.tool_manager.cancel_owner(self.job_owner)
         
     def change_tool_call(self, tool_name: str, tool_arg: dict):
         """
@@ -195,17 +205,22 @@ class ToolExecutor(BaseAPI):
                         arg_dict["content"]["analysis"] = "The user has changed the tool call. Use this tool instead to finish the plan."
                     
                     else:
-                        for obs in self.tool_manager.call(self.tool_name, self.tool_arg):
-                            # Only use the last 100 lines of the log
-                            short_obs = "\n".join(obs.split("\n")[-100:])
-                            arg_dict["content"]["running_log"] = short_obs
+                        # Each call is a separate job, so concurrent calls of the same tool do not share results
+                        job_id = self.tool_manager.submit(self.tool_name, self.tool_arg, owner=self.job_owner)
+                        # Observations only carry the appended log. Keep the last 100 lines of the log
+                        running_log = deque([""], maxlen=100)
+                        for obs in self.tool_manager.stream(job_id):
+                            lines = obs.split("\n")
+                            running_log[-1] += lines[0]
+                            running_log.extend(lines[1:])
+                            arg_dict["content"]["running_log"] = "\n".join(running_log)
                             yield AgentResponse(
                                 content=json.dumps(arg_dict, indent=4),
                                 status=AGENT_STATUS.GENERATING,
                             )
             
                         # Check if the tool execution was successful
-                        results = self.tool_manager.get_result(self.tool_name)
+                        results = self.tool_manager.get_result(self.tool_name, job_id)
                         status = "error" if "error" in results else "success"
                         arg_dict["content"]["results"] = dict(results)
                         arg_dict["content"]["status"] = status
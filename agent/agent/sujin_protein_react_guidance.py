@@ -179,8 +179,11 @@ class ProteinReActAgent:
             #                  Action                     #
             ###############################################
             # obs = self.tool_manager.call(self.action, self.action_input)
+            # Observations only carry the appended log, so collect the full observation
+            full_obs = ""
             for obs in self.tool_manager.call(self.action, self.action_input):
-                added_prompt = f"Observation {i + 1}:\n```\n{obs}\n```\n"
+                full_obs += obs
+                added_prompt = f"Observation {i + 1}:\n```\n{full_obs}\n```\n"
                 yield AgentResponse(
                     content=self.response+added_prompt,
                     status=AGENT_STATUS.GENERATING
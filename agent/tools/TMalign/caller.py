@@ -6,12 +6,10 @@ if ROOT_DIR not in sys.path:
 
 import os
 import datetime
-import torch
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
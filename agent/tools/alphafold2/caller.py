@@ -7,18 +7,47 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 import json
+import shutil
+import tempfile
 import subprocess
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
+from agent.tools.service import ServiceClient
+from agent.tools.alphafold2.server import get_msa_path
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
+def get_service(config) -> ServiceClient:
+    """
+    Get the client of the AlphaFold2 service, or None if the service is disabled. The service is started on first use
+    Args:
+        config: Config of the AlphaFold2 tool
+    """
+    service_config = config.get("service", {})
+    if not service_config.get("enabled", False):
+        return None
+
+    socket_path = service_config.get("socket_path") or f"{tempfile.gettempdir()}/alphafold2-{os.getuid()}.sock"
+    start_cmd = [
+        config["python"], f"{BASE_DIR}/server.py",
+        "--socket_path", socket_path,
+        "--work_dir", f"{ROOT_DIR}/{config['work_dir']}",
+        "--msa_dir", f"{ROOT_DIR}/{config['msa_dir']}",
+        "--xla_cache_dir", f"{ROOT_DIR}/{config['xla_cache']}",
+        "--num_models", str(service_config.get("num_models", 5)),
+        "--max_batch_size", str(service_config.get("max_batch_size", 8)),
+        "--batch_wait", str(service_config.get("batch_wait", 2)),
+    ]
+    if service_config.get("idle_timeout") is not None:
+        start_cmd += ["--idle_timeout", str(service_config.idle_timeout)]
+
+    return ServiceClient(socket_path, start_cmd, start_timeout=service_config.get("start_timeout", 600))
+
+
 @register_tool
 class Alphafold2(BaseTool):
     def __init__(self, out_dir: str = f"{ROOT_DIR}/outputs/alphafold2", **kwargs):
@@ -29,8 +58,7 @@ class Alphafold2(BaseTool):
         )
     
     def __call__(self, protein_sequence, msa_mode="mmseqs2_uniref_env"):
-        now = datetime.datetime.now()
-        now = now.strftime("%Y%m%d_%H%M")
+        now = self.run_id
 
         result_dir = f"{self.out_dir}/alphafold2/{now}"
         os.makedirs(result_dir, exist_ok=True)
@@ -44,15 +72,39 @@ class Alphafold2(BaseTool):
         self.sequence_to_fasta(fasta_file, protein_sequence)
 
 
-        cmd = f"bash {BASE_DIR}/cmd.sh input={fasta_file}\
+        if msa_mode == "local":
+            # colabfold takes the MSA of an a3m input as it is
+            msa_path = get_msa_path(f"{ROOT_DIR}/{self.config['msa_dir']}", protein_sequence)
+            if not os.path.exists(msa_path):
+                return {"error": "No local MSA of the sequence was found."}
+            input_file = os.path.join(tmp_path, "alphafold", f"alphafold_{now}.a3m")
+            shutil.copy(msa_path, input_file)
+        else:
+            input_file = fasta_file
+
+        cmd = f"bash {BASE_DIR}/cmd.sh input={input_file}\
                                                     output_dir={result_dir}\
                                                     msa_mode={msa_mode}"
 
 
         cmd += f" > {self.log_path} 2>&1"
         
+        service = get_service(self.config)
         try:
-            os.system(cmd)
+            if service is None:
+                os.system(cmd)
+            else:
+                with open(self.log_path, 'a') as f:
+                    f.write("Queueing the sequence on the AlphaFold2 service\n")
+                service.ensure_started()
+                result = service.request("POST", "/fold", {
+                    "protein_sequence": protein_sequence,
+                    "msa_mode": msa_mode,
+                    "result_dir": result_dir,
+                })
+                with open(self.log_path, 'a') as f:
+                    f.write("Stage timings (s): " + json.dumps(result["timings"]) + "\n")
+
             pdb_path = None
             for file in os.listdir(result_dir):
                 if file.endswith(".pdb") and "rank_001" in file:
@@ -119,8 +171,7 @@ if __name__ == '__main__':
     }
     
     for obs in alphafold2.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
         # alphafold2.terminate()
     
\ No newline at end of file
@@ -0,0 +1,340 @@
+import sys
+
+ROOT_DIR = __file__.rsplit("/", 4)[0]
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import threading
+
+from pathlib import Path
+from agent.tools.service import serve, current_request
+
+
+def get_msa_path(msa_dir: str, protein_sequence: str) -> str:
+    """
+    Path of the MSA of a sequence in the local MSA directory. Chains of a complex are separated by ":"
+    """
+    sequence = "".join(protein_sequence.split()).upper()
+    return f"{msa_dir}/{hashlib.sha256(sequence.encode()).hexdigest()}.a3m"
+
+
+def enable_compilation_cache(cache_dir: str):
+    """
+    Store compiled XLA programs on disk, so that later runs with the same input shapes skip the compilation
+    """
+    import jax
+
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        jax.config.update("jax_compilation_cache_dir", cache_dir)
+        # Cache every program, not only the slow ones
+        jax.config.update("jax_persistent_cache_min_compile_time_secs", 0)
+    except AttributeError:
+        # Older JAX versions
+        from jax.experimental.compilation_cache import compilation_cache as cc
+        cc.initialize_cache(cache_dir)
+    print(f"Using the XLA compilation cache at {cache_dir}", flush=True)
+
+
+class FoldJob:
+    def __init__(self, name: str, body: dict):
+        """
+        A sequence waiting to be folded
+        Args:
+            name: Job name in the batch directory of colabfold
+
+            body: Request with "protein_sequence", "msa_mode" and "result_dir"
+        """
+        self.name = name
+        self.sequence = "".join(body["protein_sequence"].split()).upper()
+        self.msa_mode = body.get("msa_mode", "mmseqs2_uniref_env")
+        # Like cmd.sh, other modes use the default MSA
+        if self.msa_mode not in ["mmseqs2_uniref", "single_sequence", "local"]:
+            self.msa_mode = "mmseqs2_uniref_env"
+        self.result_dir = body["result_dir"]
+        self.is_complex = ":" in self.sequence
+        self.a3m = None
+        self.queued_at = None
+
+        self.timings = {}
+        self.compile_s = 0.
+        self.context = current_request()
+        self.error = None
+        self.done = threading.Event()
+
+    @property
+    def query_sequence(self):
+        chains = self.sequence.split(":")
+        return chains if self.is_complex else chains[0]
+
+    def __len__(self):
+        return len(self.sequence.replace(":", ""))
+
+
+class AlphaFoldService:
+    def __init__(self, work_dir: str, msa_dir: str = None, xla_cache_dir: str = None, data_dir: str = None,
+                 num_models: int = 5, max_batch_size: int = 8, batch_wait: float = 2.):
+        """
+        Folds the requests of the AlphaFold2 tool in one long-running colabfold process. MSAs are built in the request
+        threads, then the sequences wait in a queue and are folded in batches in length order, so that the models are
+        loaded once per batch and compiled programs are reused by the following, longer sequences
+        Args:
+            work_dir: Directory of the batches
+
+            msa_dir: Local MSA directory. MSAs of "mmseqs2_uniref_env" are read from and stored to it, and
+                "local" only reads from it
+
+            xla_cache_dir: Directory of the persistent XLA compilation cache. Disabled if None
+
+            data_dir: Directory of the AlphaFold2 weights. Defaults to the one of colabfold
+
+            num_models: Number of models to fold each sequence with
+
+            max_batch_size: Maximum number of sequences in a batch
+
+            batch_wait: Seconds to wait for more requests before a batch starts
+        """
+        self.work_dir = work_dir
+        self.msa_dir = msa_dir
+        self.data_dir = data_dir
+        self.num_models = num_models
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait
+
+        self.queue = []
+        self.cond = threading.Condition()
+        self.num_jobs = 0
+        self.num_batches = 0
+        self.num_folded = 0
+        # Job whose compilation time is being counted
+        self.current = None
+
+        if xla_cache_dir is not None:
+            enable_compilation_cache(xla_cache_dir)
+        self.listen_compile_time()
+
+        threading.Thread(target=self.run_batches, daemon=True).start()
+
+    def listen_compile_time(self):
+        import jax
+
+        def listener(event: str, duration: float, **kwargs):
+            job = self.current
+            if job is not None and event.startswith("/jax/core/compile/"):
+                job.compile_s += duration
+
+        try:
+            jax.monitoring.register_event_duration_secs_listener(listener)
+        except AttributeError:
+            # Older JAX versions report no compilation events, so compile time is counted as prediction time
+            print("Compilation time is not reported by this JAX version", flush=True)
+
+    def get_msa(self, job: FoldJob) -> str:
+        """
+        Build the MSA of a job in the a3m format
+        """
+        from colabfold.batch import get_msa_and_templates, msa_to_str
+
+        local_path = get_msa_path(self.msa_dir, job.sequence) if self.msa_dir else None
+        if job.msa_mode in ["local", "mmseqs2_uniref_env"] and local_path and os.path.exists(local_path):
+            with open(local_path, "r") as r:
+                return r.read()
+
+        if job.msa_mode == "local":
+            raise RuntimeError(f"No local MSA of the sequence. Expected {local_path}")
+
+        os.makedirs(job.result_dir, exist_ok=True)
+        unpaired_msa, paired_msa, query_seqs_unique, query_seqs_cardinality, _ = get_msa_and_templates(
+            job.name, job.query_sequence, None, Path(job.result_dir), job.msa_mode, False, None, "unpaired_paired")
+        a3m = msa_to_str(unpaired_msa, paired_msa, query_seqs_unique, query_seqs_cardinality)
+
+        if job.msa_mode == "mmseqs2_uniref_env" and local_path:
+            os.makedirs(self.msa_dir, exist_ok=True)
+            tmp_path = f"{local_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+            with open(tmp_path, "w") as w:
+                w.write(a3m)
+            os.replace(tmp_path, local_path)
+
+        return a3m
+
+    def fold(self, body: dict) -> dict:
+        """
+        Handle a request of one sequence. The MSA is built right away, then the sequence waits for its batch
+        """
+        start = time.time()
+        with self.cond:
+            self.num_jobs += 1
+            job = FoldJob(f"job{self.num_jobs:06d}", body)
+
+        job.a3m = self.get_msa(job)
+        job.timings["msa_s"] = round(time.time() - start, 3)
+
+        job.queued_at = time.time()
+        with self.cond:
+            self.queue.append(job)
+            self.cond.notify()
+
+        try:
+            job.context.wait(job.done)
+        finally:
+            # A request that is cancelled or timed out is never folded
+            with self.cond:
+                if job in self.queue:
+                    self.queue.remove(job)
+
+        if job.error is not None:
+            raise RuntimeError(job.error)
+
+        job.timings["total_s"] = round(time.time() - start, 3)
+        with open(f"{job.result_dir}/timings.json", "w") as w:
+            json.dump(job.timings, w, indent=4)
+
+        print(f"Folded {job.result_dir} ({len(job)} residues): "
+              + ", ".join(f"{k}={v}" for k, v in job.timings.items()), flush=True)
+        return {"timings": job.timings}
+
+    def next_batch(self) -> list:
+        """
+        Take the shortest sequences of one model type from the queue
+        """
+        with self.cond:
+            while not self.queue:
+                self.cond.wait()
+
+        # Requests that arrive together are folded together
+        time.sleep(self.batch_wait)
+
+        with self.cond:
+            # The queued requests may have been cancelled in the meantime
+            if not self.queue:
+                return []
+
+            self.queue.sort(key=len)
+            is_complex = self.queue[0].is_complex
+            batch = [job for job in self.queue if job.is_complex == is_complex][:self.max_batch_size]
+            self.queue = [job for job in self.queue if job not in batch]
+
+        return batch
+
+    def run_batches(self):
+        while True:
+            batch = self.next_batch()
+            if not batch:
+                continue
+
+            try:
+                self.fold_batch(batch)
+            except Exception as e:
+                for job in batch:
+                    job.error = f"AlphaFold2 failed: {e}"
+            finally:
+                self.current = None
+                for job in batch:
+                    job.done.set()
+
+    def fold_batch(self, batch: list):
+        """
+        Fold a batch with one call of colabfold, which keeps the models loaded and reuses compiled programs between
+        sequences of similar length. The results of each job are moved to its result directory
+        """
+        from colabfold.batch import run, set_model_type
+
+        self.num_batches += 1
+        batch_dir = f"{self.work_dir}/batch{self.num_batches:06d}"
+        os.makedirs(batch_dir, exist_ok=True)
+        print(f"Folding a batch of {len(batch)}: lengths {[len(job) for job in batch]}", flush=True)
+
+        start = time.time()
+        for job in batch:
+            job.timings["queue_s"] = round(start - job.queued_at, 3)
+
+        # colabfold prepares the features of every sequence before folding it. The time between two of these calls is
+        # counted for the earlier sequence, so the first one also pays for loading the models
+        marks = [start]
+        jobs = iter(batch)
+
+        def start_job(input_features):
+            if self.current is not None:
+                marks.append(time.time())
+            self.current = next(jobs, None)
+
+        is_complex = batch[0].is_complex
+        kwargs = {"data_dir": Path(self.data_dir)} if self.data_dir else {}
+        run(
+            queries=[(job.name, job.query_sequence, [job.a3m]) for job in batch],
+            result_dir=Path(batch_dir),
+            is_complex=is_complex,
+            model_type=set_model_type(is_complex, "auto"),
+            msa_mode="single_sequence",
+            num_models=self.num_models,
+            keep_existing_results=False,
+            input_features_callback=start_job,
+            **kwargs
+        )
+        marks.append(time.time())
+
+        for i, job in enumerate(batch):
+            if i + 1 < len(marks):
+                elapsed = marks[i + 1] - marks[i]
+                job.timings["compile_s"] = round(job.compile_s, 3)
+                job.timings["predict_s"] = round(elapsed - job.compile_s, 3)
+
+            os.makedirs(job.result_dir, exist_ok=True)
+            for file in os.listdir(batch_dir):
+                if file.startswith(f"{job.name}_") or file.startswith(f"{job.name}."):
+                    shutil.move(f"{batch_dir}/{file}", f"{job.result_dir}/{file}")
+
+        self.num_folded += len(batch)
+        shutil.rmtree(batch_dir, ignore_errors=True)
+
+    def health(self, body: dict) -> dict:
+        with self.cond:
+            num_queued = len(self.queue)
+        return {"status": "ok", "num_queued": num_queued, "num_batches": self.num_batches,
+                "num_folded": self.num_folded}
+
+
+def main(args):
+    service = AlphaFoldService(args.work_dir, args.msa_dir, args.xla_cache_dir, args.data_dir, args.num_models,
+                               args.max_batch_size, args.batch_wait)
+    routes = {
+        ("GET", "/health"): service.health,
+        ("POST", "/fold"): service.fold,
+    }
+    serve(args.socket_path, routes, idle_timeout=args.idle_timeout)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Queue-backed AlphaFold2 service on a Unix socket")
+    parser.add_argument("--socket_path", type=str, required=True, help="Path to the Unix socket")
+    parser.add_argument("--work_dir", type=str, required=True, help="Directory of the batches")
+    parser.add_argument("--msa_dir", type=str, default=None, help="Local MSA directory")
+    parser.add_argument("--xla_cache_dir", type=str, default=None,
+                        help="Directory of the persistent XLA compilation cache")
+    parser.add_argument("--data_dir", type=str, default=None,
+                        help="Directory of the AlphaFold2 weights. Default: the one of colabfold")
+    parser.add_argument("--num_models", type=int, default=5, help="Number of models to fold each sequence with")
+    parser.add_argument("--max_batch_size", type=int, default=8, help="Maximum number of sequences in a batch")
+    parser.add_argument("--batch_wait", type=float, default=2.,
+                        help="Seconds to wait for more requests before a batch starts")
+    parser.add_argument("--idle_timeout", type=float, default=None,
+                        help="Exit after being idle for this many seconds")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    EXAMPLE:
+    python server.py    --socket_path /tmp/alphafold2.sock \
+                        --work_dir /tmp/alphafold2 \
+                        --msa_dir outputs/alphafold2_cache/msa \
+                        --xla_cache_dir outputs/alphafold2_cache/xla
+    """
+    main(get_args())
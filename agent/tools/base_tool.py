@@ -1,29 +1,68 @@
 import os
+import sys
 import time
+import asyncio
 import json
-import torch
+import uuid
 import yaml
-import multiprocessing as mp
+import logging
+import threading
 import copy
 
+from collections import OrderedDict, deque
 from easydict import EasyDict
 from agent.tools.type_check import type_check
-from agent.utils.others import kill_process
+from agent.tools.tool_job import ToolJob, JOB_STATUS
+from agent.tools.log_tail import LogTail
+from agent.tools.result_channel import wait_channels
+from agent.tools.result_cache import ResultCache
+from agent.tools.scheduler import ResourceScheduler
+from agent.tools.worker_pool import ToolWorker, DEFAULT_IDLE_TIMEOUT
+
+logger = logging.getLogger(__name__)
 
 # Timeout for the tool running process is set to 30 min
 TOOL_TIMEOUT = 18000
 
+# Seconds a cancelled job gets to exit after SIGTERM before it is killed
+CANCEL_GRACE_PERIOD = 5
+
+# Number of finished jobs whose results are kept
+MAX_FINISHED_JOBS = 100
+
+# Seconds between two checks of a growing log file. Results are received without waiting for the next check
+LOG_POLL_INTERVAL = 0.2
+
+# Objects (e.g. loaded models) that stay alive for the lifetime of a tool worker process
+_resident_objects = {}
+
 
 class BaseTool:
     def __init__(self,
                  config_path: str,
                  out_dir: str = None,
-                 enable_quick_run: bool = False):
+                 enable_quick_run: bool = False,
+                 use_worker: bool = True,
+                 worker_idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+                 max_concurrency: int = 1,
+                 result_cache: ResultCache = None,
+                 scheduler: ResourceScheduler = None):
         """
         Args:
             config_path: Path to the ".yaml" config file
             out_dir: Directory to save all output files
             enable_quick_run: If True, the tool will run in quick mode if the config file has an example output
+            use_worker: If True, the tool runs in a persistent worker process instead of a fresh process per call.
+                Tools can opt out by setting "persistent_worker: false" in their config file
+            worker_idle_timeout: The persistent worker exits after being idle for this many seconds. None keeps it
+                running until the tool is closed
+            max_concurrency: Maximum number of jobs of this tool running at the same time. Tools can override it
+                by setting "max_concurrency" in their config file
+            result_cache: Cache to reuse the results of identical calls. Non-deterministic tools opt out by setting
+                "result_cache: false" in their config file. Tools whose results change over time, e.g. those querying
+                online databases, set "result_cache_ttl_hours" to let their entries expire
+            scheduler: Scheduler that shares the CPU cores, memory and GPUs between jobs. The resources of a job
+                are declared in the "resources" block of the config file
         """
         
         self.enable_quick_run = enable_quick_run
@@ -36,15 +75,63 @@ class BaseTool:
         if self.out_dir is not None:
             os.makedirs(self.out_dir, exist_ok=True)
 
-        # Multi-processing variables
-        self.process = None
-        self.results = mp.Manager().dict()
-        self.mp_log_path = mp.Manager().Value(str, "")
+        # Worker variables. Each worker runs one job at a time
+        self.use_worker = use_worker and self.config.get("persistent_worker", True)
+        self.worker_idle_timeout = worker_idle_timeout
+        self.max_concurrency = self.config.get("max_concurrency", max_concurrency)
+        self.workers = []
+        self.in_worker = False
+
+        # Resource variables
+        self.scheduler = scheduler
+        self.resources = self.config.get("resources", {})
+
+        # Job variables
+        self.jobs = OrderedDict()
+        self.job_lock = threading.RLock()
+        self.last_job_id = None
+        self.results = {}
+        self.result_cache = result_cache if self.config.get("result_cache", True) else None
+        ttl_hours = self.config.get("result_cache_ttl_hours")
+        self.result_cache_ttl = ttl_hours * 3600 if ttl_hours is not None else None
+
+        # Variables of the job running in the current process
+        self.job_id = None
+        self.run_id = None
+        self.cache_key = None
+        self.cpu_ids = None
+        self.gpu_ids = None
+        self.channel = None
         if type(self.config.document) is not list:
             self.tool_name = self.config.document["tool_name"]
         else:
             self.tool_name = None
     
+    def get_num_threads(self, requested: int = None) -> int:
+        """
+        Number of threads for the current job. Commands launched by the tool should use it for their thread options
+        Args:
+            requested: Number of threads asked for by the caller. It is used when the job is not scheduled, since a
+                scheduled job already gets the cores it asked for
+        """
+        if self.cpu_ids is not None:
+            return len(self.cpu_ids)
+
+        if requested is not None:
+            return requested
+
+        return self.resources.get("cpus", 1)
+
+    @property
+    def device(self) -> str:
+        """
+        Device for the current job. A GPU worker only sees its own GPUs, so the first one is always "cuda:0"
+        """
+        if self.gpu_ids is None:
+            return self.config.get("device", "cuda:0")
+
+        return "cuda:0" if self.gpu_ids else "cpu"
+
     def set_out_dir(self, out_dir: str):
         """
         Set the output directory
@@ -52,13 +139,17 @@ class BaseTool:
         self.out_dir = out_dir
         os.makedirs(self.out_dir, exist_ok=True)
 
-    def reset_mp_vars(self):
+    def get_resident(self, key, loader):
         """
-        Reset the multi-processing variables
+        Get an object that stays loaded between calls when the tool runs in a persistent worker
+        Args:
+            key: Key of the object, e.g. the model path
+
+            loader: Function to load the object if it is not loaded yet
         """
-        self.process = None
-        self.results.clear()
-        self.mp_log_path.value = ""
+        if key not in _resident_objects:
+            _resident_objects[key] = loader()
+        return _resident_objects[key]
 
     def get_document(self):
         """
@@ -77,6 +168,22 @@ class BaseTool:
     def __call__(self, *args, **kwargs):
         raise NotImplementedError
 
+    def batch_call(self, tool_args_list: list):
+        """
+        Optional native implementation that runs many inputs at once, e.g. by batching them on the GPU. Tools that
+        override it get all inputs of "call_batch" in one job instead of one job per input
+        Args:
+            tool_args_list: Valid arguments of each input
+
+        Returns:
+            A generator of (index, results) tuples, where index is the position of the input in tool_args_list
+        """
+        raise NotImplementedError
+
+    @property
+    def has_batch_call(self) -> bool:
+        return type(self).batch_call is not BaseTool.batch_call
+
     def check_input(self, tool_args) -> dict:
         """
         Check the input of the tool
@@ -123,16 +230,26 @@ class BaseTool:
         else:
             return {}
 
+    def start_run(self):
+        """
+        Set the run id and the log path of the current job and send the log path back to the agent process
+        """
+        # Name of the run directory of the job. The job id keeps it unique when several jobs start at the same time
+        job_id = self.job_id if self.job_id is not None else uuid.uuid4().hex[:8]
+        now = time.strftime("%Y%m%d_%H%M%S", time.localtime())
+        self.run_id = f"{now}_{job_id}"
+
+        self.log_path = f"{self.out_dir}/{self.tool_name}/run-{self.tool_name}-{self.run_id}.log"
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        self.send("log_path", self.log_path)
+
     def run(self, **tool_arg):
         """
         Call the tool and return the output
         Returns:
             obs: The output of the tool
         """
-        now = time.strftime("%Y-%m-%d-%H-%M-%S", time.localtime())
-        self.log_path = f"{self.out_dir}/{self.tool_name}/run-{self.tool_name}-{now}.log"
-        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
-        self.mp_log_path.value = self.log_path
+        self.start_run()
         try:
             # Check input and return error if invalid
             results = self.check_input(tool_arg)
@@ -148,8 +265,102 @@ class BaseTool:
         except Exception as e:
             results = {"error": str(e)}
 
-        self.results.update(results)
+        if self.cache_key is not None and "error" not in results:
+            self.store_cache(results)
+
+        self.results = dict(results)
+        self.send("results", self.results)
+        return results
+
+    def run_batch(self, tool_args_list: list):
+        """
+        Run a list of inputs through the native batch implementation. The results of each input are sent back as
+        soon as they are ready, followed by the results of the whole batch
+        Args:
+            tool_args_list: Arguments of each input
+        """
+        self.start_run()
+
+        # Invalid inputs get their error right away and are left out of the batch
+        indices = []
+        for index, tool_args in enumerate(tool_args_list):
+            try:
+                error_dict = self.check_input(tool_args)
+            except Exception as e:
+                error_dict = {"error": str(e)}
+
+            if error_dict:
+                self.send("item_results", (index, error_dict))
+            else:
+                indices.append(index)
+
+        results = {}
+        try:
+            if indices:
+                for i, item_results in self.batch_call([tool_args_list[index] for index in indices]):
+                    self.send("item_results", (indices[i], dict(item_results)))
+
+        except Exception as e:
+            results = {"error": str(e)}
+
+        self.results = results
+        self.send("results", self.results)
         return results
+
+    def store_cache(self, results: dict):
+        """
+        Store the results of the current job in the result cache
+        """
+        try:
+            log = ""
+            if os.path.exists(self.log_path):
+                with open(self.log_path, "r") as r:
+                    log = r.read()
+
+            self.result_cache.store(self.cache_key, self.tool_name, self.run_id, self.out_dir, results, log)
+
+        except Exception as e:
+            logger.warning(f"Failed to cache the results of {self.tool_name}: {e}")
+
+    def load_cache(self, job: ToolJob) -> bool:
+        """
+        Finish a job with the cached results of an identical call
+        Returns:
+            True if the job was found in the cache
+        """
+        try:
+            job.cache_key = self.result_cache.make_key(self.tool_name, self.config, job.tool_args, self.out_dir)
+            entry = self.result_cache.lookup(self.tool_name, job.cache_key, self.result_cache_ttl)
+            if entry is None:
+                return False
+
+            now = time.strftime("%Y%m%d_%H%M%S", time.localtime())
+            run_id = f"{now}_{job.job_id}"
+            results, log = self.result_cache.materialize(job.cache_key, entry, self.out_dir, run_id)
+
+        except Exception as e:
+            logger.warning(f"Failed to look up the result cache of {self.tool_name}: {e}")
+            job.cache_key = None
+            return False
+
+        log_path = f"{self.out_dir}/{self.tool_name}/run-{self.tool_name}-{run_id}.log"
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        with open(log_path, "w") as w:
+            w.write(log)
+            w.write("Loaded the cached results of an identical call\n")
+
+        job.log_path = log_path
+        job.cached = True
+        job.start_time = time.time()
+        job.finish(results)
+        return True
+
+    def send(self, key: str, value):
+        """
+        Send a message of the current job back to the agent process
+        """
+        if self.channel is not None:
+            self.channel.send(self.job_id, key, value)
     
     def quick_run(self) -> dict:
         obs = "Successfully finished the tool call\n"
@@ -159,85 +370,462 @@ class BaseTool:
         
         return self.config.example_output
     
-    def get_result(self):
+    def get_result(self, job_id: str = None):
         """
         Get the result of the tool
+        Args:
+            job_id: ID of the job. Defaults to the last job started by mp_run
         """
+        job_id = job_id if job_id is not None else self.last_job_id
+        if job_id in self.jobs:
+            return self.jobs[job_id].results
+
         return self.results
 
-    def mp_run(self, *args, **kwargs) -> str:
+    def get_job(self, job_id: str) -> ToolJob:
         """
-        Call the tool in a multi-processing way
+        Get a job by id
         """
-        self.reset_mp_vars()
+        return self.jobs[job_id]
 
-        start_time = time.time()
-        self.process = mp.Process(target=self.run, args=args, kwargs=kwargs)
-        self.process.start()
+    def submit(self, **tool_args) -> str:
+        """
+        Submit a job of the tool. The job starts as soon as a worker is free
+        Args:
+            **tool_args: Arguments for the tool
 
-        # Wait for the log file to be created by the child process
-        while self.mp_log_path.value == "":
-            time.sleep(0.1)
-        self.log_path = self.mp_log_path.value
-        
-        # Constantly read the running log
-        while len(self.results) == 0 and self.process is not None:
-            # Read the log file
-            if os.path.exists(self.log_path):
-                with open(self.log_path, "r") as r:
-                    log = r.read()
+        Returns:
+            The job id
+        """
+        job = ToolJob(tool_args)
+        if self.result_cache is not None and not self.enable_quick_run:
+            self.load_cache(job)
+
+        return self.enqueue(job)
+
+    def enqueue(self, job: ToolJob) -> str:
+        """
+        Add a job to the queue and start it if a worker is free
+        """
+        with self.job_lock:
+            self.jobs[job.job_id] = job
+
+            # Forget the oldest finished jobs
+            finished_ids = [job_id for job_id, job in self.jobs.items() if job.is_done]
+            for job_id in finished_ids[:-MAX_FINISHED_JOBS]:
+                del self.jobs[job_id]
+
+            self.dispatch()
+
+        return job.job_id
+
+    def start_worker(self, gpu_ids: list = None) -> ToolWorker:
+        """
+        Start a worker. If persistent workers are disabled, the worker exits after one job
+        Args:
+            gpu_ids: GPUs visible to the worker. If None, the worker sees all GPUs
+        """
+        if self.use_worker:
+            worker = ToolWorker(self, idle_timeout=self.worker_idle_timeout, gpu_ids=gpu_ids)
+        else:
+            worker = ToolWorker(self, max_jobs=1, gpu_ids=gpu_ids)
+
+        self.workers.append(worker)
+        return worker
+
+    def get_resource_request(self, tool_args: dict) -> dict:
+        """
+        Get the resources of a job from the "resources" block of the config file. If "cpus_arg" is set, the number
+        of CPU cores is taken from that argument when it is given. Jobs of tools that declare no CPU cores are not
+        pinned
+        """
+        request = {
+            "cpus": self.resources.get("cpus", 0),
+            "memory_gb": self.resources.get("memory_gb", 0),
+            "gpus": self.resources.get("gpus", 0),
+        }
+
+        cpus_arg = self.resources.get("cpus_arg")
+        if cpus_arg is not None and tool_args.get(cpus_arg) is not None:
+            request["cpus"] = int(tool_args[cpus_arg])
+
+        return request
+
+    def assign_worker(self, job: ToolJob) -> tuple:
+        """
+        Find a worker and reserve the resources for a pending job
+        Returns:
+            The worker and the allocation, or (None, None) if the job has to wait
+        """
+        idle_workers = [worker for worker in self.workers if worker.is_idle()]
+        if self.scheduler is None:
+            if idle_workers:
+                return idle_workers[0], None
+
+            if len(self.workers) < self.max_concurrency:
+                return self.start_worker(), None
+
+            return None, None
+
+        # A worker keeps its GPUs for its whole life, since CUDA cannot switch devices once it is initialized
+        request = self.get_resource_request(job.tool_args)
+        for worker in idle_workers:
+            allocation = self.scheduler.acquire(job.job_id, request, job.submit_time, gpu_ids=worker.gpu_ids)
+            if allocation is not None:
+                return worker, allocation
+
+        if len(self.workers) >= self.max_concurrency and not idle_workers:
+            # The job waits for a worker of its own tool rather than for resources, so it must not keep the jobs of
+            # other tools from starting ahead of it
+            self.scheduler.discard(job.job_id)
+            return None, None
+
+        allocation = self.scheduler.acquire(job.job_id, request, job.submit_time)
+        if allocation is None:
+            return None, None
+
+        # Replace an idle worker whose GPUs are busy
+        if len(self.workers) >= self.max_concurrency:
+            idle_workers[0].close()
+            self.workers.remove(idle_workers[0])
+
+        return self.start_worker(allocation.gpu_ids), allocation
+
+    def dispatch(self):
+        """
+        Collect the results of running jobs and assign pending jobs to free workers
+        """
+        with self.job_lock:
+            for worker in self.workers:
+                job = worker.job
+                if job is None:
+                    continue
+
+                # Check the running jobs, in case nobody is streaming them
+                job.receive()
+                if job.is_done or worker.is_alive():
+                    continue
+
+                # The worker exited without finishing the job
+                job.receive()
+                if job.is_done:
+                    continue
+
+                # An idle worker may time out right before receiving the job. Resubmit the job once
+                if self.use_worker and job.log_path is None and not job.resubmitted:
+                    job.resubmitted = True
+                    job.status = JOB_STATUS.PENDING
+                    job.worker = None
+                    worker.job = None
+                    job.release()
+
+                else:
+                    job.finish({"error": "The tool process exited unexpectedly"})
+
+            # Remove exited workers
+            for worker in self.workers:
+                if not worker.is_alive():
+                    worker.close()
+            self.workers = [worker for worker in self.workers if worker.is_alive()]
+
+            for job in self.jobs.values():
+                if job.status != JOB_STATUS.PENDING:
+                    continue
+
+                worker, allocation = self.assign_worker(job)
+                if worker is None:
+                    continue
+
+                job.allocation = allocation
+                worker.submit(job, self.out_dir)
+                job.status = JOB_STATUS.RUNNING
+                job.start_time = time.time()
+
+    def stream(self, job_id: str):
+        """
+        Stream the running log of a job until it finishes. Each observation only carries the text appended since the
+        previous one, so joining all observations gives the full log followed by the results:
+        "Running log: \n{log}\n\nResults: \n{results}"
+        Args:
+            job_id: ID of the job
+
+        Returns:
+            obs: The appended part of the observation
+        """
+        job = self.jobs[job_id]
+
+        # Wait for the job to start and create its log file
+        while job.log_path is None and not job.is_done:
+            self.dispatch()
+            if job.status == JOB_STATUS.PENDING:
+                time.sleep(0.1)
             else:
-                log = "No log file"
-            
-            if time.time() - start_time > TOOL_TIMEOUT:
-                # Remove the absolute path from the log
-                log = log.replace(self.out_dir + '/', "")
-
-                obs = "Running log: \n" \
-                      f"{log}\n\n" \
-                      f"Results: \n" \
-                      "{{\"error\": \"Timeout\"}}"
-                yield obs
-                
-                os.remove(self.log_path)
-                self.reset_mp_vars()
-                self.terminate()
-                return
-            
+                job.receive(0.1)
+
+        if job.log_path is None:
             obs = "Running log: \n" \
-                  f"{log}\n\n"
+                  "No log file\n\n" \
+                  f"Results: \n" \
+                  f"{job.results}"
             yield obs
-            time.sleep(1)
+            return
 
-        # Read the final log file when the process is done
-        if os.path.exists(self.log_path):
-            with open(self.log_path, "r") as r:
-                log = r.read()
-            os.remove(self.log_path)
+        yield "Running log: \n"
+        if job.queue_wait >= 1:
+            yield f"Waited {job.queue_wait:.1f} s in the queue for resources\n"
 
-        else:
-            log = "No log file"
+        # Follow the log file until the job is done
+        tail = LogTail(job.log_path)
+        while not job.is_done:
+            self.dispatch()
+            if job.is_done:
+                break
+
+            if time.time() - job.start_time > TOOL_TIMEOUT:
+                self.cancel(job_id, error="Timeout")
+                break
 
-        # Remove the absolute path from the log
-        log = log.replace(self.out_dir + '/', "")
+            # Remove the absolute path from the log
+            log = tail.read().replace(self.out_dir + '/', "")
+            if log:
+                yield log
 
+            # Wake up as soon as the results arrive
+            job.receive(LOG_POLL_INTERVAL)
 
-        obs = "Running log: \n" \
-              f"{log}\n\n" \
+        # Read the rest of the log when the process is done
+        log = tail.read(final=True).replace(self.out_dir + '/', "")
+        if os.path.exists(job.log_path):
+            os.remove(job.log_path)
+
+        obs = f"{log}\n\n" \
               f"Results: \n" \
-              f"{self.results}"
+              f"{job.results}"
         yield obs
 
-        
+    def mp_run(self, **tool_args) -> str:
+        """
+        Call the tool in a multi-processing way
+        """
+        self.last_job_id = self.submit(**tool_args)
+        yield from self.stream(self.last_job_id)
+
+    async def async_stream(self, job_id: str):
+        """
+        Async counterpart of "stream". The event loop is never blocked while waiting for the job, so a single thread
+        can follow many running jobs
+        Args:
+            job_id: ID of the job
+
+        Returns:
+            obs: The appended part of the observation
+        """
+        job = self.jobs[job_id]
+
+        # Wait for the job to start and create its log file
+        while job.log_path is None and not job.is_done:
+            self.dispatch()
+            await job.receive_async(0.1)
+
+        if job.log_path is None:
+            obs = "Running log: \n" \
+                  "No log file\n\n" \
+                  f"Results: \n" \
+                  f"{job.results}"
+            yield obs
+            return
+
+        yield "Running log: \n"
+        if job.queue_wait >= 1:
+            yield f"Waited {job.queue_wait:.1f} s in the queue for resources\n"
+
+        # Follow the log file until the job is done
+        tail = LogTail(job.log_path)
+        while not job.is_done:
+            self.dispatch()
+            if job.is_done:
+                break
+
+            if time.time() - job.start_time > TOOL_TIMEOUT:
+                # Stopping the worker may take up to the grace period
+                await asyncio.to_thread(self.cancel, job_id, "Timeout")
+                break
+
+            # Remove the absolute path from the log
+            log = tail.read().replace(self.out_dir + '/', "")
+            if log:
+                yield log
+
+            # Wake up as soon as the results arrive
+            await job.receive_async(LOG_POLL_INTERVAL)
+
+        # Read the rest of the log when the process is done
+        log = tail.read(final=True).replace(self.out_dir + '/', "")
+        if os.path.exists(job.log_path):
+            os.remove(job.log_path)
+
+        obs = f"{log}\n\n" \
+              f"Results: \n" \
+              f"{job.results}"
+        yield obs
+
+    async def async_mp_run(self, **tool_args):
+        """
+        Async counterpart of "mp_run". The job is cancelled if the caller stops iterating before it finishes, e.g.
+        when the client of a server disconnects
+        """
+        self.last_job_id = self.submit(**tool_args)
+        job = self.get_job(self.last_job_id)
+        try:
+            async for obs in self.async_stream(job.job_id):
+                yield obs
+
+        finally:
+            if not job.is_done:
+                await asyncio.to_thread(self.cancel, job.job_id)
+
+    def mp_run_batch(self, tool_args_list: list, max_in_flight: int = None):
+        """
+        Call the tool on a list of inputs. Tools with a native batch implementation run all inputs in one job.
+        Otherwise each input becomes a job, and at most "max_in_flight" of them are submitted at the same time
+        Args:
+            tool_args_list: Arguments of each input
+
+            max_in_flight: Maximum number of submitted jobs. Defaults to twice the concurrency of the tool
+
+        Returns:
+            A generator of (index, results) tuples in completion order, where index is the position of the input
+            in tool_args_list
+        """
+        quick_run = self.enable_quick_run and hasattr(self.config, "example_output")
+        if self.has_batch_call and not quick_run:
+            yield from self.stream_batch(tool_args_list)
+            return
+
+        max_in_flight = max_in_flight if max_in_flight is not None else 2 * self.max_concurrency
+        inputs = deque(enumerate(tool_args_list))
+        # The job objects are kept, since finished jobs may be dropped from self.jobs
+        running = {}
+        while inputs or running:
+            while inputs and len(running) < max(1, max_in_flight):
+                index, tool_args = inputs.popleft()
+                running[index] = self.get_job(self.submit(**tool_args))
+
+            self.dispatch()
+            finished = []
+            for index, job in running.items():
+                if not job.is_done and job.start_time is not None and time.time() - job.start_time > TOOL_TIMEOUT:
+                    self.cancel(job.job_id, error="Timeout")
+
+                if job.is_done:
+                    finished.append(index)
+
+            for index in finished:
+                job = running.pop(index)
+                if job.log_path is not None and os.path.exists(job.log_path):
+                    os.remove(job.log_path)
+                yield index, job.results
+
+            # Wake up as soon as one of the running jobs sends a message
+            if not finished:
+                channels = [job.worker.channel for job in running.values() if job.worker is not None]
+                wait_channels(channels, LOG_POLL_INTERVAL)
+
+    def stream_batch(self, tool_args_list: list):
+        """
+        Run all inputs in one job through the native batch implementation of the tool
+        Args:
+            tool_args_list: Arguments of each input
+
+        Returns:
+            A generator of (index, results) tuples in completion order
+        """
+        job = ToolJob({"tool_args_list": tool_args_list}, method="run_batch")
+        self.enqueue(job)
+
+        done_indices = set()
+        while True:
+            self.dispatch()
+            while job.item_results:
+                index, results = job.item_results.pop(0)
+                done_indices.add(index)
+                yield index, results
+
+            if job.is_done:
+                break
+
+            if job.start_time is not None and time.time() - job.start_time > TOOL_TIMEOUT:
+                self.cancel(job.job_id, error="Timeout")
+                continue
+
+            if job.worker is not None:
+                job.receive(LOG_POLL_INTERVAL)
+            else:
+                time.sleep(LOG_POLL_INTERVAL)
+
+        # Inputs without results share the error of the batch
+        error = job.results.get("error", "The batch finished without results for this input")
+        for index in range(len(tool_args_list)):
+            if index not in done_indices:
+                yield index, {"error": error}
+
+        if job.log_path is not None and os.path.exists(job.log_path):
+            os.remove(job.log_path)
+
+    def cancel(self, job_id: str, error: str = "The job was cancelled"):
+        """
+        Cancel a job. A running job is stopped by killing its worker
+        Args:
+            job_id: ID of the job
+
+            error: Error message saved as the result of the job
+        """
+        with self.job_lock:
+            job = self.jobs[job_id]
+            if job.is_done:
+                return
+
+            worker = job.worker if job.status == JOB_STATUS.RUNNING else None
+            # A removed worker is never given another job
+            if worker is not None and worker in self.workers:
+                self.workers.remove(worker)
+
+            if self.scheduler is not None:
+                self.scheduler.discard(job_id)
+
+            # The resources stay reserved until the worker is dead
+            allocation = job.allocation
+            job.allocation = None
+            job.finish({"error": error}, status=JOB_STATUS.CANCELLED)
+            # Late messages of the killed worker are ignored
+            job.worker = None
+
+        # Killing takes up to the grace period, so it runs without the lock to keep the other jobs dispatched
+        if worker is not None:
+            worker.kill(CANCEL_GRACE_PERIOD)
+            worker.close()
+
+        if allocation is not None:
+            allocation.release()
+
     def terminate(self):
         """
-        Terminate the tool running process
+        Terminate all running and pending jobs of the tool
         """
-        if self.process is not None:
-            while self.process.is_alive():
-                kill_process(self.process.pid)
+        unfinished_ids = [job_id for job_id, job in self.jobs.items() if not job.is_done]
+        for job_id in unfinished_ids:
+            self.cancel(job_id)
 
-            self.reset_mp_vars()
-        
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
+        # Only release cached GPU memory if the tool runs models in this process
+        torch = sys.modules.get("torch")
+        if unfinished_ids and torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def close_workers(self):
+        """
+        Shut down all workers
+        """
+        with self.job_lock:
+            for worker in self.workers:
+                worker.close()
+            self.workers = []
@@ -79,8 +79,7 @@ if __name__ == '__main__':
 
     for obs in biorxiv.mp_run(**input_args):
        
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
         # biorxiv.terminate()
         # pass
\ No newline at end of file
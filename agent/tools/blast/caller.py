@@ -7,7 +7,6 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 import shlex
 import re
 
@@ -16,7 +15,6 @@ from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -31,7 +29,7 @@ class Blast(BaseTool):
     
     def __call__(self, query_sequence, blast_program="blastp", blast_database="nr", hitlist_size=50, expect_value=10) -> dict:
         start = datetime.datetime.now()
-        now = start.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         save_path = f"{self.out_dir}/blast/{now}/result.xml"
         fasta_path = f"{self.out_dir}/blast/{now}/result.fasta"
         os.makedirs(os.path.dirname(save_path), exist_ok=True)
@@ -194,8 +192,7 @@ if __name__ == '__main__':
     }
 
     for obs in blast.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
         # blast.terminate()
     
\ No newline at end of file
@@ -8,7 +8,6 @@ import os
 import datetime
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
 from Bio import SeqIO
 
 from agent.tools.base_tool import BaseTool
@@ -63,7 +62,7 @@ class BuildDataset(BaseTool):
                 return {"error": f"FASTA file not found: {fasta_path}"}
         
         start_time = datetime.datetime.now()
-        timestamp = start_time.strftime("%Y%m%d_%H%M%S")
+        timestamp = self.run_id
         save_dir = f"{self.out_dir}/build_dataset/{timestamp}"
         
         if not os.path.exists(save_dir):
@@ -121,5 +120,4 @@ if __name__ == '__main__':
     }
     
     for obs in caller.mp_run(**input_args):
-        os.system("clear")
-        print(obs) 
\ No newline at end of file
+        print(obs, end="") 
\ No newline at end of file
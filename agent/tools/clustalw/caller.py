@@ -8,13 +8,11 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -31,7 +29,7 @@ class Clustalw(BaseTool):
         sequence_path = f"{self.out_dir}/{sequence_path}"
         
         start = datetime.datetime.now()
-        now = start.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         
         clustalw_path = f"{ROOT_DIR}/{self.config['clustalw2']}"
             
@@ -84,8 +82,7 @@ if __name__ == '__main__':
     }
 
     for obs in clustalw.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
         # clustalw.terminate()
     
\ No newline at end of file
@@ -8,16 +8,43 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 import json
+import tempfile
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
+from agent.tools.service import ServiceClient
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
+def get_service(config, device: str) -> ServiceClient:
+    """
+    Get the client of the DeepAb service, or None if the service is disabled. The service is started on first use
+    Args:
+        config: Config of the DeepAb tool
+
+        device: Device to run the ensemble if the service has to be started
+    """
+    service_config = config.get("service", {})
+    if not service_config.get("enabled", False):
+        return None
+
+    socket_path = service_config.get("socket_path") or f"{tempfile.gettempdir()}/deepab-{os.getuid()}.sock"
+    start_cmd = [
+        config["python"], f"{BASE_DIR}/server.py",
+        "--socket_path", socket_path,
+        "--device", device,
+        "--max_models", str(service_config.get("max_models", 1)),
+    ]
+    if service_config.get("num_workers") is not None:
+        start_cmd += ["--num_workers", str(service_config.num_workers)]
+    if service_config.get("idle_timeout") is not None:
+        start_cmd += ["--idle_timeout", str(service_config.idle_timeout)]
+
+    return ServiceClient(socket_path, start_cmd, start_timeout=service_config.get("start_timeout", 600))
+
+
 @register_tool
 class Deepab(BaseTool):
     def __init__(self, out_dir: str = f"{ROOT_DIR}/outputs/deepab",**kwargs):
@@ -28,8 +55,7 @@ class Deepab(BaseTool):
         )
     
     def __call__(self, heavy_chain_sequence, light_chain_sequence, decoys=5, renumber=True) -> dict:
-        now = datetime.datetime.now()
-        now = now.strftime("%Y%m%d_%H%M")
+        now = self.run_id
 
         pred_dir = f"{self.out_dir}/deepab/{now}"
         os.makedirs(pred_dir, exist_ok=True)
@@ -50,8 +76,24 @@ class Deepab(BaseTool):
                                         --single_chain {single_chain} \
                                         --model_dir {shlex.quote(model_dir)} \
                                         > {self.log_path} 2>&1"
+        service = get_service(self.config, self.device)
         try:
-            os.system(cmd)  
+            if service is None:
+                os.system(cmd)
+            else:
+                with open(self.log_path, 'a') as f:
+                    f.write("Connecting to the DeepAb service\n")
+                service.ensure_started()
+                result = service.request("POST", "/predict", {
+                    "fasta_file": fasta_file,
+                    "pred_dir": pred_dir,
+                    "model_dir": model_dir,
+                    "decoys": decoys,
+                    "renumber": renumber,
+                    "single_chain": single_chain,
+                })
+                with open(self.log_path, 'a') as f:
+                    f.write("Stage timings (s): " + json.dumps(result["timings"]) + "\n")
         
             pdb_path = os.path.join(pred_dir, "pred.deepab.pdb")
             if os.path.exists(pdb_path):
@@ -94,6 +136,5 @@ if __name__ == '__main__':
     }
 
     for obs in deepab.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
     
\ No newline at end of file
@@ -1,5 +1,6 @@
 
 import os
+import time
 import argparse
 from datetime import datetime
 from glob import glob
@@ -26,26 +27,51 @@ def prog_print(text):
     print("*" * 50)
 
 
+def str2bool(value) -> bool:
+    return str(value).lower() == "true"
+
+
+# PyRosetta is initialized once per process. Workers of a resident pool refine many decoys
+PYROSETTA_INITIALIZED = False
+
+
+def init_pyrosetta():
+    global PYROSETTA_INITIALIZED
+    if not PYROSETTA_INITIALIZED:
+        pyrosetta.init(init_string)
+        PYROSETTA_INITIALIZED = True
+
+
 def refine_fv_(args):
     in_pdb_file, out_pdb_file, cst_defs = args
-    pyrosetta.init(init_string)
+    init_pyrosetta()
     return refine_fv(in_pdb_file, out_pdb_file, cst_defs)
 
 
-def build_structure(model,
-                    fasta_file,
-                    cst_defs,
-                    out_dir,
-                    target="pred",
-                    num_decoys=5,
-                    num_procs=os.cpu_count(),
-                    single_chain=False,
-                    device=None):
+def load_ensemble(model_dir, device):
+    """Loads all models of the ensemble in model_dir"""
+    model_files = sorted(glob(os.path.join(model_dir, "*.pt")))
+    if len(model_files) == 0:
+        raise FileNotFoundError("No model files found at: {}".format(model_dir))
+
+    return ModelEnsemble(model_files=model_files,
+                         load_model=load_model,
+                         eval_mode=True,
+                         device=device)
+
+
+def build_mds(model,
+              fasta_file,
+              out_dir,
+              target="pred",
+              single_chain=False,
+              device=None):
+    """Builds the initial MDS structure from the ensemble outputs"""
     decoy_dir = os.path.join(out_dir, "decoys")
     os.makedirs(decoy_dir, exist_ok=True)
 
     prog_print("Creating MDS structure")
-    pyrosetta.init(init_string)
+    init_pyrosetta()
     mds_pdb_file = os.path.join(decoy_dir, "{}.mds.pdb".format(target))
     build_initial_fv(fasta_file,
                      mds_pdb_file,
@@ -53,12 +79,30 @@ def build_structure(model,
                      single_chain=single_chain,
                      device=device)
 
+    return mds_pdb_file
+
+
+def refine_decoys(mds_pdb_file,
+                  cst_defs,
+                  out_dir,
+                  target="pred",
+                  num_decoys=5,
+                  num_procs=os.cpu_count(),
+                  pool=None):
+    """
+    Refines the decoys in parallel and keeps the one with the lowest score.
+    Decoys run on the given process pool, or on a new pool of num_procs processes
+    """
     prog_print("Creating decoys structures")
+    decoy_dir = os.path.join(out_dir, "decoys")
     decoy_pdb_pattern = os.path.join(decoy_dir,
                                      "{}.deepab.{{}}.pdb".format(target))
     refine_args = [(mds_pdb_file, decoy_pdb_pattern.format(i), cst_defs)
                    for i in range(num_decoys)]
-    decoy_scores = process_map(refine_fv_, refine_args, max_workers=num_procs)
+    if pool is None:
+        decoy_scores = process_map(refine_fv_, refine_args, max_workers=num_procs)
+    else:
+        decoy_scores = list(pool.map(refine_fv_, refine_args))
 
     best_decoy_i = np.argmin(decoy_scores)
     best_decoy_pdb = decoy_pdb_pattern.format(best_decoy_i)
@@ -72,6 +116,96 @@ def build_structure(model,
     return out_pdb
 
 
+def build_structure(model,
+                    fasta_file,
+                    cst_defs,
+                    out_dir,
+                    target="pred",
+                    num_decoys=5,
+                    num_procs=os.cpu_count(),
+                    single_chain=False,
+                    device=None,
+                    timings=None):
+    """
+    Builds the MDS structure and refines the decoys. Durations of the
+    stages are added to timings
+    """
+    timings = timings if timings is not None else {}
+
+    start = time.time()
+    mds_pdb_file = build_mds(model,
+                             fasta_file,
+                             out_dir,
+                             target=target,
+                             single_chain=single_chain,
+                             device=device)
+    timings["mds_s"] = round(time.time() - start, 3)
+
+    start = time.time()
+    out_pdb = refine_decoys(mds_pdb_file,
+                            cst_defs,
+                            out_dir,
+                            target=target,
+                            num_decoys=num_decoys,
+                            num_procs=num_procs)
+    timings["refine_s"] = round(time.time() - start, 3)
+
+    return out_pdb
+
+
+def save_timings(pred_dir, timings):
+    """Adds the durations of the stages to metrics.json"""
+    with open(f"{pred_dir}/metrics.json", "r", encoding="utf-8") as f:
+        metrics = json.load(f)
+    metrics["timings"] = timings
+    with open(f"{pred_dir}/metrics.json", "w", encoding="utf-8") as f:
+        json.dump(metrics, f, indent=4)
+
+
+def predict(model,
+            fasta_file,
+            pred_dir,
+            target="pred",
+            decoys=5,
+            num_procs=os.cpu_count(),
+            renumber=True,
+            single_chain=False,
+            device=None):
+    """
+    Predicts the Fv structure with a loaded ensemble and returns the
+    durations of the stages in seconds. They are also saved to metrics.json
+    """
+    start = time.time()
+    timings = {}
+
+    prog_print("Generating constraints")
+    cst_defs = get_cst_defs(model, fasta_file, device=device)
+    timings["constraints_s"] = round(time.time() - start, 3)
+
+    if decoys > 0:
+        pred_pdb = build_structure(model,
+                                   fasta_file,
+                                   cst_defs,
+                                   pred_dir,
+                                   target=target,
+                                   num_decoys=decoys,
+                                   num_procs=num_procs,
+                                   single_chain=single_chain,
+                                   device=device,
+                                   timings=timings)
+
+        if renumber:
+            renumber_start = time.time()
+            renumber_pdb(pred_pdb, pred_pdb)
+            timings["renumber_s"] = round(time.time() - renumber_start, 3)
+
+        timings["total_s"] = round(time.time() - start, 3)
+        save_timings(pred_dir, timings)
+
+    prog_print("Timings: " + ", ".join(f"{k}={v}" for k, v in timings.items()))
+    return timings
+
+
 def _get_args():
     """Gets command line arguments"""
 
@@ -115,10 +249,12 @@ def _get_args():
     )
     parser.add_argument(
         "--renumber",
+        type=str2bool,
         default=True,
         help="Convert final predicted structure to Chothia format using AbNum."
     )
     parser.add_argument("--single_chain",
+                        type=str2bool,
                         default=False,
                         help="Predict for fasta with only one chain")
     parser.add_argument(
@@ -127,6 +263,7 @@ def _get_args():
         default=None,
         help="Native PDB in Chothia format for measuring RMSDs.")
     parser.add_argument("--use_gpu",
+                        type=str2bool,
                         default=True,
                         help="Run model prediction on GPU.")
 
@@ -150,31 +287,21 @@ def deepab_main():
     ) and args.use_gpu else 'cpu'
     device = torch.device(device_type)
 
-    model_files = list(glob(os.path.join(model_dir, "*.pt")))
-    if len(model_files) == 0:
-        exit("No model files found at: {}".format(model_dir))
-
-    model = ModelEnsemble(model_files=model_files,
-                          load_model=load_model,
-                          eval_mode=True,
-                          device=device)
-
-    prog_print("Generating constraints")
-    cst_defs = get_cst_defs(model, fasta_file, device=device)
-
-    if decoys > 0:
-        pred_pdb = build_structure(model,
-                                   fasta_file,
-                                   cst_defs,
-                                   pred_dir,
-                                   target=target,
-                                   num_decoys=decoys,
-                                   num_procs=num_procs,
-                                   single_chain=single_chain,
-                                   device=device)
-
-        if renumber:
-            renumber_pdb(pred_pdb, pred_pdb)
+    try:
+        model = load_ensemble(model_dir, device)
+    except FileNotFoundError as e:
+        exit(str(e))
+
+    predict(model,
+            fasta_file,
+            pred_dir,
+            target=target,
+            decoys=decoys,
+            num_procs=num_procs,
+            renumber=renumber,
+            single_chain=single_chain,
+            device=device)
+    pred_pdb = os.path.join(pred_dir, "{}.deepab.pdb".format(target))
 
     if native_pdb is not None and os.path.exists(native_pdb):
         pose = pyrosetta.pose_from_pdb(pred_pdb)
@@ -10,6 +10,10 @@ from deepab.util.pdb import calc_dihedral
 from deepab.util.util import _aa_1_3_dict, get_heavy_seq_len, load_full_seq
 
 ARBITRARILY_LARGE_VALUE = 999
+# Number of pivots that "fill_dist_mat" relaxes at once
+FW_BLOCK_SIZE = 64
+# Largest intermediate tensor of a min-plus product
+MIN_PLUS_CHUNK_ELEMENTS = 1 << 24
 
 # def calc_dihedral(a_coord: torch.Tensor, b_coord: torch.Tensor,
 #                   c_coord: torch.Tensor,
@@ -68,16 +72,39 @@ def fix_bond_lengths(
     return dist_mat
 
 
-def fill_dist_mat(dist_mat: torch.Tensor) -> torch.Tensor:
+def min_plus(a: torch.Tensor, b: torch.Tensor) -> torch.Tensor:
     """
-    Fill sparse distance matrix using Floyd-Warshall shortest path algorithm
+    Min-plus product of matrices: out[i, j] = min_k a[i, k] + b[k, j]. Rows are processed in chunks so that the
+    broadcast sum stays below MIN_PLUS_CHUNK_ELEMENTS
+    """
+    rows_per_chunk = max(1, MIN_PLUS_CHUNK_ELEMENTS // (a.shape[1] * b.shape[1]))
+    out = torch.empty(a.shape[0], b.shape[1], dtype=a.dtype, device=a.device)
+    for start in range(0, a.shape[0], rows_per_chunk):
+        end = start + rows_per_chunk
+        out[start:end] = (a[start:end, :, None] + b[None]).amin(dim=1)
+
+    return out
+
+
+def fill_dist_mat(dist_mat: torch.Tensor, block_size: int = FW_BLOCK_SIZE) -> torch.Tensor:
+    """
+    Fill sparse distance matrix using blocked Floyd-Warshall shortest path algorithm.
+    For each block of pivots, the paths within the block are closed with the plain algorithm, and all pairs are then
+    relaxed through the block with two min-plus products. Path lengths i -> k and k -> j are taken from column and row
+    of the pivots, so the matrix does not need to be symmetric
     """
     dist_mat[dist_mat != dist_mat] = ARBITRARILY_LARGE_VALUE
-    for m in range(dist_mat.shape[0]):
-        o = dist_mat[m]
-        dist_mat = torch.min(torch.stack(
-            [dist_mat, o.unsqueeze(0) + o.unsqueeze(1)]),
-                             dim=0)[0]
+    for start in range(0, dist_mat.shape[0], block_size):
+        block = slice(start, start + block_size)
+
+        # Shortest paths between the pivots of the block
+        pivots = dist_mat[block, block].clone()
+        for m in range(pivots.shape[0]):
+            torch.minimum(pivots, pivots[:, m, None] + pivots[None, m, :], out=pivots)
+
+        # Paths i -> pivot -> ... -> pivot -> j
+        to_block = torch.minimum(dist_mat[:, block], min_plus(dist_mat[:, block], pivots))
+        torch.minimum(dist_mat, min_plus(to_block, dist_mat[block, :]), out=dist_mat)
 
     return dist_mat
 
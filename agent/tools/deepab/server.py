@@ -0,0 +1,170 @@
+import sys
+
+ROOT_DIR = __file__.rsplit("/", 4)[0]
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import os
+import time
+import torch
+import argparse
+import threading
+import multiprocessing as mp
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from agent.tools.deepab.command import (init_pyrosetta, load_ensemble, get_cst_defs, build_mds, refine_decoys,
+                                        renumber_pdb, save_timings, str2bool, prog_print)
+from agent.tools.service import current_request, serve
+
+
+class DeepAbService:
+    def __init__(self, device: str, num_workers: int = None, max_models: int = 1):
+        """
+        Keeps DeepAb model ensembles loaded and refines the decoys of the requests on a pool of PyRosetta processes.
+        The ensemble stages of a request run one at a time, while the decoys of a request are refined in parallel with
+        the ensemble stages of the next one
+        Args:
+            device: Device to run the ensemble
+
+            num_workers: Number of processes that refine decoys. Defaults to the number of CPUs the service may run on
+
+            max_models: Number of ensembles kept loaded. The least recently used ones are dropped
+        """
+        self.device = torch.device(device)
+        # The service is pinned to the cores reserved for services, so size the pool from the affinity
+        self.num_workers = num_workers or len(os.sched_getaffinity(0))
+        self.max_models = max_models
+
+        self.models = OrderedDict()
+        # The ensemble runs one request at a time
+        self.lock = threading.Lock()
+        # Guards the pool and the counters
+        self.state_lock = threading.Lock()
+        self.pool = self.create_pool()
+        self.num_predicted = 0
+        # Total seconds spent in each stage, reported by /health
+        self.stage_totals = {}
+
+        # The MDS stage runs PyRosetta in the service process
+        init_pyrosetta()
+
+    def create_pool(self) -> ProcessPoolExecutor:
+        # Forking would copy the CUDA context of the ensemble
+        return ProcessPoolExecutor(self.num_workers, mp_context=mp.get_context("spawn"), initializer=init_pyrosetta)
+
+    def get_model(self, model_dir: str):
+        model_dir = os.path.abspath(model_dir)
+        if model_dir in self.models:
+            self.models.move_to_end(model_dir)
+            return self.models[model_dir]
+
+        if len(self.models) >= self.max_models:
+            self.models.popitem(last=False)
+
+        self.models[model_dir] = load_ensemble(model_dir, self.device)
+        return self.models[model_dir]
+
+    def predict(self, body: dict) -> dict:
+        """
+        Handle a prediction request. The body contains the arguments of "command.py"
+        """
+        start = time.time()
+        timings = {}
+        fasta_file = body["fasta_file"]
+        pred_dir = body["pred_dir"]
+        target = body.get("target", "pred")
+        decoys = int(body.get("decoys", 5))
+
+        # Requests that are cancelled or timed out while they wait for the ensemble are skipped
+        context = current_request()
+        context.acquire(self.lock)
+        try:
+            timings["queue_s"] = round(time.time() - start, 3)
+
+            stage_start = time.time()
+            model = self.get_model(body["model_dir"])
+            timings["load_s"] = round(time.time() - stage_start, 3)
+
+            stage_start = time.time()
+            prog_print("Generating constraints")
+            cst_defs = get_cst_defs(model, fasta_file, device=self.device)
+            timings["constraints_s"] = round(time.time() - stage_start, 3)
+
+            stage_start = time.time()
+            mds_pdb_file = build_mds(model, fasta_file, pred_dir, target=target,
+                                     single_chain=str2bool(body.get("single_chain", False)), device=self.device)
+            timings["mds_s"] = round(time.time() - stage_start, 3)
+        finally:
+            self.lock.release()
+
+        if decoys > 0:
+            # Do not occupy the refinement workers for a request that was given up during the ensemble stages
+            context.check()
+            stage_start = time.time()
+            pool = self.pool
+            try:
+                pred_pdb = refine_decoys(mds_pdb_file, cst_defs, pred_dir, target=target, num_decoys=decoys,
+                                         pool=pool)
+            except BrokenProcessPool:
+                # A worker that crashed breaks the pool. The next request gets a new one
+                with self.state_lock:
+                    if self.pool is pool:
+                        self.pool = self.create_pool()
+                raise RuntimeError("A DeepAb refinement worker crashed")
+            timings["refine_s"] = round(time.time() - stage_start, 3)
+
+            if str2bool(body.get("renumber", True)):
+                stage_start = time.time()
+                renumber_pdb(pred_pdb, pred_pdb)
+                timings["renumber_s"] = round(time.time() - stage_start, 3)
+
+            timings["total_s"] = round(time.time() - start, 3)
+            save_timings(pred_dir, timings)
+        else:
+            timings["total_s"] = round(time.time() - start, 3)
+
+        with self.state_lock:
+            self.num_predicted += 1
+            for stage, seconds in timings.items():
+                self.stage_totals[stage] = round(self.stage_totals.get(stage, 0) + seconds, 3)
+
+        print(f"Predicted {pred_dir}: " + ", ".join(f"{k}={v}" for k, v in timings.items()), flush=True)
+        return {"timings": timings}
+
+    def health(self, body: dict) -> dict:
+        return {"status": "ok", "device": str(self.device), "models": list(self.models),
+                "num_workers": self.num_workers, "num_predicted": self.num_predicted,
+                "stage_totals": self.stage_totals}
+
+
+def main(args):
+    service = DeepAbService(args.device, args.num_workers, args.max_models)
+    routes = {
+        ("GET", "/health"): service.health,
+        ("POST", "/predict"): service.predict,
+    }
+    serve(args.socket_path, routes, idle_timeout=args.idle_timeout)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Resident DeepAb service on a Unix socket")
+    parser.add_argument("--socket_path", type=str, required=True, help="Path to the Unix socket")
+    parser.add_argument("--device", type=str, default="cuda:0", help="Device to run the ensemble. Default: cuda:0")
+    parser.add_argument("--num_workers", type=int, default=None,
+                        help="Number of processes that refine decoys. Default: number of CPUs the service may run on")
+    parser.add_argument("--max_models", type=int, default=1, help="Number of ensembles kept loaded")
+    parser.add_argument("--idle_timeout", type=float, default=None,
+                        help="Exit after being idle for this many seconds")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    EXAMPLE:
+    python server.py    --socket_path /tmp/deepab.sock \
+                        --device "cuda:0"
+    """
+    main(get_args())
@@ -7,16 +7,61 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 import json
+import tempfile
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
+from agent.tools.service import ServiceClient
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
+def get_service(config, device: str) -> ServiceClient:
+    """
+    Get the client of the resident DiffAb worker, or None if it is disabled. The worker is shared by all DiffAb tools
+    and started on first use
+    Args:
+        config: Config of the DiffAb tools
+
+        device: Device to run the model if the worker has to be started
+    """
+    service_config = config.get("service", {})
+    if not service_config.get("enabled", False):
+        return None
+
+    socket_path = service_config.get("socket_path") or f"{tempfile.gettempdir()}/diffab-{os.getuid()}.sock"
+    start_cmd = [
+        config["python"], f"{BASE_DIR}/server.py",
+        "--socket_path", socket_path,
+        "--device", device,
+    ]
+    if service_config.get("num_workers") is not None:
+        start_cmd += ["--num_workers", str(service_config.num_workers)]
+    if service_config.get("idle_timeout") is not None:
+        start_cmd += ["--idle_timeout", str(service_config.idle_timeout)]
+
+    return ServiceClient(socket_path, start_cmd, start_timeout=service_config.get("start_timeout", 600))
+
+
+def service_run(service: ServiceClient, endpoint: str, job_args: dict, log_path: str):
+    """
+    Run a DiffAb job on the resident worker. The output of the job is written to the log file
+    Args:
+        service: Client of the worker
+
+        endpoint: "/design" or "/optimize"
+
+        job_args: Arguments of the command line script of the job
+
+        log_path: Path to the log file
+    """
+    with open(log_path, "w") as w:
+        w.write("Connecting to the DiffAb service\n")
+    service.ensure_started()
+    service.request("POST", endpoint, {"args": job_args, "log_path": log_path})
+
+
 @register_tool
 class DiffAbDesign(BaseTool):
     def __init__(self, out_dir: str = f"{ROOT_DIR}/outputs/diffab_design", **kwargs):
@@ -52,8 +97,7 @@ class DiffAbDesign(BaseTool):
         model_dir = self.get_model_dir(diffab_config)
         diffab_config = f"{BASE_DIR}/diffab/configs/{diffab_config}.yml"
         
-        now = datetime.datetime.now()
-        now = now.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         
         out_root = f"{self.out_dir}/diffab_design/{now}"
         os.makedirs(out_root, exist_ok=True)
@@ -80,8 +124,32 @@ class DiffAbDesign(BaseTool):
         # Redirect the stdout and stderr to a log file
         cmd += f" > {self.log_path} 2>&1"
         
+        service = get_service(self.config, self.device)
         try:
-            os.system(cmd)
+            if service is None:
+                os.system(cmd)
+            else:
+                job_args = {
+                    "antigen": antigen_structure,
+                    "antibody": antibody_template,
+                    "heavy": "H",
+                    "light": "L",
+                    "renumber": True,
+                    "hdock_bin": hdock_bin,
+                    "createpl_bin": createpl_bin,
+                    "config": diffab_config,
+                    "out_root": out_root,
+                    "tmp_root": tmp_root,
+                    "model_dir": model_dir,
+                    "decoys": int(decoys),
+                    "num_samples": int(num_samples),
+                    "tag": "",
+                    "seed": None,
+                    "relax_distance": int(relax_distance),
+                    "repeats": int(repeats),
+                    "batch_size": 32,
+                }
+                service_run(service, "/design", job_args, self.log_path)
             
             if os.path.exists(f"{out_root}/final_score.json"):
                 with open(f"{out_root}/final_score.json", "r") as f:
@@ -107,7 +175,6 @@ if __name__ == '__main__':
         "repeats":1
     }
     for obs in diffab_antigen_only.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
     
\ No newline at end of file
@@ -30,15 +30,26 @@ def args_from_cmdline():
     parser.add_argument('-b', '--batch_size', type=int, default=32)
     parser.add_argument('--relax_distance', type=int, default=6)
     parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--num_workers', type=int, default=None, help='Number of processes that score and relax the samples.')
     args = parser.parse_args()
     return args
 
-if __name__ == '__main__':
-    args = args_from_cmdline()
+def run_antigen_antibody(args):
+    """
+    Design the CDRs of an antibody-antigen complex and relax the best sample. Called by the script and by the resident
+    DiffAb worker
+    Args:
+        args: Arguments of the command line
+    """
     design_for_pdb(args)
     eval_pipeline(pdb_dir=args.out_root,
                   chain_h=args.heavy,
                   chain_l=args.light,
                   chain_a=args.antigen,
                   relax_distance=args.relax_distance,
-                  repeats=args.repeats)
\ No newline at end of file
+                  repeats=args.repeats,
+                  num_workers=args.num_workers)
+
+if __name__ == '__main__':
+    args = args_from_cmdline()
+    run_antigen_antibody(args)
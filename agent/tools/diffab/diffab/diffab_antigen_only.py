@@ -28,41 +28,22 @@ def args_factory(**kwargs):
     default_args.update(kwargs)
     return default_args
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--antigen', type=str, required=False, default="dataset/diffab/7DK2_AB_C.pdb")
-    parser.add_argument('--antibody', type=str, default='dataset/diffab/3QHF_Fv.pdb')
-    parser.add_argument('--heavy', type=str, default='H', help='Chain id of the heavy chain.')
-    parser.add_argument('--light', type=str, default='L', help='Chain id of the light chain.')
-    parser.add_argument('--renumber', default=True)
-    parser.add_argument('--hdock_bin', type=str, default='bin/diffab/hdock')
-    parser.add_argument('--createpl_bin', type=str, default='bin/diffab/createpl')
-    parser.add_argument('--config', type=str, default='model/diffab/configs/test/codesign_multicdrs.yml')
-    parser.add_argument('--out_root', type=str, default='outputs/diffab_antigen_only')
-    parser.add_argument('--tmp_root', type=str, default='tmp/diffab_antigen_only')
-    parser.add_argument('--model_dir', type=str, default='')
-    parser.add_argument('--decoys', type=int, default=10)
-    parser.add_argument('--num_samples', type=int, default=10)
-    parser.add_argument('--tag', type=str, default='')
-    parser.add_argument('--seed', type=int, default=None)
-    parser.add_argument('--device', type=str, default='cuda')
-    parser.add_argument('--relax_distance', type=int, default=6)
-    parser.add_argument('--repeats', type=int, default=3)
-    parser.add_argument('--batch_size', type=int, default=32)
-    args = parser.parse_args()
-
+def run_antigen_only(args):
+    """
+    Dock the antibody template to the antigen with HDOCK, design the CDRs of each decoy and relax the best sample.
+    Called by the script and by the resident DiffAb worker
+    Args:
+        args: Arguments of the command line
+    """
     hdock_missing = []
     if not os.path.exists(args.hdock_bin):
         hdock_missing.append(args.hdock_bin)
     if not os.path.exists(args.createpl_bin):
         hdock_missing.append(args.createpl_bin)
     if len(hdock_missing) > 0:
-        print("[WARNING] The following HDOCK applications are missing:")
-        for f in hdock_missing:
-            print(f" > {f}")
-        print("Please download HDOCK from http://huanglab.phys.hust.edu.cn/software/hdocklite/ "
-                "and put `hdock` and `createpl` to the above path.")
-        exit()
+        raise FileNotFoundError(f"The following HDOCK applications are missing: {', '.join(hdock_missing)}. "
+                                "Please download HDOCK from http://huanglab.phys.hust.edu.cn/software/hdocklite/ "
+                                "and put `hdock` and `createpl` to the above path.")
     antigen_name = os.path.basename(os.path.splitext(args.antigen)[0])
     docked_pdb_dir = os.path.join(args.tmp_root, antigen_name+'_dock')
     os.makedirs(docked_pdb_dir, exist_ok=True)
@@ -80,7 +61,7 @@ def main():
     for i, pdb_path in enumerate(docked_pdb_paths):
         if i == args.decoys:
             break
-        current_args = vars(args)
+        current_args = dict(args)
         current_args['tag'] = antigen_name + f"_{i}"
         design_args = args_factory(
             pdb_path = pdb_path,
@@ -92,7 +73,34 @@ def main():
                   chain_h=args.heavy,
                   chain_l=args.light,
                   relax_distance=args.relax_distance,
-                  repeats=args.repeats)
+                  repeats=args.repeats,
+                  num_workers=args.num_workers)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--antigen', type=str, required=False, default="dataset/diffab/7DK2_AB_C.pdb")
+    parser.add_argument('--antibody', type=str, default='dataset/diffab/3QHF_Fv.pdb')
+    parser.add_argument('--heavy', type=str, default='H', help='Chain id of the heavy chain.')
+    parser.add_argument('--light', type=str, default='L', help='Chain id of the light chain.')
+    parser.add_argument('--renumber', default=True)
+    parser.add_argument('--hdock_bin', type=str, default='bin/diffab/hdock')
+    parser.add_argument('--createpl_bin', type=str, default='bin/diffab/createpl')
+    parser.add_argument('--config', type=str, default='model/diffab/configs/test/codesign_multicdrs.yml')
+    parser.add_argument('--out_root', type=str, default='outputs/diffab_antigen_only')
+    parser.add_argument('--tmp_root', type=str, default='tmp/diffab_antigen_only')
+    parser.add_argument('--model_dir', type=str, default='')
+    parser.add_argument('--decoys', type=int, default=10)
+    parser.add_argument('--num_samples', type=int, default=10)
+    parser.add_argument('--tag', type=str, default='')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--device', type=str, default='cuda')
+    parser.add_argument('--relax_distance', type=int, default=6)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--batch_size', type=int, default=32)
+    parser.add_argument('--num_workers', type=int, default=None, help='Number of processes that score and relax the samples.')
+    args = parser.parse_args()
+    run_antigen_only(EasyDict(vars(args)))
 
 if __name__ == '__main__':
     main()
@@ -6,8 +6,11 @@ from pyrosetta.rosetta.protocols.relax import FastRelax
 from pyrosetta.rosetta.core.select.residue_selector import InterGroupInterfaceByVectorSelector, OrResidueSelector, ChainSelector
 from pyrosetta.rosetta.core.select import get_residues_from_subset
 
+import os
 import argparse
+import multiprocessing as mp
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from Bio.PDB import PDBParser
 import json
 
@@ -105,12 +108,54 @@ def calculate_interface_scores(pose, interface_definition):
     return scores
 
 
-def eval_pipeline(pdb_dir, chain_h="H", chain_l="L", chain_a=None, relax_distance=8, repeats=5):
+# Process pool of the evaluation, kept alive so that a resident worker only initializes PyRosetta once per process
+POOL = None
+POOL_SIZE = None
+
+
+def get_pool(num_workers=None):
+    """
+    Get the process pool that scores and relaxes the samples
+    Args:
+        num_workers: Number of worker processes. Defaults to the number of CPUs the process may run on
+    """
+    global POOL, POOL_SIZE
+    # The scheduler pins the worker to its allocated cores, so size the pool from the affinity and not the machine
+    num_workers = num_workers or len(os.sched_getaffinity(0))
+    if POOL is None or POOL_SIZE != num_workers:
+        if POOL is not None:
+            POOL.shutdown()
+        # The workers import this module and initialize their own PyRosetta. Forking would copy the CUDA context of
+        # the sampling model
+        POOL = ProcessPoolExecutor(num_workers, mp_context=mp.get_context("spawn"))
+        POOL_SIZE = num_workers
+    return POOL
+
+
+def score_pdb(pdb_path, interface_definition):
+    """
+    Stage 1 of the evaluation: geometric interface scores of one sample
+    """
+    pose = pyrosetta.pose_from_pdb(pdb_path)
+    return calculate_interface_scores(pose, interface_definition)
+
+
+def relax_pdb(pdb_path, out_path, chain_h, chain_l, chain_a, interface_definition, relax_distance, repeats):
+    """
+    Stage 2 of the evaluation: relax the interface of one sample, save it to "out_path" and score it again
+    """
+    pose = pyrosetta.pose_from_pdb(pdb_path)
+    relaxed_pose = relax_antibody_interface(pose, chain_h, chain_l, chain_a, relax_distance=relax_distance, repeats=repeats)
+    scores = calculate_interface_scores(relaxed_pose, interface_definition)
+    relaxed_pose.dump_pdb(out_path)
+    return scores
+
+
+def eval_pipeline(pdb_dir, chain_h="H", chain_l="L", chain_a=None, relax_distance=8, repeats=5, num_workers=None):
     top_n = 1
     all_pdb_files = find_numeric_pdb_filepaths_pathlib(pdb_dir)
     if not all_pdb_files:
-        print(f"Error: No .pdb files found in directory '{pdb_dir}'.")
-        exit()
+        raise FileNotFoundError(f"No .pdb files found in directory '{pdb_dir}'.")
 
     print(f"Found {len(all_pdb_files)} PDB file(s). Starting filtering process...\n")
 
@@ -119,27 +164,27 @@ def eval_pipeline(pdb_dir, chain_h="H", chain_l="L", chain_a=None, relax_distanc
         chain_a = get_antigen_id(all_pdb_files[0], chain_h=chain_h, chain_l=chain_l)
     
     ab_ag_interface_def = f"{chain_h}{chain_l}_{chain_a}"
+    pool = get_pool(num_workers)
     
     print("================== STAGE 1: Geometric Scoring & Ranking =============")
     stage1_all_scores = []
     all_pdb_files = dict(enumerate(all_pdb_files))
 
-    # Performing initial structure screening based on geometric criteria
-    for index, pdb_path in all_pdb_files.items():
-        print(f"Processing pdb{index}...")
+    # Performing initial structure screening based on geometric criteria. The samples are scored in parallel
+    futures = {pool.submit(score_pdb, pdb_path, ab_ag_interface_def): index for index, pdb_path in all_pdb_files.items()}
+    for future in as_completed(futures):
+        index = futures[future]
         try:
-            pose = pyrosetta.pose_from_pdb(pdb_path)
-            scores = calculate_interface_scores(pose, ab_ag_interface_def)
+            scores = future.result()
             sasa = scores.get('dSASA_int', 0.0)
             sc = scores.get('sc_value', 0.0)
             
             combined_score = sasa * sc
             
-            print(f"  dSASA={sasa:.1f}, sc={sc:.3f}, Combined_Score={combined_score:.1f}")
+            print(f"  pdb{index}: dSASA={sasa:.1f}, sc={sc:.3f}, Combined_Score={combined_score:.1f}")
             stage1_all_scores.append({
                 'index': index,
-                'path': pdb_path, 
-                'pose': pose, 
+                'path': all_pdb_files[index], 
                 'sasa': sasa, 
                 'sc': sc,
                 'combined_score': combined_score
@@ -148,7 +193,7 @@ def eval_pipeline(pdb_dir, chain_h="H", chain_l="L", chain_a=None, relax_distanc
             print(f"  [ERROR] Loading or processing pdb{index} failed: {e}")
 
 
-    stage1_all_scores.sort(key=lambda x: x['combined_score'], reverse=True)
+    stage1_all_scores.sort(key=lambda x: (x['combined_score'], -x['index']), reverse=True)
     
     stage1_results = stage1_all_scores[:top_n]
     
@@ -159,28 +204,32 @@ def eval_pipeline(pdb_dir, chain_h="H", chain_l="L", chain_a=None, relax_distanc
 
     print("================== STAGE 2: Full Relaxation & Final Analysis =======")
     final_results = []
+    futures = {}
     for candidate in stage1_results:
-        print(f"Processing pdb{candidate['index']}...")
+        # relax the strcuture generated by diffab
+        candidate['relaxed_path'] = f"{pdb_dir}/relaxed_{candidate['index']}.pdb"
+        future = pool.submit(relax_pdb, candidate['path'], candidate['relaxed_path'], chain_h, chain_l, chain_a,
+                             ab_ag_interface_def, relax_distance, repeats)
+        futures[future] = candidate
+
+    for future in as_completed(futures):
+        candidate = futures[future]
         try:
-            # relax the strcuture generated by diffab
-            relaxed_pose = relax_antibody_interface(candidate['pose'], chain_h, chain_l, chain_a, relax_distance=relax_distance, repeats=repeats)
-            
-            final_ab_ag_scores = calculate_interface_scores(relaxed_pose, ab_ag_interface_def)
-            candidate['final_scores_ab_ag'] = final_ab_ag_scores
+            candidate['final_scores_ab_ag'] = future.result()
             final_results.append(candidate)
-            
-            # save the relaxed structure
-            relaxed_pose.dump_pdb(f"{pdb_dir}/final_relaxed.pdb")
-
         except Exception as e:
             print(f"  [ERROR] Stage 2 processing for pdb{candidate['index']} failed: {e}")
     
+    if not final_results:
+        raise RuntimeError("No candidate could be relaxed.")
+
     # rank the final strcture based on dG_separated
     final_results.sort(key=lambda x: x['final_scores_ab_ag']['dG_separated'])
     
-    # save the final score
+    # save the relaxed structure and the final score of the best candidate
+    os.replace(final_results[0]['relaxed_path'], f"{pdb_dir}/final_relaxed.pdb")
     with open(f"{pdb_dir}/final_score.json", "w+") as f:
-        json.dump(final_ab_ag_scores, f, indent=4)
+        json.dump(final_results[0]['final_scores_ab_ag'], f, indent=4)
     
     # --- output final results ---
     print("\n\n========================= FINAL RANKED RESULTS =========================")
@@ -202,6 +251,7 @@ def args_from_cmdline():
     parser.add_argument('--out_root', type=str, default='outputs/diffab_antigen_antibody')
     parser.add_argument('--relax_distance', type=int, default=6)
     parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--num_workers', type=int, default=None, help='Number of processes that score and relax the samples.')
     args = parser.parse_args()
     return args
 
@@ -215,7 +265,8 @@ if __name__ == '__main__':
         "chain_l": args.light,
         "chain_a": args.antigen,  
         "relax_distance": args.relax_distance, 
-        "repeats": args.repeats
+        "repeats": args.repeats,
+        "num_workers": args.num_workers
         }
     
     eval_pipeline(**args)
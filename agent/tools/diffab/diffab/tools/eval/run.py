@@ -1,17 +1,16 @@
 import os
 import argparse
-import ray
 import shelve
 import time
 import pandas as pd
 from typing import Mapping
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 
 from tools.eval.base import EvalTask, TaskScanner
 from tools.eval.similarity import eval_similarity
 from tools.eval.energy import eval_interface_energy
 
 
-@ray.remote(num_cpus=1)
 def evaluate(task, args):
     funcs = []
     funcs.append(eval_similarity)
@@ -39,22 +38,22 @@ def main():
     parser.add_argument('--root', type=str, default='./results')
     parser.add_argument('--pfx', type=str, default='rosetta')
     parser.add_argument('--no_energy', action='store_true', default=False)
+    parser.add_argument('--num_workers', type=int, default=None, help='Number of evaluation processes. Defaults to the number of CPUs.')
     args = parser.parse_args()
-    ray.init()
     
     db_path = os.path.join(args.root, 'evaluation_db')
-    with shelve.open(db_path) as db:
+    with shelve.open(db_path) as db, ProcessPoolExecutor(args.num_workers) as pool:
         scanner = TaskScanner(root=args.root, postfix=args.pfx, db=db)
 
         while True:        
             tasks = scanner.scan()
-            futures = [evaluate.remote(t, args) for t in tasks]
+            futures = {pool.submit(evaluate, t, args) for t in tasks}
             if len(futures) > 0:
                 print(f'Submitted {len(futures)} tasks.')
             while len(futures) > 0:
-                done_ids, futures = ray.wait(futures, num_returns=1)
-                for done_id in done_ids:
-                    done_task = ray.get(done_id)
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    done_task = future.result()
                     done_task.save_to_db(db)
                     print(f'Remaining {len(futures)}. Finished {done_task.in_path}')
                 db.sync()
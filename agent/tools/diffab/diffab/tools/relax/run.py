@@ -1,56 +1,30 @@
 import argparse
-import ray
 import time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 
 from agent.tools.diffab.diffab.tools.relax.openmm_relaxer import run_openmm
 from agent.tools.diffab.diffab.tools.relax.pyrosetta_relaxer import run_pyrosetta, run_pyrosetta_fixbb
 from agent.tools.diffab.diffab.tools.relax.base import TaskScanner
 
 
-@ray.remote(num_gpus=1/8, num_cpus=1)
-def run_openmm_remote(task):
-    return run_openmm(task)
-
-
-@ray.remote(num_cpus=1)
-def run_pyrosetta_remote(task):
-    return run_pyrosetta(task)
-
-
-@ray.remote(num_cpus=1)
-def run_pyrosetta_fixbb_remote(task):
-    return run_pyrosetta_fixbb(task)
-
-
-@ray.remote
+# The stages of a pipeline run one after another in the same worker process. Tasks run in parallel over the pool
 def pipeline_openmm_pyrosetta(task):
     funcs = [
-        run_openmm_remote,
-        run_pyrosetta_remote,
+        run_openmm,
+        run_pyrosetta,
     ]
     for fn in funcs:
-        task = fn.remote(task)
-    return ray.get(task)
+        task = fn(task)
+    return task
 
 
-@ray.remote
 def pipeline_pyrosetta(task):
-    funcs = [
-        run_pyrosetta_remote,
-    ]
-    for fn in funcs:
-        task = fn.remote(task)
-    return ray.get(task)
+    return run_pyrosetta(task)
 
 
-@ray.remote
 def pipeline_pyrosetta_fixbb(task):
-    funcs = [
-        run_pyrosetta_fixbb_remote,
-    ]
-    for fn in funcs:
-        task = fn.remote(task)
-    return ray.get(task)
+    return run_pyrosetta_fixbb(task)
 
 
 pipeline_dict = {
@@ -61,25 +35,27 @@ pipeline_dict = {
 
 
 def main():
-    ray.init()
     parser = argparse.ArgumentParser()
     parser.add_argument('--root', type=str, default='./results')
     parser.add_argument('--pipeline', type=lambda s: pipeline_dict[s], default=pipeline_openmm_pyrosetta)
+    parser.add_argument('--num_workers', type=int, default=None, help='Number of relaxation processes. Defaults to the number of CPUs.')
     args = parser.parse_args()
 
     final_pfx = 'fixbb' if args.pipeline == pipeline_pyrosetta_fixbb else 'rosetta'
     scanner = TaskScanner(args.root, final_postfix=final_pfx)
-    while True:
-        tasks = scanner.scan()
-        futures = [args.pipeline.remote(t) for t in tasks]
-        if len(futures) > 0:
-            print(f'Submitted {len(futures)} tasks.')
-        while len(futures) > 0:
-            done_ids, futures = ray.wait(futures, num_returns=1)
-            for done_id in done_ids:
-                done_task = ray.get(done_id)
-                print(f'Remaining {len(futures)}. Finished {done_task.current_path}')
-        time.sleep(1.0)
+    # OpenMM may run on the GPU, which cannot be used in forked processes
+    with ProcessPoolExecutor(args.num_workers, mp_context=mp.get_context('spawn')) as pool:
+        while True:
+            tasks = scanner.scan()
+            futures = {pool.submit(args.pipeline, t) for t in tasks}
+            if len(futures) > 0:
+                print(f'Submitted {len(futures)} tasks.')
+            while len(futures) > 0:
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    done_task = future.result()
+                    print(f'Remaining {len(futures)}. Finished {done_task.current_path}')
+            time.sleep(1.0)
 
 if __name__ == '__main__':
     main()
@@ -28,6 +28,33 @@ def assign_number_to_sequence(seq):
     return numbers, abchain
 
 
+# Chothia numbering of every chain sequence seen by the process. Docked decoys and repeated jobs share their antibody
+# and antigen chains, so each sequence is only numbered once. Sequences without a valid Fv keep their parse error
+NUMBERING_CACHE = {}
+
+
+def number_sequence(seq):
+    """
+    Cached version of "assign_number_to_sequence"
+    Args:
+        seq: Sequence of the chain
+
+    Returns:
+        The numbers of the residues and the chain type. Raises abnumber.ChainParseError if there is no valid Fv
+    """
+    if seq not in NUMBERING_CACHE:
+        try:
+            numbers, abchain = assign_number_to_sequence(seq)
+            NUMBERING_CACHE[seq] = (numbers, abchain.chain_type, None)
+        except abnumber.ChainParseError as e:
+            NUMBERING_CACHE[seq] = (None, None, str(e))
+
+    numbers, chain_type, error = NUMBERING_CACHE[seq]
+    if error is not None:
+        raise abnumber.ChainParseError(error)
+    return numbers, chain_type
+
+
 def renumber_biopython_chain(chain_id, residue_list: List[Residue.Residue], numbers: List[Tuple[int, str]]):
     chain = Chain.Chain(chain_id)
     for residue, number in zip(residue_list, numbers):
@@ -51,12 +78,12 @@ def renumber(in_pdb, out_pdb, return_other_chains=False):
     for chain in model:
         try:
             seq, reslist = biopython_chain_to_sequence(chain)
-            numbers, abchain = assign_number_to_sequence(seq)
+            numbers, chain_type = number_sequence(seq)
             chain_new = renumber_biopython_chain(chain.id, reslist, numbers)
-            print(f'[INFO] Renumbered chain {chain_new.id} ({abchain.chain_type})')
-            if abchain.chain_type == 'H':
+            print(f'[INFO] Renumbered chain {chain_new.id} ({chain_type})')
+            if chain_type == 'H':
                 heavy_chains.append(chain_new.id)
-            elif abchain.chain_type in ('K', 'L'):
+            elif chain_type in ('K', 'L'):
                 light_chains.append(chain_new.id)
         except abnumber.ChainParseError as e:
             print(f'[INFO] Chain {chain.id} does not contain valid Fv: {str(e)}')
@@ -26,6 +26,28 @@ from agent.tools.diffab.diffab.utils.inference import *
 from agent.tools.diffab.diffab.tools.renumber import renumber as renumber_antibody
 
 
+# Models loaded by the process, keyed by checkpoint and device. Every decoy of a job and every job of a resident
+# worker reuses them instead of loading the checkpoint again
+MODELS = {}
+
+
+def load_model(model_dir, device):
+    """
+    Load a DiffAb checkpoint, or return it if it is already loaded
+    Args:
+        model_dir: Path to the checkpoint
+
+        device: Device to run the model
+    """
+    key = (os.path.abspath(model_dir), str(device))
+    if key not in MODELS:
+        ckpt = torch.load(model_dir, map_location='cpu')
+        model = get_model(ckpt['config'].model).to(device)
+        lsd = model.load_state_dict(ckpt['model'])
+        MODELS[key] = (model, str(lsd))
+    return MODELS[key]
+
+
 def create_data_variants(config, structure_factory):
     structure = structure_factory()
     structure_id = structure['id']
@@ -146,11 +168,8 @@ def design_for_pdb(args):
 
     # Load checkpoint and model
     logger.info('Loading model config and checkpoints: %s' % (args.model_dir))
-    ckpt = torch.load(args.model_dir, map_location='cpu')
-    cfg_ckpt = ckpt['config']
-    model = get_model(cfg_ckpt.model).to(args.device)
-    lsd = model.load_state_dict(ckpt['model'])
-    logger.info(str(lsd))
+    model, lsd = load_model(args.model_dir, args.device)
+    logger.info(lsd)
 
     # Make data variants
     data_variants = create_data_variants(
@@ -36,6 +36,10 @@ class Counter(object):
 def get_logger(name, log_dir=None):
     logger = logging.getLogger(name)
     logger.setLevel(logging.DEBUG)
+    # A resident worker asks for the same logger in every job. Drop the handlers of the previous job
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
     formatter = logging.Formatter('[%(asctime)s::%(name)s::%(levelname)s] %(message)s')
 
     stream_handler = logging.StreamHandler()
@@ -7,14 +7,13 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 import json
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
+from agent.tools.diffab.design_caller import get_service, service_run
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -48,8 +47,7 @@ class DiffAbOptimize(BaseTool):
         model_dir = self.get_model_dir(diffab_config)
         diffab_config = f"{BASE_DIR}/diffab/configs/{diffab_config}.yml"
         
-        now = datetime.datetime.now()
-        now = now.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         
         out_root = f"{self.out_dir}/diffab_optimize/{now}"
         os.makedirs(out_root, exist_ok=True)
@@ -69,8 +67,28 @@ class DiffAbOptimize(BaseTool):
         # Redirect the stdout and stderr to a log file
         cmd += f" > {self.log_path} 2>&1"
         
+        service = get_service(self.config, self.device)
         try:
-            os.system(cmd)
+            if service is None:
+                os.system(cmd)
+            else:
+                job_args = {
+                    "pdb_path": antigen_antibody_structure,
+                    "heavy": "H",
+                    "light": "L",
+                    "antigen": None,
+                    "renumber": True,
+                    "num_samples": int(num_samples),
+                    "config": diffab_config,
+                    "out_root": out_root,
+                    "model_dir": model_dir,
+                    "tag": "",
+                    "seed": None,
+                    "batch_size": 32,
+                    "relax_distance": int(relax_distance),
+                    "repeats": int(repeats),
+                }
+                service_run(service, "/optimize", job_args, self.log_path)
             
             if os.path.exists(f"{out_root}/final_score.json"):
                 with open(f"{out_root}/final_score.json", "r") as f:
@@ -97,7 +115,6 @@ if __name__ == '__main__':
         }
     
     for obs in diffab_antigen_antibody.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
     
\ No newline at end of file
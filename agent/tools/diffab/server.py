@@ -0,0 +1,135 @@
+import sys
+
+ROOT_DIR = __file__.rsplit("/", 4)[0]
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import os
+import time
+import argparse
+import threading
+
+from contextlib import contextmanager
+from easydict import EasyDict
+from agent.tools.diffab.diffab.diffab_antigen_only import run_antigen_only
+from agent.tools.diffab.diffab.diffab_antigen_antibody import run_antigen_antibody
+from agent.tools.diffab.diffab.tools.runner.design_for_pdb import MODELS
+from agent.tools.diffab.diffab.tools.renumber.run import NUMBERING_CACHE
+from agent.tools.diffab.diffab.evaluation import get_pool
+from agent.tools.service import current_request, serve
+
+
+@contextmanager
+def redirect_output(log_path: str):
+    """
+    Redirect the stdout and stderr file descriptors of the process to a log file. Unlike "redirect_stdout", this also
+    captures the output of subprocesses such as HDOCK and of C extensions such as PyRosetta. The descriptors belong to
+    the whole process, so callers must not run two redirections at once
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_fds = [os.dup(1), os.dup(2)]
+    try:
+        with open(log_path, "a") as log:
+            os.dup2(log.fileno(), 1)
+            os.dup2(log.fileno(), 2)
+            try:
+                yield
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+    finally:
+        os.dup2(saved_fds[0], 1)
+        os.dup2(saved_fds[1], 2)
+        for fd in saved_fds:
+            os.close(fd)
+
+
+class DiffAbService:
+    def __init__(self, device: str, num_workers: int = None):
+        """
+        Resident DiffAb worker. Checkpoints stay loaded and the Chothia numbering of every chain is cached across jobs.
+        Scoring and relaxation of the samples run on a pool of PyRosetta processes that is kept alive between jobs
+        Args:
+            device: Device to run the model
+
+            num_workers: Number of PyRosetta processes. Defaults to the number of CPUs
+        """
+        self.device = device
+        self.num_workers = num_workers
+        # Jobs share the model on the GPU, the process pool and the output file descriptors, so they run one at a time
+        self.lock = threading.Lock()
+        self.num_jobs = 0
+
+        # Start the PyRosetta processes before the first job arrives
+        get_pool(num_workers)
+
+    def run_job(self, body: dict, pipeline) -> dict:
+        """
+        Run a pipeline with the arguments of its command line script. Its output goes to the log of the request
+        """
+        args = EasyDict(body["args"])
+        args.device = self.device
+        args.num_workers = self.num_workers
+        # A job can wait for hours behind the others, so one that is cancelled or timed out meanwhile is skipped
+        current_request().acquire(self.lock)
+        try:
+            start = time.time()
+            with redirect_output(body["log_path"]):
+                pipeline(args)
+            self.num_jobs += 1
+
+            # Printed before the next job redirects the output
+            elapsed = time.time() - start
+            print(f"Finished {args.out_root} in {elapsed:.2f} s", flush=True)
+        finally:
+            self.lock.release()
+
+        return {"out_root": args.out_root, "time_s": round(elapsed, 3)}
+
+    def design(self, body: dict) -> dict:
+        """
+        Handle a request of "diffab_antigen_only.py": dock the antibody template, design and relax
+        """
+        return self.run_job(body, run_antigen_only)
+
+    def optimize(self, body: dict) -> dict:
+        """
+        Handle a request of "diffab_antigen_antibody.py": design a given complex and relax
+        """
+        return self.run_job(body, run_antigen_antibody)
+
+    def health(self, body: dict) -> dict:
+        return {"status": "ok", "device": self.device, "models": [model_dir for model_dir, _ in MODELS],
+                "num_numbered_chains": len(NUMBERING_CACHE), "num_jobs": self.num_jobs}
+
+
+def main(args):
+    service = DiffAbService(args.device, args.num_workers)
+    routes = {
+        ("GET", "/health"): service.health,
+        ("POST", "/design"): service.design,
+        ("POST", "/optimize"): service.optimize,
+    }
+    serve(args.socket_path, routes, idle_timeout=args.idle_timeout)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Resident DiffAb worker on a Unix socket")
+    parser.add_argument("--socket_path", type=str, required=True, help="Path to the Unix socket")
+    parser.add_argument("--device", type=str, default="cuda:0", help="Device to run the model. Default: cuda:0")
+    parser.add_argument("--num_workers", type=int, default=None,
+                        help="Number of processes that score and relax the samples. Default: number of CPUs")
+    parser.add_argument("--idle_timeout", type=float, default=None,
+                        help="Exit after being idle for this many seconds")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    EXAMPLE:
+    python server.py    --socket_path /tmp/diffab.sock \
+                        --device "cuda:0"
+    """
+    main(get_args())
@@ -0,0 +1,145 @@
+import os
+import fcntl
+import hashlib
+import logging
+import threading
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+# Files of a model larger than this are fingerprinted by their size and their first and last bytes
+FINGERPRINT_CHUNK_SIZE = 1 << 20
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def model_fingerprint(model_path: str) -> str:
+    """
+    Fingerprint of the config and weights of a model, so that embeddings of a retrained or replaced model under the
+    same path are not reused
+    Args:
+        model_path: Path to the model file or directory
+
+    Returns:
+        The fingerprint, or an empty string if the path does not exist
+    """
+    if model_path is None or not os.path.exists(model_path):
+        return ""
+
+    if os.path.isdir(model_path):
+        paths = []
+        for root, dirs, files in os.walk(model_path):
+            dirs.sort()
+            paths += [os.path.join(root, file) for file in sorted(files)]
+    else:
+        paths = [model_path]
+
+    sha = hashlib.sha256()
+    for path in paths:
+        size = os.path.getsize(path)
+        sha.update(f"{os.path.relpath(path, model_path)}:{size}".encode())
+        with open(path, "rb") as r:
+            if size <= 2 * FINGERPRINT_CHUNK_SIZE:
+                sha.update(r.read())
+            else:
+                sha.update(r.read(FINGERPRINT_CHUNK_SIZE))
+                r.seek(-FINGERPRINT_CHUNK_SIZE, os.SEEK_END)
+                sha.update(r.read())
+
+    return sha.hexdigest()
+
+
+class EmbeddingStore:
+    def __init__(self, store_dir: str, model_name: str, model_path: str = None):
+        """
+        Persistent store of document embeddings. Embeddings are keyed by the content hash of the document and stored in
+        one file per embedding model, together with the fingerprint of the model, so a changed model never returns
+        vectors of another one. Processes sharing the store merge their updates under a file lock
+        Args:
+            store_dir: Directory of the store
+
+            model_name: Name or path of the embedding model
+
+            model_path: Path to the files of the model, used for its fingerprint. If None, only the name is checked
+        """
+        self.model_name = model_name
+        self.fingerprint = model_fingerprint(model_path)
+        self.path = f"{store_dir}/{content_hash(model_name)[:16]}.npz"
+        self.lock = threading.Lock()
+        self.embeddings = {}
+        # Number of documents encoded by the last call of "get_embeddings"
+        self.num_encoded = 0
+        self.load()
+
+    def load(self):
+        """
+        Merge the embeddings on disk into the store. Embeddings of another model or model version are ignored
+        """
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data["model_name"]) != self.model_name or str(data["fingerprint"]) != self.fingerprint:
+                    return
+
+                self.embeddings.update(zip(data["keys"].tolist(), data["vectors"]))
+        except (OSError, KeyError, ValueError) as e:
+            # A corrupt store is rebuilt
+            logger.warning(f"Failed to load the embedding store {self.path}: {e}")
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        keys = list(self.embeddings)
+        vectors = np.stack([self.embeddings[key] for key in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+
+        # Write to a temporary file and move it into place, so readers never see a partial store
+        tmp_path = f"{self.path}.tmp-{os.getpid()}-{threading.get_ident()}.npz"
+        np.savez(tmp_path, model_name=np.array(self.model_name), fingerprint=np.array(self.fingerprint),
+                 keys=np.array(keys), vectors=vectors)
+        os.replace(tmp_path, self.path)
+
+    def get_embeddings(self, documents: list, encode) -> np.ndarray:
+        """
+        Get the embeddings of documents. Only documents missing from the store are encoded, and embeddings of documents
+        that are no longer given are dropped
+        Args:
+            documents: Documents to embed, i.e. the whole current corpus
+
+            encode: Function that encodes a list of documents into an array of embeddings
+
+        Returns:
+            Array of embeddings in the order of the documents
+        """
+        keys = [content_hash(doc) for doc in documents]
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.lock, open(f"{self.path}.lock", "w") as lock_file:
+            # Other processes wait while the missing documents are encoded, and then find them in the store
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self.load()
+
+            missing = {}
+            for key, doc in zip(keys, documents):
+                if key not in self.embeddings:
+                    missing[key] = doc
+
+            if missing:
+                vectors = np.asarray(encode(list(missing.values())), dtype=np.float32)
+                for key, vector in zip(missing, vectors):
+                    self.embeddings[key] = vector
+
+            stale = set(self.embeddings) - set(keys)
+            for key in stale:
+                del self.embeddings[key]
+
+            if missing or stale:
+                self.save()
+
+            self.num_encoded = len(missing)
+            if not keys:
+                return np.zeros((0, 0), dtype=np.float32)
+
+            return np.stack([self.embeddings[key] for key in keys])
@@ -0,0 +1,156 @@
+import sys
+
+ROOT_DIR = __file__.rsplit("/", 4)[0]
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import os
+import csv
+import contextlib
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from agent.tools.base_tool import BaseTool
+from agent.tools.register import register_tool
+from agent.tools.esmfold.caller import get_service
+from agent.tools.esmfold.batching import read_fasta, structure_names, SummaryWriter
+
+
+BASE_DIR = os.path.dirname(__file__)
+
+
+@register_tool
+class EsmfoldBatch(BaseTool):
+    def __init__(self, out_dir: str = f"{ROOT_DIR}/outputs/esmfold_batch", **kwargs):
+        super().__init__(
+            config_path=f"{BASE_DIR}/config.yaml",
+            out_dir=out_dir,
+            **kwargs
+        )
+        tool_name = "esmfold_batch"
+        for doc in self.config["document"]:
+            if doc["tool_name"] == tool_name:
+                self.config["document"] = doc
+                break
+        self.config["example_output"] = self.config["example_output"][tool_name]
+        self.tool_name = tool_name
+
+    def __call__(self, fasta_file) -> dict:
+        fasta_file = fasta_file if os.path.isabs(fasta_file) else f"{self.out_dir}/{fasta_file}"
+        save_dir = f"{self.out_dir}/esmfold_batch/{self.run_id}"
+        structure_dir = f"{save_dir}/structures"
+        summary_path = f"{save_dir}/summary.tsv"
+
+        cmd_args = {
+            "fasta_file": fasta_file,
+            "save_dir": structure_dir,
+            "summary_path": summary_path,
+            "model_path": f"{ROOT_DIR}/{self.config['model_path']}",
+            "device": self.device,
+        }
+        service_config = self.config.get("service", {})
+        batch_args = {
+            "max_tokens": service_config.get("max_tokens", 4096),
+            "max_batch_size": service_config.get("max_batch_size", 16),
+        }
+
+        # Call the ESMFold model
+        cmd = f"{self.config['python']} {BASE_DIR}/command.py"
+        for k, v in {**cmd_args, **batch_args}.items():
+            cmd += f" --{k} {v}"
+
+        # Redirect the stdout and stderr to a log file
+        cmd += f" > {self.log_path} 2>&1"
+        try:
+            if service_config.get("enabled", False):
+                self.service_fold(**cmd_args, max_batch_size=batch_args["max_batch_size"])
+            elif self.in_worker and os.path.realpath(self.config["python"]) == os.path.realpath(sys.executable):
+                self.resident_fold(**cmd_args, **batch_args)
+            else:
+                os.system(cmd)
+
+            if not os.path.exists(summary_path):
+                return {"error": "Failed to run esmfold"}
+
+            with open(summary_path, "r") as r:
+                rows = list(csv.DictReader(r, delimiter="\t"))
+            if not rows:
+                return {"error": "Failed to fold any sequence of the FASTA file"}
+
+            return {
+                "structure_dir": structure_dir[len(self.out_dir)+1:],
+                "summary_file": summary_path[len(self.out_dir)+1:],
+                "num_folded": len(rows),
+                "avg_plddt": sum(float(row["mean_plddt"]) for row in rows) / len(rows),
+            }
+
+        except Exception as e:
+            return {"error": str(e)}
+
+    def service_fold(self, fasta_file: str, save_dir: str, summary_path: str, model_path: str, device: str,
+                     max_batch_size: int = 16):
+        """
+        Fold the sequences with the resident ESMFold service. The requests are sent concurrently in length order, so
+        that the service packs sequences of similar length into the same batch. Each structure is written and logged
+        as soon as its batch is done
+        """
+        records = read_fasta(fasta_file)
+        if not records:
+            raise ValueError(f"No sequences found in {fasta_file}")
+
+        names = structure_names([seq_id for seq_id, _ in records])
+        order = sorted(range(len(records)), key=lambda i: -len(records[i][1]))
+        service = get_service(self.config, model_path, device)
+        with open(self.log_path, "w") as w, SummaryWriter(summary_path) as summary:
+            w.write("Connecting to the ESMFold service\n")
+            w.flush()
+            service.ensure_started()
+
+            w.write(f"Folding {len(records)} sequences\n")
+            w.flush()
+            # Enough requests are in flight to fill two batches of the service
+            with ThreadPoolExecutor(max_workers=2 * max_batch_size) as pool:
+                futures = {
+                    pool.submit(service.request, "POST", "/fold",
+                                {"sequence": records[i][1], "save_path": f"{save_dir}/{names[i]}"}): i
+                    for i in order
+                }
+                for num_done, future in enumerate(as_completed(futures), 1):
+                    seq_id, seq = records[futures[future]]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        w.write(f"Failed to fold {seq_id}: {e}\n")
+                        w.flush()
+                        continue
+
+                    summary.write(seq_id, len(seq), result["mean_plddt"], result["ptm"], names[futures[future]])
+                    w.write(f"Folded {num_done}/{len(records)}: {seq_id} ({len(seq)} residues) with mean pLDDT "
+                            f"{result['mean_plddt']:.2f} and pTM {result['ptm']:.3f}\n")
+                    w.flush()
+
+            w.write(f"Structures saved to {save_dir}\n")
+
+    def resident_fold(self, fasta_file: str, save_dir: str, summary_path: str, model_path: str, device: str,
+                      max_tokens: int = 4096, max_batch_size: int = 16):
+        """
+        Fold the sequences in the worker process, keeping the model loaded between calls
+        """
+        from agent.tools.esmfold.command import load_model, fold_fasta
+
+        with open(self.log_path, "w") as w, contextlib.redirect_stdout(w):
+            print(f"Loading ESMFold from {model_path}", flush=True)
+            tokenizer, model = self.get_resident(("esmfold", model_path, device), lambda: load_model(model_path, device))
+            fold_fasta(fasta_file, tokenizer, model, save_dir, summary_path, max_tokens, max_batch_size)
+            print(f"Structures saved to {save_dir}", flush=True)
+
+
+if __name__ == '__main__':
+    # Test
+    esmfold_batch = EsmfoldBatch()
+
+    input_args = {
+        "fasta_file": "example/human_FP.fasta",
+    }
+
+    for obs in esmfold_batch.mp_run(**input_args):
+        print(obs, end="")
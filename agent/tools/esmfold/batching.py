@@ -0,0 +1,113 @@
+import os
+import re
+import csv
+
+
+# Columns of the summary table written by the batch mode
+SUMMARY_COLUMNS = ["id", "length", "mean_plddt", "ptm", "structure"]
+
+
+def read_fasta(path: str) -> list:
+    """
+    Read the records of a FASTA file
+    Args:
+        path: Path to the FASTA file
+
+    Returns:
+        A list of (id, sequence) tuples. The id is the first word of the header
+    """
+    records = []
+    header, seq = None, []
+    with open(path, "r") as r:
+        for line in r:
+            line = line.strip()
+            if line.startswith(">"):
+                if header is not None:
+                    records.append((header, "".join(seq)))
+                header, seq = line[1:], []
+            elif line:
+                seq.append(line)
+
+    if header is not None:
+        records.append((header, "".join(seq)))
+
+    return [(header.split()[0] if header.split() else f"seq_{i}", seq.upper())
+            for i, (header, seq) in enumerate(records)]
+
+
+def pack_batches(lengths: list, max_tokens: int, max_batch_size: int) -> list:
+    """
+    Sort the sequences by length and pack them into batches whose padded size fits the token budget. The longest
+    sequences come first, so that a budget that does not fit in memory fails before most of the work is done
+    Args:
+        lengths: Length of each sequence
+
+        max_tokens: Maximum number of padded residues in a batch. Longer sequences are folded alone
+
+        max_batch_size: Maximum number of sequences in a batch
+
+    Returns:
+        A list of batches, each a list of indices into "lengths"
+    """
+    batches = []
+    batch, batch_length = [], 0
+    for i in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+        if batch and (len(batch) >= max_batch_size or (len(batch) + 1) * batch_length > max_tokens):
+            batches.append(batch)
+            batch = []
+
+        if not batch:
+            batch_length = lengths[i]
+        batch.append(i)
+
+    if batch:
+        batches.append(batch)
+
+    return batches
+
+
+def structure_names(ids: list) -> list:
+    """
+    Make a unique PDB file name for each sequence id
+    """
+    names = []
+    used = set()
+    for seq_id in ids:
+        base = re.sub(r"[^\w.-]", "_", seq_id)[:100] or "seq"
+        name, suffix = base, 1
+        while name in used:
+            suffix += 1
+            name = f"{base}_{suffix}"
+
+        used.add(name)
+        names.append(f"{name}.pdb")
+
+    return names
+
+
+class SummaryWriter:
+    def __init__(self, path: str):
+        """
+        Write the summary table of a batch row by row, so that the scores of finished sequences are kept even if the
+        run stops early
+        Args:
+            path: Path to the TSV file
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file, delimiter="\t")
+        self.writer.writerow(SUMMARY_COLUMNS)
+        self.file.flush()
+
+    def write(self, seq_id: str, length: int, mean_plddt: float, ptm: float, structure: str):
+        self.writer.writerow([seq_id, length, f"{mean_plddt:.2f}", f"{ptm:.4f}", structure])
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,6 +1,5 @@
 import sys
 import time
-import biotite.structure.io as bsio
 
 ROOT_DIR = __file__.rsplit("/", 4)[0]
 if ROOT_DIR not in sys.path:
@@ -8,14 +7,45 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
+import tempfile
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
+from agent.tools.service import ServiceClient
 
 
 BASE_DIR = os.path.dirname(__file__)
 
 
+def get_service(config, model_path: str, device: str) -> ServiceClient:
+    """
+    Get the client of the ESMFold service. The service is shared by all jobs and started on first use
+    Args:
+        config: Config of the ESMFold tools
+
+        model_path: Path to the ESMFold model
+
+        device: Device to run the model if the service has to be started
+    """
+    service_config = config.service
+    socket_path = service_config.get("socket_path") or f"{tempfile.gettempdir()}/esmfold-{os.getuid()}.sock"
+    start_cmd = [
+        config["python"], f"{BASE_DIR}/server.py",
+        "--socket_path", socket_path,
+        "--model_path", model_path,
+        "--device", device,
+        "--max_tokens", str(service_config.get("max_tokens", 4096)),
+        "--max_batch_size", str(service_config.get("max_batch_size", 16)),
+        "--bucket_size", str(service_config.get("bucket_size", 64)),
+        "--batch_wait", str(service_config.get("batch_wait", 0.05)),
+    ]
+    if service_config.get("idle_timeout") is not None:
+        start_cmd += ["--idle_timeout", str(service_config.idle_timeout)]
+
+    return ServiceClient(socket_path, start_cmd, start_timeout=service_config.get("start_timeout", 600))
+
+
 @register_tool
 class Esmfold(BaseTool):
     def __init__(self, out_dir: str = f"{ROOT_DIR}/outputs/esmfold", **kwargs):
@@ -24,17 +54,23 @@ class Esmfold(BaseTool):
             out_dir=out_dir,
             **kwargs
         )
+        tool_name = "esmfold"
+        for doc in self.config["document"]:
+            if doc["tool_name"] == tool_name:
+                self.config["document"] = doc
+                break
+        self.config["example_output"] = self.config["example_output"][tool_name]
+        self.tool_name = tool_name
     
     def __call__(self, protein_sequence) -> dict:
-        now = datetime.datetime.now()
-        now = now.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         save_path = f"{self.out_dir}/esmfold/{now}/esmfold_prediction.pdb"
         
         cmd_args = {
             "sequence": protein_sequence,
             "save_path": save_path,
             "model_path": f"{ROOT_DIR}/{self.config['model_path']}",
-            "device": "cuda:1",
+            "device": self.device,
         }
         
         # Call the ESMFold model
@@ -45,9 +81,18 @@ class Esmfold(BaseTool):
         # Redirect the stdout and stderr to a log file
         cmd += f" > {self.log_path} 2>&1"
         try:
-            os.system(cmd)  
+            if self.config.get("service", {}).get("enabled", False):
+                result = self.service_predict(**cmd_args)
+                return {"save_path": save_path[len(self.out_dir)+1:], "avg_plddt": result["mean_plddt"]}
+
+            if self.in_worker and os.path.realpath(self.config["python"]) == os.path.realpath(sys.executable):
+                self.resident_predict(**cmd_args)
+            else:
+                os.system(cmd)
         
             if os.path.exists(save_path):
+                import biotite.structure.io as bsio
+
                 struct = bsio.load_structure(save_path, extra_fields=["b_factor"])
                 avg_plddt = float(struct.b_factor.mean())
                 return {"save_path": save_path[len(self.out_dir)+1:], "avg_plddt": avg_plddt}
@@ -58,6 +103,87 @@ class Esmfold(BaseTool):
         except Exception as e:
             return {"error": str(e)}
 
+    @property
+    def has_batch_call(self) -> bool:
+        # Inputs are batched by the service. Without it, each input runs as its own job
+        return self.config.get("service", {}).get("enabled", False)
+
+    def batch_call(self, tool_args_list: list):
+        """
+        Fold the inputs with the ESMFold service. The requests are sent concurrently in length order, so that the
+        service packs sequences of similar length into the same batch
+        """
+        model_path = f"{ROOT_DIR}/{self.config['model_path']}"
+        service = get_service(self.config, model_path, self.device)
+        sequences = [tool_args["protein_sequence"] for tool_args in tool_args_list]
+        save_paths = [f"{self.out_dir}/esmfold/{self.run_id}/{i}/esmfold_prediction.pdb" for i in range(len(sequences))]
+        order = sorted(range(len(sequences)), key=lambda i: -len(sequences[i]))
+
+        with open(self.log_path, "w") as w:
+            w.write("Connecting to the ESMFold service\n")
+            w.flush()
+            service.ensure_started()
+
+            w.write(f"Folding {len(sequences)} sequences\n")
+            w.flush()
+            # Enough requests are in flight to fill two batches of the service
+            max_batch_size = self.config.service.get("max_batch_size", 16)
+            with ThreadPoolExecutor(max_workers=min(len(sequences), 2 * max_batch_size)) as pool:
+                futures = {
+                    pool.submit(service.request, "POST", "/fold",
+                                {"sequence": sequences[i], "save_path": save_paths[i]}): i
+                    for i in order
+                }
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        w.write(f"Failed to fold sequence {i}: {e}\n")
+                        w.flush()
+                        yield i, {"error": str(e)}
+                        continue
+
+                    w.write(f"Folded sequence {i} ({len(sequences[i])} residues) in a batch of "
+                            f"{result['batch_size']}\n")
+                    w.flush()
+                    yield i, {"save_path": save_paths[i][len(self.out_dir)+1:], "avg_plddt": result["mean_plddt"]}
+
+    def service_predict(self, sequence: str, save_path: str, model_path: str, device: str) -> dict:
+        """
+        Predict the structure with the resident ESMFold service, which batches concurrent requests
+        """
+        service = get_service(self.config, model_path, device)
+        with open(self.log_path, "w") as w:
+            w.write("Connecting to the ESMFold service\n")
+            w.flush()
+            service.ensure_started()
+
+            w.write(f"Predicting the structure of a protein with {len(sequence)} residues\n")
+            w.flush()
+            result = service.request("POST", "/fold", {"sequence": sequence, "save_path": save_path})
+            w.write(f"Folded in a batch of {result['batch_size']} with chunk size {result['chunk_size']} "
+                    f"after waiting {result['queue_time_s']} s in the queue\n")
+            w.write(f"Structure saved to {save_path}\n")
+
+        return result
+
+    def resident_predict(self, sequence: str, save_path: str, model_path: str, device: str):
+        """
+        Predict the structure in the worker process, keeping the model loaded between calls
+        """
+        from agent.tools.esmfold.command import load_model, predict
+
+        with open(self.log_path, "w") as w:
+            w.write(f"Loading ESMFold from {model_path}\n")
+            w.flush()
+            tokenizer, model = self.get_resident(("esmfold", model_path, device), lambda: load_model(model_path, device))
+
+            w.write(f"Predicting the structure of a protein with {len(sequence)} residues\n")
+            w.flush()
+            predict(sequence, tokenizer, model, save_path=save_path)
+            w.write(f"Structure saved to {save_path}\n")
+
 
 if __name__ == '__main__':
     # Test
@@ -68,5 +194,4 @@ if __name__ == '__main__':
     }
 
     for obs in esmfold.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
@@ -1,10 +1,20 @@
+import sys
+
+ROOT_DIR = __file__.rsplit("/", 4)[0]
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
 import os
+import time
 import torch
 import argparse
 
 from transformers import AutoTokenizer, EsmForProteinFolding
 from transformers.models.esm.openfold_utils.protein import to_pdb, Protein as OFProtein
 from transformers.models.esm.openfold_utils.feats import atom14_to_atom37
+from transformers.models.esm.openfold_utils.loss import compute_tm
+
+from agent.tools.esmfold.batching import read_fasta, pack_batches, structure_names, SummaryWriter
 
 
 torch.backends.cuda.matmul.allow_tf32 = True
@@ -13,74 +23,193 @@ torch.backends.cudnn.allow_tf32 = True
 def load_model(model_path, device):
     tokenizer = AutoTokenizer.from_pretrained(model_path)
     model = EsmForProteinFolding.from_pretrained(model_path, device_map=device)
-    model.esm = model.esm.half()
+    # The language model runs in half precision on the GPU. Half precision is slow or unsupported on the CPU
+    if device != "cpu":
+        model.esm = model.esm.half()
     model.trunk.set_chunk_size(64)
     
     return tokenizer, model
 
 
-def predict(seq, tokenizer, model, save_path=None):
-    tokenized_input = tokenizer([seq], return_tensors="pt", add_special_tokens=False)['input_ids']
-    tokenized_input = tokenized_input.to(model.device)
+def fold(seqs, tokenizer, model):
+    """
+    Predict the structures of a batch of sequences. Shorter sequences are padded to the longest one
+    Args:
+        seqs: Protein sequences
+
+        tokenizer: ESMFold tokenizer
+
+        model: ESMFold model
+
+    Returns:
+        A list with a dict of "pdb", "mean_plddt" and "ptm" for each sequence
+    """
+    tokenized = tokenizer(seqs, return_tensors="pt", padding=True, add_special_tokens=False)
+    input_ids = tokenized["input_ids"].to(model.device)
+    attention_mask = tokenized["attention_mask"].to(model.device)
     with torch.no_grad():
-        output = model(tokenized_input)
+        output = model(input_ids, attention_mask=attention_mask)
+
+    return convert_outputs(output, [len(seq) for seq in seqs])
+
+
+def predict(seq, tokenizer, model, save_path=None):
+    result = fold([seq], tokenizer, model)[0]
     
     if save_path is not None:
-        pdb = convert_outputs_to_pdb(output)
         os.makedirs(os.path.dirname(save_path), exist_ok=True)
         with open(save_path, "w") as w:
-            w.write("".join(pdb))
+            w.write(result["pdb"])
     
-    return output
+    return result
+
+
+def fold_fasta(fasta_file, tokenizer, model, save_dir, summary_path, max_tokens=4096, max_batch_size=16):
+    """
+    Predict the structures of all sequences in a FASTA file. Sequences are sorted by length and packed into batches
+    under a token budget. The PDB files and summary rows of each batch are written as soon as the batch is done
+    Args:
+        fasta_file: Path to the FASTA file
+
+        tokenizer: ESMFold tokenizer
+
+        model: ESMFold model
+
+        save_dir: Directory to save the predicted structures
+
+        summary_path: Path to the TSV table of the id, length, mean pLDDT, pTM and PDB file of each sequence
+
+        max_tokens: Maximum number of padded residues in a batch
+
+        max_batch_size: Maximum number of sequences in a batch
+
+    Returns:
+        The number of folded sequences
+    """
+    records = read_fasta(fasta_file)
+    names = structure_names([seq_id for seq_id, _ in records])
+    batches = pack_batches([len(seq) for _, seq in records], max_tokens, max_batch_size)
+    print(f"Folding {len(records)} sequences in {len(batches)} batches", flush=True)
+
+    os.makedirs(save_dir, exist_ok=True)
+    num_folded = 0
+    with SummaryWriter(summary_path) as summary:
+        pending = list(batches)
+        while pending:
+            batch = pending.pop(0)
+            start = time.time()
+            try:
+                results = fold([records[i][1] for i in batch], tokenizer, model)
 
+            except RuntimeError as e:
+                # A batch that runs out of memory is folded one sequence at a time
+                if len(batch) > 1 and "out of memory" in str(e):
+                    if model.device.type == "cuda":
+                        torch.cuda.empty_cache()
+                    pending = [[i] for i in batch] + pending
+                    continue
 
-def convert_outputs_to_pdb(outputs):
+                for i in batch:
+                    print(f"Failed to fold {records[i][0]}: {e}", flush=True)
+                continue
+
+            for i, result in zip(batch, results):
+                seq_id, seq = records[i]
+                with open(f"{save_dir}/{names[i]}", "w") as w:
+                    w.write(result["pdb"])
+                summary.write(seq_id, len(seq), result["mean_plddt"], result["ptm"], names[i])
+
+            num_folded += len(batch)
+            print(f"Folded {num_folded}/{len(records)}: {len(batch)} sequences of up to "
+                  f"{max(len(records[i][1]) for i in batch)} residues in {time.time() - start:.2f} s", flush=True)
+
+    return num_folded
+
+
+def convert_outputs(outputs, lengths):
+    """
+    Convert the model output into PDB strings and confidence scores. Each sequence is cropped to its own length, and
+    only the tensors needed for the PDB file are copied from the device
+    Args:
+        outputs: Output of the model
+
+        lengths: Length of each sequence in the batch
+    """
     final_atom_positions = atom14_to_atom37(outputs["positions"][-1], outputs)
-    outputs = {k: v.to("cpu").numpy() for k, v in outputs.items()}
-    final_atom_positions = final_atom_positions.cpu().numpy()
-    final_atom_mask = outputs["atom37_atom_exists"]
-    pdbs = []
-    outputs["plddt"] *= 100
-    
-    for i in range(outputs["aatype"].shape[0]):
-        aa = outputs["aatype"][i]
-        pred_pos = final_atom_positions[i]
-        mask = final_atom_mask[i]
-        resid = outputs["residue_index"][i] + 1
+    results = []
+    for i, length in enumerate(lengths):
+        plddt = outputs["plddt"][i, :length].float().cpu().numpy() * 100
+        atom_mask = outputs["atom37_atom_exists"][i, :length].float().cpu().numpy()
         pred = OFProtein(
-            aatype=aa,
-            atom_positions=pred_pos,
-            atom_mask=mask,
-            residue_index=resid,
-            b_factors=outputs["plddt"][i],
-            chain_index=outputs["chain_index"][i] if "chain_index" in outputs else None,
+            aatype=outputs["aatype"][i, :length].cpu().numpy(),
+            atom_positions=final_atom_positions[i, :length].float().cpu().numpy(),
+            atom_mask=atom_mask,
+            residue_index=outputs["residue_index"][i, :length].cpu().numpy() + 1,
+            b_factors=plddt,
+            chain_index=None,
         )
-        pdbs.append(to_pdb(pred))
-    return pdbs
+
+        # PTM of the unpadded sequence
+        ptm_logits = outputs["ptm_logits"][i:i + 1, :length, :length]
+        ptm = compute_tm(ptm_logits, max_bin=31, no_bins=ptm_logits.shape[-1])
+
+        results.append({
+            "pdb": to_pdb(pred),
+            "mean_plddt": float((plddt * atom_mask).sum() / atom_mask.sum()),
+            "ptm": float(ptm),
+        })
+
+    return results
 
 
 def main():
     # Load ESMFold
     tokenizer, model = load_model(args.model_path, args.device)
-    predict(args.sequence, tokenizer, model, save_path=args.save_path)
+    if args.fasta_file is not None:
+        fold_fasta(args.fasta_file, tokenizer, model, args.save_dir, args.summary_path, args.max_tokens,
+                   args.max_batch_size)
+    else:
+        predict(args.sequence, tokenizer, model, save_path=args.save_path)
 
 
 def get_args():
     parser = argparse.ArgumentParser()
-    parser.add_argument(
-        '--sequence', type=str, required=True, help='Protein sequence'
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument(
+        '--sequence', type=str, help='Protein sequence'
+    )
+    group.add_argument(
+        '--fasta_file', type=str, help='FASTA file of the sequences to fold in batches'
     )
     parser.add_argument(
         '--model_path', type=str, required=True, help='Path to the ESMFold model'
     )
     parser.add_argument(
-        '--save_path', type=str, required=True, help='Path to save the predicted structure'
+        '--save_path', type=str, default=None, help='Path to save the predicted structure of "--sequence"'
+    )
+    parser.add_argument(
+        '--save_dir', type=str, default=None, help='Directory to save the structures of "--fasta_file"'
+    )
+    parser.add_argument(
+        '--summary_path', type=str, default=None, help='Path to save the summary table of "--fasta_file"'
+    )
+    parser.add_argument(
+        '--max_tokens', type=int, default=4096, help='Maximum number of padded residues in a batch'
+    )
+    parser.add_argument(
+        '--max_batch_size', type=int, default=16, help='Maximum number of sequences in a batch'
     )
     parser.add_argument(
         '--device', type=str, default='cuda:0', help='Device to run the model. Default: cuda:0'
     )
     
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.fasta_file is not None and (args.save_dir is None or args.summary_path is None):
+        parser.error("--fasta_file requires --save_dir and --summary_path")
+    if args.sequence is not None and args.save_path is None:
+        parser.error("--sequence requires --save_path")
+
+    return args
 
 
 if __name__ == '__main__':
@@ -90,6 +219,11 @@ if __name__ == '__main__':
                     --model_path "/home/public/modelhub/esmfold_v1" \
                     --save_path "/root/temp/predicted_structure.pdb" \
                     --device "cuda:1"
+    python cmd.py   --fasta_file "/root/temp/library.fasta" \
+                    --model_path "/home/public/modelhub/esmfold_v1" \
+                    --save_dir "/root/temp/structures" \
+                    --summary_path "/root/temp/summary.tsv" \
+                    --max_tokens 4096
     """
     args = get_args()
     main()
@@ -0,0 +1,298 @@
+import sys
+
+ROOT_DIR = __file__.rsplit("/", 4)[0]
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import os
+import time
+import argparse
+import threading
+import torch
+
+from agent.tools.esmfold.command import load_model, fold
+from agent.tools.service import serve, current_request
+
+
+# Chunk sizes of the folding trunk, from the fastest to the most memory-saving. None disables chunking
+CHUNK_SIZES = [None, 128, 64, 32, 16, 8, 4]
+
+# Fraction of the free memory that a batch may use
+MEMORY_FRACTION = 0.8
+
+
+def is_out_of_memory(error: Exception) -> bool:
+    return isinstance(error, getattr(torch.cuda, "OutOfMemoryError", ())) or "out of memory" in str(error)
+
+
+class FoldRequest:
+    def __init__(self, sequence: str, save_path: str = None):
+        self.sequence = sequence
+        self.save_path = save_path
+        self.submit_time = time.time()
+        self.context = current_request()
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class FoldingService:
+    def __init__(self,
+                 model_path: str,
+                 device: str,
+                 max_tokens: int = 4096,
+                 max_batch_size: int = 16,
+                 bucket_size: int = 64,
+                 batch_wait: float = 0.05):
+        """
+        Keeps ESMFold loaded and folds the queued requests in batches. Requests are grouped into length buckets, so
+        that a batch wastes little compute on padding
+        Args:
+            model_path: Path to the ESMFold model
+
+            device: Device to run the model. Falls back to the CPU if no GPU is available
+
+            max_tokens: Maximum number of padded residues in a batch
+
+            max_batch_size: Maximum number of sequences in a batch
+
+            bucket_size: Width of the length buckets in residues
+
+            batch_wait: Seconds to wait for more requests before folding a batch
+        """
+        if device.startswith("cuda") and not torch.cuda.is_available():
+            device = "cpu"
+        self.device = device
+        self.max_tokens = max_tokens
+        self.max_batch_size = max_batch_size
+        self.bucket_size = bucket_size
+        self.batch_wait = batch_wait
+
+        print(f"Loading ESMFold from {model_path} on {device}", flush=True)
+        self.tokenizer, self.model = load_model(model_path, device)
+
+        self.queue = []
+        self.condition = threading.Condition()
+        # Smallest chunk size that ran out of memory for each (batch size, length bucket)
+        self.failed_chunk_sizes = {}
+        self.num_folded = 0
+
+        threading.Thread(target=self.loop, daemon=True).start()
+
+    def get_bucket(self, length: int) -> int:
+        return (length - 1) // self.bucket_size
+
+    def get_free_memory(self) -> int:
+        if self.device == "cpu":
+            return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+        return torch.cuda.mem_get_info(torch.device(self.device))[0]
+
+    def choose_chunk_size(self, batch_size: int, length: int):
+        """
+        Choose the largest chunk size whose estimated peak memory fits in the free memory. The trunk keeps a few
+        copies of the L x L x 128 pair representation, and its triangular attention additionally materializes
+        chunk x L x L logits for each of its 4 heads
+        """
+        free_memory = self.get_free_memory() * MEMORY_FRACTION
+        pair_bytes = batch_size * length * length * 128 * 4
+        key = (batch_size, self.get_bucket(length))
+        candidates = CHUNK_SIZES
+        if key in self.failed_chunk_sizes:
+            candidates = CHUNK_SIZES[CHUNK_SIZES.index(self.failed_chunk_sizes[key]) + 1:]
+
+        for chunk_size in candidates:
+            rows = length if chunk_size is None else min(chunk_size, length)
+            attention_bytes = batch_size * rows * length * length * 4 * 4
+            if 8 * pair_bytes + attention_bytes < free_memory:
+                return chunk_size
+
+        return candidates[-1] if candidates else CHUNK_SIZES[-1]
+
+    def fold(self, body: dict) -> dict:
+        """
+        Handle a fold request. Blocks until the batch containing the request is done
+        """
+        sequence = body["sequence"].strip().replace(" ", "").replace("\n", "")
+        request = FoldRequest(sequence, body.get("save_path"))
+        with self.condition:
+            self.queue.append(request)
+            self.condition.notify()
+
+        try:
+            request.context.wait(request.done)
+        finally:
+            # A request that is cancelled or timed out is never folded
+            with self.condition:
+                if request in self.queue:
+                    self.queue.remove(request)
+
+        if request.error is not None:
+            raise RuntimeError(request.error)
+
+        return request.result
+
+    def health(self, body: dict) -> dict:
+        with self.condition:
+            num_queued = len(self.queue)
+
+        return {"status": "ok", "device": self.device, "num_queued": num_queued, "num_folded": self.num_folded}
+
+    def next_batch(self) -> list:
+        """
+        Take the oldest request and the queued requests of the same length bucket, up to the token budget
+        """
+        with self.condition:
+            while not self.queue:
+                self.condition.wait()
+            num_queued = len(self.queue)
+
+        # Give concurrent requests a moment to arrive, so that they can share the batch
+        if num_queued < self.max_batch_size:
+            time.sleep(self.batch_wait)
+
+        with self.condition:
+            # The queued requests may have been cancelled in the meantime
+            if not self.queue:
+                return []
+
+            bucket = self.get_bucket(len(self.queue[0].sequence))
+            batch = []
+            max_length = 0
+            for request in self.queue:
+                if self.get_bucket(len(request.sequence)) != bucket:
+                    continue
+
+                length = max(max_length, len(request.sequence))
+                if batch and (len(batch) >= self.max_batch_size or (len(batch) + 1) * length > self.max_tokens):
+                    break
+
+                batch.append(request)
+                max_length = length
+
+            for request in batch:
+                self.queue.remove(request)
+
+        return batch
+
+    def infer(self, sequences: list) -> tuple:
+        """
+        Fold a batch, retrying with smaller chunks when it runs out of memory
+        Returns:
+            The results and the chunk size that was used
+        """
+        length = max(len(seq) for seq in sequences)
+        key = (len(sequences), self.get_bucket(length))
+        while True:
+            chunk_size = self.choose_chunk_size(len(sequences), length)
+            self.model.trunk.set_chunk_size(chunk_size)
+            try:
+                return fold(sequences, self.tokenizer, self.model), chunk_size
+
+            except RuntimeError as e:
+                if not is_out_of_memory(e) or chunk_size == CHUNK_SIZES[-1]:
+                    raise
+
+                # Remember the failure, so that later batches of this size start from a smaller chunk
+                self.failed_chunk_sizes[key] = chunk_size
+                if self.device != "cpu":
+                    torch.cuda.empty_cache()
+                print(f"Out of memory with chunk size {chunk_size} for {len(sequences)} x {length} residues", flush=True)
+
+    def run_batch(self, batch: list):
+        start = time.time()
+        try:
+            results, chunk_size = self.infer([request.sequence for request in batch])
+
+        except Exception as e:
+            # A batch that does not fit even with the smallest chunks is folded one sequence at a time
+            if len(batch) > 1 and is_out_of_memory(e):
+                if self.device != "cpu":
+                    torch.cuda.empty_cache()
+                for request in batch:
+                    self.run_batch([request])
+                return
+
+            for request in batch:
+                request.error = str(e)
+                request.done.set()
+            return
+
+        elapsed = time.time() - start
+        for request, result in zip(batch, results):
+            try:
+                if request.save_path is not None:
+                    os.makedirs(os.path.dirname(request.save_path), exist_ok=True)
+                    with open(request.save_path, "w") as w:
+                        w.write(result["pdb"])
+                    del result["pdb"]
+
+                result.update({
+                    "length": len(request.sequence),
+                    "batch_size": len(batch),
+                    "chunk_size": chunk_size,
+                    "queue_time_s": round(start - request.submit_time, 3),
+                    "fold_time_s": round(elapsed, 3),
+                })
+                request.result = result
+
+            except Exception as e:
+                request.error = str(e)
+
+            request.done.set()
+
+        self.num_folded += len(batch)
+        print(f"Folded {len(batch)} sequences of up to {max(len(r.sequence) for r in batch)} residues "
+              f"in {elapsed:.2f} s with chunk size {chunk_size}", flush=True)
+
+    def loop(self):
+        while True:
+            batch = self.next_batch()
+            if not batch:
+                continue
+
+            try:
+                self.run_batch(batch)
+            except Exception as e:
+                for request in batch:
+                    request.error = request.error or str(e)
+            finally:
+                # Every request of the batch gets an answer, even if the batch failed unexpectedly
+                for request in batch:
+                    request.done.set()
+
+
+def main(args):
+    service = FoldingService(args.model_path, args.device, args.max_tokens, args.max_batch_size, args.bucket_size,
+                             args.batch_wait)
+    routes = {
+        ("GET", "/health"): service.health,
+        ("POST", "/fold"): service.fold,
+    }
+    serve(args.socket_path, routes, idle_timeout=args.idle_timeout)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Resident ESMFold service on a Unix socket")
+    parser.add_argument("--socket_path", type=str, required=True, help="Path to the Unix socket")
+    parser.add_argument("--model_path", type=str, required=True, help="Path to the ESMFold model")
+    parser.add_argument("--device", type=str, default="cuda:0", help="Device to run the model. Default: cuda:0")
+    parser.add_argument("--max_tokens", type=int, default=4096, help="Maximum number of padded residues in a batch")
+    parser.add_argument("--max_batch_size", type=int, default=16, help="Maximum number of sequences in a batch")
+    parser.add_argument("--bucket_size", type=int, default=64, help="Width of the length buckets in residues")
+    parser.add_argument("--batch_wait", type=float, default=0.05,
+                        help="Seconds to wait for more requests before folding a batch")
+    parser.add_argument("--idle_timeout", type=float, default=None,
+                        help="Exit after being idle for this many seconds")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    EXAMPLE:
+    python server.py    --socket_path /tmp/esmfold.sock \
+                        --model_path "/home/public/modelhub/esmfold_v1" \
+                        --device "cuda:0"
+    """
+    main(get_args())
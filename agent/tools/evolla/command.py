@@ -83,9 +83,9 @@ def id_args(uniprot_id, tmp_pdb_dir, foldseek_path):
     foldseek_str = get_foldseek(protein_structure, foldseek_path).lower()
     return protein_sequence, foldseek_str
 
-def seq_args(protein_sequence, tmp_pdb_dir, esmfold_path, foldseek_path):
+def seq_args(protein_sequence, tmp_pdb_dir, esmfold_path, foldseek_path, device="cuda:1"):
     print(f"Start loading ESMFold from {esmfold_path}")
-    tokenizer, model = load_model(esmfold_path, "cuda:1")
+    tokenizer, model = load_model(esmfold_path, device)
     print(f"ESMFold loaded successfully")
     print(f"Start predicting structure for sequence: {protein_sequence}")
     
@@ -149,13 +149,14 @@ def get_args():
     parser.add_argument("--tmp_pdb_dir", type=str, help="Temporary directory to save PDB files")
     parser.add_argument("--esmfold_path", type=str, help="Path to the ESMFold model")
     parser.add_argument("--foldseek_path", type=str, help="Path to the FoldSeek model")
+    parser.add_argument("--device", type=str, default="cuda:1", help="Device to run ESMFold")
     return parser.parse_args()
 
 def main(args):
     if args.uniprot_id:
         protein_sequence, foldseek_str = id_args(args.uniprot_id, args.tmp_pdb_dir, args.foldseek_path)
     elif args.protein_sequence:
-         protein_sequence, foldseek_str = seq_args(args.protein_sequence, args.tmp_pdb_dir, args.esmfold_path, args.foldseek_path)
+         protein_sequence, foldseek_str = seq_args(args.protein_sequence, args.tmp_pdb_dir, args.esmfold_path, args.foldseek_path, args.device)
     elif args.protein_structure:
         protein_sequence, foldseek_str = structure_args(args.protein_structure, args.foldseek_path)
     else:
@@ -7,13 +7,11 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -33,8 +31,7 @@ class EvollaSeq(BaseTool):
         self.tool_name = tool_name
         
     def __call__(self, question, protein_sequence) -> dict:
-        now = datetime.datetime.now()
-        now = now.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         os.makedirs(f"{self.out_dir}/evolla/{now}", exist_ok=True)
         
         cmd_args = {
@@ -43,6 +40,7 @@ class EvollaSeq(BaseTool):
             "tmp_pdb_dir": f"{self.out_dir}/evolla/{now}",
             "esmfold_path": f"{ROOT_DIR}/{self.config['esmfold_path']}",
             "foldseek_path": f"{ROOT_DIR}/{self.config['foldseek_path']}",
+            "device": self.device,
         }
         
         # Call the ESMFold model
@@ -79,8 +77,7 @@ if __name__ == '__main__':
     }
 
     for obs in protein_chat_byid.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
         # protein_chat_byid.terminate()
     
\ No newline at end of file
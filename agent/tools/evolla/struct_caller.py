@@ -7,13 +7,11 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -33,8 +31,7 @@ class EvollaStruct(BaseTool):
         self.tool_name = tool_name
         
     def __call__(self, question, protein_structure) -> dict:
-        now = datetime.datetime.now()
-        now = now.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         os.makedirs(f"{self.out_dir}/evolla/{now}", exist_ok=True)
         
         protein_structure = f"{self.out_dir}/{protein_structure}"
@@ -82,8 +79,7 @@ if __name__ == '__main__':
     }
 
     for obs in protein_chat_byid.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
         # protein_chat_byid.terminate()
     
\ No newline at end of file
@@ -23,7 +23,7 @@ class Extractbackbone(BaseTool):
     
     def __call__(self, structure_file) -> dict:
         start = datetime.datetime.now()
-        now = start.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         os.makedirs(f"{self.out_dir}/extract_backbone/{now}", exist_ok=True)
         
         script_path = f'{BASE_DIR}/command.py'
@@ -90,5 +90,4 @@ if __name__ == '__main__':
     }
 
     for obs in tool.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
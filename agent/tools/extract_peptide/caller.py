@@ -54,7 +54,7 @@ class ExtractPeptide(BaseTool):
                 return {"error": "Start residue must be less than or equal to end residue"}
             
             start_time = datetime.datetime.now()
-            timestamp = start_time.strftime("%Y%m%d_%H%M%S")
+            timestamp = self.run_id
             
             save_dir = f"{self.out_dir}/extract_peptide/{timestamp}"
             if not os.path.exists(save_dir):
@@ -205,5 +205,4 @@ if __name__ == '__main__':
     }
     
     for obs in tool.mp_run(**input_args):
-        os.system("clear")
-        print(obs) 
\ No newline at end of file
+        print(obs, end="") 
\ No newline at end of file
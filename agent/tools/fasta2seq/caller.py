@@ -107,6 +107,5 @@ if __name__ == '__main__':
     }
 
     for obs in caller.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
@@ -7,14 +7,12 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 import numpy as np
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -31,7 +29,7 @@ class Foldseek(BaseTool):
         pdb_path = f"{self.out_dir}/{pdb_path}"
         
         start = datetime.datetime.now()
-        now = start.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         os.makedirs(f"{self.out_dir}/foldseek/{now}", exist_ok=True)
         
         foldseek_path = f'{ROOT_DIR}/{self.config["bin"]}'
@@ -100,7 +98,7 @@ if __name__ == '__main__':
 
     for obs in foldseek.mp_run(**input_args):
         # os.system("clear")
-        print(obs)
+        print(obs, end="")
 
         # foldseek.terminate()
     
\ No newline at end of file
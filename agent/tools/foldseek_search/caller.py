@@ -47,7 +47,7 @@ class FoldseekSearch(BaseTool):
             return {"error": f"Input query PDB file not found at path: {query_pdb_path}"}
         
         start_time = datetime.datetime.now()
-        timestamp = start_time.strftime("%Y%m%d_%H%M%S")
+        timestamp = self.run_id
         
         query_basename = os.path.basename(query_pdb_path).split('.')[0]
         save_dir = f"{self.out_dir}/foldseek_search/{timestamp}"
@@ -75,7 +75,8 @@ class FoldseekSearch(BaseTool):
             database_path, 
             result_path,
             str(max_results),
-            str(evalue_threshold)
+            str(evalue_threshold),
+            str(self.get_num_threads())
         ]
         
         cmd = [f"cd {ROOT_DIR} && "] + [script_path] + script_args
@@ -163,5 +164,4 @@ if __name__ == '__main__':
     }
     
     for obs in foldseek_search.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
@@ -1,17 +1,18 @@
 #!/bin/bash
 
-# Use case: foldseek_search.sh <FOLDSEEK_PATH> <QUERY_PDB_PATH> <DATABASE_PATH> <RESULT_PATH> [MAX_RESULTS] [EVALUE_THRESHOLD]
+# Use case: foldseek_search.sh <FOLDSEEK_PATH> <QUERY_PDB_PATH> <DATABASE_PATH> <RESULT_PATH> [MAX_RESULTS] [EVALUE_THRESHOLD] [THREADS]
 # Please make sure you are at the project root (e.g., ProtAgent).
 
 # Check parameter usage
 if [ "$#" -lt 4 ]; then
-    echo "Usage: foldseek_search.sh <FOLDSEEK_PATH> <QUERY_PDB_PATH> <DATABASE_PATH> <RESULT_PATH> [MAX_RESULTS] [EVALUE_THRESHOLD]"
+    echo "Usage: foldseek_search.sh <FOLDSEEK_PATH> <QUERY_PDB_PATH> <DATABASE_PATH> <RESULT_PATH> [MAX_RESULTS] [EVALUE_THRESHOLD] [THREADS]"
     echo "  FOLDSEEK_PATH: Path to foldseek binary"
     echo "  QUERY_PDB_PATH: Path to query PDB file"
     echo "  DATABASE_PATH: Path to foldseek database (e.g., PDB, AlphaFold)"
     echo "  RESULT_PATH: Path to save search results"
     echo "  MAX_RESULTS: Maximum number of results to return (default: 100)"
     echo "  EVALUE_THRESHOLD: E-value threshold for filtering results (default: 1e-3)"
+    echo "  THREADS: Number of threads (default: 1)"
     exit 1
 fi
 
@@ -32,6 +33,7 @@ DATABASE_PATH=$3
 RESULT_PATH=$4
 MAX_RESULTS=${5:-100}
 EVALUE_THRESHOLD=${6:-1e-3}
+THREADS=${7:-1}
 
 # Create temporary directory for intermediate files
 TEMP_DIR=$(mktemp -d)
@@ -41,7 +43,7 @@ TEMP_RESULT="$TEMP_DIR/result"
 echo "Creating temporary query database..."
 
 # Create database from query structure
-$FOLDSEEK_PATH createdb $QUERY_PDB_PATH $TEMP_QUERY_DB --threads 1
+$FOLDSEEK_PATH createdb $QUERY_PDB_PATH $TEMP_QUERY_DB --threads $THREADS
 
 if [ $? -ne 0 ]; then
     echo "Failed to create query database"
@@ -55,7 +57,7 @@ echo "Searching for similar structures..."
 $FOLDSEEK_PATH search $TEMP_QUERY_DB $DATABASE_PATH $TEMP_RESULT $TEMP_DIR \
     --max-seqs $MAX_RESULTS \
     -e $EVALUE_THRESHOLD \
-    --threads 1 \
+    --threads $THREADS \
     -v 1
 
 if [ $? -ne 0 ]; then
@@ -69,7 +71,7 @@ echo "Converting results to readable format..."
 # Convert results to readable format
 $FOLDSEEK_PATH convertalis $TEMP_QUERY_DB $DATABASE_PATH $TEMP_RESULT $RESULT_PATH \
     --format-output "query,target,pident,alnlen,mismatch,gapopen,qstart,qend,tstart,tend,evalue,bits" \
-    --threads 1
+    --threads $THREADS
 
 # Check for errors
 if [ $? -ne 0 ]; then
@@ -46,7 +46,7 @@ class GetChainSequence(BaseTool):
                 return {"error": f"PDB file not found: {pdb_file}"}
             
             start_time = datetime.datetime.now()
-            timestamp = start_time.strftime("%Y%m%d_%H%M%S")
+            timestamp = self.run_id
             
             save_dir = f"{self.out_dir}/get_chain_sequence/{timestamp}"
             if not os.path.exists(save_dir):
@@ -164,5 +164,4 @@ if __name__ == '__main__':
     }
     
     for obs in tool.mp_run(**input_args):
-        os.system("clear")
-        print(obs) 
\ No newline at end of file
+        print(obs, end="") 
\ No newline at end of file
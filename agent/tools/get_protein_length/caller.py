@@ -137,5 +137,4 @@ if __name__ == '__main__':
     }
     
     for obs in tool.mp_run(**input_args):
-        os.system("clear")
-        print(obs) 
\ No newline at end of file
+        print(obs, end="") 
\ No newline at end of file
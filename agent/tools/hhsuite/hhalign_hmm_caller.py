@@ -68,7 +68,7 @@ class HHAlignHMM(BaseTool):
             save_dir = os.path.dirname(save_path)
         else:
             # Generate a unique output path
-            timestamp = start_time.strftime("%Y%m%d_%H%M%S")
+            timestamp = self.run_id
             save_dir = f"{self.out_dir}/hhalign_hmm/{timestamp}"
             save_path = f"{save_dir}/hhalign_result.hhr"
         
@@ -161,5 +161,4 @@ if __name__ == '__main__':
         }
 
     for obs in hhalign.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
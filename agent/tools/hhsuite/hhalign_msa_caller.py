@@ -69,7 +69,7 @@ class HHAlignMSA(BaseTool):
             save_dir = os.path.dirname(save_path)
         else:
             # Generate a unique output path
-            timestamp = start_time.strftime("%Y%m%d_%H%M%S")
+            timestamp = self.run_id
             save_dir = f"{self.out_dir}/hhalign_msa/{timestamp}"
             save_path = f"{save_dir}/hhalign_result.hhr"
         
@@ -163,6 +163,5 @@ if __name__ == '__main__':
     }
     
     for obs in hhalign.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
     
\ No newline at end of file
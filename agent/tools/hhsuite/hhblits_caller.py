@@ -6,13 +6,11 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -58,7 +56,7 @@ class HHBlits(BaseTool):
         start_time = datetime.datetime.now()
         
 
-        timestamp = start_time.strftime("%Y%m%d_%H%M%S")
+        timestamp = self.run_id
         save_dir = f"{self.out_dir}/hhblits/{timestamp}"
         a3m_save_path = f"{save_dir}/{os.path.basename(query).split('.')[0]}.a3m"
         hhr_save_path = f"{save_dir}/{os.path.basename(query).split('.')[0]}_align-detail.hhr"
@@ -75,7 +73,7 @@ class HHBlits(BaseTool):
         # -cpu: number of threads
         
         cmd = (f"{self.config.HHblits} -i '{query_path}' -d '{db_path_prefix}' "
-               f"-oa3m '{a3m_save_path}' -o {hhr_save_path} -n {n_iter} -e {evalue} -cpu {cpu} "
+               f"-oa3m '{a3m_save_path}' -o {hhr_save_path} -n {n_iter} -e {evalue} -cpu {self.get_num_threads(cpu)} "
                f"> /dev/null 2> {self.log_path}")
         
         try:
@@ -180,5 +178,4 @@ if __name__ == '__main__':
         "evalue": 1e-3,
     }
     for obs in hhblits.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
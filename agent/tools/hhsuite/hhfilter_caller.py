@@ -6,13 +6,11 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -38,7 +36,7 @@ class HHFilter(BaseTool):
         origin_seq_num = self._parse_a3m_for_sequence_count(input_msa)
         
         start = datetime.datetime.now()
-        now = start.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         save_dir = f"{self.out_dir}/hhfilter/{now}"
         if not os.path.exists(save_dir):
             os.makedirs(save_dir)
@@ -89,5 +87,4 @@ if __name__ == '__main__':
         "diff": 1000
     }
     for obs in hhfilter.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
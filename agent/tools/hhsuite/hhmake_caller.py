@@ -6,13 +6,11 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -35,7 +33,7 @@ class HHMake(BaseTool):
     def __call__(self, msa_file) -> dict:
         msa_file = f"{self.out_dir}/{msa_file}"
         start_time = datetime.datetime.now()
-        now = start_time.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         save_dir = f"{self.out_dir}/hhmake/{now}"
         if not os.path.exists(save_dir):
             os.makedirs(save_dir)
@@ -67,7 +65,6 @@ if __name__ == '__main__':
         "msa_file": f"example/protein_sequence.a3m",
     }
     for obs in hhmake.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
     
\ No newline at end of file
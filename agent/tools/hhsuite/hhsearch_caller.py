@@ -6,13 +6,11 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -35,7 +33,7 @@ class HHSearch(BaseTool):
     def __call__(self, query_hmm, database: str = 'uniclust30', evalue: float = 0.001, cpu: int = 10) -> dict:
         query_hmm = f"{self.out_dir}/{query_hmm}"
         start = datetime.datetime.now()
-        now = start.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         save_dir = f"{self.out_dir}/hhsearch/{now}"
         if not os.path.exists(save_dir):
             os.makedirs(save_dir)
@@ -55,7 +53,7 @@ class HHSearch(BaseTool):
         
         # Call the hhsearch
         cmd =  (f"{ROOT_DIR}/{self.config.HHsearch} -i '{query_hmm}' -d '{db_path_prefix}' "
-               f"-o {hhr_save_path} -oa3m {a3m_save_path} -e {evalue} -cpu {cpu} "
+               f"-o {hhr_save_path} -oa3m {a3m_save_path} -e {evalue} -cpu {self.get_num_threads(cpu)} "
                f"> /dev/null 2> {self.log_path}")
         
         
@@ -150,6 +148,5 @@ if __name__ == '__main__':
         "evalue": 1e-3
     }
     for obs in hhsearch.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
     
@@ -53,7 +53,7 @@ class HMMBuild(BaseTool):
             return {"error": f"Input MSA file not found at path: {msa_file}"}
         
         start_time = datetime.datetime.now()
-        timestamp = start_time.strftime("%Y%m%d_%H%M%S")
+        timestamp = self.run_id
         
         msa_basename = os.path.basename(msa_file).split('.')[0]
         save_dir = f"{self.out_dir}/hmmbuild/{timestamp}"
@@ -73,7 +73,7 @@ class HMMBuild(BaseTool):
         # --cpu: number of threads
         # --name: assign a name to the HMM
         # The two main arguments are the output HMM file and the input MSA file.
-        cmd = (f"{self.config.HMMbuild} --cpu {cpu} -n '{hmm_name}' "
+        cmd = (f"{self.config.HMMbuild} --cpu {self.get_num_threads(cpu)} -n '{hmm_name}' "
                f"'{hmm_output_path}' '{msa_abs_path}' "
                f"> {self.log_path} 2>&1")
 
@@ -148,7 +148,6 @@ if __name__ == '__main__':
     }
     
     for obs in hmmbuild.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
     
 
@@ -7,14 +7,12 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 import re
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -58,7 +56,7 @@ class HMMScan(BaseTool):
 
         start_time = datetime.datetime.now()
 
-        timestamp = start_time.strftime("%Y%m%d_%H%M%S")
+        timestamp = self.run_id
         save_dir = f"{self.out_dir}/{self.tool_name}/{timestamp}"
         
         if not os.path.exists(save_dir):
@@ -77,7 +75,7 @@ class HMMScan(BaseTool):
         # --cpu: number of threads
         cmd_parts = [
             self.config.HMMscan,  # Path to the hmmscan executable
-            f"--cpu {cpu}",
+            f"--cpu {self.get_num_threads(cpu)}",
             f"-E {e_value_cutoff}",
             f"--tblout '{tblout_save_path}'",
             f"--domtblout '{domtblout_save_path}'",
@@ -268,5 +266,4 @@ if __name__ == '__main__':
     }
     
     for obs in hmmscan.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
\ No newline at end of file
+        print(obs, end="")
\ No newline at end of file
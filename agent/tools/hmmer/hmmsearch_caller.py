@@ -71,7 +71,7 @@ class HMMSearch(BaseTool):
             return {"error": f"Input sequence database not found at path: {seq_db}"}
 
         start_time = datetime.datetime.now()
-        timestamp = start_time.strftime("%Y%m%d_%H%M%S")
+        timestamp = self.run_id
         
         save_dir = f"{self.out_dir}/hmmsearch/{timestamp}"
         
@@ -87,7 +87,7 @@ class HMMSearch(BaseTool):
         # --- Command Construction ---
         cmd_parts = [
             self.config.HMMsearch,
-            f"--cpu {cpu}",
+            f"--cpu {self.get_num_threads(cpu)}",
             f"-E {e_value_cutoff}",
             f"--tblout '{tblout_path}'",
             f"--domtblout '{domtblout_path}'",
@@ -194,6 +194,5 @@ if __name__ == '__main__':
     }
     
     for obs in hmmsearch.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
     
\ No newline at end of file
@@ -0,0 +1,221 @@
+import os
+import json
+import mmap
+import math
+import time
+import hashlib
+import threading
+
+
+# Source of the list of all released PDB entries
+PDB_ENTRIES_URL = "https://data.rcsb.org/rest/v1/holdings/current/entry_ids"
+
+# Source of UniProt accessions. The query selects the entries, e.g. "reviewed:true" for Swiss-Prot
+UNIPROT_LIST_URL = "https://rest.uniprot.org/uniprotkb/stream?format=list&query={query}"
+
+
+class BloomFilter:
+    def __init__(self, num_bits: int, num_hashes: int, bits=None):
+        """
+        Compact set membership test with no false negatives, used for identifier lists too large to keep in memory
+        as a set, such as all UniProt accessions
+        Args:
+            num_bits: Size of the bit array
+
+            num_hashes: Number of bits set for each item
+
+            bits: Existing bit array, e.g. a memory-mapped file. A new empty array is created if None
+        """
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float = 0.001) -> "BloomFilter":
+        """
+        Create an empty filter sized for the given number of items and false positive rate
+        """
+        num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        num_hashes = max(1, round(num_bits / max(capacity, 1) * math.log(2)))
+        return cls(num_bits, num_hashes)
+
+    def positions(self, item: str):
+        # Double hashing derives all positions from one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str):
+        for pos in self.positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self.positions(item))
+
+    def save(self, path: str):
+        """
+        Save the filter as a json header line followed by the bit array
+        """
+        with open(path, "wb") as w:
+            w.write(json.dumps({"num_bits": self.num_bits, "num_hashes": self.num_hashes}).encode() + b"\n")
+            w.write(self.bits)
+
+    @classmethod
+    def load(cls, path: str) -> "BloomFilter":
+        """
+        Load a saved filter. The bit array is memory-mapped, so only the pages that are looked up are read
+        """
+        with open(path, "rb") as r:
+            header = r.readline()
+            data = mmap.mmap(r.fileno(), 0, access=mmap.ACCESS_READ)
+
+        meta = json.loads(header)
+        bits = memoryview(data)[len(header):]
+        return cls(meta["num_bits"], meta["num_hashes"], bits)
+
+
+def read_ids(path: str) -> set:
+    """
+    Read one identifier per line
+    """
+    with open(path, "r") as r:
+        return {line.strip().upper() for line in r if line.strip()}
+
+
+def write_ids(path: str, ids):
+    """
+    Write one identifier per line. The file is replaced atomically, so readers never see a partial list
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w") as w:
+        for identifier in sorted(ids):
+            w.write(f"{identifier}\n")
+    os.replace(tmp_path, path)
+
+
+class IdentifierIndex:
+    def __init__(self, index_dir: str):
+        """
+        Local index of valid identifiers, used to validate identifiers without network requests. The index directory
+        may contain:
+            pdb_entries.txt: All released PDB IDs, one per line
+            uniprot_accessions.txt: UniProt accessions, one per line
+            uniprot_accessions.bloom: Bloom filter of UniProt accessions, used when the list is too large to load
+        Missing files mean that the corresponding identifiers cannot be checked locally.
+        Args:
+            index_dir: Directory of the index files
+        """
+        self.index_dir = index_dir
+        self.pdb_path = f"{index_dir}/pdb_entries.txt"
+        self.uniprot_path = f"{index_dir}/uniprot_accessions.txt"
+        self.uniprot_bloom_path = f"{index_dir}/uniprot_accessions.bloom"
+
+        self.lock = threading.Lock()
+        # Identifier sets are loaded on their first use
+        self.pdb_ids = None
+        self.uniprot_ids = None
+        self.loaded = False
+
+    def load(self):
+        with self.lock:
+            if self.loaded:
+                return
+
+            if os.path.exists(self.pdb_path):
+                self.pdb_ids = read_ids(self.pdb_path)
+
+            if os.path.exists(self.uniprot_path):
+                self.uniprot_ids = read_ids(self.uniprot_path)
+            elif os.path.exists(self.uniprot_bloom_path):
+                self.uniprot_ids = BloomFilter.load(self.uniprot_bloom_path)
+
+            self.loaded = True
+
+    def reload(self):
+        """
+        Drop the loaded identifiers, so that updated index files are read on the next lookup
+        """
+        with self.lock:
+            self.pdb_ids = None
+            self.uniprot_ids = None
+            self.loaded = False
+
+    def contains(self, kind: str, value: str):
+        """
+        Check whether an identifier is in the index
+        Args:
+            kind: Kind of the identifier. Should be one of ["PDB_ID", "UNIPROT_ID"]
+
+            value: The identifier
+
+        Returns:
+            True or False, or None if the index has no list for this kind of identifier
+        """
+        self.load()
+        ids = self.pdb_ids if kind == "PDB_ID" else self.uniprot_ids
+        if ids is None:
+            return None
+
+        return value.strip().upper() in ids
+
+    def is_stale(self, max_age_days: float) -> bool:
+        """
+        Whether the PDB entry list is missing or older than the given age
+        """
+        if not os.path.exists(self.pdb_path):
+            return True
+
+        return time.time() - os.path.getmtime(self.pdb_path) > max_age_days * 86400
+
+    def refresh_pdb(self, url: str = PDB_ENTRIES_URL):
+        """
+        Download the current list of PDB entries
+        """
+        import requests
+
+        response = requests.get(url, timeout=300)
+        response.raise_for_status()
+        write_ids(self.pdb_path, {entry_id.upper() for entry_id in response.json()})
+        self.reload()
+
+    def refresh_uniprot(self, query: str = "reviewed:true", bloom: bool = False, error_rate: float = 0.001):
+        """
+        Download the UniProt accessions matching a query
+        Args:
+            query: UniProt query selecting the entries
+
+            bloom: If True, store the accessions as a Bloom filter instead of a plain list
+
+            error_rate: False positive rate of the Bloom filter
+        """
+        import requests
+
+        response = requests.get(UNIPROT_LIST_URL.format(query=query), timeout=3600)
+        response.raise_for_status()
+        accessions = {line.strip().upper() for line in response.text.splitlines() if line.strip()}
+        self.build_uniprot(accessions, bloom, error_rate)
+
+    def build_uniprot(self, accessions: set, bloom: bool = False, error_rate: float = 0.001):
+        """
+        Store a set of UniProt accessions in the index
+        """
+        if bloom:
+            bloom_filter = BloomFilter.for_capacity(len(accessions), error_rate)
+            for accession in accessions:
+                bloom_filter.add(accession)
+
+            os.makedirs(self.index_dir, exist_ok=True)
+            tmp_path = f"{self.uniprot_bloom_path}.tmp-{os.getpid()}"
+            bloom_filter.save(tmp_path)
+            os.replace(tmp_path, self.uniprot_bloom_path)
+            # The plain list takes precedence over the filter
+            if os.path.exists(self.uniprot_path):
+                os.remove(self.uniprot_path)
+
+        else:
+            write_ids(self.uniprot_path, accessions)
+
+        self.reload()
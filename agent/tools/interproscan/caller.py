@@ -10,13 +10,11 @@ if ROOT_DIR not in sys.path:
 
 import os
 import datetime
-import torch
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -32,7 +30,7 @@ class InterproScan(BaseTool):
     def __call__(self, fasta_file, goterms=False, pathways=False) -> dict:
         fasta_file = f"{self.out_dir}/{fasta_file}"
         start_time = datetime.datetime.now()
-        now = start_time.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         save_dir = f"{self.out_dir}/interproscan/{now}"
         if not os.path.exists(save_dir):
             os.makedirs(save_dir)
@@ -219,6 +217,5 @@ if __name__ == '__main__':
         "fasta_file": "example/example_1.fasta"
     }
     for obs in interproscan.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
     
\ No newline at end of file
@@ -0,0 +1,45 @@
+import os
+
+
+class LogTail:
+    def __init__(self, log_path: str):
+        """
+        Follow a log file from a byte offset, so that only the appended part is read on every check
+        Args:
+            log_path: Path to the log file
+        """
+        self.log_path = log_path
+        self.offset = 0
+        # Trailing bytes of an incomplete line
+        self.buffer = b""
+
+    def read(self, final: bool = False) -> str:
+        """
+        Read the lines appended since the last read
+        Args:
+            final: If True, also return the last line even if it does not end with a newline
+
+        Returns:
+            The appended lines. Empty if nothing new has been written
+        """
+        try:
+            size = os.path.getsize(self.log_path)
+        except OSError:
+            size = 0
+
+        data = b""
+        if size > self.offset:
+            with open(self.log_path, "rb") as r:
+                r.seek(self.offset)
+                data = r.read(size - self.offset)
+            self.offset += len(data)
+
+        data = self.buffer + data
+        if final:
+            self.buffer = b""
+        else:
+            # Hold back the incomplete last line until it is finished
+            end = data.rfind(b"\n") + 1
+            data, self.buffer = data[:end], data[end:]
+
+        return data.decode("utf-8", errors="replace")
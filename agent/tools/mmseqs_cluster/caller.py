@@ -7,13 +7,11 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -30,7 +28,7 @@ class MMSeqsCluster(BaseTool):
         sequence_path = f"{self.out_dir}/{sequence_path}"
         
         start = datetime.datetime.now()
-        now = start.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         save_dir = f"{self.out_dir}/mmseqs_cluster/{now}"
         os.makedirs(save_dir, exist_ok=True)
         
@@ -70,8 +68,7 @@ if __name__ == '__main__':
     }
 
     for obs in mmseqs_cluster.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
         # mmseqs_cluster.terminate()
     
\ No newline at end of file
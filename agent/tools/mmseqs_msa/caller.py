@@ -6,13 +6,11 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -27,7 +25,7 @@ class MmseqsMsa(BaseTool):
     
     def __call__(self, query_sequence, msa_mode) -> dict:
         start = datetime.datetime.now()
-        now = start.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         save_dir = f"{self.out_dir}/mmseqs_msa/{now}"
         if not os.path.exists(save_dir):
             os.makedirs(save_dir)
@@ -80,5 +78,4 @@ if __name__ == '__main__':
         "msa_mode": "mmseqs2_uniref",
     }
     for obs in mmseqs2.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
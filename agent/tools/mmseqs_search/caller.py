@@ -7,13 +7,11 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -33,7 +31,7 @@ class MMSeqsSearch(BaseTool):
             target_fasta_path = os.path.join(self.out_dir, target_fasta_path)
         
         start = datetime.datetime.now()
-        now = start.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         save_dir = f"{self.out_dir}/mmseqs_search/{now}"
         os.makedirs(save_dir, exist_ok=True)
         
@@ -94,8 +92,7 @@ if __name__ == '__main__':
     print("\nRunning MMSeqs search...")
 
     for obs in mmseqs_search.mp_run(**input_args):
-        os.system("clear")
         print("=== Results ===")
-        print(obs)
+        print(obs, end="")
 
         # mmseqs_search.terminate()
\ No newline at end of file
@@ -73,5 +73,4 @@ if __name__ == "__main__":
         "pdb_file": "example/1A2B.pdb",
     }
     for obs in caller.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
\ No newline at end of file
+        print(obs, end="")
\ No newline at end of file
@@ -39,7 +39,7 @@ class GetPDB(BaseTool):
     
     def __call__(self, pdb_id) -> dict:
         start = datetime.datetime.now()
-        now = start.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         save_dir = f"{self.out_dir}/pdb_entry/{now}"
         
         os.makedirs(save_dir, exist_ok=True)
@@ -79,6 +79,5 @@ if __name__ == '__main__':
     }
 
     for obs in caller.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
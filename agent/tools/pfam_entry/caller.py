@@ -7,13 +7,11 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 import ast
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 import shlex
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -69,8 +67,7 @@ if __name__ == '__main__':
     }
 
     for obs in pfam_entry.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
         # pfam_entry.terminate()
     
\ No newline at end of file
@@ -8,14 +8,12 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 import pandas as pd
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -29,8 +27,7 @@ class Pinal(BaseTool):
         )
     
     def __call__(self, input_text, design_num=5) -> dict:
-        now = datetime.datetime.now()
-        now = now.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         save_dir = f"{self.out_dir}/pinal/{now}"
         if not os.path.exists(save_dir):
             os.makedirs(save_dir)
@@ -84,8 +81,7 @@ if __name__ == '__main__':
     }
 
     for obs in pinal.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
         # pinal.terminate()
     
\ No newline at end of file
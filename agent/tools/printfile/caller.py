@@ -73,4 +73,4 @@ if __name__ == "__main__":
     tool = PrintFile(out_dir = BASE_DIR)
     args = {"file_path": "example/test.txt"}
     for obs in tool.mp_run(**args):
-        print(obs)
\ No newline at end of file
+        print(obs, end="")
\ No newline at end of file
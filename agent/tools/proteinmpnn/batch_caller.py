@@ -0,0 +1,98 @@
+import sys
+
+ROOT_DIR = __file__.rsplit("/", 4)[0]
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import os
+import shlex
+import pandas as pd
+
+from agent.tools.base_tool import BaseTool
+from agent.tools.register import register_tool
+from agent.tools.proteinmpnn.caller import get_service, service_design
+from agent.tools.proteinmpnn.designs import list_backbones
+
+
+BASE_DIR = os.path.dirname(__file__)
+
+
+@register_tool
+class ProteinMPNNBatch(BaseTool):
+    def __init__(self, out_dir: str = f"{ROOT_DIR}/outputs/proteinmpnn_batch", **kwargs):
+        super().__init__(
+            config_path=f"{BASE_DIR}/config.yaml",
+            out_dir=out_dir,
+            **kwargs
+        )
+        tool_name = "proteinmpnn_batch"
+        for doc in self.config["document"]:
+            if doc["tool_name"] == tool_name:
+                self.config["document"] = doc
+                break
+        self.tool_name = tool_name
+
+    def __call__(self, backbone_dir, chains='A', num_seqs=8, sampling_temp=0.1, model_name="v_48_002") -> dict:
+        backbone_dir = backbone_dir if os.path.isabs(backbone_dir) else f"{self.out_dir}/{backbone_dir}"
+        save_dir = f"{self.out_dir}/proteinmpnn_batch/{self.run_id}"
+        summary_path = f"{save_dir}/mpnn_results.csv"
+        design_args = {
+            "chains": chains,
+            "num_seqs": num_seqs,
+            "sampling_temp": sampling_temp,
+            "model_name": model_name,
+        }
+
+        try:
+            pdb_paths = list_backbones(backbone_dir)
+            if not pdb_paths:
+                return {"error": f"No .pdb or .cif files found in {backbone_dir}"}
+
+            if self.config.get("service", {}).get("enabled", False):
+                service_design(get_service(self.config, self.device), pdb_paths, save_dir, design_args,
+                               self.log_path)
+            else:
+                cmd = f"{self.config['python']} {BASE_DIR}/command.py"
+                cmd_args = {
+                    "pdb_path": backbone_dir,
+                    "out_dir": save_dir,
+                    "device": self.device,
+                    "batch_size": self.config.get("service", {}).get("batch_size", 32),
+                    **design_args,
+                }
+                for k, v in cmd_args.items():
+                    cmd += f" --{k} {shlex.quote(str(v))}"
+
+                # Redirect the stdout and stderr to a log file
+                cmd += f" > {self.log_path} 2>&1"
+                os.system(cmd)
+
+            if not os.path.exists(summary_path):
+                return {"error": "ProteinMPNN failed. Please check the log file."}
+
+            result_df = pd.read_csv(summary_path)
+            if result_df.empty:
+                return {"error": "ProteinMPNN failed to design any backbone. Please check the log file."}
+
+            return {
+                "design_dir": save_dir[len(self.out_dir)+1:],
+                "full_result": summary_path[len(self.out_dir)+1:],
+                "full_fasta": f"{save_dir[len(self.out_dir)+1:]}/designs.fasta",
+                "num_backbones": int(result_df["backbone"].nunique()),
+            }
+
+        except Exception as e:
+            return {"error": str(e)}
+
+
+if __name__ == '__main__':
+    # Test
+    proteinmpnn_batch = ProteinMPNNBatch(BASE_DIR)
+
+    input_args = {
+        "backbone_dir": "example",
+        "num_seqs": 4,
+    }
+
+    for obs in proteinmpnn_batch.mp_run(**input_args):
+        print(obs, end="")
@@ -9,16 +9,84 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
+import tempfile
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
+from agent.tools.service import ServiceClient
+from agent.tools.proteinmpnn.designs import backbone_name, DesignWriter
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
+def get_service(config, device: str) -> ServiceClient:
+    """
+    Get the client of the ProteinMPNN service. The service is shared by all jobs and started on first use
+    Args:
+        config: Config of the ProteinMPNN tools
+
+        device: Device to run the model if the service has to be started
+    """
+    service_config = config.service
+    socket_path = service_config.get("socket_path") or f"{tempfile.gettempdir()}/proteinmpnn-{os.getuid()}.sock"
+    start_cmd = [
+        config["python"], f"{BASE_DIR}/server.py",
+        "--socket_path", socket_path,
+        "--device", device,
+        "--max_models", str(service_config.get("max_models", 2)),
+        "--batch_size", str(service_config.get("batch_size", 32)),
+    ]
+    if service_config.get("idle_timeout") is not None:
+        start_cmd += ["--idle_timeout", str(service_config.idle_timeout)]
+
+    return ServiceClient(socket_path, start_cmd, start_timeout=service_config.get("start_timeout", 600))
+
+
+def service_design(service: ServiceClient, pdb_paths: list, save_dir: str, design_args: dict, log_path: str) -> int:
+    """
+    Design sequences for the backbones with the resident ProteinMPNN service. The designs of each backbone are
+    written and logged as soon as they are sampled
+    Args:
+        service: Client of the service
+
+        pdb_paths: Paths to the backbone structures
+
+        save_dir: Directory of the results
+
+        design_args: Arguments of the design, e.g. "chains" and "num_seqs"
+
+        log_path: Path to the log file
+
+    Returns:
+        The number of backbones that were designed
+    """
+    num_designed = 0
+    with open(log_path, "w") as w, DesignWriter(save_dir) as writer:
+        w.write("Connecting to the ProteinMPNN service\n")
+        w.flush()
+        service.ensure_started()
+
+        w.write(f"Sampling {design_args['num_seqs']} sequences for each of {len(pdb_paths)} backbones\n")
+        w.flush()
+        for i, pdb_path in enumerate(pdb_paths):
+            name = backbone_name(pdb_path)
+            try:
+                result = service.request("POST", "/design", {"pdb_path": pdb_path, "out_dir": save_dir,
+                                                              **design_args})
+            except Exception as e:
+                w.write(f"Failed to design {name}: {e}\n")
+                w.flush()
+                continue
+
+            writer.write(name, result["designs"])
+            num_designed += 1
+            w.write(f"Designed {i + 1}/{len(pdb_paths)}: {name} in {result['design_time_s']} s\n")
+            w.flush()
+
+    return num_designed
+
+
 @register_tool
 class ProteinMPNN(BaseTool):
     def __init__(self, out_dir: str = f"{ROOT_DIR}/outputs/proteinmpnn", **kwargs):
@@ -27,11 +95,16 @@ class ProteinMPNN(BaseTool):
             out_dir=out_dir,
             **kwargs
         )
+        tool_name = "proteinmpnn"
+        for doc in self.config["document"]:
+            if doc["tool_name"] == tool_name:
+                self.config["document"] = doc
+                break
+        self.tool_name = tool_name
     
     def __call__(self, protein_structure, chains='A', homooligomer=False, fix_pos=None, inverse=False, rm_aa=None, num_seqs=32, sampling_temp=0.1, model_name="v_48_002") -> dict:
         protein_structure = f"{self.out_dir}/{protein_structure}"
-        now = datetime.datetime.now()
-        now = now.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         save_dir = f"{self.out_dir}/proteinmpnn/{now}"
         os.makedirs(save_dir, exist_ok=True)
         cmd_args = {
@@ -42,7 +115,8 @@ class ProteinMPNN(BaseTool):
             "inverse": inverse,
             "num_seqs": num_seqs,
             "sampling_temp": sampling_temp,
-            "model_name": model_name
+            "model_name": model_name,
+            "device": self.device,
         }
         
         if fix_pos is not None:
@@ -62,12 +136,21 @@ class ProteinMPNN(BaseTool):
         cmd += f" > {self.log_path} 2>&1"
         
         try:
-            os.system(cmd)  
+            if self.config.get("service", {}).get("enabled", False):
+                design_args = {k: v for k, v in cmd_args.items() if k not in ["pdb_path", "out_dir", "device"]}
+                design_args["rm_aa"] = rm_aa
+                service_design(get_service(self.config, self.device), [protein_structure], save_dir, design_args,
+                               self.log_path)
+            else:
+                os.system(cmd)
 
             if os.path.exists(f"{save_dir}/mpnn_results.csv"):
                 result_df = pd.read_csv(f"{save_dir}/mpnn_results.csv")
             else:
                 return {"error": "ProteinMPNN failed. Please check the log file."}
+
+            if result_df.empty:
+                return {"error": "ProteinMPNN failed to design the backbone. Please check the log file."}
             
             best_score = result_df["score"][0]
             best_seq = result_df["protein_sequence"][0]
@@ -97,8 +180,7 @@ if __name__ == '__main__':
     }
 
     for obs in proteinmpnn.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
         # proteinmpnn.terminate()
     
\ No newline at end of file
@@ -1,7 +1,20 @@
+import sys
+
+ROOT_DIR = __file__.rsplit("/", 4)[0]
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import os
+import time
 import argparse
-from colabdesign.mpnn import mk_mpnn_model
 from Bio.PDB import PDBIO, MMCIFParser
-import pandas as pd
+from agent.tools.proteinmpnn.designs import list_backbones, backbone_name, DesignWriter
+
+
+# Designs of one backbone are sampled in batches of this size. The sampler is compiled once for every backbone length
+# and batch size, so the batch size is kept fixed and the extra samples of the last batch are dropped
+DEFAULT_BATCH_SIZE = 32
+
 
 def int_to_chain(i,base=62):
     """
@@ -59,75 +72,135 @@ def rename_chains(structure):
                 o.id = c
     return chainmap
 
-def run_mpnn(pdb_path, chains, out_dir, homooligomer=False, fix_pos=None, inverse=False, rm_aa=None, num_seqs=32, sampling_temp=0.1, model_name="v_48_002"):
-    print(f"Loading MPNN {model_name}...")
+def str2bool(value) -> bool:
+    return str(value).lower() == "true"
+
+
+def load_model(model_name: str = "v_48_002", device: str = "cuda:0"):
+    """
+    Load a ProteinMPNN model. JAX is only imported here, so that it can be restricted to the CPU before
+    """
+    if device == "cpu":
+        os.environ["JAX_PLATFORMS"] = "cpu"
+    from colabdesign.mpnn import mk_mpnn_model
+
+    print(f"Loading MPNN {model_name}...", flush=True)
     mpnn_model = mk_mpnn_model(model_name)
-    print(f"MPNN {model_name} loaded.")
-
-    print(f"Preparing inputs...")
-    if pdb_path.endswith(".cif"):
-        name = pdb_path.split("/")[-1].split(".")[0]
-        
-        parser = MMCIFParser()
-        
-        structure = parser.get_structure(name, pdb_path)
-        
-        try:
-            chainmap = rename_chains(structure)
-        except OutOfChainsError:
-            print("Too many chains to represent in PDB format")
-            return
-    
-        
-        pdbio = PDBIO(use_model_flag=1)
-        pdbio.set_structure(structure)
-        pdbio.save(f"{out_dir}/{name}.pdb")
-        
-        pdb_path = f"{out_dir}/{name}.pdb"
-    
+    print(f"MPNN {model_name} loaded.", flush=True)
+    return mpnn_model
+
+
+def to_pdb(pdb_path: str, out_dir: str) -> str:
+    """
+    Convert a .cif file to a .pdb file in "out_dir", since ProteinMPNN only reads PDB files
+    Returns:
+        The path of the PDB file
+    """
+    if not pdb_path.endswith(".cif"):
+        return pdb_path
+
+    name = backbone_name(pdb_path)
+    structure = MMCIFParser().get_structure(name, pdb_path)
+    try:
+        rename_chains(structure)
+    except OutOfChainsError:
+        raise ValueError("Too many chains to represent in PDB format")
+
+    pdbio = PDBIO(use_model_flag=1)
+    pdbio.set_structure(structure)
+    pdbio.save(f"{out_dir}/{name}.pdb")
+    return f"{out_dir}/{name}.pdb"
+
+
+def design(mpnn_model, pdb_path, chains="A", homooligomer=False, fix_pos=None, inverse=False, rm_aa=None,
+           num_seqs=32, sampling_temp=0.1, batch_size=DEFAULT_BATCH_SIZE) -> list:
+    """
+    Sample sequences for one backbone
+    Args:
+        mpnn_model: ProteinMPNN model returned by "load_model"
+
+        pdb_path: Path to the PDB file of the backbone
+
+        batch_size: Number of sequences sampled in parallel
+
+        The other arguments are those of "run_mpnn"
+
+    Returns:
+        A list of (score, seqid, sequence) tuples, one for each design
+    """
+    num_seqs = int(num_seqs)
     mpnn_model.prep_inputs(pdb_filename=pdb_path,
-                            chain=chains, homooligomer=homooligomer,
-                            fix_pos=fix_pos, inverse=inverse,
-                            rm_aa=rm_aa, verbose=True)
-    print(f"Sampling sequences...")
-    out = mpnn_model.sample(num=int(num_seqs) // 32, batch=32,
+                           chain=chains, homooligomer=homooligomer,
+                           fix_pos=fix_pos, inverse=inverse,
+                           rm_aa=rm_aa, verbose=True)
+    batch_size = min(int(batch_size), num_seqs)
+    out = mpnn_model.sample(num=-(-num_seqs // batch_size), batch=batch_size,
                             temperature=float(sampling_temp),
                             rescore=homooligomer)
 
-    with open(f'{out_dir}/designs.fasta', "w") as fasta:
-        for n in range(int(num_seqs)):
-            print(f"(design {n}) score:{out['score'][n]:.3f} seqid:{out['seqid'][n]:.3f}")
-            line = f'>score:{out["score"][n]:.3f}_seqid:{out["seqid"][n]:.3f}\n{out["seq"][n]}'
-            fasta.write(line + "\n")
+    return [(float(out["score"][n]), float(out["seqid"][n]), out["seq"][n]) for n in range(num_seqs)]
 
-    labels = ["score", "seqid", "seq"]
-    data = [[out[k][n] for k in labels] for n in range(int(num_seqs))]
 
-    summary_path = f'{out_dir}/mpnn_results.csv'
+def design_backbones(mpnn_model, pdb_paths, out_dir, chains="A", homooligomer=False, fix_pos=None, inverse=False,
+                     rm_aa=None, num_seqs=32, sampling_temp=0.1, batch_size=DEFAULT_BATCH_SIZE) -> int:
+    """
+    Design sequences for several backbones with one loaded model. Backbones of the same length reuse the compiled
+    sampler, so a campaign of RFdiffusion backbones only pays the compilation once per length
+    Returns:
+        The number of backbones that were designed
+    """
+    num_designed = 0
+    with DesignWriter(out_dir) as writer:
+        for i, pdb_path in enumerate(pdb_paths):
+            name = backbone_name(pdb_path)
+            start = time.time()
+            try:
+                designs = design(mpnn_model, to_pdb(pdb_path, out_dir), chains, homooligomer, fix_pos, inverse,
+                                 rm_aa, num_seqs, sampling_temp, batch_size)
+            except Exception as e:
+                print(f"Failed to design {name}: {e}", flush=True)
+                continue
+
+            writer.write(name, designs)
+            num_designed += 1
+            scores = [score for score, _, _ in designs]
+            print(f"Designed {i + 1}/{len(pdb_paths)}: {name} in {time.time() - start:.2f} s with scores from "
+                  f"{min(scores):.3f} to {max(scores):.3f}", flush=True)
+
+    return num_designed
+
+
+def run_mpnn(pdb_path, chains, out_dir, homooligomer=False, fix_pos=None, inverse=False, rm_aa=None, num_seqs=32,
+             sampling_temp=0.1, model_name="v_48_002", device="cuda:0", batch_size=DEFAULT_BATCH_SIZE):
+    mpnn_model = load_model(model_name, device)
+    pdb_paths = list_backbones(pdb_path) if os.path.isdir(pdb_path) else [pdb_path]
+    print(f"Sampling {num_seqs} sequences for each of {len(pdb_paths)} backbones...", flush=True)
+    design_backbones(mpnn_model, pdb_paths, out_dir, chains, homooligomer, fix_pos, inverse, rm_aa, num_seqs,
+                     sampling_temp, batch_size)
 
-    # rename seq to protein_sequence
-    labels[2] = "protein_sequence"
-    
-    df = pd.DataFrame(data, columns=labels)
-    df.to_csv(summary_path, index=None)
 
 def get_args():
     paser = argparse.ArgumentParser()
-    paser.add_argument("--pdb_path", type=str, required=True)
+    paser.add_argument("--pdb_path", type=str, required=True,
+                       help="Backbone structure, or a directory of backbones that are designed one after another")
     paser.add_argument("--chains", type=str, default="A")
     paser.add_argument("--out_dir", type=str, required=True)
-    paser.add_argument("--homooligomer", type=bool, default=False)
+    paser.add_argument("--homooligomer", type=str2bool, default=False)
     paser.add_argument("--fix_pos", type=str, default=None)
-    paser.add_argument("--inverse", type=bool, default=False)
+    paser.add_argument("--inverse", type=str2bool, default=False)
     paser.add_argument("--protein_sequence", type=str, default=None)
     paser.add_argument("--num_seqs", type=int, default=32)
     paser.add_argument("--sampling_temp", type=float, default=0.1)
     paser.add_argument("--model_name", type=str, default="v_48_002")
+    paser.add_argument("--device", type=str, default="cuda:0", help="Device to run the model. Default: cuda:0")
+    paser.add_argument("--batch_size", type=int, default=DEFAULT_BATCH_SIZE,
+                       help="Number of sequences sampled in parallel")
     return paser.parse_args()
 
 def main(args):
     print(args.pdb_path)
-    run_mpnn(args.pdb_path, args.chains, args.out_dir, args.homooligomer, args.fix_pos, args.inverse, args.protein_sequence, args.num_seqs, args.sampling_temp, args.model_name)
+    run_mpnn(args.pdb_path, args.chains, args.out_dir, args.homooligomer, args.fix_pos, args.inverse,
+             args.protein_sequence, args.num_seqs, args.sampling_temp, args.model_name, args.device, args.batch_size)
     
 if __name__ == "__main__":
     """
@@ -137,4 +210,4 @@ if __name__ == "__main__":
                           --out_dir .
     """
     args = get_args()
-    main(args)
\ No newline at end of file
+    main(args)
@@ -0,0 +1,63 @@
+import os
+import csv
+
+
+STRUCTURE_SUFFIXES = (".pdb", ".cif")
+
+# Columns of the table of all designs. The tables of single backbones leave out the backbone
+RESULT_COLUMNS = ["backbone", "score", "seqid", "protein_sequence"]
+
+
+def backbone_name(pdb_path: str) -> str:
+    return os.path.basename(pdb_path).rsplit(".", 1)[0]
+
+
+def list_backbones(backbone_dir: str) -> list:
+    """
+    List the structure files of a directory, e.g. the backbones generated by RFdiffusion
+    """
+    return [f"{backbone_dir}/{file_name}" for file_name in sorted(os.listdir(backbone_dir))
+            if file_name.endswith(STRUCTURE_SUFFIXES)]
+
+
+class DesignWriter:
+    def __init__(self, out_dir: str):
+        """
+        Write the designs of each backbone to its own FASTA file and score table in "backbones" as soon as they are
+        sampled, and append them to "designs.fasta" and "mpnn_results.csv", which collect the designs of all backbones.
+        The subdirectory keeps a backbone named e.g. "designs" from overwriting the combined files
+        Args:
+            out_dir: Directory of the results
+        """
+        self.backbone_dir = f"{out_dir}/backbones"
+        os.makedirs(self.backbone_dir, exist_ok=True)
+        self.fasta = open(f"{out_dir}/designs.fasta", "w")
+        self.summary = open(f"{out_dir}/mpnn_results.csv", "w", newline="")
+        self.writer = csv.writer(self.summary)
+        self.writer.writerow(RESULT_COLUMNS)
+        self.summary.flush()
+
+    def write(self, name: str, designs: list):
+        with open(f"{self.backbone_dir}/{name}.fasta", "w") as fasta, \
+                open(f"{self.backbone_dir}/{name}.csv", "w", newline="") as table:
+            writer = csv.writer(table)
+            writer.writerow(RESULT_COLUMNS[1:])
+            for n, (score, seqid, seq) in enumerate(designs):
+                line = f">{name}_design{n}_score:{score:.3f}_seqid:{seqid:.3f}\n{seq}\n"
+                fasta.write(line)
+                self.fasta.write(line)
+                writer.writerow([f"{score:.3f}", f"{seqid:.3f}", seq])
+                self.writer.writerow([name, f"{score:.3f}", f"{seqid:.3f}", seq])
+
+        self.fasta.flush()
+        self.summary.flush()
+
+    def close(self):
+        self.fasta.close()
+        self.summary.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
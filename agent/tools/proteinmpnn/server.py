@@ -0,0 +1,97 @@
+import sys
+
+ROOT_DIR = __file__.rsplit("/", 4)[0]
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import time
+import argparse
+import threading
+
+from collections import OrderedDict
+from agent.tools.proteinmpnn.command import load_model, to_pdb, design, str2bool, DEFAULT_BATCH_SIZE
+from agent.tools.service import serve
+
+
+class DesignService:
+    def __init__(self, device: str, max_models: int = 2, batch_size: int = DEFAULT_BATCH_SIZE):
+        """
+        Keeps ProteinMPNN models loaded and designs sequences for the backbones of the requests. Backbones of the same
+        length reuse the sampler that JAX compiled for the first of them
+        Args:
+            device: "cpu" restricts JAX to the CPU. Otherwise JAX uses the GPU of the process
+
+            max_models: Number of model weights kept loaded. The least recently used ones are dropped
+
+            batch_size: Number of sequences sampled in parallel for a backbone
+        """
+        self.device = device
+        self.max_models = max_models
+        self.batch_size = batch_size
+
+        self.models = OrderedDict()
+        # A model keeps the inputs of its current backbone, so requests are designed one at a time
+        self.lock = threading.Lock()
+        self.num_designed = 0
+
+    def get_model(self, model_name: str):
+        if model_name in self.models:
+            self.models.move_to_end(model_name)
+            return self.models[model_name]
+
+        if len(self.models) >= self.max_models:
+            self.models.popitem(last=False)
+
+        self.models[model_name] = load_model(model_name, self.device)
+        return self.models[model_name]
+
+    def design(self, body: dict) -> dict:
+        """
+        Handle a design request of one backbone
+        """
+        with self.lock:
+            start = time.time()
+            mpnn_model = self.get_model(body.get("model_name", "v_48_002"))
+            pdb_path = to_pdb(body["pdb_path"], body["out_dir"])
+            designs = design(mpnn_model, pdb_path, body.get("chains", "A"), str2bool(body.get("homooligomer", False)),
+                             body.get("fix_pos"), str2bool(body.get("inverse", False)), body.get("rm_aa"),
+                             body.get("num_seqs", 32), body.get("sampling_temp", 0.1), self.batch_size)
+            self.num_designed += 1
+
+        elapsed = time.time() - start
+        print(f"Designed {len(designs)} sequences for {pdb_path} in {elapsed:.2f} s", flush=True)
+        return {"designs": designs, "design_time_s": round(elapsed, 3)}
+
+    def health(self, body: dict) -> dict:
+        return {"status": "ok", "device": self.device, "models": list(self.models), "num_designed": self.num_designed}
+
+
+def main(args):
+    service = DesignService(args.device, args.max_models, args.batch_size)
+    routes = {
+        ("GET", "/health"): service.health,
+        ("POST", "/design"): service.design,
+    }
+    serve(args.socket_path, routes, idle_timeout=args.idle_timeout)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Resident ProteinMPNN service on a Unix socket")
+    parser.add_argument("--socket_path", type=str, required=True, help="Path to the Unix socket")
+    parser.add_argument("--device", type=str, default="cuda:0", help="Device to run the model. Default: cuda:0")
+    parser.add_argument("--max_models", type=int, default=2, help="Number of model weights kept loaded")
+    parser.add_argument("--batch_size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Number of sequences sampled in parallel for a backbone")
+    parser.add_argument("--idle_timeout", type=float, default=None,
+                        help="Exit after being idle for this many seconds")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    EXAMPLE:
+    python server.py    --socket_path /tmp/proteinmpnn.sock \
+                        --device "cpu"
+    """
+    main(get_args())
@@ -32,7 +32,7 @@ class ProTrekStructure2Text(BaseTool):
         
     def __call__(self, foldseek_sequence, database="Swiss-Prot", subsection="Function"):
         start = datetime.datetime.now()
-        now = start.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         os.makedirs(f"{self.out_dir}/protrek", exist_ok=True)
         
         cmd_args = {
@@ -77,8 +77,7 @@ if __name__ == '__main__':
     }
 
     for obs in tool.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
         # pinal.terminate()
     
\ No newline at end of file
@@ -0,0 +1,370 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+
+
+def _normalize(value):
+    """
+    Normalize an argument value so that equivalent calls share the same key
+    """
+    if isinstance(value, str):
+        return value.strip()
+
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+
+    return value
+
+
+def _replace_strings(value, old: str, new: str):
+    """
+    Replace a substring in all strings of a nested result
+    """
+    if isinstance(value, str):
+        return value.replace(old, new)
+
+    if isinstance(value, list):
+        return [_replace_strings(v, old, new) for v in value]
+
+    if isinstance(value, dict):
+        return {k: _replace_strings(v, old, new) for k, v in value.items()}
+
+    return value
+
+
+def _iter_strings(value):
+    """
+    Iterate over all strings of a nested result
+    """
+    if isinstance(value, str):
+        yield value
+
+    elif isinstance(value, list):
+        for v in value:
+            yield from _iter_strings(v)
+
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from _iter_strings(v)
+
+
+def _link(src: str, dst: str):
+    """
+    Hardlink a file, falling back to a copy across file systems
+    """
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class ResultCache:
+    def __init__(self, cache_dir: str, max_size_gb: float = 20):
+        """
+        Persistent content-addressed cache of tool results. An entry is keyed on the tool name, the hash of the tool
+        config, the normalized arguments and the hashes of the input files. The output files referenced by the
+        results are stored as read-only artifacts and hardlinked into the run directory of a later identical call.
+        Entries are evicted in LRU order when the cache grows beyond its size limit.
+        Args:
+            cache_dir: Directory of the cache
+
+            max_size_gb: Maximum total size of the stored artifacts
+        """
+        self.cache_dir = cache_dir
+        self.entry_dir = f"{cache_dir}/entries"
+        self.index_path = f"{cache_dir}/index.sqlite"
+        self.max_size = int(max_size_gb * 1024 ** 3)
+        os.makedirs(self.entry_dir, exist_ok=True)
+
+        self.execute("CREATE TABLE IF NOT EXISTS entries "
+                     "(key TEXT PRIMARY KEY, tool_name TEXT, size INTEGER, last_access REAL)")
+
+        # Hit and miss counts of each tool in this process
+        self.stats = {}
+        self.lock = threading.Lock()
+        # File hashes, keyed on (path, size, mtime)
+        self.file_hashes = {}
+
+    def execute(self, sql: str, params: tuple = ()) -> list:
+        """
+        Run a statement on the index. A new connection is opened every time, since the cache is shared with the
+        forked worker processes
+        """
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        try:
+            with conn:
+                return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def hash_file(self, path: str) -> str:
+        """
+        Hash the content of a file or, for a directory, of all files in it
+        """
+        if os.path.isdir(path):
+            sha = hashlib.sha256()
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for file in sorted(files):
+                    file_path = os.path.join(root, file)
+                    sha.update(os.path.relpath(file_path, path).encode())
+                    sha.update(self.hash_file(file_path).encode())
+            return sha.hexdigest()
+
+        stat = os.stat(path)
+        stat_key = (path, stat.st_size, stat.st_mtime_ns)
+        if stat_key not in self.file_hashes:
+            sha = hashlib.sha256()
+            with open(path, "rb") as r:
+                for chunk in iter(lambda: r.read(1 << 20), b""):
+                    sha.update(chunk)
+            self.file_hashes[stat_key] = sha.hexdigest()
+
+        return self.file_hashes[stat_key]
+
+    def make_key(self, tool_name: str, config: dict, tool_args: dict, file_dir: str) -> str:
+        """
+        Build the cache key of a tool call
+        Args:
+            tool_name: Name of the tool
+
+            config: Config of the tool. Any change to it invalidates the cached results
+
+            tool_args: Arguments for the tool
+
+            file_dir: Directory where the input files are located
+        """
+        # Fill in the default values, so that omitting an argument and passing its default give the same key
+        args = {param["name"]: param["default"] for param in config["document"].get("optional_parameters", [])
+                if "default" in param}
+        args.update(tool_args)
+
+        normalized_args = {}
+        for name, value in args.items():
+            value = _normalize(value)
+            if isinstance(value, str) and value and os.path.exists(os.path.join(file_dir, value)):
+                value = {"file": self.hash_file(os.path.join(file_dir, value))}
+            normalized_args[name] = value
+
+        content = {
+            "tool_name": tool_name,
+            "config": hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest(),
+            "args": normalized_args,
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get_entry_dir(self, key: str) -> str:
+        return f"{self.entry_dir}/{key[:2]}/{key}"
+
+    def count(self, tool_name: str, hit: bool):
+        with self.lock:
+            stats = self.stats.setdefault(tool_name, {"hits": 0, "misses": 0})
+            stats["hits" if hit else "misses"] += 1
+
+    def lookup(self, tool_name: str, key: str, max_age: float = None) -> dict:
+        """
+        Look up a cached entry and mark it as recently used
+        Args:
+            tool_name: Name of the tool
+
+            key: Cache key of the call
+
+            max_age: Entries older than this many seconds are removed and count as misses. If None, entries never
+                expire
+
+        Returns:
+            The metadata of the entry, or None if it is not cached
+        """
+        meta_path = f"{self.get_entry_dir(key)}/meta.json"
+        rows = self.execute("SELECT key FROM entries WHERE key = ?", (key,))
+        if not rows or not os.path.exists(meta_path):
+            self.count(tool_name, hit=False)
+            return None
+
+        with open(meta_path, "r") as r:
+            meta = json.load(r)
+
+        # Entries written before the creation time was recorded are treated as expired
+        if max_age is not None and time.time() - meta.get("created", 0) > max_age:
+            self.remove(key)
+            self.count(tool_name, hit=False)
+            return None
+
+        self.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        self.count(tool_name, hit=True)
+        return meta
+
+    def store(self, key: str, tool_name: str, run_id: str, out_dir: str, results: dict, log: str):
+        """
+        Store the results of a successful call, together with the output files they refer to
+        Args:
+            key: Cache key of the call
+
+            tool_name: Name of the tool
+
+            run_id: Run id of the call. It is replaced by the run id of the call that reuses the entry
+
+            out_dir: Output directory the result paths are relative to
+
+            results: Results of the call
+
+            log: Running log of the call
+        """
+        entry_dir = self.get_entry_dir(key)
+        if os.path.exists(entry_dir):
+            return
+
+        # Write into a temporary directory first, so that readers never see a partial entry. The temporary directory
+        # is removed whatever happens, e.g. when the disk is full or an artifact disappears while being copied
+        tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        try:
+            size, artifacts = self.write_artifacts(tmp_dir, run_id, out_dir, results)
+            meta = {
+                "tool_name": tool_name,
+                "run_id": run_id,
+                "created": time.time(),
+                "results": results,
+                "log": log,
+                "artifacts": artifacts,
+            }
+            with open(f"{tmp_dir}/meta.json", "w") as w:
+                json.dump(meta, w)
+
+            try:
+                os.rename(tmp_dir, entry_dir)
+            except OSError:
+                # Another process stored the same entry first
+                return
+
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", (key, tool_name, size, time.time()))
+        self.evict()
+
+    @staticmethod
+    def write_artifacts(tmp_dir: str, run_id: str, out_dir: str, results: dict) -> tuple:
+        """
+        Copy the output files referenced by the results into the "files" directory of an entry
+        Returns:
+            The total size of the copied files and the list of stored artifacts
+        """
+        os.makedirs(f"{tmp_dir}/files")
+
+        artifacts = []
+        for value in _iter_strings(results):
+            path = os.path.join(out_dir, value)
+            if not value or os.path.isabs(value) or not os.path.exists(path) or value in artifacts:
+                continue
+
+            # Only directories created by this call are stored, not shared ones such as the tool directory
+            if os.path.isdir(path) and run_id not in value:
+                continue
+
+            if os.path.isdir(path):
+                shutil.copytree(path, f"{tmp_dir}/files/{value}", dirs_exist_ok=True)
+            else:
+                os.makedirs(os.path.dirname(f"{tmp_dir}/files/{value}"), exist_ok=True)
+                shutil.copy2(path, f"{tmp_dir}/files/{value}")
+            artifacts.append(value)
+
+        # Artifacts are shared by hardlinks, so they are made read-only
+        size = 0
+        for root, _, files in os.walk(f"{tmp_dir}/files"):
+            for file in files:
+                file_path = os.path.join(root, file)
+                os.chmod(file_path, 0o444)
+                size += os.path.getsize(file_path)
+
+        return size, artifacts
+
+    def materialize(self, key: str, entry: dict, out_dir: str, run_id: str) -> tuple:
+        """
+        Link the artifacts of a cached entry into a new run directory
+        Args:
+            key: Cache key of the entry
+
+            entry: Metadata returned by "lookup"
+
+            out_dir: Output directory of the new call
+
+            run_id: Run id of the new call
+
+        Returns:
+            The results and the running log, with paths pointing to the new run directory
+        """
+        files_dir = f"{self.get_entry_dir(key)}/files"
+        for artifact in entry["artifacts"]:
+            src = f"{files_dir}/{artifact}"
+            dst = os.path.join(out_dir, artifact.replace(entry["run_id"], run_id))
+            if os.path.isdir(src):
+                for root, _, files in os.walk(src):
+                    for file in files:
+                        file_dst = os.path.join(dst, os.path.relpath(os.path.join(root, file), src))
+                        if not os.path.exists(file_dst):
+                            _link(os.path.join(root, file), file_dst)
+
+            elif not os.path.exists(dst):
+                _link(src, dst)
+
+        results = _replace_strings(entry["results"], entry["run_id"], run_id)
+        log = entry["log"].replace(entry["run_id"], run_id)
+        return results, log
+
+    def remove(self, key: str):
+        """
+        Remove an entry from the index and delete its artifacts
+        """
+        self.execute("DELETE FROM entries WHERE key = ?", (key,))
+        entry_dir = self.get_entry_dir(key)
+        # Move the entry away first, so that a concurrent lookup never sees it half deleted
+        trash_dir = f"{entry_dir}.del-{os.getpid()}-{threading.get_ident()}"
+        try:
+            os.rename(entry_dir, trash_dir)
+        except OSError:
+            return
+
+        shutil.rmtree(trash_dir, ignore_errors=True)
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits in its size limit
+        """
+        total_size = self.execute("SELECT COALESCE(SUM(size), 0) FROM entries")[0][0]
+        if total_size <= self.max_size:
+            return
+
+        for key, size in self.execute("SELECT key, size FROM entries ORDER BY last_access"):
+            self.remove(key)
+
+            total_size -= size
+            if total_size <= self.max_size:
+                break
+
+    def get_stats(self) -> dict:
+        """
+        Get the hit and miss counts of this process and the size of the cache
+        """
+        num_entries, size = self.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries")[0]
+        with self.lock:
+            tools = {tool_name: dict(stats) for tool_name, stats in self.stats.items()}
+
+        hits = sum(stats["hits"] for stats in tools.values())
+        misses = sum(stats["misses"] for stats in tools.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "num_entries": num_entries,
+            "size_mb": round(size / 1024 ** 2, 2),
+            "tools": tools,
+        }
@@ -0,0 +1,99 @@
+import time
+import asyncio
+import threading
+import multiprocessing as mp
+import multiprocessing.connection
+
+
+class ResultChannel:
+    def __init__(self):
+        """
+        One-way channel that carries the log path and the results of each tool call from the process running the
+        tool back to the agent process. It is built on a pipe, so unlike a multiprocessing Manager it does not cost
+        a helper process.
+        """
+        self.reader, self.writer = mp.Pipe(duplex=False)
+        # Several threads of the agent process may read the same channel
+        self.lock = threading.Lock()
+
+    def send(self, job_id: str, key: str, value):
+        """
+        Send a message from the tool process
+        Args:
+            job_id: ID of the job that produced the message
+
+            key: Type of the message. Should be one of ["log_path", "item_results", "results"]
+
+            value: Content of the message
+        """
+        self.writer.send((job_id, key, value))
+
+    def receive(self, timeout: float = 0) -> list:
+        """
+        Receive all pending messages
+        Args:
+            timeout: Seconds to wait for the first message
+
+        Returns:
+            A list of (job_id, key, value) tuples
+        """
+        messages = []
+        with self.lock:
+            # The channel is closed once its worker has exited
+            if self.reader.closed:
+                return messages
+
+            while self.reader.poll(timeout):
+                messages.append(self.reader.recv())
+                timeout = 0
+
+        return messages
+
+    async def wait_async(self, timeout: float):
+        """
+        Wait until a message is available without blocking the event loop. The reader end of the pipe is watched by
+        the event loop, so many channels can be waited on from a single thread
+        Args:
+            timeout: Maximum seconds to wait
+        """
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        try:
+            fd = self.reader.fileno()
+            loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+        # The channel is closed once its worker has exited
+        except (OSError, ValueError):
+            await asyncio.sleep(timeout)
+            return
+
+        try:
+            await asyncio.wait_for(readable, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            loop.remove_reader(fd)
+
+    def close(self):
+        with self.lock:
+            self.reader.close()
+            self.writer.close()
+
+
+def wait_channels(channels: list, timeout: float):
+    """
+    Wait until one of the channels has a message
+    Args:
+        channels: Channels to wait on
+
+        timeout: Maximum seconds to wait
+    """
+    readers = [channel.reader for channel in channels if not channel.reader.closed]
+    if not readers:
+        time.sleep(timeout)
+        return
+
+    try:
+        mp.connection.wait(readers, timeout)
+    # A channel may be closed by another thread while waiting
+    except (OSError, ValueError):
+        pass
@@ -2,6 +2,9 @@ import os
 import argparse
 import time
 import json
+import shlex
+import random
+import tempfile
 import numpy as np
 import matplotlib.pyplot as plt
 import signal
@@ -16,6 +19,8 @@ if ROOT_DIR not in sys.path:
     sys.path.append(ROOT_DIR)
 
 from agent.tools.rfdiffusion import residue_constants
+from agent.tools.service import ServiceClient
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # from rfdiffusion.inference.utils import parse_pdb
 
@@ -1107,6 +1112,45 @@ def parse_pdb_lines(lines, parse_hetatom=False, ignore_het_h=True):
     return out
 
 
+# Checkpoints of the model types in "{rf_root}/models". Designs with hotspots use the complex model, others the base
+# model. The active site model is meant for scaffolding very small motifs
+MODEL_CHECKPOINTS = {
+    "base": "Base_ckpt.pt",
+    "complex": "Complex_base_ckpt.pt",
+    "complex_beta": "Complex_beta_ckpt.pt",
+    "active_site": "ActiveSite_ckpt.pt",
+}
+
+
+def get_service(config, rf_root: str, device: str) -> ServiceClient:
+    """
+    Get the client of the RFdiffusion service, or None if the service is disabled. The service is shared by all
+    RFdiffusion tools and started on first use
+    Args:
+        config: Config of the RFdiffusion tools
+
+        rf_root: Root of the RFdiffusion repository
+
+        device: Device to run the model if the service has to be started
+    """
+    service_config = config.get("service", {})
+    if not service_config.get("enabled", False):
+        return None
+
+    socket_path = service_config.get("socket_path") or f"{tempfile.gettempdir()}/rfdiffusion-{os.getuid()}.sock"
+    start_cmd = [
+        config["python"], f"{os.path.dirname(__file__)}/server.py",
+        "--socket_path", socket_path,
+        "--rf_root", rf_root,
+        "--device", device,
+        "--num_workers", str(service_config.get("num_workers", 2)),
+    ]
+    if service_config.get("idle_timeout") is not None:
+        start_cmd += ["--idle_timeout", str(service_config.idle_timeout)]
+
+    return ServiceClient(socket_path, start_cmd, start_timeout=service_config.get("start_timeout", 600))
+
+
 class RFExecutor:
     def __init__(
         self,
@@ -1119,6 +1163,8 @@ class RFExecutor:
         hotspot=None,
         chains=None,
         num_designs=1,
+        model_type=None,
+        service=None,
     ):
         print("Initializing RFExecutor")
         print(
@@ -1139,6 +1185,10 @@ class RFExecutor:
         self.partial_T = "auto"
         self.num_designs = num_designs
         self.use_beta_model = False
+        # One of MODEL_CHECKPOINTS. None chooses the model from the design
+        self.model_type = model_type
+        # Client of the resident RFdiffusion service. None runs "scripts/run_inference.py" in a new process
+        self.service = service
         self.visual = None
         os.makedirs(self.out_dir, exist_ok=True)
         self.opts = [
@@ -1233,6 +1283,63 @@ class RFExecutor:
                 output_path = f"{self.out_prefix}_0.pdb"
                 return {"design": output_path}
 
+    def run_service(self, opts_str, log_path=None):
+        """
+        Run the designs on the resident RFdiffusion service. The designs are sent as separate requests with distinct
+        seeds, so that they run in parallel on the workers of the service, and each design is logged as it finishes
+        """
+        # The service receives the arguments that the shell would pass to "scripts/run_inference.py"
+        args = shlex.split(opts_str)
+        config_name = "base"
+        if "--config-name" in args:
+            i = args.index("--config-name")
+            config_name = args[i + 1]
+            del args[i: i + 2]
+        overrides = [arg for arg in args if not arg.startswith(("inference.output_prefix=", "inference.num_designs="))]
+
+        num_designs = int(self.num_designs)
+        seed = random.randrange(2 ** 31 - num_designs)
+        log = open(log_path, "w") if log_path is not None else sys.stdout
+        designs = []
+        try:
+            log.write("Connecting to the RFdiffusion service\n")
+            log.flush()
+            self.service.ensure_started()
+
+            log.write(f"Running {num_designs} designs with {self.iterations} steps\n")
+            log.flush()
+            with ThreadPoolExecutor(max_workers=num_designs) as pool:
+                futures = {
+                    pool.submit(self.service.request, "POST", "/design", {
+                        "config_name": config_name,
+                        "overrides": overrides,
+                        "out_prefix": f"{self.out_prefix}_{i}",
+                        "seed": seed + i,
+                    }): i
+                    for i in range(num_designs)
+                }
+                for future in as_completed(futures):
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        log.write(f"Design {futures[future]} failed: {e}\n")
+                        log.flush()
+                        continue
+
+                    designs.append(futures[future])
+                    log.write(f"Design {futures[future]} finished in {result['design_time_s']} s with mean pLDDT "
+                              f"{result['mean_plddt']:.3f}. Saved to {result['pdb']}\n")
+                    log.flush()
+
+        finally:
+            if log is not sys.stdout:
+                log.close()
+
+        if not designs:
+            return {"error": "Failed to run RFDiffusion. Please check whether your contigs are valid."}
+
+        return {"design": f"{self.out_prefix}_{min(designs)}.pdb"}
+
     def run_diffusion(self, contigs, pdb, log_path=None):
         print(f"Received contigs: {contigs}")
         print(f"Received PDB: {pdb}")
@@ -1324,16 +1431,24 @@ class RFExecutor:
 
         self.opts.append(f"'contigmap.contigs=[{' '.join(contigs)}]'")
 
-        if self.use_beta_model:
-            self.opts += [
-                f"inference.ckpt_override_path={self.rf_root}/models/Complex_beta_ckpt.pt"
-            ]
+        # The checkpoint is always given explicitly, so that the service can keep one loaded model per checkpoint
+        model_type = self.model_type
+        if model_type is None:
+            if self.use_beta_model:
+                model_type = "complex_beta"
+            elif self.hotspot is not None and self.hotspot != "":
+                model_type = "complex"
+            else:
+                model_type = "base"
+        self.opts.append(f"inference.ckpt_override_path={self.rf_root}/models/{MODEL_CHECKPOINTS[model_type]}")
 
         print(f"mode:{mode}")
         print(f"output_prefix:{self.out_prefix}")
         print(f"contigs:{contigs}")
 
         opts_str = " ".join(self.opts)
+        if self.service is not None:
+            return self.run_service(opts_str, log_path)
 
         cmd = f"export MKL_SERVICE_FORCE_INTEL=1; HYDRA_FULL_ERROR=1 {self.python} {self.rf_root}/scripts/run_inference.py {opts_str}"
         if log_path is not None:
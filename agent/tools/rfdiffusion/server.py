@@ -0,0 +1,221 @@
+import sys
+
+ROOT_DIR = __file__.rsplit("/", 4)[0]
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import os
+import time
+import random
+import pickle
+import argparse
+import threading
+import multiprocessing as mp
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from agent.tools.service import ServiceError, current_request, serve
+
+
+# State of a worker process. Samplers are kept per sampler type and checkpoint, together with the overrides of the
+# job that they were last initialized for
+RF_ROOT = None
+SAMPLERS = {}
+
+
+def init_worker(rf_root: str, device: str):
+    global RF_ROOT
+    if device == "cpu":
+        os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    os.environ["MKL_SERVICE_FORCE_INTEL"] = "1"
+
+    RF_ROOT = rf_root = os.path.abspath(rf_root)
+    if rf_root not in sys.path:
+        sys.path.append(rf_root)
+
+
+def compose_config(config_name: str, overrides: list):
+    """
+    Build the hydra config that "scripts/run_inference.py" would receive with the same command line overrides
+    """
+    from hydra import compose, initialize_config_dir
+    from hydra.core.global_hydra import GlobalHydra
+
+    GlobalHydra.instance().clear()
+    with initialize_config_dir(version_base=None, config_dir=f"{RF_ROOT}/config/inference"):
+        return compose(config_name=config_name, overrides=overrides)
+
+
+def get_sampler(config_name: str, overrides: list):
+    """
+    Get a sampler that is initialized for the job. A loaded checkpoint is reused by every job of the same model type,
+    and a sampler that was last initialized for the same job is reused as it is, so its input PDB is not parsed again
+    """
+    from rfdiffusion.inference import utils as iu
+
+    conf = compose_config(config_name, overrides)
+    key = (conf.scaffoldguided.scaffoldguided, conf.inference.model_runner, conf.inference.ckpt_override_path)
+    job = (config_name, tuple(overrides))
+    if key not in SAMPLERS:
+        print(f"Loading {conf.inference.ckpt_override_path}", flush=True)
+        SAMPLERS[key] = [iu.sampler_selector(conf), job]
+
+    sampler, last_job = SAMPLERS[key]
+    if last_job != job:
+        # The checkpoint path is unchanged, so "initialize" keeps the loaded model and only prepares the new inputs
+        sampler.initialize(conf)
+        SAMPLERS[key][1] = job
+
+    return sampler
+
+
+def sample_design(sampler, out_prefix: str, seed: int) -> dict:
+    """
+    Sample one design and save "{out_prefix}.pdb" and "{out_prefix}.trb", as "scripts/run_inference.py" does
+    """
+    import torch
+    import numpy as np
+    from omegaconf import OmegaConf
+    from rfdiffusion.util import writepdb
+
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+    start = time.time()
+    x_init, seq_init = sampler.sample_init()
+    x_t, seq_t = torch.clone(x_init), torch.clone(seq_init)
+    plddt_stack = []
+    for t in range(int(sampler.t_step_input), sampler.inf_conf.final_step - 1, -1):
+        px0, x_t, seq_t, plddt = sampler.sample_step(t=t, x_t=x_t, seq_init=seq_t,
+                                                     final_step=sampler.inf_conf.final_step)
+        plddt_stack.append(plddt[0])
+
+    # Residues to design are written as glycine with a B-factor of 0
+    final_seq = torch.where(torch.argmax(seq_init, dim=-1) == 21, 7, torch.argmax(seq_init, dim=-1))
+    bfacts = torch.ones_like(final_seq.squeeze())
+    bfacts[torch.where(torch.argmax(seq_init, dim=-1) == 21, True, False)] = 0
+
+    os.makedirs(os.path.dirname(out_prefix), exist_ok=True)
+    writepdb(f"{out_prefix}.pdb", x_t[:, :4], final_seq, sampler.binderlen, chain_idx=sampler.chain_idx,
+             bfacts=bfacts)
+
+    plddt = torch.stack(plddt_stack).cpu().numpy()
+    elapsed = time.time() - start
+    trb = {
+        "config": OmegaConf.to_container(sampler._conf, resolve=True),
+        "plddt": plddt,
+        "device": torch.cuda.get_device_name(torch.cuda.current_device()) if torch.cuda.is_available() else "CPU",
+        "time": elapsed,
+        "seed": seed,
+    }
+    if hasattr(sampler, "contig_map"):
+        trb.update(sampler.contig_map.get_mappings())
+    with open(f"{out_prefix}.trb", "wb") as f:
+        pickle.dump(trb, f)
+
+    return {
+        "pdb": f"{out_prefix}.pdb",
+        "trb": f"{out_prefix}.trb",
+        "mean_plddt": float(plddt[-1].mean()),
+        "seed": seed,
+        "design_time_s": round(elapsed, 3),
+        "pid": os.getpid(),
+    }
+
+
+def run_design(job: dict) -> dict:
+    sampler = get_sampler(job.get("config_name", "base"), job["overrides"])
+    return sample_design(sampler, job["out_prefix"], job["seed"])
+
+
+class DiffusionService:
+    def __init__(self, rf_root: str, device: str, num_workers: int = 2):
+        """
+        Runs RFdiffusion designs in a pool of worker processes that keep their checkpoints loaded. The designs of a
+        job are sent as separate requests, so they run in parallel on the workers and are returned as they finish
+        Args:
+            rf_root: Root of the RFdiffusion repository
+
+            device: "cpu" hides the GPUs from the workers. Otherwise the workers share the GPU of the service
+
+            num_workers: Number of worker processes
+        """
+        self.rf_root = rf_root
+        self.device = device
+        self.num_workers = num_workers
+        self.lock = threading.Lock()
+        self.pool = self.create_pool()
+        self.num_designed = 0
+
+    def create_pool(self) -> ProcessPoolExecutor:
+        # CUDA cannot be used in forked processes
+        return ProcessPoolExecutor(self.num_workers, mp_context=mp.get_context("spawn"), initializer=init_worker,
+                                   initargs=(self.rf_root, self.device))
+
+    def design(self, body: dict) -> dict:
+        """
+        Handle a request of one design. The body contains the hydra "config_name" and "overrides" of the job, the
+        "out_prefix" of the design and its "seed"
+        """
+        pool = self.pool
+        context = current_request()
+        done = threading.Event()
+        try:
+            future = pool.submit(run_design, body)
+            future.add_done_callback(lambda _: done.set())
+            try:
+                context.wait(done)
+            except ServiceError:
+                # Drop the design if it is still queued, so a cancelled job does not keep the workers busy
+                future.cancel()
+                raise
+
+            result = future.result()
+
+        except BrokenProcessPool:
+            # A worker that crashed, e.g. on a CUDA error, breaks the pool. The next request gets a new one
+            with self.lock:
+                if self.pool is pool:
+                    self.pool = self.create_pool()
+            raise RuntimeError("The RFdiffusion worker crashed")
+
+        with self.lock:
+            self.num_designed += 1
+        print(f"Saved {result['pdb']} in {result['design_time_s']} s (worker {result['pid']})", flush=True)
+        return result
+
+    def health(self, body: dict) -> dict:
+        return {"status": "ok", "device": self.device, "num_workers": self.num_workers,
+                "num_designed": self.num_designed}
+
+
+def main(args):
+    service = DiffusionService(args.rf_root, args.device, args.num_workers)
+    routes = {
+        ("GET", "/health"): service.health,
+        ("POST", "/design"): service.design,
+    }
+    serve(args.socket_path, routes, idle_timeout=args.idle_timeout)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Resident RFdiffusion service on a Unix socket")
+    parser.add_argument("--socket_path", type=str, required=True, help="Path to the Unix socket")
+    parser.add_argument("--rf_root", type=str, required=True, help="Root of the RFdiffusion repository")
+    parser.add_argument("--device", type=str, default="cuda:0", help="Device to run the model. Default: cuda:0")
+    parser.add_argument("--num_workers", type=int, default=2, help="Number of worker processes")
+    parser.add_argument("--idle_timeout", type=float, default=None,
+                        help="Exit after being idle for this many seconds")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    EXAMPLE:
+    python server.py    --socket_path /tmp/rfdiffusion.sock \
+                        --rf_root /root/ProtAgent/modelhub/RFdiffusion \
+                        --device "cuda:0"
+    """
+    main(get_args())
@@ -7,15 +7,13 @@ ROOT_DIR = __file__.rsplit("/", 4)[0]
 if ROOT_DIR not in sys.path:
     sys.path.append(ROOT_DIR)
 
-import torch
 import pickle
 
-from agent.tools.rfdiffusion.runrf import RFExecutor
+from agent.tools.rfdiffusion.runrf import RFExecutor, get_service
 from agent.tools.register import register_tool
 from agent.tools.base_tool import BaseTool
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -36,13 +34,12 @@ class RFUnconditionalCaller(BaseTool):
         
     def __call__(self, contigs, iterations=50, symmetry=None, order=1, hotspot=None,
                  chains=None, num_designs=1) -> dict:
-        now = datetime.datetime.now()
-        now = now.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         rf_root = ROOT_DIR+'/'+self.config["rf_root"]
         out_dir = f"{self.out_dir}/rfdiffusion/{now}"
         try:
             executor = RFExecutor(rf_root, out_dir, self.config["python"], iterations, symmetry, order, hotspot,
-                                chains, num_designs)
+                                chains, num_designs, service=get_service(self.config, rf_root, self.device))
             ret = executor.run_diffusion(contigs, None, self.log_path)
             avg_plddts = self.get_avg_plddts(out_dir)
             # select the best sample
@@ -76,6 +73,5 @@ if __name__ == "__main__":
     }
 
     for obs in caller.mp_run(**input_args):
-        os.system("clear")
         
-        print(obs)
\ No newline at end of file
+        print(obs, end="")
\ No newline at end of file
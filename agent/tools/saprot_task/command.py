@@ -1,5 +1,7 @@
 from easydict import EasyDict
+import os
 import sys
+import json
 import torch
 import argparse
 
@@ -15,6 +17,88 @@ from agent.tools.saprot_task.saprot.model_interface import ModelInterface
 sys.path.append(".")
 
 
+def format_prediction(task: str, logits: torch.Tensor, length: int = None, label_dict: dict = None) -> dict:
+    """
+    Convert the model output of one protein into the structured result of a task
+    Args:
+        task: One of ["classification", "regression", "token_classification"]
+
+        logits: Output of the model for the protein. [num_labels] for classification, a scalar for regression and
+            [L, num_labels] for token classification, where L includes the special tokens
+
+        length: Number of residues. The special tokens are removed from token classification results
+
+        label_dict: Optional mapping from label index to label name
+
+    Returns:
+        A dict with the prediction "pred". Classification results also contain the probability of each label
+    """
+    if task == "regression":
+        return {"pred": float(logits)}
+
+    probs = logits.float().softmax(dim=-1)
+    label_dict = {int(k): v for k, v in label_dict.items()} if label_dict else None
+    if task == "token_classification":
+        preds = probs[1:length + 1].argmax(dim=-1).tolist()
+        result = {"pred": preds}
+        if label_dict is not None:
+            result["labels"] = [label_dict[pred] for pred in preds]
+        return result
+
+    pred = int(probs.argmax())
+    result = {"pred": pred, "probs": probs.tolist()}
+    if label_dict is not None:
+        result["label"] = label_dict[pred]
+    return result
+
+
+def run_mutation_scan(model, sa_seq: str, scan_path: str, top_k: int = 10, batch_size: int = None) -> dict:
+    """
+    Run a deep mutational scan and save the [L, 20] score matrix
+    Args:
+        model: SaProt mutation model
+
+        sa_seq: The wild type structure-aware sequence
+
+        scan_path: Path to save the matrix. Saved as Parquet if it ends with ".parquet", otherwise as CSV
+
+        top_k: Number of mutations with the highest scores to return
+
+        batch_size: Number of masked copies of the sequence in a forward pass. Defaults to 16 on the GPU and to 4 on
+            the CPU, where large batches of long sequences take a lot of memory
+
+    Returns:
+        The path of the matrix and the top mutations, e.g. {"mutation": "A12V", "score": 1.3}
+    """
+    import pandas as pd
+    from utils.constants import aa_list
+
+    if batch_size is None:
+        batch_size = 4 if model.device.type == "cpu" else 16
+    scores, wild_type = model.predict_saturation(sa_seq, batch_size=batch_size)
+    df = pd.DataFrame(scores.numpy(), columns=aa_list)
+    df.insert(0, "wild_type", wild_type)
+    df.insert(0, "position", range(1, len(wild_type) + 1))
+
+    os.makedirs(os.path.dirname(os.path.abspath(scan_path)), exist_ok=True)
+    if scan_path.endswith(".parquet"):
+        df.to_parquet(scan_path, index=False)
+    else:
+        df.to_csv(scan_path, index=False)
+
+    # The wild type itself always scores 0 and is not a mutation
+    flat = scores.clone()
+    flat[torch.arange(len(wild_type)), [aa_list.index(aa) if aa in aa_list else 0 for aa in wild_type]] = float("nan")
+    flat = flat.nan_to_num(nan=float("-inf")).flatten()
+    top = flat.topk(min(top_k, int(torch.isfinite(flat).sum()))) if top_k > 0 else None
+    top_mutations = [] if top is None else [
+        {"mutation": f"{wild_type[i // 20]}{i // 20 + 1}{aa_list[i % 20]}", "score": float(score)}
+        for score, i in zip(top.values.tolist(), top.indices.tolist())
+    ]
+    print(f"Scanned {len(wild_type)} positions. Scores saved to {scan_path}")
+    return {"scan_path": scan_path, "top_mutations": top_mutations}
+
+
 class SaProtExecutor:
     def __init__(self, model_py_path, huggingface_path, lora_path, num_labels=None, label_dict=None):
         huggingface_path = huggingface_path
@@ -92,46 +176,41 @@ class SaProtExecutor:
             raise ValueError(f"Tool {tool} not found in SaProt tools")
 
     def token_classification_inference(self, sa_seq):
-        inputs = self.tokenizer(sa_seq, return_tensors="pt")
-        print(f"Suceessfully tokenized {sa_seq}")
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
-        logits = self.model(inputs)
-        preds = torch.argmax(logits, dim=-1).cpu().detach().numpy().tolist()
-        if self.label_dict is not None:
-            preds = ' '.join([f"{self.label_dict[pred]}({pred})" for pred in preds])
-        print(f"Prediction complete. Result is {preds}")
-        return preds
+        return self.sequence_inference("token_classification", sa_seq)
 
     def classification_inference(self, sa_seq):
-        inputs = self.tokenizer(sa_seq, return_tensors="pt")
-        print(f"Suceessfully tokenized {sa_seq}")
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
-        logits = self.model(inputs)
-        pred = torch.argmax(logits, dim=1).item()
-        if self.label_dict is not None:
-            pred = f"{self.label_dict[pred]}({pred})"
-        print(f"Prediction complete. Result is {pred}")
-        return pred
+        return self.sequence_inference("classification", sa_seq)
 
     def regression_inference(self, sa_seq):
+        return self.sequence_inference("regression", sa_seq)
+
+    def sequence_inference(self, task, sa_seq):
         inputs = self.tokenizer(sa_seq, return_tensors="pt")
         print(f"Suceessfully tokenized {sa_seq}")
         inputs = {k: v.to(self.device) for k, v in inputs.items()}
-        logits = self.model(inputs)
-        pred = logits.item()
-        print(f"Prediction complete. Result is {pred}")
-        return pred
+        with torch.no_grad():
+            logits = self.model(inputs)
+        result = format_prediction(task, logits[0].cpu(), len(sa_seq) // 2, self.label_dict)
+        print(f"Prediction complete. Result is {json.dumps(result)}")
+        return result
 
-    def mutation_inference(self, sa_seq, mut_info=None, mut_position=None):
-        if mut_info is not None:
+    def mutation_inference(self, sa_seq, mut_info=None, mut_position=None, scan_path=None, top_k=10,
+                           scan_batch_size=None, mut_infos=None):
+        if mut_infos is not None:
+            print(f"Mutating {sa_seq} using {len(mut_infos)} mutants")
+            result = {"pred": self.model.predict_muts(sa_seq, mut_infos)}
+        elif scan_path is not None:
+            print(f"Scanning all mutations of {sa_seq}")
+            result = {"pred": run_mutation_scan(self.model, sa_seq, scan_path, top_k, scan_batch_size)}
+        elif mut_info is not None:
             print(f"Mutating {sa_seq} using mut_info({mut_info}) only")
-            result = self.model.predict_mut(sa_seq, mut_info)
-            print(f"Prediction complete. Result is {result}")
-            return result
+            result = {"pred": self.model.predict_mut(sa_seq, mut_info)}
         else:
             print(f"Mutating {sa_seq} at position {mut_position}")
-            result = self.model.predict_pos_prob(sa_seq, mut_position)
-            print(f"Prediction complete. Result is {result}")
+            result = {"pred": self.model.predict_pos_prob(sa_seq, mut_position)}
+
+        print(f"Prediction complete. Result is {json.dumps(result)}")
+        return result
 
     def pair_inference(self, sa_seq1, sa_seq2):
         seq1 = "".join([char + "#" for char in sa_seq1])
@@ -159,18 +238,29 @@ def main(args):
     tool = model_py_path[7:-6]
     executor = SaProtExecutor(model_py_path, huggingface_path, lora_adaptor, num_labels, label_dict).get_executor(tool)
     if tool == "mutation":
-        result = executor(args.sa_seq, args.mut_info, args.mut_position)
+        mut_infos = None
+        if args.mut_info_path is not None:
+            with open(args.mut_info_path, "r") as r:
+                mut_infos = [line.strip() for line in r if line.strip()]
+
+        result = executor(args.sa_seq, args.mut_info, args.mut_position, args.scan_path, args.top_k,
+                          args.scan_batch_size, mut_infos)
     elif tool == "pair_classification" or tool == "pair_regression":
         result = executor(args.sa_seq1, args.sa_seq2)
     else:
         result = executor(args.sa_seq)
 
+    if args.save_path is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_path)), exist_ok=True)
+        with open(args.save_path, "w") as w:
+            json.dump(result, w)
+
 def get_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("--model_py_path", type=str, required=True)
     parser.add_argument("--huggingface_path", type=str, required=True)
     parser.add_argument("--lora_adaptor", type=str)
-    parser.add_argument("--label_dict", type=dict)
+    parser.add_argument("--label_dict", type=json.loads, help="Json mapping from label index to label name")
     parser.add_argument("--num_labels", type=int)
     parser.add_argument("--tool", type=str)
     parser.add_argument("--sa_seq", type=str)
@@ -178,6 +268,13 @@ def get_args():
     parser.add_argument("--sa_seq2", type=str)
     parser.add_argument("--mut_info", type=str)
     parser.add_argument("--mut_position", type=int)
+    parser.add_argument("--mut_info_path", type=str, help="File with the mutation information of one mutant per line")
+    parser.add_argument("--scan_path", type=str,
+                        help="Score all mutations at all positions and save the matrix to this CSV or Parquet file")
+    parser.add_argument("--top_k", type=int, default=10, help="Number of top mutations returned by the scan")
+    parser.add_argument("--scan_batch_size", type=int,
+                        help="Number of masked sequences in a forward pass of the scan. Default: 16 on GPU, 4 on CPU")
+    parser.add_argument("--save_path", type=str, help="Path to save the result as json")
     args = parser.parse_args()
     return args
 
@@ -0,0 +1,192 @@
+import sys
+
+ROOT_DIR = __file__.rsplit("/", 4)[0]
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import os
+import time
+import json
+import argparse
+import torch
+
+from utils.foldseek_util import get_struc_seq
+from agent.tools.esmfold.batching import read_fasta, pack_batches
+from agent.tools.saprot_task.saprot.model_interface import ModelInterface
+from agent.tools.saprot_task.embedding_store import EmbeddingWriter
+
+
+# SaProt has 1026 positions, two of which are taken by the <cls> and <eos> tokens
+MAX_LENGTH = 1022
+
+STRUCTURE_SUFFIXES = (".pdb", ".cif", ".pdb.gz", ".cif.gz")
+
+
+def load_model(huggingface_path: str, device: str):
+    model = ModelInterface.init_model("saprot/saprot_mutation_model", config_path=huggingface_path,
+                                      load_pretrained=True)
+    if device.startswith("cuda") and not torch.cuda.is_available():
+        device = "cpu"
+    model.eval()
+    model.to(device)
+    return model
+
+
+def read_structures(structure_dir: str, foldseek: str, skip_ids: set) -> list:
+    """
+    Get the structure-aware sequences of the first chain of every structure file in a directory. The id of a protein
+    is its file name without the suffix
+    Args:
+        structure_dir: Directory of the structure files
+
+        foldseek: Path to the foldseek binary
+
+        skip_ids: Ids that are already embedded. Their structures are not parsed again
+
+    Returns:
+        A list of (id, structure-aware sequence) tuples
+    """
+    records = []
+    for file_name in sorted(os.listdir(structure_dir)):
+        suffix = next((suffix for suffix in STRUCTURE_SUFFIXES if file_name.endswith(suffix)), None)
+        if suffix is None:
+            continue
+
+        seq_id = file_name[:-len(suffix)]
+        if seq_id in skip_ids:
+            continue
+
+        try:
+            seq_dict = get_struc_seq(foldseek, f"{structure_dir}/{file_name}")
+            records.append((seq_id, next(iter(seq_dict.values()))[-1]))
+        except Exception as e:
+            print(f"Failed to parse {file_name}: {e}", flush=True)
+
+    return records
+
+
+def embed_batch(model, sa_seqs: list) -> list:
+    """
+    Get the per-residue embeddings of a batch of structure-aware sequences
+    Returns:
+        A list of [L, D] float16 arrays
+    """
+    with torch.no_grad():
+        hidden_states = model.get_hidden_states_from_seqs(sa_seqs)
+
+    return [hidden_state.half().cpu().numpy() for hidden_state in hidden_states]
+
+
+def embed(model, records: list, writer: EmbeddingWriter, max_tokens: int = 16384, max_batch_size: int = 64) -> int:
+    """
+    Embed the proteins that are not in the store yet. Sequences are sorted by length and packed into batches under a
+    token budget, and each batch is appended to the store as soon as it is done
+    Args:
+        model: SaProt model
+
+        records: A list of (id, structure-aware sequence) tuples
+
+        writer: Writer of the embedding store
+
+        max_tokens: Maximum number of padded residues in a batch
+
+        max_batch_size: Maximum number of sequences in a batch
+
+    Returns:
+        The number of embedded proteins
+    """
+    seen = set(writer.done)
+    pending_records = []
+    for seq_id, sa_seq in records:
+        if seq_id in seen:
+            continue
+
+        seen.add(seq_id)
+        if len(sa_seq) // 2 > MAX_LENGTH:
+            print(f"{seq_id} has {len(sa_seq) // 2} residues. Only the first {MAX_LENGTH} are embedded", flush=True)
+            sa_seq = sa_seq[:2 * MAX_LENGTH]
+        pending_records.append((seq_id, sa_seq))
+
+    print(f"{len(writer.done)} proteins are already in the store. Embedding {len(pending_records)} proteins",
+          flush=True)
+    records = pending_records
+    pending = pack_batches([len(sa_seq) // 2 for _, sa_seq in records], max_tokens, max_batch_size)
+
+    num_embedded = 0
+    while pending:
+        batch = pending.pop(0)
+        start = time.time()
+        try:
+            embeddings = embed_batch(model, [records[i][1] for i in batch])
+
+        except RuntimeError as e:
+            # A batch that runs out of memory is embedded one sequence at a time
+            if len(batch) > 1 and "out of memory" in str(e):
+                if model.device.type == "cuda":
+                    torch.cuda.empty_cache()
+                pending = [[i] for i in batch] + pending
+                continue
+
+            for i in batch:
+                print(f"Failed to embed {records[i][0]}: {e}", flush=True)
+            continue
+
+        writer.write([records[i][0] for i in batch], embeddings)
+        num_embedded += len(batch)
+        print(f"Embedded {num_embedded}/{len(records)}: {len(batch)} sequences of up to "
+              f"{max(len(records[i][1]) // 2 for i in batch)} residues in {time.time() - start:.2f} s", flush=True)
+
+    return num_embedded
+
+
+def main(args):
+    model = load_model(args.huggingface_path, args.device)
+    dim = model.model.config.hidden_size
+    with EmbeddingWriter(args.store_dir, os.path.basename(args.huggingface_path.rstrip("/")), dim,
+                         args.per_residue) as writer:
+        if args.fasta_file is not None:
+            # FASTA files contain amino acid sequences, whose structure tokens are masked
+            records = [(seq_id, "".join(aa + "#" for aa in seq)) for seq_id, seq in read_fasta(args.fasta_file)]
+        else:
+            records = read_structures(args.structure_dir, args.foldseek, writer.done)
+
+        num_embedded = embed(model, records, writer, args.max_tokens, args.max_batch_size)
+        result = {"num_embedded": num_embedded, "num_proteins": len(writer.done), "dim": dim}
+
+    print(f"Embeddings saved to {args.store_dir}. Result is {json.dumps(result)}", flush=True)
+    if args.save_path is not None:
+        with open(args.save_path, "w") as w:
+            json.dump(result, w)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Embed proteins with SaProt into a memory-mapped store")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--fasta_file", type=str, help="FASTA file of amino acid sequences")
+    group.add_argument("--structure_dir", type=str, help="Directory of .pdb or .cif files")
+    parser.add_argument("--store_dir", type=str, required=True,
+                        help="Directory of the embedding store. An existing store is resumed")
+    parser.add_argument("--huggingface_path", type=str, required=True, help="Path to the SaProt model")
+    parser.add_argument("--foldseek", type=str, default=None, help="Path to the foldseek binary")
+    parser.add_argument("--per_residue", action="store_true",
+                        help="Save the per-residue embeddings besides the mean-pooled ones")
+    parser.add_argument("--max_tokens", type=int, default=16384, help="Maximum number of padded residues in a batch")
+    parser.add_argument("--max_batch_size", type=int, default=64, help="Maximum number of sequences in a batch")
+    parser.add_argument("--device", type=str, default="cuda:0", help="Device to run the model. Default: cuda:0")
+    parser.add_argument("--save_path", type=str, default=None, help="Save the summary of the run as JSON")
+
+    args = parser.parse_args()
+    if args.structure_dir is not None and args.foldseek is None:
+        parser.error("--structure_dir requires --foldseek")
+
+    return args
+
+
+if __name__ == '__main__':
+    """
+    EXAMPLE:
+    python embed.py     --fasta_file example/human_FP.fasta \
+                        --store_dir outputs/saprot_embedding/human_FP \
+                        --huggingface_path /home/public/huggingface/SaProt/SaProt_650M_AF2
+    """
+    main(get_args())
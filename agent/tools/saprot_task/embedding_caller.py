@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import shlex
+
+
+ROOT_DIR = __file__.rsplit("/", 4)[0]
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+
+from agent.tools.saprot_task.saprot_caller import SaProtCaller, HUGGINGFACE_ROOT
+from agent.tools.register import register_tool
+
+BASE_DIR = os.path.dirname(__file__)
+
+
+@register_tool
+class SaProtEmbeddingCaller(SaProtCaller):
+    # Runs its own process instead of the shared service
+    uses_service = False
+
+    def __init__(self, **kwargs):
+        super().__init__("saprot_embedding", **kwargs)
+
+    def __call__(self, fasta_file=None, structure_dir=None, per_residue=False, store_dir=None) -> dict:
+        if (fasta_file is None) == (structure_dir is None):
+            return {"error": "Exactly one of fasta_file and structure_dir should be provided"}
+
+        # Embedding a whole dataset is a long job, so it runs in its own process instead of the shared service
+        store_dir = store_dir if store_dir is not None else f"{self.tool_name}/{self.run_id}/store"
+        store_dir = store_dir if os.path.isabs(store_dir) else f"{self.out_dir}/{store_dir}"
+        save_path = f"{self.out_dir}/{self.tool_name}/{self.run_id}.json"
+        embedding_config = self.config.get("embedding", {})
+        cmd_args = {
+            "store_dir": store_dir,
+            "huggingface_path": HUGGINGFACE_ROOT + self.config[self.tool_name]["saprot_embedding"]["huggingface_path"],
+            "max_tokens": embedding_config.get("max_tokens", 16384),
+            "max_batch_size": embedding_config.get("max_batch_size", 64),
+            "device": self.device,
+            "save_path": save_path,
+        }
+        if fasta_file is not None:
+            cmd_args["fasta_file"] = fasta_file if os.path.isabs(fasta_file) else f"{self.out_dir}/{fasta_file}"
+        else:
+            cmd_args["structure_dir"] = structure_dir if os.path.isabs(structure_dir) else f"{self.out_dir}/{structure_dir}"
+            cmd_args["foldseek"] = self.config["foldseek"]
+
+        cmd = f"{self.config['python']} {BASE_DIR}/embed.py"
+        for k, v in cmd_args.items():
+            cmd += f" --{k} {shlex.quote(str(v))}"
+        if str(per_residue).lower() == "true":
+            cmd += " --per_residue"
+
+        # Redirect the stdout and stderr to a log file
+        cmd += f" > {self.log_path} 2>&1"
+        try:
+            os.system(cmd)
+            if not os.path.exists(save_path):
+                return {"error": "Failed to run the SaProt embedding"}
+
+            with open(save_path, "r") as r:
+                result = json.load(r)
+
+            if store_dir.startswith(f"{self.out_dir}/"):
+                store_dir = store_dir[len(self.out_dir)+1:]
+
+            return {
+                "store_dir": store_dir,
+                "num_proteins": result["num_proteins"],
+                "embedding_dim": result["dim"],
+            }
+        except Exception as e:
+            return {"error": str(e)}
+
+
+if __name__ == "__main__":
+    caller = SaProtEmbeddingCaller()
+
+    input_args = {
+        "fasta_file": "example/human_FP.fasta",
+    }
+
+    for obs in caller.mp_run(**input_args):
+
+        print(obs, end="")
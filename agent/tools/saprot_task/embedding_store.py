@@ -0,0 +1,176 @@
+import os
+import json
+import numpy as np
+
+
+# Files of an embedding store
+META_FILE = "meta.json"
+INDEX_FILE = "index.tsv"
+PROTEIN_FILE = "proteins.f16"
+RESIDUE_FILE = "residues.f16"
+
+
+def read_index(store_dir: str) -> list:
+    """
+    Read the complete rows of the id index
+    Returns:
+        A list of (id, length, residue offset) tuples, in the order of the rows of the protein embeddings. The residue
+        offset is the first row of the protein in the per-residue embeddings
+    """
+    index_path = f"{store_dir}/{INDEX_FILE}"
+    if not os.path.exists(index_path):
+        return []
+
+    rows = []
+    with open(index_path, "r") as r:
+        for line in r:
+            # A line without a newline was cut off by an interruption
+            if not line.endswith("\n"):
+                break
+            seq_id, length, offset = line.rstrip("\n").split("\t")
+            rows.append((seq_id, int(length), int(offset)))
+
+    return rows
+
+
+class EmbeddingStore:
+    def __init__(self, store_dir: str):
+        """
+        Read-only view of an embedding store. The mean-pooled embeddings are a [N, D] float16 array and the
+        per-residue embeddings of all proteins are concatenated into a [sum(L), D] array. Both are memory-mapped, so
+        stores of millions of proteins can be read without loading them into memory
+        Args:
+            store_dir: Directory of the store
+        """
+        with open(f"{store_dir}/{META_FILE}", "r") as r:
+            self.meta = json.load(r)
+
+        self.store_dir = store_dir
+        self.dim = self.meta["dim"]
+        self.index = read_index(store_dir)
+        self.rows = {seq_id: i for i, (seq_id, _, _) in enumerate(self.index)}
+
+        self.proteins = self.load_array(PROTEIN_FILE, len(self.index))
+        self.residues = None
+        if self.meta["per_residue"]:
+            num_residues = self.index[-1][1] + self.index[-1][2] if self.index else 0
+            self.residues = self.load_array(RESIDUE_FILE, num_residues)
+
+    def load_array(self, file_name: str, num_rows: int) -> np.ndarray:
+        if num_rows == 0:
+            return np.zeros((0, self.dim), dtype=np.float16)
+
+        return np.memmap(f"{self.store_dir}/{file_name}", dtype=np.float16, mode="r", shape=(num_rows, self.dim))
+
+    @property
+    def ids(self) -> list:
+        return [seq_id for seq_id, _, _ in self.index]
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, seq_id: str):
+        return seq_id in self.rows
+
+    def get(self, seq_id: str) -> np.ndarray:
+        """
+        Mean-pooled embedding of a protein
+        Returns:
+            A [D] float16 array
+        """
+        return self.proteins[self.rows[seq_id]]
+
+    def get_residues(self, seq_id: str) -> np.ndarray:
+        """
+        Per-residue embeddings of a protein
+        Returns:
+            A [L, D] float16 array
+        """
+        if self.residues is None:
+            raise ValueError(f"The store {self.store_dir} does not contain per-residue embeddings")
+
+        _, length, offset = self.index[self.rows[seq_id]]
+        return self.residues[offset: offset + length]
+
+
+class EmbeddingWriter:
+    def __init__(self, store_dir: str, model: str, dim: int, per_residue: bool = False):
+        """
+        Append embeddings to a store. The embeddings are written before their index rows, so an interrupted run
+        leaves at most some unindexed rows, which are dropped when the store is opened again. The run can then resume
+        from the proteins that are not in the index
+        Args:
+            store_dir: Directory of the store. Created if it does not exist
+
+            model: Name of the model. A store can only be resumed with the model that created it
+
+            dim: Dimension of the embeddings
+
+            per_residue: Whether to save the per-residue embeddings besides the mean-pooled ones
+        """
+        os.makedirs(store_dir, exist_ok=True)
+        meta = {"model": model, "dim": dim, "dtype": "float16", "per_residue": per_residue}
+        meta_path = f"{store_dir}/{META_FILE}"
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as r:
+                stored_meta = json.load(r)
+            if stored_meta != meta:
+                raise ValueError(f"The store {store_dir} was created with {stored_meta}, which does not match {meta}")
+        else:
+            with open(meta_path, "w") as w:
+                json.dump(meta, w, indent=4)
+
+        self.store_dir = store_dir
+        self.dim = dim
+        self.per_residue = per_residue
+        index = read_index(store_dir)
+        self.done = {seq_id for seq_id, _, _ in index}
+        self.num_residues = index[-1][1] + index[-1][2] if index else 0
+
+        # Drop whatever an interrupted run wrote after its last complete index row
+        row_bytes = dim * np.dtype(np.float16).itemsize
+        index_bytes = sum(len(f"{seq_id}\t{length}\t{offset}\n".encode()) for seq_id, length, offset in index)
+        self.index_file = self.open_truncated(INDEX_FILE, index_bytes, "a")
+        self.protein_file = self.open_truncated(PROTEIN_FILE, len(index) * row_bytes, "ab")
+        self.residue_file = None
+        if per_residue:
+            self.residue_file = self.open_truncated(RESIDUE_FILE, self.num_residues * row_bytes, "ab")
+
+    def open_truncated(self, file_name: str, size: int, mode: str):
+        path = f"{self.store_dir}/{file_name}"
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            os.truncate(path, size)
+        return open(path, mode)
+
+    def write(self, ids: list, embeddings: list):
+        """
+        Append the embeddings of a batch of proteins
+        Args:
+            ids: Ids of the proteins
+
+            embeddings: Per-residue embeddings of each protein, as [L, D] arrays
+        """
+        proteins = np.stack([embedding.astype(np.float32).mean(axis=0) for embedding in embeddings])
+        self.protein_file.write(proteins.astype(np.float16).tobytes())
+        self.protein_file.flush()
+        if self.per_residue:
+            for embedding in embeddings:
+                self.residue_file.write(embedding.astype(np.float16).tobytes())
+            self.residue_file.flush()
+
+        for seq_id, embedding in zip(ids, embeddings):
+            self.index_file.write(f"{seq_id}\t{len(embedding)}\t{self.num_residues}\n")
+            self.num_residues += len(embedding)
+            self.done.add(seq_id)
+        self.index_file.flush()
+
+    def close(self):
+        for file in [self.index_file, self.protein_file, self.residue_file]:
+            if file is not None:
+                file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -7,13 +7,11 @@ ROOT_DIR = __file__.rsplit("/", 4)[0]
 if ROOT_DIR not in sys.path:
     sys.path.append(ROOT_DIR)
 
-import torch
 
 from utils.foldseek_util import get_struc_seq
 from agent.tools.saprot_task.saprot_caller import SaProtCaller
 from agent.tools.register import register_tool
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -57,24 +55,9 @@ class SaProtInferenceClassificationCaller(SaProtCaller):
                 sa_seq += aa + "#"
         cmd_args["sa_seq"] = sa_seq
         
-        cmd = f"{self.config['python']} {BASE_DIR}/command.py"
-        for k, v in cmd_args.items():
-            cmd += f" --{k} {v}"
-        
-        # Redirect the stdout and stderr to a log file
-        cmd += f" > {self.log_path} 2>&1"
         try:
-            os.system(cmd)
-        
-            with open(self.log_path, "r") as r:
-                prediction = None
-                for line in r:
-                    if line.startswith("Prediction complete. Result is "):
-                        prediction = line.split("Prediction complete. Result is ")[1].strip()
-                        break
-            if prediction is None:
-                return {"error": "Prediction failed"}
-            return {"pred": prediction}
+            result = self.predict(cmd_args)
+            return {"pred": result["pred"]}
         except Exception as e:
             return {"error": str(e)}
     
@@ -91,4 +74,4 @@ if __name__ == "__main__":
     for obs in caller.mp_run(**input_args):
         # os.system("clear")
         
-        print(obs)
\ No newline at end of file
+        print(obs, end="")
\ No newline at end of file
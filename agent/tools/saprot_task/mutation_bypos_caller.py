@@ -6,13 +6,11 @@ ROOT_DIR = __file__.rsplit("/", 4)[0]
 if ROOT_DIR not in sys.path:
     sys.path.append(ROOT_DIR)
 
-import torch
 
 from utils.foldseek_util import get_struc_seq
 from agent.tools.saprot_task.saprot_caller import SaProtCaller
 from agent.tools.register import register_tool
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -40,26 +38,14 @@ class SaProtMutationPosCaller(SaProtCaller):
             return{"error": "Invalid mutation position"}
         cmd_args["mut_position"] = pos
     
-        cmd = f"{self.config['python']} {BASE_DIR}/command.py"
-        for k, v in cmd_args.items():
-            cmd += f" --{k} {v}"
-        
-        # Redirect the stdout and stderr to a log file
-        cmd += f" > {self.log_path} 2>&1"
         try:
-            os.system(cmd)
-        
-            with open(self.log_path, "r") as r:
-                for line in r:
-                    if line.startswith("Prediction complete. Result is "):
-                        prediction = line.split("Prediction complete. Result is ")[1].strip()
-                        break
-            
+            result = self.predict(cmd_args)
+
             origin_aa = protein_sequence[pos]
-            mutation_dict = eval(prediction)
+            mutation_dict = result["pred"]
             best_mutation = max(mutation_dict, key=mutation_dict.get)
             
-            return {"pred": prediction, "origin_aa": origin_aa, "best_mutation": best_mutation}
+            return {"pred": mutation_dict, "origin_aa": origin_aa, "best_mutation": best_mutation}
         except Exception as e:
             return {"error": str(e)}
     
@@ -72,6 +58,5 @@ if __name__ == "__main__":
     }
 
     for obs in caller.mp_run(**input_args):
-        os.system("clear")
         
-        print(obs)
\ No newline at end of file
+        print(obs, end="")
\ No newline at end of file
@@ -0,0 +1,64 @@
+import os
+import sys
+
+
+ROOT_DIR = __file__.rsplit("/", 4)[0]
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+
+from utils.foldseek_util import get_struc_seq
+from agent.tools.saprot_task.saprot_caller import SaProtCaller
+from agent.tools.register import register_tool
+
+BASE_DIR = os.path.dirname(__file__)
+
+
+@register_tool
+class SaProtMutationScanCaller(SaProtCaller):
+    def __init__(self, **kwargs):
+        super().__init__("saprot_mutation_scan", **kwargs)
+
+    def __call__(self, protein_sequence, structure_path=None, top_k=10, output_format="csv") -> dict:
+        chain = "A"
+        cmd_args = self.model_config("saprot_mutation")
+        if structure_path is not None:
+            sa_seq = get_struc_seq(
+                self.config["foldseek"],
+                structure_path
+            )[chain][-1]
+        else:
+            sa_seq = ""
+            for aa in protein_sequence:
+                sa_seq += aa + "#"
+        cmd_args["sa_seq"] = sa_seq
+
+        if output_format not in ["csv", "parquet"]:
+            return {"error": "Invalid output format. Should be one of ['csv', 'parquet']"}
+
+        scan_path = f"{self.out_dir}/{self.tool_name}/{self.item_run_id}/mutation_scan.{output_format}"
+        cmd_args["scan_path"] = scan_path
+        cmd_args["top_k"] = int(top_k)
+        cmd_args["scan_batch_size"] = self.config.get("scan_batch_size")
+
+        try:
+            result = self.predict(cmd_args)
+            top_mutations = {mutation["mutation"]: mutation["score"] for mutation in result["pred"]["top_mutations"]}
+            best_mutation = next(iter(top_mutations), None)
+
+            return {"scan_path": scan_path[len(self.out_dir)+1:], "top_mutations": top_mutations,
+                    "best_mutation": best_mutation}
+        except Exception as e:
+            return {"error": str(e)}
+    
+if __name__ == "__main__":
+    caller = SaProtMutationScanCaller()
+    
+    input_args = {
+        "protein_sequence": "AAAAAAAAAA",
+        "top_k": 5,
+    }
+
+    for obs in caller.mp_run(**input_args):
+        
+        print(obs, end="")
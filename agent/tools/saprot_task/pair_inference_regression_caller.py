@@ -7,18 +7,19 @@ ROOT_DIR = __file__.rsplit("/", 4)[0]
 if ROOT_DIR not in sys.path:
     sys.path.append(ROOT_DIR)
 
-import torch
 
 from utils.foldseek_util import get_struc_seq
 from agent.tools.saprot_task.saprot_caller import SaProtCaller
 from agent.tools.register import register_tool
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
 @register_tool
 class SaProtPairInferenceRegressionCaller(SaProtCaller):
+    # Runs command.py instead of the shared service
+    uses_service = False
+
     def __init__(self, **kwargs):
         super(SaProtCaller, self).__init__(
             config_path=f"{BASE_DIR}/config.yaml",
@@ -97,6 +98,5 @@ if __name__ == "__main__":
     }
 
     for obs in caller.mp_run(**input_args):
-        os.system("clear")
         
-        print(obs)
\ No newline at end of file
+        print(obs, end="")
\ No newline at end of file
@@ -66,6 +66,16 @@ class SaprotFoldseekMutationModel(SaprotBaseModel):
         
         self.struc_seq = seqs
         
+        # Without insertions and MSA priors, mutants that mask the same positions share a forward pass
+        has_insertion = any(single[0] not in aa_set for info in mut_info for single in info.split(":"))
+        if not has_insertion and self.MSA_log_path is None:
+            sa_seq = "".join(a + b.lower() for a, b in zip(wild_type, self.struc_seq))
+            preds = torch.tensor(self.predict_muts(sa_seq, list(mut_info)), device=device)
+            if self.log_clinvar:
+                self.mut_info_list.append((mut_info, -preds.cpu()))
+            
+            return preds
+        
         ins_seqs = []
         ori_seqs = []
         mut_data = []
@@ -132,14 +142,16 @@ class SaprotFoldseekMutationModel(SaprotBaseModel):
             MSA_log_prior = MSA_info["MSA_log_prior"].to(device)
             st, ed = MSA_info["MSA_start"], MSA_info["MSA_end"]
         
+        # get_vocab builds a new dict on every call
+        vocab = self.tokenizer.get_vocab()
         preds = []
         for i, data_list in enumerate(mut_data):
             pred = 0
             for data in data_list:
                 ori_aa, ori_pos, mut_aa, ins_pos = data
 
-                ori_st = self.tokenizer.get_vocab()[ori_aa + foldseek_struc_vocab[0]]
-                mut_st = self.tokenizer.get_vocab()[mut_aa + foldseek_struc_vocab[0]]
+                ori_st = vocab[ori_aa + foldseek_struc_vocab[0]]
+                mut_st = vocab[mut_aa + foldseek_struc_vocab[0]]
 
                 ori_prob = ori_probs[i, ori_pos, ori_st: ori_st + len(foldseek_struc_vocab)].sum()
                 # ori_sturc_aa = ori_aa + self.struc_seq[ori_pos-1].lower()
@@ -233,32 +245,88 @@ class SaprotFoldseekMutationModel(SaprotBaseModel):
                Returns:
                    The predicted mutational effect
                """
+        return self.predict_muts(seq, [mut_info])[0]
+    
+    def get_aa_token_ids(self) -> torch.Tensor:
+        """
+        Vocabulary ids of each amino acid combined with every structure token, in the order of aa_list
+        Returns:
+            A [20, len(foldseek_struc_vocab)] tensor on the device of the model
+        """
+        if getattr(self, "aa_token_ids", None) is None or self.aa_token_ids.device != self.device:
+            vocab = self.tokenizer.get_vocab()
+            self.aa_token_ids = torch.tensor([[vocab[aa + struc] for struc in foldseek_struc_vocab] for aa in aa_list],
+                                             device=self.device)
+        return self.aa_token_ids
+    
+    def predict_muts(self, seq: str, mut_infos: list, batch_size: int = 16) -> list:
+        """
+        Predict the mutational effects of many mutants of a sequence. Mutants that mask the same set of positions
+        share one forward pass, e.g. all single mutants at a position, so the number of forward passes is the number
+        of unique position sets rather than the number of mutants
+        Args:
+            seq: The wild type sequence
+
+            mut_infos: Mutation information of each mutant, in the format of "predict_mut", e.g. "A123B:C124D"
+
+            batch_size: Number of masked sequences in a forward pass
+
+        Returns:
+            The predicted mutational effect of each mutant
+        """
         tokens = self.tokenizer.tokenize(seq)
-        for single in mut_info.split(":"):
-            pos = int(single[1:-1])
-            tokens[pos - 1] = "#" + tokens[pos - 1][-1]
+        vocab = self.tokenizer.get_vocab()
+        aa_index = {aa: i for i, aa in enumerate(aa_list)}
         
-        mask_seq = " ".join(tokens)
-        inputs = self.tokenizer(mask_seq, return_tensors="pt")
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        # One entry per mutated site of every mutant
+        position_sets = {}
+        site_set, site_pos, site_ori, site_mut, site_mutant = [], [], [], [], []
+        for i, mut_info in enumerate(mut_infos):
+            singles = [(single[0], int(single[1:-1]), single[-1]) for single in mut_info.split(":")]
+            key = tuple(sorted({pos for _, pos, _ in singles}))
+            set_id = position_sets.setdefault(key, len(position_sets))
+            for ori_aa, pos, mut_aa in singles:
+                site_set.append(set_id)
+                site_pos.append(pos)
+                site_ori.append(aa_index[ori_aa])
+                site_mut.append(aa_index[mut_aa])
+                site_mutant.append(i)
+        
+        site_set = torch.tensor(site_set, device=self.device)
+        site_pos = torch.tensor(site_pos, device=self.device)
+        site_ori = torch.tensor(site_ori, device=self.device)
+        site_mut = torch.tensor(site_mut, device=self.device)
+        site_mutant = torch.tensor(site_mutant, device=self.device)
         
+        token_ids = [self.tokenizer.cls_token_id] + self.tokenizer.convert_tokens_to_ids(tokens) + \
+                    [self.tokenizer.eos_token_id]
+        token_ids = torch.tensor(token_ids, device=self.device)
+        # Id of each token with its amino acid masked. +1 skips the <cls> token
+        mask_ids = torch.tensor([token_ids[0].item()] + [vocab["#" + token[-1]] for token in tokens] +
+                                [token_ids[-1].item()], device=self.device)
+        aa_ids = self.get_aa_token_ids()
+        
+        keys = list(position_sets)
+        scores = torch.zeros(len(mut_infos), device=self.device)
         with torch.no_grad():
-            outputs = self.model(**inputs)
-            logits = outputs.logits
-            probs = logits.softmax(dim=-1)
-            
-            score = 0
-            for single in mut_info.split(":"):
-                ori_aa, pos, mut_aa = single[0], int(single[1:-1]), single[-1]
-                ori_st = self.tokenizer.get_vocab()[ori_aa + foldseek_struc_vocab[0]]
-                mut_st = self.tokenizer.get_vocab()[mut_aa + foldseek_struc_vocab[0]]
+            for st in range(0, len(keys), batch_size):
+                batch_keys = keys[st: st + batch_size]
+                input_ids = token_ids.repeat(len(batch_keys), 1)
+                rows = torch.tensor([b for b, key in enumerate(batch_keys) for _ in key], device=self.device)
+                cols = torch.tensor([pos for key in batch_keys for pos in key], device=self.device)
+                input_ids[rows, cols] = mask_ids[cols]
                 
-                ori_prob = probs[0, pos, ori_st: ori_st + len(foldseek_struc_vocab)].sum()
-                mut_prob = probs[0, pos, mut_st: mut_st + len(foldseek_struc_vocab)].sum()
+                logits = self.model(input_ids=input_ids, attention_mask=torch.ones_like(input_ids)).logits
                 
-                score += torch.log(mut_prob / ori_prob)
+                # Gather the sites of the mutants whose position sets are in this batch
+                selected = (site_set >= st) & (site_set < st + len(batch_keys))
+                probs = logits[site_set[selected] - st, site_pos[selected]].float().softmax(dim=-1)
+                log_probs = probs[:, aa_ids].sum(dim=-1).log()
+                mut_log_probs = log_probs.gather(1, site_mut[selected, None]).squeeze(1)
+                ori_log_probs = log_probs.gather(1, site_ori[selected, None]).squeeze(1)
+                scores.index_add_(0, site_mutant[selected], mut_log_probs - ori_log_probs)
         
-        return score.item()
+        return scores.tolist()
     
     def predict_pos_mut(self, seq: str, pos: int) -> dict:
         """
@@ -285,9 +353,10 @@ class SaprotFoldseekMutationModel(SaprotBaseModel):
             probs = logits.softmax(dim=-1)[0, pos]
             
             scores = {}
-            ori_st = self.tokenizer.get_vocab()[ori_aa + foldseek_struc_vocab[0]]
+            vocab = self.tokenizer.get_vocab()
+            ori_st = vocab[ori_aa + foldseek_struc_vocab[0]]
             for mut_aa in aa_list:
-                mut_st = self.tokenizer.get_vocab()[mut_aa + foldseek_struc_vocab[0]]
+                mut_st = vocab[mut_aa + foldseek_struc_vocab[0]]
                 
                 ori_prob = probs[ori_st: ori_st + len(foldseek_struc_vocab)].sum()
                 mut_prob = probs[mut_st: mut_st + len(foldseek_struc_vocab)].sum()
@@ -321,10 +390,67 @@ class SaprotFoldseekMutationModel(SaprotBaseModel):
             probs = logits.softmax(dim=-1)[0, pos]
             
             scores = {}
+            vocab = self.tokenizer.get_vocab()
             for aa in aa_list:
-                st = self.tokenizer.get_vocab()[aa + foldseek_struc_vocab[0]]
+                st = vocab[aa + foldseek_struc_vocab[0]]
                 prob = probs[st: st + len(foldseek_struc_vocab)].sum()
                 
                 scores[aa] = prob.item()
         
-        return scores
\ No newline at end of file
+        return scores
+    
+    def predict_saturation(self, seq: str, batch_size: int = 16, window: int = 1022) -> tuple:
+        """
+        Predict the mutational effect of all 20 amino acids at every position, i.e. a deep mutational scan. Each
+        position is masked in its own copy of the sequence, and the copies are run through the model in batches
+        Args:
+            seq: The wild type sequence
+
+            batch_size: Number of masked copies in a forward pass. Smaller values use less memory, e.g. on the CPU
+
+            window: Maximum number of residues in a forward pass. For longer sequences each position is predicted
+                    from the window of this size centered on it
+
+        Returns:
+            A [L, 20] tensor of the scores log(p(mut) / p(wt)), with the columns in the order of aa_list, and the list
+            of wild type amino acids. Positions whose wild type is not a standard amino acid are NaN
+        """
+        tokens = self.tokenizer.tokenize(seq)
+        length = len(tokens)
+        wild_type = [token[0] for token in tokens]
+        vocab = self.tokenizer.get_vocab()
+        
+        aa_ids = self.get_aa_token_ids()
+        wt_index = torch.tensor([aa_list.index(aa) if aa in aa_set else 0 for aa in wild_type], device=self.device)
+        
+        token_ids = torch.tensor(self.tokenizer.convert_tokens_to_ids(tokens), device=self.device)
+        mask_ids = torch.tensor([vocab["#" + token[-1]] for token in tokens], device=self.device)
+        cls_id = torch.tensor([self.tokenizer.cls_token_id], device=self.device)
+        eos_id = torch.tensor([self.tokenizer.eos_token_id], device=self.device)
+        
+        window = min(window, length)
+        scores = []
+        with torch.no_grad():
+            for st in range(0, length, batch_size):
+                positions = torch.arange(st, min(st + batch_size, length), device=self.device)
+                
+                # Windows are centered on the masked positions and shifted to stay inside the sequence
+                starts = (positions - window // 2).clamp(0, length - window)
+                offsets = torch.arange(window, device=self.device)
+                input_ids = token_ids[starts[:, None] + offsets]
+                local_pos = positions - starts
+                input_ids[torch.arange(len(positions), device=self.device), local_pos] = mask_ids[positions]
+                
+                input_ids = torch.cat([cls_id.expand(len(positions), 1), input_ids,
+                                       eos_id.expand(len(positions), 1)], dim=1)
+                logits = self.model(input_ids=input_ids, attention_mask=torch.ones_like(input_ids)).logits
+                
+                # +1 skips the <cls> token
+                probs = logits[torch.arange(len(positions), device=self.device), local_pos + 1].float().softmax(dim=-1)
+                aa_probs = probs[:, aa_ids].sum(dim=-1)
+                log_probs = aa_probs.log()
+                scores.append(log_probs - log_probs.gather(1, wt_index[positions, None]))
+        
+        scores = torch.cat(scores).cpu()
+        scores[[i for i, aa in enumerate(wild_type) if aa not in aa_set]] = float("nan")
+        return scores, wild_type
@@ -1,21 +1,29 @@
 import os
 import sys
+import json
+import shlex
+import tempfile
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 ROOT_DIR = __file__.rsplit("/", 4)[0]
 if ROOT_DIR not in sys.path:
     sys.path.append(ROOT_DIR)
 
-import torch
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
+from agent.tools.service import ServiceClient
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 HUGGINGFACE_ROOT = "/home/public/huggingface/"
 
 class SaProtCaller(BaseTool):
+    # Whether the tool predicts through "predict", so that its inputs can be batched by the service
+    uses_service = True
+
     def __init__(self, tool_name: str, **kwargs):
         super().__init__(
             config_path=f"{BASE_DIR}/config.yaml",
@@ -29,7 +37,18 @@ class SaProtCaller(BaseTool):
                 self.config["document"] = doc
                 break
         self.tool_name = tool_name
-    
+        # Index of the input of a batch handled by the current thread
+        self.batch_item = threading.local()
+
+    @property
+    def item_run_id(self) -> str:
+        """
+        Run id for the files of the current input. The inputs of a batch run concurrently under one run id, so each
+        gets its own subdirectory, as in the batches of ESMFold
+        """
+        index = getattr(self.batch_item, "index", None)
+        return self.run_id if index is None else f"{self.run_id}/{index}"
+
     def model_config(self, task_name: str):
         base_config = {
             "model_py_path": self.config[self.tool_name][task_name]["model_path"],
@@ -41,4 +60,95 @@ class SaProtCaller(BaseTool):
             base_config["label_dict"] = self.config[self.tool_name][task_name]["label_dict"]
         if "num_labels" in self.config[self.tool_name][task_name]:
             base_config["num_labels"] = self.config[self.tool_name][task_name]["num_labels"]
-        return base_config
\ No newline at end of file
+        return base_config
+
+    @property
+    def has_batch_call(self) -> bool:
+        return self.uses_service and self.config.get("service", {}).get("enabled", False)
+
+    def batch_call(self, tool_args_list: list):
+        """
+        Send the inputs to the SaProt service as concurrent requests, so that the service batches the requests of the
+        same base model
+        """
+        max_batch_size = self.config.service.get("max_batch_size", 32)
+        with ThreadPoolExecutor(max_workers=min(len(tool_args_list), max_batch_size)) as pool:
+            futures = {pool.submit(self.call_batch_item, i, tool_args): i
+                       for i, tool_args in enumerate(tool_args_list)}
+            for future in as_completed(futures):
+                try:
+                    results = future.result()
+                except Exception as e:
+                    results = {"error": str(e)}
+
+                yield futures[future], results
+
+    def call_batch_item(self, index: int, tool_args: dict) -> dict:
+        self.batch_item.index = index
+        try:
+            return self(**tool_args)
+        finally:
+            self.batch_item.index = None
+
+    def get_service(self) -> ServiceClient:
+        """
+        Get the client of the SaProt service. The service is shared by all SaProt tools and started on first use
+        """
+        service_config = self.config.service
+        socket_path = service_config.get("socket_path") or f"{tempfile.gettempdir()}/saprot-{os.getuid()}.sock"
+        start_cmd = [
+            self.config["python"], f"{BASE_DIR}/server.py",
+            "--socket_path", socket_path,
+            "--device", self.device,
+            "--max_models", str(service_config.get("max_models", 2)),
+            "--max_adapters", str(service_config.get("max_adapters", 16)),
+            "--max_batch_size", str(service_config.get("max_batch_size", 32)),
+            "--max_tokens", str(service_config.get("max_tokens", 16384)),
+            "--batch_wait", str(service_config.get("batch_wait", 0.02)),
+        ]
+        if service_config.get("idle_timeout") is not None:
+            start_cmd += ["--idle_timeout", str(service_config.idle_timeout)]
+
+        return ServiceClient(socket_path, start_cmd, start_timeout=service_config.get("start_timeout", 600))
+
+    def predict(self, cmd_args: dict) -> dict:
+        """
+        Run a SaProt prediction. The resident service is used if it is enabled, otherwise the model is loaded by a new
+        process of command.py
+        Args:
+            cmd_args: Arguments of command.py
+
+        Returns:
+            The structured result, with the prediction as "pred"
+        """
+        if self.config.get("service", {}).get("enabled", False):
+            service = self.get_service()
+            # Appended, since the inputs of a batch share the log
+            with open(self.log_path, "a") as w:
+                w.write("Connecting to the SaProt service\n")
+                w.flush()
+                service.ensure_started()
+
+                w.write(f"Predicting with {cmd_args['model_py_path']}\n")
+                w.flush()
+                result = service.request("POST", "/predict", cmd_args)
+                w.write(f"Prediction complete. Result is {json.dumps(result)}\n")
+
+            return result
+
+        save_path = f"{self.out_dir}/{self.tool_name}/{self.run_id}.json"
+        cmd = f"{self.config['python']} {BASE_DIR}/command.py --save_path {shlex.quote(save_path)}"
+        for k, v in cmd_args.items():
+            if v is None:
+                continue
+            v = json.dumps(v) if isinstance(v, dict) else str(v)
+            cmd += f" --{k} {shlex.quote(v)}"
+
+        # Redirect the stdout and stderr to a log file
+        cmd += f" > {self.log_path} 2>&1"
+        os.system(cmd)
+        if not os.path.exists(save_path):
+            raise RuntimeError("Prediction failed")
+
+        with open(save_path, "r") as r:
+            return json.load(r)
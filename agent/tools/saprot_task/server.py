@@ -0,0 +1,464 @@
+import sys
+
+ROOT_DIR = __file__.rsplit("/", 4)[0]
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import os
+import time
+import argparse
+import threading
+import torch
+
+from collections import OrderedDict
+from agent.tools.saprot_task.command import format_prediction, run_mutation_scan
+from agent.tools.saprot_task.saprot.model_interface import ModelInterface
+from agent.tools.service import serve, current_request
+
+
+# Tasks whose requests are batched together. Other tasks are run one request at a time
+BATCHED_TASKS = ["classification", "regression", "token_classification"]
+
+# Adapter name that runs a sample of a mixed batch without any adapter
+BASE_ADAPTER = "__base__"
+
+
+class PredictRequest:
+    def __init__(self, body: dict):
+        self.body = body
+        self.task = body["model_py_path"][7:-6]
+        self.sa_seq = body.get("sa_seq")
+        self.adapter = body.get("lora_adaptor")
+        # Requests of the same group share the base model
+        num_labels = int(body["num_labels"]) if body.get("num_labels") is not None else None
+        self.group = (body["model_py_path"], body["huggingface_path"], num_labels)
+        self.submit_time = time.time()
+        self.context = current_request()
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+def get_mtime(adapter_path: str) -> float:
+    """
+    Latest modification time of the files of an adapter
+    """
+    mtimes = [os.path.getmtime(entry.path) for entry in os.scandir(adapter_path)]
+    return max(mtimes) if mtimes else os.path.getmtime(adapter_path)
+
+
+class LoadedModel:
+    def __init__(self, model):
+        """
+        A base model and the LoRA adapters attached to it
+        Args:
+            model: SaProt task model. Its "model" attribute becomes a PEFT model once the first adapter is attached
+        """
+        self.model = model
+        # Attached adapters in least recently used order: adapter path -> adapter name
+        self.adapters = OrderedDict()
+        # Modification time of each attached adapter, so that retrained adapters are attached again
+        self.adapter_mtimes = {}
+        self.num_loaded = 0
+        # Whether the PEFT model accepts a different adapter for each sample. None until the first mixed batch
+        self.mixed_batches = None
+
+    @property
+    def is_peft(self) -> bool:
+        return hasattr(self.model.model, "peft_config")
+
+
+class SaProtService:
+    def __init__(self,
+                 device: str,
+                 max_models: int = 2,
+                 max_adapters: int = 16,
+                 max_batch_size: int = 32,
+                 max_tokens: int = 16384,
+                 batch_wait: float = 0.02):
+        """
+        Keeps SaProt base models loaded and attaches the LoRA adapters of the requests to them, so that predictions
+        with fine-tuned models do not reload the base model. Queued requests of the same base model are batched, even
+        if they use different adapters
+        Args:
+            device: Device to run the models. Falls back to the CPU if no GPU is available
+
+            max_models: Maximum number of base models kept loaded. The least recently used model is unloaded
+
+            max_adapters: Maximum number of adapters attached to a base model. The least recently used adapter is
+                detached
+
+            max_batch_size: Maximum number of sequences in a batch
+
+            max_tokens: Maximum number of padded tokens in a batch
+
+            batch_wait: Seconds to wait for more requests before running a batch
+        """
+        if device.startswith("cuda") and not torch.cuda.is_available():
+            device = "cpu"
+        self.device = device
+        self.max_models = max_models
+        self.max_adapters = max_adapters
+        self.max_batch_size = max_batch_size
+        self.max_tokens = max_tokens
+        self.batch_wait = batch_wait
+
+        self.models = OrderedDict()
+        self.queue = []
+        self.condition = threading.Condition()
+        # Adapters are attached and detached by the inference loop and the "/detach" endpoint
+        self.model_lock = threading.Lock()
+        self.num_predicted = 0
+
+        threading.Thread(target=self.loop, daemon=True).start()
+
+    def get_model(self, group: tuple) -> LoadedModel:
+        """
+        Get a loaded base model, loading it if needed
+        """
+        if group in self.models:
+            self.models.move_to_end(group)
+            return self.models[group]
+
+        while len(self.models) >= self.max_models:
+            evicted, _ = self.models.popitem(last=False)
+            print(f"Unloaded {evicted[0]} of {evicted[1]}", flush=True)
+            if self.device != "cpu":
+                torch.cuda.empty_cache()
+
+        model_py_path, huggingface_path, num_labels = group
+        config = {"config_path": huggingface_path, "load_pretrained": True}
+        if num_labels is not None:
+            config["num_labels"] = num_labels
+
+        print(f"Loading {model_py_path} from {huggingface_path} on {self.device}", flush=True)
+        model = ModelInterface.init_model(model_py_path, **config)
+        model.eval()
+        model.to(self.device)
+        self.models[group] = LoadedModel(model)
+        return self.models[group]
+
+    def attach(self, loaded: LoadedModel, adapter_path: str, pinned: set = ()) -> str:
+        """
+        Attach a LoRA adapter to a base model without reloading it
+        Args:
+            loaded: The base model
+
+            adapter_path: Directory of the adapter
+
+            pinned: Adapters used by the current batch, which must not be detached
+
+        Returns:
+            The name of the adapter in the PEFT model
+        """
+        mtime = get_mtime(adapter_path)
+        if adapter_path in loaded.adapters:
+            if loaded.adapter_mtimes[adapter_path] == mtime:
+                loaded.adapters.move_to_end(adapter_path)
+                return loaded.adapters[adapter_path]
+
+            # The adapter has been retrained since it was attached
+            self.detach(loaded, adapter_path)
+
+        while len(loaded.adapters) >= self.max_adapters:
+            evicted = next((path for path in loaded.adapters if path not in pinned), None)
+            if evicted is None:
+                break
+            self.detach(loaded, evicted)
+
+        name = f"adapter_{loaded.num_loaded}"
+        loaded.num_loaded += 1
+        if not loaded.is_peft:
+            from agent.tools.saprot_task.saprot.self_peft.peft_model import PeftModelForSequenceClassification
+
+            loaded.model.model = PeftModelForSequenceClassification.from_pretrained(
+                loaded.model.model, adapter_path, adapter_name=name, is_trainable=False)
+        else:
+            loaded.model.model.load_adapter(adapter_path, adapter_name=name, is_trainable=False)
+
+        loaded.model.model.to(self.device)
+        loaded.model.eval()
+        loaded.adapters[adapter_path] = name
+        loaded.adapter_mtimes[adapter_path] = mtime
+        print(f"Attached adapter {adapter_path}", flush=True)
+        return name
+
+    def detach(self, loaded: LoadedModel, adapter_path: str):
+        """
+        Remove a LoRA adapter and its copy of the classification head from a base model
+        """
+        name = loaded.adapters.pop(adapter_path)
+        loaded.adapter_mtimes.pop(adapter_path, None)
+        peft_model = loaded.model.model
+        peft_model.base_model.delete_adapter(name)
+        peft_model.peft_config.pop(name, None)
+        for module in peft_model.modules():
+            modules_to_save = getattr(module, "modules_to_save", None)
+            if isinstance(modules_to_save, torch.nn.ModuleDict) and name in modules_to_save:
+                del modules_to_save[name]
+
+        if self.device != "cpu":
+            torch.cuda.empty_cache()
+        print(f"Detached adapter {adapter_path}", flush=True)
+
+    def predict(self, body: dict) -> dict:
+        """
+        Handle a prediction request. Blocks until the batch containing the request is done
+        """
+        request = PredictRequest(body)
+        with self.condition:
+            self.queue.append(request)
+            self.condition.notify()
+
+        try:
+            request.context.wait(request.done)
+        finally:
+            # A request that is cancelled or timed out is never run
+            with self.condition:
+                if request in self.queue:
+                    self.queue.remove(request)
+
+        if request.error is not None:
+            raise RuntimeError(request.error)
+
+        return request.result
+
+    def detach_request(self, body: dict) -> dict:
+        """
+        Detach an adapter from every base model it is attached to, e.g. to free memory
+        """
+        num_detached = 0
+        with self.model_lock:
+            for loaded in self.models.values():
+                if body["lora_adaptor"] in loaded.adapters:
+                    self.detach(loaded, body["lora_adaptor"])
+                    num_detached += 1
+
+        return {"num_detached": num_detached}
+
+    def health(self, body: dict) -> dict:
+        with self.condition:
+            num_queued = len(self.queue)
+
+        with self.model_lock:
+            models = [{"model_py_path": group[0], "huggingface_path": group[1], "num_labels": group[2],
+                       "adapters": list(loaded.adapters)} for group, loaded in self.models.items()]
+
+        return {"status": "ok", "device": self.device, "num_queued": num_queued,
+                "num_predicted": self.num_predicted, "models": models}
+
+    def next_batch(self) -> list:
+        """
+        Take the oldest request and the queued requests of the same base model, up to the batch limits
+        """
+        with self.condition:
+            while not self.queue:
+                self.condition.wait()
+            num_queued = len(self.queue)
+
+        # Give concurrent requests a moment to arrive, so that they can share the batch
+        if num_queued < self.max_batch_size:
+            time.sleep(self.batch_wait)
+
+        with self.condition:
+            # The queued requests may have been cancelled in the meantime
+            if not self.queue:
+                return []
+
+            first = self.queue[0]
+            batch = [first]
+            if first.task in BATCHED_TASKS:
+                adapters = {first.adapter}
+                max_length = len(first.sa_seq) // 2 + 2
+                for request in self.queue[1:]:
+                    if len(batch) >= self.max_batch_size:
+                        break
+
+                    if request.group != first.group or request.task not in BATCHED_TASKS:
+                        continue
+
+                    # All adapters of a batch have to be attached at the same time
+                    if request.adapter not in adapters and len(adapters) >= self.max_adapters:
+                        continue
+
+                    length = max(max_length, len(request.sa_seq) // 2 + 2)
+                    if (len(batch) + 1) * length > self.max_tokens:
+                        continue
+
+                    batch.append(request)
+                    adapters.add(request.adapter)
+                    max_length = length
+
+            for request in batch:
+                self.queue.remove(request)
+
+        return batch
+
+    def forward(self, loaded: LoadedModel, inputs: dict, adapter_names: list):
+        """
+        Run a batch whose samples may use different adapters. PEFT models that support mixed batches run it in one
+        forward pass. Otherwise the batch is split by adapter
+        """
+        model = loaded.model
+        if not loaded.is_peft:
+            return model(inputs)
+
+        # Older PEFT versions silently ignore the per-sample adapter names
+        if loaded.mixed_batches is None and not hasattr(model.model.base_model, "_enable_peft_forward_hooks"):
+            loaded.mixed_batches = False
+
+        if loaded.mixed_batches is not False and len(set(adapter_names)) > 1:
+            try:
+                logits = model({**inputs, "adapter_names": adapter_names})
+                loaded.mixed_batches = True
+                return logits
+
+            except (TypeError, ValueError, AttributeError) as e:
+                print(f"Mixed adapter batches are not supported, splitting batches by adapter: {e}", flush=True)
+                loaded.mixed_batches = False
+
+        logits = [None] * len(adapter_names)
+        for name in dict.fromkeys(adapter_names):
+            indices = [i for i, adapter_name in enumerate(adapter_names) if adapter_name == name]
+            sub_inputs = {k: v[indices] for k, v in inputs.items()}
+            if name == BASE_ADAPTER:
+                with model.model.disable_adapter():
+                    sub_logits = model(sub_inputs)
+            else:
+                model.model.set_adapter(name)
+                sub_logits = model(sub_inputs)
+
+            for i, row in zip(indices, sub_logits):
+                logits[i] = row
+
+        return torch.stack(logits)
+
+    def run_batch(self, batch: list):
+        start = time.time()
+        first = batch[0]
+        try:
+            with self.model_lock, torch.no_grad():
+                loaded = self.get_model(first.group)
+                pinned = {request.adapter for request in batch}
+                adapter_names = [self.attach(loaded, request.adapter, pinned) if request.adapter is not None
+                                 else BASE_ADAPTER for request in batch]
+
+                if first.task in BATCHED_TASKS:
+                    results = self.run_sequences(loaded, batch, adapter_names)
+                else:
+                    results = [self.run_single(loaded, first, adapter_names[0])]
+
+        except Exception as e:
+            for request in batch:
+                request.error = str(e)
+                request.done.set()
+            return
+
+        elapsed = time.time() - start
+        for request, result in zip(batch, results):
+            result.update({
+                "batch_size": len(batch),
+                "queue_time_s": round(start - request.submit_time, 3),
+                "predict_time_s": round(elapsed, 3),
+            })
+            request.result = result
+            request.done.set()
+
+        self.num_predicted += len(batch)
+        print(f"Predicted {len(batch)} {first.task} requests with {len(set(adapter_names))} adapters "
+              f"in {elapsed:.2f} s", flush=True)
+
+    def run_sequences(self, loaded: LoadedModel, batch: list, adapter_names: list) -> list:
+        model = loaded.model
+        inputs = model.tokenizer([request.sa_seq for request in batch], return_tensors="pt", padding=True)
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        logits = self.forward(loaded, inputs, adapter_names).float().cpu()
+
+        return [format_prediction(request.task, row, len(request.sa_seq) // 2, request.body.get("label_dict"))
+                for request, row in zip(batch, logits)]
+
+    def run_single(self, loaded: LoadedModel, request: PredictRequest, adapter_name: str) -> dict:
+        """
+        Run a request of a task that is not batched
+        """
+        model = loaded.model
+        if loaded.is_peft and adapter_name != BASE_ADAPTER:
+            model.model.set_adapter(adapter_name)
+
+        body = request.body
+        if request.task == "mutation":
+            if body.get("mut_infos") is not None:
+                return {"pred": model.predict_muts(body["sa_seq"], body["mut_infos"])}
+            if body.get("scan_path") is not None:
+                return {"pred": run_mutation_scan(model, body["sa_seq"], body["scan_path"], body.get("top_k", 10),
+                                                  body.get("scan_batch_size"))}
+            if body.get("mut_info") is not None:
+                return {"pred": model.predict_mut(body["sa_seq"], body["mut_info"])}
+            return {"pred": model.predict_pos_prob(body["sa_seq"], body["mut_position"])}
+
+        if request.task in ["pair_classification", "pair_regression"]:
+            inputs = []
+            for sa_seq in [body["sa_seq1"], body["sa_seq2"]]:
+                tokens = model.tokenizer(sa_seq, return_tensors="pt")
+                inputs.append({k: v.to(self.device) for k, v in tokens.items()})
+
+            logits = model(*inputs)[0].float().cpu()
+            task = "classification" if request.task == "pair_classification" else "regression"
+            return format_prediction(task, logits.squeeze(-1) if task == "regression" else logits,
+                                     label_dict=body.get("label_dict"))
+
+        raise ValueError(f"Unsupported SaProt task: {request.task}")
+
+    def loop(self):
+        while True:
+            batch = self.next_batch()
+            if not batch:
+                continue
+
+            try:
+                self.run_batch(batch)
+            except Exception as e:
+                for request in batch:
+                    request.error = request.error or str(e)
+            finally:
+                # Every request of the batch gets an answer, even if the batch failed unexpectedly
+                for request in batch:
+                    request.done.set()
+
+
+def main(args):
+    service = SaProtService(args.device, args.max_models, args.max_adapters, args.max_batch_size, args.max_tokens,
+                            args.batch_wait)
+    routes = {
+        ("GET", "/health"): service.health,
+        ("POST", "/predict"): service.predict,
+        ("POST", "/detach"): service.detach_request,
+    }
+    serve(args.socket_path, routes, idle_timeout=args.idle_timeout)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Resident SaProt service on a Unix socket")
+    parser.add_argument("--socket_path", type=str, required=True, help="Path to the Unix socket")
+    parser.add_argument("--device", type=str, default="cuda:0", help="Device to run the models. Default: cuda:0")
+    parser.add_argument("--max_models", type=int, default=2, help="Maximum number of base models kept loaded")
+    parser.add_argument("--max_adapters", type=int, default=16,
+                        help="Maximum number of LoRA adapters attached to a base model")
+    parser.add_argument("--max_batch_size", type=int, default=32, help="Maximum number of sequences in a batch")
+    parser.add_argument("--max_tokens", type=int, default=16384, help="Maximum number of padded tokens in a batch")
+    parser.add_argument("--batch_wait", type=float, default=0.02,
+                        help="Seconds to wait for more requests before running a batch")
+    parser.add_argument("--idle_timeout", type=float, default=None,
+                        help="Exit after being idle for this many seconds")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    EXAMPLE:
+    python server.py    --socket_path /tmp/saprot.sock \
+                        --device "cuda:0" \
+                        --max_adapters 16
+    """
+    main(get_args())
@@ -6,13 +6,11 @@ ROOT_DIR = __file__.rsplit("/", 4)[0]
 if ROOT_DIR not in sys.path:
     sys.path.append(ROOT_DIR)
 
-import torch
 import datetime
 
 from agent.tools.saprot_tune.tune_caller import TuneCaller
 from agent.tools.register import register_tool
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 HUGGINGFACE_ROOT = "/home/public/huggingface/"
@@ -28,7 +26,7 @@ class TunePairRegressionCaller(TuneCaller):
         
         # Create save directory following the same pattern as other callers
         start_time = datetime.datetime.now()
-        timestamp = start_time.strftime("%Y%m%d_%H%M%S")
+        timestamp = self.run_id
         work_dir = f"{self.out_dir}/saprot_tune_pair_regression/{timestamp}"
         os.makedirs(work_dir, exist_ok=True)
         
@@ -100,6 +98,5 @@ if __name__ == "__main__":
     }
 
     for obs in caller.mp_run(**input_args):
-        os.system("clear")
         
-        print(obs)
\ No newline at end of file
+        print(obs, end="")
\ No newline at end of file
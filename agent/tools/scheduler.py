@@ -0,0 +1,249 @@
+import os
+import time
+import threading
+import subprocess
+import psutil
+
+
+# Environment variables that limit the threads of common numerical libraries
+THREAD_ENV_VARS = ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS"]
+
+
+def get_process_cpu_ids() -> list:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+
+    return list(range(os.cpu_count()))
+
+
+# CPU cores and visible GPUs of the agent process, read before any job is pinned. Forked workers inherit the values
+AGENT_CPU_IDS = get_process_cpu_ids()
+AGENT_VISIBLE_DEVICES = os.environ.get("CUDA_VISIBLE_DEVICES")
+
+
+def detect_gpus() -> list:
+    """
+    Detect the GPUs visible to the current process without initializing CUDA
+    Returns:
+        A list of GPU ids. Empty on a machine without GPUs
+    """
+    visible_devices = os.environ.get("CUDA_VISIBLE_DEVICES")
+    if visible_devices is not None:
+        return [int(gpu_id) for gpu_id in visible_devices.split(",") if gpu_id.strip().isdigit()]
+
+    try:
+        output = subprocess.run(["nvidia-smi", "--query-gpu=index", "--format=csv,noheader"],
+                                capture_output=True, text=True, timeout=10).stdout
+        return [int(line) for line in output.split() if line.isdigit()]
+
+    except (OSError, subprocess.SubprocessError):
+        return []
+
+
+class Allocation:
+    def __init__(self, scheduler, job_id: str, cpu_ids: list, memory_gb: float, gpu_ids: list):
+        """
+        Resources assigned to a job
+        Args:
+            scheduler: The scheduler that owns the resources
+
+            job_id: ID of the job
+
+            cpu_ids: CPU cores the job is pinned to. None if the job is not pinned and shares all cores
+
+            memory_gb: Reserved memory
+
+            gpu_ids: GPUs assigned to the job
+        """
+        self.scheduler = scheduler
+        self.job_id = job_id
+        self.cpu_ids = cpu_ids
+        self.memory_gb = memory_gb
+        self.gpu_ids = gpu_ids
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.scheduler.release(self)
+
+
+class ResourceScheduler:
+    def __init__(self, cpus: int = None, memory_gb: float = None, gpus: list = None, max_backfill_wait: float = 60,
+                 service_cpus: int = 0, service_gpus: list = None):
+        """
+        Shares the CPU cores, memory and GPUs of the machine between the jobs of all tools. Each tool declares the
+        resources of one job in the "resources" block of its config file. A job that asks for no CPU cores is not
+        pinned and shares all cores. A job starts only when its resources are free, and smaller jobs may start ahead
+        of a larger one until the larger one has waited "max_backfill_wait" seconds. Resident services, e.g. the
+        ESMFold service, are shared by all jobs and outlive them, so they are not scheduled. They run on the resources
+        reserved by "service_cpus" and "service_gpus", which jobs never get, or share all resources with the jobs if
+        nothing is reserved.
+        Args:
+            cpus: Number of CPU cores to schedule. Defaults to all cores available to the process
+
+            memory_gb: Memory to schedule. Defaults to the total memory of the machine
+
+            gpus: IDs of the GPUs to schedule. Defaults to all visible GPUs
+
+            max_backfill_wait: Seconds after which a waiting job blocks the jobs submitted after it
+
+            service_cpus: Number of CPU cores reserved for resident services. They are taken from the end of the
+                scheduled cores
+
+            service_gpus: IDs of the GPUs reserved for resident services
+        """
+        cpu_ids = get_process_cpu_ids()
+        cpu_ids = cpu_ids[:cpus] if cpus else cpu_ids
+        gpu_ids = gpus if gpus is not None else detect_gpus()
+
+        # At least one core is left to the jobs
+        service_cpus = min(service_cpus or 0, len(cpu_ids) - 1)
+        self.service_cpu_ids = cpu_ids[len(cpu_ids) - service_cpus:] if service_cpus > 0 else []
+        self.service_gpu_ids = [gpu_id for gpu_id in service_gpus or [] if gpu_id in gpu_ids]
+
+        self.cpu_ids = [cpu_id for cpu_id in cpu_ids if cpu_id not in self.service_cpu_ids]
+        self.memory_gb = memory_gb if memory_gb else psutil.virtual_memory().total / 1024 ** 3
+        self.gpu_ids = [gpu_id for gpu_id in gpu_ids if gpu_id not in self.service_gpu_ids]
+        self.max_backfill_wait = max_backfill_wait
+
+        self.lock = threading.Lock()
+        self.free_cpu_ids = list(self.cpu_ids)
+        self.free_memory_gb = self.memory_gb
+        self.free_gpu_ids = list(self.gpu_ids)
+        # Submit time of the jobs waiting for resources
+        self.waiting = {}
+
+    def normalize(self, request: dict) -> dict:
+        """
+        Fit a resource request to the capacity of the machine. GPU jobs fall back to the CPU on a machine without
+        enough GPUs
+        """
+        gpus = request.get("gpus", 0)
+        return {
+            "cpus": max(0, min(request.get("cpus", 0), len(self.cpu_ids))),
+            "memory_gb": min(request.get("memory_gb", 0), self.memory_gb),
+            "gpus": gpus if gpus <= len(self.gpu_ids) else 0,
+        }
+
+    def acquire(self, job_id: str, request: dict, submit_time: float, gpu_ids: list = None) -> Allocation:
+        """
+        Try to reserve the resources of a job
+        Args:
+            job_id: ID of the job
+
+            request: Resources of the job, with keys "cpus", "memory_gb" and "gpus". If "cpus" is 0, the job is not
+                pinned to any core
+
+            submit_time: Submit time of the job, used to order the waiting jobs
+
+            gpu_ids: If set, the job has to run on these GPUs
+
+        Returns:
+            The allocation, or None if the resources are not free yet
+        """
+        request = self.normalize(request)
+        with self.lock:
+            self.waiting.setdefault(job_id, submit_time)
+
+            # Keep the resources for a job that has waited too long
+            oldest_id = min(self.waiting, key=self.waiting.get)
+            if oldest_id != job_id and time.time() - self.waiting[oldest_id] > self.max_backfill_wait:
+                return None
+
+            if len(self.free_cpu_ids) < request["cpus"] or self.free_memory_gb < request["memory_gb"]:
+                return None
+
+            if request["gpus"]:
+                if gpu_ids is None:
+                    gpu_ids = self.free_gpu_ids[:request["gpus"]]
+                if len(gpu_ids) < request["gpus"] or not set(gpu_ids) <= set(self.free_gpu_ids):
+                    return None
+            else:
+                gpu_ids = []
+
+            cpu_ids = None
+            if request["cpus"]:
+                cpu_ids = self.free_cpu_ids[:request["cpus"]]
+                self.free_cpu_ids = self.free_cpu_ids[request["cpus"]:]
+            self.free_memory_gb -= request["memory_gb"]
+            self.free_gpu_ids = [gpu_id for gpu_id in self.free_gpu_ids if gpu_id not in gpu_ids]
+            del self.waiting[job_id]
+
+        return Allocation(self, job_id, cpu_ids, request["memory_gb"], gpu_ids)
+
+    def release(self, allocation: Allocation):
+        """
+        Return the resources of a finished job
+        """
+        with self.lock:
+            if allocation.cpu_ids is not None:
+                self.free_cpu_ids = sorted(self.free_cpu_ids + allocation.cpu_ids)
+            self.free_memory_gb += allocation.memory_gb
+            self.free_gpu_ids = sorted(self.free_gpu_ids + allocation.gpu_ids)
+
+    def discard(self, job_id: str):
+        """
+        Stop waiting for the resources of a job
+        """
+        with self.lock:
+            self.waiting.pop(job_id, None)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "cpus": len(self.cpu_ids),
+                "free_cpus": len(self.free_cpu_ids),
+                "memory_gb": round(self.memory_gb, 1),
+                "free_memory_gb": round(self.free_memory_gb, 1),
+                "gpus": list(self.gpu_ids),
+                "free_gpus": list(self.free_gpu_ids),
+                "num_waiting_jobs": len(self.waiting),
+                "service_cpus": len(self.service_cpu_ids),
+                "service_gpus": list(self.service_gpu_ids),
+            }
+
+
+def get_service_resources() -> tuple:
+    """
+    Get the resources of resident services. Without reserved resources, services use all CPU cores of the agent and
+    the GPUs visible to it
+    Returns:
+        The CPU cores, and the GPU ids or None for the GPUs visible to the agent
+    """
+    scheduler = _shared_scheduler
+    if scheduler is None:
+        return AGENT_CPU_IDS, None
+
+    cpu_ids = scheduler.service_cpu_ids if scheduler.service_cpu_ids else AGENT_CPU_IDS
+    gpu_ids = scheduler.service_gpu_ids if scheduler.service_gpu_ids else None
+    return cpu_ids, gpu_ids
+
+
+def apply_cpu_allocation(cpu_ids: list):
+    """
+    Limit the current process, and the commands it launches, to the given CPU cores
+    """
+    num_threads = str(len(cpu_ids))
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = num_threads
+
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpu_ids)
+
+
+# Scheduler shared by the tool managers of the process
+_shared_scheduler = None
+_shared_scheduler_lock = threading.Lock()
+
+
+def get_shared_scheduler(**kwargs) -> ResourceScheduler:
+    """
+    Get the scheduler shared by all tools of the process. It is created with the given arguments on the first call
+    """
+    global _shared_scheduler
+    with _shared_scheduler_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = ResourceScheduler(**kwargs)
+
+        return _shared_scheduler
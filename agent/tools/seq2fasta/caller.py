@@ -24,6 +24,7 @@ import datetime
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
+from agent.tools.seq2fasta.command import write_fasta
 
 
 BASE_DIR = os.path.dirname(__file__)
@@ -46,30 +47,18 @@ class Seq2Fasta(BaseTool):
         else:
             name = header.split()[0]
         
-        now = datetime.datetime.now()
-        now = now.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         save_dir = f"{self.out_dir}/seq2fasta/{now}"
         os.makedirs(save_dir, exist_ok=True)
         
-        cmd_args = {
-            "protein_sequence": protein_sequence,
-            "header": header, 
-            "save_path": f"{save_dir}/{name}.fasta",
-        }
-        
-        # Call the ESMFold model
-        cmd = f"{self.config['python']} {BASE_DIR}/command.py"
-        for k, v in cmd_args.items():
-            if isinstance(v, str):
-                v = shlex.quote(v)
-            cmd += f" --{k} {v}"
-        print(cmd)
-        
-        # Redirect the stdout and stderr to a log file
-        cmd += f" > {self.log_path} 2>&1"
+        # Writing a FASTA file is cheap, so it runs in-process instead of launching a new interpreter
+        save_path = f"{save_dir}/{name}.fasta"
         try:
-            os.system(cmd)
-            if not os.path.exists(f"{save_dir}/{name}.fasta"):
+            with open(self.log_path, "w") as w:
+                write_fasta(protein_sequence, header, save_path)
+                w.write(f"FASTA file saved to {save_path}\n")
+
+            if not os.path.exists(save_path):
                 return {"error": f"Failed to save FASTA file for {name}"}
                 
             return {"fasta_file": f"seq2fasta/{now}/{name}.fasta"}
@@ -88,6 +77,5 @@ if __name__ == '__main__':
     }
 
     for obs in caller.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
@@ -1,30 +1,41 @@
 import argparse
 
-def main():
-    parser = argparse.ArgumentParser(description='Convert protein sequence to FASTA format')
-    parser.add_argument('--protein_sequence', help='Input protein sequence')
-    parser.add_argument('--header',
-                       default=None,
-                       help='Custom header')
-    parser.add_argument('--save_path', help='Path to save the output FASTA file')
 
-    args = parser.parse_args()
+def write_fasta(protein_sequence: str, header: str = None, save_path: str = None):
+    """
+    Write a protein sequence to a FASTA file
+    Args:
+        protein_sequence: Input protein sequence
 
-    if args.header is None:
+        header: Custom header. Defaults to ">protein_sequence"
+
+        save_path: Path to save the output FASTA file
+    """
+    if header is None:
         # Generate default header with '>' prefix
         header = f">protein_sequence"
     else:
         # Ensure the header starts with '>'
-        if not args.header.startswith('>'):
-            header = '>' + args.header
-        else:
-            header = args.header
+        if not header.startswith('>'):
+            header = '>' + header
 
     # Output the FASTA formatted content
-    with open(args.save_path, 'w') as f:
+    with open(save_path, 'w') as f:
         f.write(f"{header}\n")
-        protein_sequence = args.protein_sequence.replace(" ", "").replace("\n", "")
+        protein_sequence = protein_sequence.replace(" ", "").replace("\n", "")
         f.write(f"{protein_sequence}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert protein sequence to FASTA format')
+    parser.add_argument('--protein_sequence', help='Input protein sequence')
+    parser.add_argument('--header',
+                       default=None,
+                       help='Custom header')
+    parser.add_argument('--save_path', help='Path to save the output FASTA file')
+
+    args = parser.parse_args()
+    write_fasta(args.protein_sequence, args.header, args.save_path)
     print(f"FASTA file saved to {args.save_path}")
 
 if __name__ == '__main__':
@@ -0,0 +1,368 @@
+import os
+import json
+import time
+import uuid
+import fcntl
+import socket
+import threading
+import subprocess
+import http.client
+import socketserver
+
+from http.server import BaseHTTPRequestHandler
+
+
+# Seconds a client waits for the response of a request, and a service for the result of a queued request. Same as
+# the tool timeout, so that no request outlives the job that sent it
+REQUEST_TIMEOUT = 18000
+
+# Seconds between two checks of a waiting request for cancellation
+CANCEL_POLL_INTERVAL = 1
+
+
+class ServiceError(Exception):
+    pass
+
+
+class RequestContext:
+    def __init__(self, request_id: str = None, timeout: float = None):
+        """
+        State of a request handled by a service
+        Args:
+            request_id: ID sent by the client, used to cancel the request
+
+            timeout: Seconds the client waits for the response. The service gives up on the request after that
+        """
+        self.request_id = request_id
+        self.deadline = time.time() + (timeout if timeout is not None else REQUEST_TIMEOUT)
+        self.cancelled = threading.Event()
+
+    def check(self):
+        """
+        Raise a ServiceError if the client cancelled the request or stopped waiting for it
+        """
+        if self.cancelled.is_set():
+            raise ServiceError("The request was cancelled")
+
+        if time.time() > self.deadline:
+            raise ServiceError("The request timed out")
+
+    def wait(self, done: threading.Event):
+        """
+        Wait for a queued request to be done. Raises a ServiceError if the client cancels the request or stops
+        waiting for it
+        """
+        while not done.wait(CANCEL_POLL_INTERVAL):
+            self.check()
+
+    def acquire(self, lock: threading.Lock):
+        """
+        Acquire a lock that requests hold while they run, e.g. a model on the GPU. Raises a ServiceError instead if
+        the client cancels the request or stops waiting for it, so that abandoned requests never start
+        """
+        while not lock.acquire(timeout=CANCEL_POLL_INTERVAL):
+            self.check()
+
+        try:
+            self.check()
+        except ServiceError:
+            lock.release()
+            raise
+
+
+# Context of the request handled by each thread of a service
+_request_contexts = threading.local()
+
+
+def current_request() -> RequestContext:
+    """
+    Get the context of the request handled by the current thread. Routes pass it to the threads that run the request
+    """
+    context = getattr(_request_contexts, "context", None)
+    return context if context is not None else RequestContext()
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float = None):
+        """
+        HTTP connection over a Unix socket
+        Args:
+            socket_path: Path to the socket of the service
+
+            timeout: Socket timeout in seconds. None waits forever
+        """
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def serve(socket_path: str, routes: dict, idle_timeout: float = None):
+    """
+    Serve json requests on a Unix socket until the service has been idle for "idle_timeout" seconds. Each request is
+    handled in its own thread. This module only uses the standard library, so services can run in the python
+    environment of their tool.
+    Args:
+        socket_path: Path to the socket
+
+        routes: Mapping from (method, path), e.g. ("POST", "/fold"), to a function that takes the json body of the
+            request and returns the json response. Exceptions are returned as {"error": message} with status 500.
+            Routes that queue their requests wait for them with the "current_request" context, so that the requests
+            can be cancelled with "POST /cancel"
+
+        idle_timeout: The service exits after being idle for this many seconds. None keeps it running
+    """
+    state = {"last_request": time.time(), "in_flight": 0}
+    lock = threading.Lock()
+    # Contexts of the requests being handled, by request id
+    contexts = {}
+
+    def cancel(body: dict) -> dict:
+        with lock:
+            context = contexts.get(body.get("request_id"))
+        if context is not None:
+            context.cancelled.set()
+
+        return {"cancelled": context is not None}
+
+    routes = {("POST", "/cancel"): cancel, **routes}
+
+    class Handler(BaseHTTPRequestHandler):
+        def handle_json(self, method: str):
+            route = routes.get((method, self.path))
+            if route is None:
+                self.send_json(404, {"error": f"Unknown endpoint: {method} {self.path}"})
+                return
+
+            timeout = self.headers.get("X-Request-Timeout")
+            context = RequestContext(self.headers.get("X-Request-Id"), float(timeout) if timeout else None)
+            _request_contexts.context = context
+            with lock:
+                state["in_flight"] += 1
+                if context.request_id is not None:
+                    contexts[context.request_id] = context
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length)) if length else {}
+                response, status = route(body), 200
+            except Exception as e:
+                response, status = {"error": str(e)}, 500
+            finally:
+                _request_contexts.context = None
+                with lock:
+                    state["in_flight"] -= 1
+                    state["last_request"] = time.time()
+                    contexts.pop(context.request_id, None)
+
+            self.send_json(status, response)
+
+        def send_json(self, status: int, response: dict):
+            data = json.dumps(response).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self.handle_json("GET")
+
+        def do_POST(self):
+            self.handle_json("POST")
+
+        # Unix sockets have no client address
+        def address_string(self):
+            return "local"
+
+        def log_message(self, format, *args):
+            pass
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+
+    server = UnixHTTPServer(socket_path, Handler)
+    os.chmod(socket_path, 0o600)
+
+    def watch_idle():
+        while True:
+            time.sleep(min(idle_timeout, 10))
+            with lock:
+                idle = state["in_flight"] == 0 and time.time() - state["last_request"] > idle_timeout
+            if idle:
+                server.shutdown()
+                return
+
+    if idle_timeout is not None:
+        threading.Thread(target=watch_idle, daemon=True).start()
+
+    print(f"Serving on {socket_path}", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+# Requests sent by this process and not answered yet: request id -> socket path
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def cancel_requests():
+    """
+    Cancel the requests that this process is waiting for, e.g. when its job is cancelled. Requests still queued in a
+    service are dropped, so that the service does not spend its time on results nobody waits for
+    """
+    with _in_flight_lock:
+        requests = list(_in_flight.items())
+
+    for request_id, socket_path in requests:
+        try:
+            ServiceClient(socket_path).request("POST", "/cancel", {"request_id": request_id}, timeout=2)
+        except (OSError, ServiceError, http.client.HTTPException, ValueError):
+            pass
+
+
+def service_environment() -> tuple:
+    """
+    Environment and CPU cores of a new service. A service is shared by all jobs and outlives the job that starts it,
+    so it must not inherit the thread limits, CPU cores and GPUs of that job. It runs on the resources the scheduler
+    reserves for services, or on all resources of the agent if none are reserved
+    Returns:
+        The environment variables and the CPU cores of the service
+    """
+    # Imported here, since services import this module in the python environment of their tool
+    from agent.tools.scheduler import THREAD_ENV_VARS, AGENT_VISIBLE_DEVICES, get_service_resources
+
+    cpu_ids, gpu_ids = get_service_resources()
+    env = dict(os.environ)
+    for name in THREAD_ENV_VARS:
+        env.pop(name, None)
+
+    visible_devices = AGENT_VISIBLE_DEVICES if gpu_ids is None else ",".join(str(gpu_id) for gpu_id in gpu_ids)
+    if visible_devices is None:
+        env.pop("CUDA_VISIBLE_DEVICES", None)
+    else:
+        env["CUDA_VISIBLE_DEVICES"] = visible_devices
+
+    return env, cpu_ids
+
+
+class ServiceClient:
+    def __init__(self, socket_path: str, start_cmd: list = None, log_path: str = None, start_timeout: float = 600,
+                 request_timeout: float = REQUEST_TIMEOUT):
+        """
+        Client of a service started with "serve". The service is started on the first request if it is not running,
+        and keeps running in its own session after the process that started it exits.
+        Args:
+            socket_path: Path to the socket of the service
+
+            start_cmd: Command that starts the service. If None, the service has to be started separately
+
+            log_path: File that receives the output of the service. Defaults to "{socket_path}.log"
+
+            start_timeout: Seconds to wait for the service to come up, e.g. while it loads its model
+
+            request_timeout: Default seconds to wait for the response of a request
+        """
+        self.socket_path = socket_path
+        self.start_cmd = start_cmd
+        self.log_path = log_path if log_path is not None else f"{socket_path}.log"
+        self.start_timeout = start_timeout
+        self.request_timeout = request_timeout
+
+    def request(self, method: str, path: str, payload: dict = None, timeout: float = None) -> dict:
+        """
+        Send a request to the service. The request is cancelled in the service by "cancel_requests"
+        Args:
+            method: "GET" or "POST"
+
+            path: Endpoint of the service
+
+            payload: Json body of the request
+
+            timeout: Seconds to wait for the response. Defaults to the request timeout of the client
+
+        Returns:
+            The json response
+        """
+        timeout = timeout if timeout is not None else self.request_timeout
+        request_id = uuid.uuid4().hex
+        headers = {
+            "Content-Type": "application/json",
+            "X-Request-Id": request_id,
+            "X-Request-Timeout": str(timeout),
+        }
+
+        # The service answers once it gives up on the request, so the socket waits a little longer
+        conn = UnixHTTPConnection(self.socket_path, timeout=timeout + 2 * CANCEL_POLL_INTERVAL)
+        with _in_flight_lock:
+            _in_flight[request_id] = self.socket_path
+        try:
+            body = json.dumps(payload).encode() if payload is not None else None
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = json.loads(response.read())
+        finally:
+            conn.close()
+            with _in_flight_lock:
+                _in_flight.pop(request_id, None)
+
+        if response.status != 200:
+            raise ServiceError(data.get("error", f"Request failed with status {response.status}"))
+
+        return data
+
+    def is_alive(self) -> bool:
+        try:
+            self.request("GET", "/health", timeout=5)
+            return True
+        except (OSError, ServiceError, http.client.HTTPException, ValueError):
+            return False
+
+    def ensure_started(self):
+        """
+        Start the service if it is not running and wait until it accepts requests
+        """
+        if self.is_alive():
+            return
+
+        if self.start_cmd is None:
+            raise ServiceError(f"No service is running on {self.socket_path}")
+
+        # Only one process starts the service. The others wait for the lock and find it running
+        os.makedirs(os.path.dirname(os.path.abspath(self.socket_path)), exist_ok=True)
+        with open(f"{self.socket_path}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if self.is_alive():
+                return
+
+            env, cpu_ids = service_environment()
+            with open(self.log_path, "a") as log:
+                process = subprocess.Popen(self.start_cmd, stdout=log, stderr=subprocess.STDOUT, env=env,
+                                           start_new_session=True)
+            try:
+                os.sched_setaffinity(process.pid, cpu_ids)
+            except (AttributeError, ProcessLookupError):
+                # No affinity on this platform, or the service exited right away
+                pass
+
+            deadline = time.time() + self.start_timeout
+            while time.time() < deadline:
+                if self.is_alive():
+                    return
+
+                if process.poll() is not None:
+                    raise ServiceError(f"The service exited during start-up. See {self.log_path}")
+                time.sleep(0.5)
+
+            raise ServiceError(f"The service did not start within {self.start_timeout} s. See {self.log_path}")
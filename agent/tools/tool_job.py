@@ -0,0 +1,111 @@
+import time
+import uuid
+import asyncio
+
+
+class JOB_STATUS:
+    PENDING = "pending"
+    RUNNING = "running"
+    FINISHED = "finished"
+    CANCELLED = "cancelled"
+
+
+class ToolJob:
+    def __init__(self, tool_args: dict, method: str = "run"):
+        """
+        One invocation of a tool. Each job has its own id, log file, results and run directory, so that several
+        jobs of the same tool can run at the same time
+        Args:
+            tool_args: Arguments for the tool
+
+            method: Method of the tool that runs the job in the worker. "run_batch" runs a list of inputs at once
+        """
+        self.job_id = uuid.uuid4().hex[:12]
+        self.tool_args = tool_args
+        self.method = method
+        self.status = JOB_STATUS.PENDING
+
+        # The worker running the job and the resources reserved for it
+        self.worker = None
+        self.allocation = None
+        # Whether the job has been resubmitted after its worker exited before picking it up
+        self.resubmitted = False
+
+        self.log_path = None
+        self.results = {}
+        # (index, results) of the inputs of a batch job that have finished and not been consumed yet
+        self.item_results = []
+
+        # Key of the job in the result cache, and whether the results were loaded from it
+        self.cache_key = None
+        self.cached = False
+
+        self.submit_time = time.time()
+        self.start_time = None
+        self.end_time = None
+
+    @property
+    def is_done(self) -> bool:
+        return self.status in (JOB_STATUS.FINISHED, JOB_STATUS.CANCELLED)
+
+    @property
+    def queue_wait(self) -> float:
+        """
+        Seconds the job waited for a worker and its resources
+        """
+        start_time = self.start_time if self.start_time is not None else time.time()
+        return start_time - self.submit_time
+
+    def release(self):
+        """
+        Return the resources reserved for the job
+        """
+        if self.allocation is not None:
+            self.allocation.release()
+            self.allocation = None
+
+    def receive(self, timeout: float = 0):
+        """
+        Receive the messages of this job from the worker
+        Args:
+            timeout: Seconds to wait for the first message
+        """
+        if self.worker is None:
+            return
+
+        for job_id, key, value in self.worker.channel.receive(timeout):
+            # Drop messages of abandoned jobs that ran on the same worker
+            if job_id != self.job_id:
+                continue
+
+            if key == "log_path":
+                self.log_path = value
+            elif key == "item_results":
+                self.item_results.append(value)
+            elif key == "results":
+                self.finish(value)
+
+    async def receive_async(self, timeout: float = 0):
+        """
+        Receive the messages of this job from the worker without blocking the event loop
+        Args:
+            timeout: Seconds to wait for the first message
+        """
+        if self.worker is None:
+            await asyncio.sleep(timeout)
+            return
+
+        await self.worker.channel.wait_async(timeout)
+        self.receive()
+
+    def finish(self, results: dict, status: str = JOB_STATUS.FINISHED):
+        """
+        Mark the job as done and release its worker
+        """
+        self.results = results
+        self.status = status
+        self.end_time = time.time()
+        self.release()
+
+        if self.worker is not None and self.worker.job is self:
+            self.worker.job = None
@@ -10,9 +10,18 @@ if ROOT_DIR not in sys.path:
 
 import os
 import yaml
-from sentence_transformers import SentenceTransformer, util
+import asyncio
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
 from easydict import EasyDict
 from agent.tools.register import get_tools
+from agent.tools.tool_registry import ToolSpec, load_tool_spec
+from agent.tools.result_cache import ResultCache
+from agent.tools.embedding_store import EmbeddingStore
+from agent.tools.scheduler import get_shared_scheduler
+from agent.tools.worker_pool import DEFAULT_IDLE_TIMEOUT
+from agent.tools.type_check import configure_identifier_check
 
 
 BASE_DIR = os.path.dirname(__file__)
@@ -22,14 +31,39 @@ import sys
 import importlib
 
 
+class LazyToolDict(Mapping):
+    def __init__(self, tool_manager):
+        """
+        Mapping from tool names to tool instances. A tool is imported and instantiated on its first access
+        Args:
+            tool_manager: The tool manager that owns the tools
+        """
+        self.tool_manager = tool_manager
+
+    def __getitem__(self, tool_name: str):
+        return self.tool_manager.load_tool(tool_name)
+
+    def __iter__(self):
+        return iter(self.tool_manager.specs)
+
+    def __len__(self):
+        return len(self.tool_manager.specs)
+
+    def __contains__(self, tool_name):
+        return tool_name in self.tool_manager.specs
+
+
 class ToolManager:
-    def __init__(self, out_dir: str = None, enable_quick_run: bool = False):
+    def __init__(self, out_dir: str = None, enable_quick_run: bool = False, prewarm: bool = True):
         """
-        Initialize the tool manager
+        Initialize the tool manager. The tool catalogue is built from the config files of the tools, and a tool
+        is only imported and instantiated on its first use
         Args:
             out_dir: Output directory
             
             enable_quick_run: If True, the tool will run in quick mode if the config file has an example output
+
+            prewarm: If True, load the tools listed in "prewarm_tools" of the config file in the background
         """
         config_path = f"{BASE_DIR}/tool_manager_config.yaml"
         
@@ -37,48 +71,160 @@ class ToolManager:
         with open(config_path, "r") as f:
             self.config = EasyDict(yaml.safe_load(f))
         
-        # Load all available tools
+        self.out_dir = out_dir
+        self.enable_quick_run = enable_quick_run
+
+        # Results of identical calls are reused from a persistent cache
+        cache_config = self.config.get("result_cache", {})
+        self.result_cache = None
+        if cache_config.get("enabled", False):
+            self.result_cache = ResultCache(f"{ROOT_DIR}/{cache_config.cache_dir}", cache_config.get("max_size_gb", 20))
+
+        # Jobs of all tool managers in the process share the CPU cores, memory and GPUs of the machine
+        scheduler_config = self.config.get("scheduler", {})
+        self.scheduler = None
+        if scheduler_config.get("enabled", False):
+            self.scheduler = get_shared_scheduler(
+                cpus=scheduler_config.get("cpus"),
+                memory_gb=scheduler_config.get("memory_gb"),
+                gpus=scheduler_config.get("gpus"),
+                max_backfill_wait=scheduler_config.get("max_backfill_wait", 60),
+                service_cpus=scheduler_config.get("service_cpus", 0),
+                service_gpus=scheduler_config.get("service_gpus"),
+            )
+
+        index_config = self.config.get("identifier_index", {})
+        if index_config:
+            configure_identifier_check(
+                index_dir=f"{ROOT_DIR}/{index_config.index_dir}",
+                network_fallback=index_config.get("network_fallback", False),
+                refresh_days=index_config.get("refresh_days"),
+            )
+
+        # Tools run in persistent workers that keep their imports and models resident between calls
+        worker_config = self.config.get("persistent_worker", {})
+        self.tool_kwargs = {
+            "use_worker": worker_config.get("enabled", True),
+            "worker_idle_timeout": worker_config.get("idle_timeout", DEFAULT_IDLE_TIMEOUT),
+            "max_concurrency": worker_config.get("max_concurrency", 1),
+            "result_cache": self.result_cache,
+            "scheduler": self.scheduler,
+        }
+
+        self.lock = threading.RLock()
+        self.specs = {}
+        self.loaded_tools = {}
+        self.tools = LazyToolDict(self)
+        # Tool name of each submitted job
+        self.job_tools = {}
+        # Submitted jobs of each owner, e.g. of a chat session, so that stopping one chat only cancels its own jobs
+        self.owner_jobs = {}
+
+        # Build the catalogue of all available tools
         for tool_path in self.config.tools:
-            module_name = f"agent.tools.{tool_path}"
-            if module_name in sys.modules:
-                del sys.modules[module_name]
-            cmd = f"import {module_name}"
-            exec(cmd)
-        
-        self.tools = {}
-        # Instantiate all tools
-        for tool in get_tools().values():
-            obj = tool(enable_quick_run=enable_quick_run)
-            if out_dir:
-                obj.set_out_dir(out_dir)
+            spec = load_tool_spec(tool_path)
+            if spec is not None:
+                self.specs[spec.tool_name] = spec
+            else:
+                # The tool cannot be resolved from its config file. Import and instantiate it now
+                self.load_module(tool_path)
 
-            try:
-                tool_name = obj.config.document.tool_name
-            except Exception as e:
-                print(f"Error: {e}")
-                print(obj)
-                raise
-            self.tools[tool_name] = obj
+        self.prewarm_thread = None
+        if prewarm and self.config.get("prewarm_tools"):
+            self.prewarm_thread = threading.Thread(target=self.prewarm, args=(self.config.prewarm_tools,), daemon=True)
+            self.prewarm_thread.start()
     
     def __del__(self):
         """
         Destructor
         """
-        for tool in self.tools.values():
+        for tool in self.loaded_tools.values():
             tool.terminate()
+            tool.close_workers()
             del tool
         
         # if self.model exists, delete it
         if hasattr(self, "model"):
             del self.model
+
+    def init_tool(self, tool_cls):
+        """
+        Instantiate a tool with the settings of the tool manager
+        Args:
+            tool_cls: Class of the tool
+        """
+        obj = tool_cls(enable_quick_run=self.enable_quick_run, **self.tool_kwargs)
+        if self.out_dir:
+            obj.set_out_dir(self.out_dir)
+
+        return obj
+
+    def load_module(self, tool_path: str):
+        """
+        Import a caller module and instantiate all tools registered in it
+        Args:
+            tool_path: Caller module relative to "agent.tools", e.g. "esmfold.caller"
+        """
+        module_name = f"agent.tools.{tool_path}"
+        importlib.import_module(module_name)
+
+        for tool_cls in get_tools().values():
+            if tool_cls.__module__ != module_name:
+                continue
+
+            obj = self.init_tool(tool_cls)
+            tool_name = obj.config.document.tool_name
+            self.specs[tool_name] = ToolSpec(module_name, tool_cls.__name__, tool_name, obj.config)
+            self.loaded_tools[tool_name] = obj
+
+    def load_tool(self, tool_name: str):
+        """
+        Get a tool instance, importing and instantiating the tool on its first use
+        Args:
+            tool_name: Name of the tool
+        """
+        with self.lock:
+            if tool_name not in self.loaded_tools:
+                self.loaded_tools[tool_name] = self.init_tool(self.specs[tool_name].load_class())
+
+            return self.loaded_tools[tool_name]
+
+    def prewarm(self, tool_names: list):
+        """
+        Load tools ahead of their first use
+        Args:
+            tool_names: Names of the tools to load
+        """
+        for tool_name in tool_names:
+            try:
+                self.load_tool(tool_name)
+            except Exception as e:
+                print(f"Failed to prewarm {tool_name}: {e}")
+
+    def wait_prewarm(self):
+        """
+        Wait for the background prewarm to finish. Tool processes are forked, so they should not be started while
+        another thread is importing modules
+        """
+        if self.prewarm_thread is not None:
+            self.prewarm_thread.join()
+            self.prewarm_thread = None
+
+    def terminate(self):
+        """
+        Terminate the running processes of all loaded tools
+        """
+        for tool in self.loaded_tools.values():
+            tool.terminate()
     
     def set_out_dir(self, out_dir: str):
         """
         Set the output directory
         """
-        for tool in self.tools.values():
-            tool.set_out_dir(out_dir)
-        self.out_dir = out_dir
+        with self.lock:
+            for tool in self.loaded_tools.values():
+                tool.set_out_dir(out_dir)
+            self.out_dir = out_dir
     
     def generate_tool_priority(self):
         return json.dumps(self.config.relationship, indent=4)
@@ -89,7 +235,7 @@ class ToolManager:
         Args:
             tool_name: Name of the tool
         """
-        return self.tools[tool_name].get_argument_document()
+        return self.specs[tool_name].get_argument_document()
 
     def generate_return_document(self, selected_tools: list = None):
         """
@@ -97,7 +243,7 @@ class ToolManager:
         """
         document = ""
         for toolname in selected_tools:
-            tool = self.get_tool(toolname)
+            tool = self.specs[toolname]
             return_dict = {
                 "tool_name": tool.config.document.tool_name,
                 "tool_description": tool.config.document.tool_description,
@@ -114,7 +260,7 @@ class ToolManager:
         """
         document = ""
         for toolname in selected_tools:
-            tool = self.get_tool(toolname)
+            tool = self.specs[toolname]
             document += tool.get_document()
             document += "\n\n"
         
@@ -126,7 +272,7 @@ class ToolManager:
         """
         brief_docs = ""
         for toolname in selected_tools:
-            tool = self.get_tool(toolname)
+            tool = self.specs[toolname]
             brief_docs += f"{toolname}: {tool.config.document.tool_description}\n"
         return brief_docs
     
@@ -148,7 +294,114 @@ class ToolManager:
             tool_name: Name of the tool
             tool_args: Arguments for the tool
         """
+        self.wait_prewarm()
         yield from self.tools[tool_name].mp_run(**tool_args)
+
+    async def async_call(self, tool_name: str, tool_args: dict):
+        """
+        Async counterpart of "call". Observations are yielded from an async iterator, so a server can run many tool
+        calls in one event loop without a thread per request
+        Args:
+            tool_name: Name of the tool
+            tool_args: Arguments for the tool
+        """
+        await asyncio.to_thread(self.wait_prewarm)
+        async for obs in self.tools[tool_name].async_mp_run(**tool_args):
+            yield obs
+
+    def call_batch(self, tool_name: str, tool_args_list: list, max_in_flight: int = None):
+        """
+        Call a tool on a list of inputs. Tools with a native batch implementation get all inputs at once, other
+        tools run one job per input with a bounded number of jobs in flight
+        Args:
+            tool_name: Name of the tool
+            tool_args_list: Arguments for each input
+            max_in_flight: Maximum number of jobs submitted at the same time. Defaults to twice the concurrency
+                of the tool
+
+        Returns:
+            A generator of (index, results) tuples in completion order, where index is the position of the input
+            in tool_args_list
+        """
+        self.wait_prewarm()
+        yield from self.tools[tool_name].mp_run_batch(tool_args_list, max_in_flight)
+
+    def submit(self, tool_name: str, tool_args: dict, owner: str = None) -> str:
+        """
+        Submit a job of a tool. Several jobs of the same tool can run at the same time
+        Args:
+            tool_name: Name of the tool
+            tool_args: Arguments for the tool
+            owner: Owner of the job, e.g. a chat session. "cancel_owner" cancels the unfinished jobs of an owner
+
+        Returns:
+            The job id
+        """
+        self.wait_prewarm()
+        job_id = self.tools[tool_name].submit(**tool_args)
+        with self.lock:
+            self.job_tools[job_id] = tool_name
+            if owner is not None:
+                # Only unfinished jobs have to be remembered
+                owned = [owned_id for owned_id in self.owner_jobs.get(owner, []) if not self.is_done(owned_id)]
+                self.owner_jobs[owner] = owned + [job_id]
+
+        return job_id
+
+    def stream(self, job_id: str):
+        """
+        Stream the running log of a job until it finishes
+        Args:
+            job_id: ID of the job
+        """
+        yield from self.tools[self.job_tools[job_id]].stream(job_id)
+
+    async def async_stream(self, job_id: str):
+        """
+        Async counterpart of "stream"
+        Args:
+            job_id: ID of the job
+        """
+        async for obs in self.tools[self.job_tools[job_id]].async_stream(job_id):
+            yield obs
+
+    def get_job(self, job_id: str):
+        """
+        Get a job by id
+        Args:
+            job_id: ID of the job
+        """
+        return self.tools[self.job_tools[job_id]].get_job(job_id)
+
+    def cancel(self, job_id: str):
+        """
+        Cancel a job
+        Args:
+            job_id: ID of the job
+        """
+        self.tools[self.job_tools[job_id]].cancel(job_id)
+
+    def cancel_owner(self, owner: str):
+        """
+        Cancel the unfinished jobs of an owner. Jobs of other owners keep running
+        Args:
+            owner: Owner given to "submit"
+        """
+        with self.lock:
+            job_ids = self.owner_jobs.pop(owner, [])
+
+        for job_id in job_ids:
+            if not self.is_done(job_id):
+                self.cancel(job_id)
+
+    def is_done(self, job_id: str) -> bool:
+        """
+        Check if a job has finished. Old finished jobs are dropped by their tool and count as finished
+        Args:
+            job_id: ID of the job
+        """
+        tool = self.tools[self.job_tools[job_id]]
+        return job_id not in tool.jobs or tool.get_job(job_id).is_done
     
     def quick_call(self, tool_name: str, tool_args: dict):
         """
@@ -167,13 +420,32 @@ class ToolManager:
         """
         return self.tools[tool_name]
     
-    def get_result(self, tool_name: str):
+    def get_cache_stats(self) -> dict:
+        """
+        Get the hit and miss counts of the result cache
+        """
+        if self.result_cache is None:
+            return {}
+
+        return self.result_cache.get_stats()
+
+    def get_scheduler_stats(self) -> dict:
+        """
+        Get the free resources and the number of jobs waiting for them
+        """
+        if self.scheduler is None:
+            return {}
+
+        return self.scheduler.get_stats()
+
+    def get_result(self, tool_name: str, job_id: str = None):
         """
         Get the result of a tool
         Args:
             tool_name: Name of the tool
+            job_id: ID of the job. Defaults to the last job started by "call"
         """
-        return self.tools[tool_name].get_result()
+        return self.tools[tool_name].get_result(job_id)
 
     def standarize_json(self, doc_str: str):
         doc = json.loads(doc_str)
@@ -194,19 +466,68 @@ class ToolManager:
 
     def initialize_retriever(self):
         """
-        Initialize the retriever
+        Initialize the retriever. Embeddings of the tool documents are loaded from a persistent store, so only added or
+        changed tools are encoded
         """
         self.corpus = {}
         self.corpus2tool = {}
-        for tool in self.tools.values():
+        for tool in self.specs.values():
             standard_doc = self.standarize_json(tool.get_document())
             self.corpus[tool.config.document.tool_name] = standard_doc
             self.corpus2tool[standard_doc] = tool.config.document.tool_name
         corpus_ids = list(self.corpus.keys())
         self.corpus = [self.corpus[cid] for cid in corpus_ids]
-        self.model = SentenceTransformer(f"{ROOT_DIR}/{self.config.embedding_model_path}")
-        self.corpus_embeddings = self.model.encode(self.corpus, convert_to_tensor=True)
-        
+
+        retriever_config = self.config.get("retriever", {})
+        if getattr(self, "embedding_store", None) is None:
+            self.embedding_store = EmbeddingStore(
+                f"{ROOT_DIR}/{retriever_config.get('store_dir', 'outputs/retriever_cache')}",
+                self.config.embedding_model_path,
+                model_path=f"{ROOT_DIR}/{self.config.embedding_model_path}"
+            )
+            # Query embeddings in LRU order
+            self.query_cache = OrderedDict()
+            self.query_cache_size = retriever_config.get("query_cache_size", 1024)
+
+        import torch
+        embeddings = self.embedding_store.get_embeddings(self.corpus, self.encode)
+        self.corpus_embeddings = torch.from_numpy(embeddings)
+
+    def encode(self, texts: list):
+        """
+        Encode texts with the sentence encoder, which is loaded on first use
+        Args:
+            texts: Texts to encode
+        """
+        with self.lock:
+            if not hasattr(self, "model"):
+                # The sentence encoder is heavy, so it is only imported when texts have to be encoded
+                from sentence_transformers import SentenceTransformer
+                self.model = SentenceTransformer(f"{ROOT_DIR}/{self.config.embedding_model_path}")
+
+        return self.model.encode(texts, convert_to_numpy=True)
+
+    def encode_query(self, query: str):
+        """
+        Get the embedding of a query from the LRU cache, encoding it on a miss
+        Args:
+            query: Query
+        """
+        import torch
+
+        with self.lock:
+            if query in self.query_cache:
+                self.query_cache.move_to_end(query)
+                return self.query_cache[query]
+
+        embedding = torch.from_numpy(self.encode([query])[0])
+        with self.lock:
+            self.query_cache[query] = embedding
+            while len(self.query_cache) > self.query_cache_size:
+                self.query_cache.popitem(last=False)
+
+        return embedding
+
     def retrieve(self, query, top_k=10):
         """
         Retrieve tools
@@ -214,10 +535,12 @@ class ToolManager:
             query: Query
             top_k: Number of tools to retrieve
         """
-        if not hasattr(self, "model"):
+        if not hasattr(self, "corpus_embeddings"):
             self.initialize_retriever()
         
-        query_embedding = self.model.encode(query, convert_to_tensor=True)
+        from sentence_transformers import util
+
+        query_embedding = self.encode_query(query)
         hits = util.semantic_search(
             query_embedding,
             self.corpus_embeddings,
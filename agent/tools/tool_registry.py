@@ -0,0 +1,145 @@
+import os
+import ast
+import json
+import yaml
+import importlib
+
+from easydict import EasyDict
+
+
+BASE_DIR = os.path.dirname(__file__)
+
+# The C loader parses the config files several times faster when libyaml is available
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class ToolSpec:
+    def __init__(self, module_name: str, class_name: str, tool_name: str, config: EasyDict):
+        """
+        Catalogue entry of a tool. It is built from the caller source and the "config.yaml" of the tool without
+        importing the caller module, so the documents of all tools are available before any tool is loaded.
+        Args:
+            module_name: Full name of the caller module, e.g. "agent.tools.esmfold.caller"
+
+            class_name: Name of the tool class in the caller module
+
+            tool_name: Name of the tool
+
+            config: Config of the tool, with the document narrowed to this tool
+        """
+        self.module_name = module_name
+        self.class_name = class_name
+        self.tool_name = tool_name
+        self.config = config
+
+    def get_document(self):
+        """
+        Get the tool description document
+        """
+        return json.dumps(self.config.document, indent=4)
+
+    def get_argument_document(self):
+        args = {
+            "required_parameters": self.config.document["required_parameters"],
+            "optional_parameters": self.config.document["optional_parameters"]
+        }
+        return json.dumps(args)
+
+    def load_class(self):
+        """
+        Import the caller module and return the tool class
+        """
+        module = importlib.import_module(self.module_name)
+        return getattr(module, self.class_name)
+
+
+def _find_tool_class(tree: ast.Module) -> str:
+    """
+    Find the class decorated with "register_tool"
+    """
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            for decorator in node.decorator_list:
+                if isinstance(decorator, ast.Name) and decorator.id == "register_tool":
+                    return node.name
+
+
+def _is_tool_name_target(node: ast.AST) -> bool:
+    """
+    Check whether the node is "tool_name", "self.tool_name" or "doc['tool_name']"
+    """
+    if isinstance(node, ast.Name):
+        return node.id == "tool_name"
+
+    if isinstance(node, ast.Attribute):
+        return node.attr == "tool_name"
+
+    if isinstance(node, ast.Subscript):
+        return isinstance(node.slice, ast.Constant) and node.slice.value == "tool_name"
+
+    return False
+
+
+def _find_tool_name(tree: ast.Module, documented_names: set) -> str:
+    """
+    Find the tool name used by a caller whose config documents several tools. The name is the string assigned to
+    "tool_name", compared with "doc['tool_name']" or passed to "super().__init__"
+    """
+    candidates = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and any(_is_tool_name_target(target) for target in node.targets):
+            values = [node.value]
+
+        elif isinstance(node, ast.Compare) and _is_tool_name_target(node.left):
+            values = node.comparators
+
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == "__init__":
+            values = node.args[:1]
+
+        else:
+            continue
+
+        for value in values:
+            if isinstance(value, ast.Constant) and value.value in documented_names:
+                candidates.add(value.value)
+
+    if len(candidates) == 1:
+        return candidates.pop()
+
+
+def load_tool_spec(module_path: str) -> ToolSpec:
+    """
+    Build the catalogue entry of a tool from its caller source and config file
+    Args:
+        module_path: Caller module relative to "agent.tools", e.g. "esmfold.caller"
+
+    Returns:
+        The tool spec, or None if the tool cannot be resolved without importing the caller module
+    """
+    caller_path = os.path.join(BASE_DIR, *module_path.split(".")) + ".py"
+    config_path = os.path.join(os.path.dirname(caller_path), "config.yaml")
+    if not os.path.exists(config_path):
+        return None
+
+    with open(caller_path, "r", encoding="utf-8") as r:
+        tree = ast.parse(r.read())
+
+    class_name = _find_tool_class(tree)
+    if class_name is None:
+        return None
+
+    with open(config_path, "r", encoding="utf-8") as r:
+        config = yaml.load(r, Loader=YamlLoader)
+
+    document = config["document"]
+    if isinstance(document, list):
+        tool_name = _find_tool_name(tree, {doc["tool_name"] for doc in document})
+        if tool_name is None:
+            return None
+
+        config["document"] = next(doc for doc in document if doc["tool_name"] == tool_name)
+
+    else:
+        tool_name = document["tool_name"]
+
+    return ToolSpec(f"agent.tools.{module_path}", class_name, tool_name, EasyDict(config))
@@ -1,8 +1,41 @@
 import os
 import re
+import time
+import threading
+import functools
 
-from rdkit import Chem
-import requests
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from agent.tools.identifier_index import IdentifierIndex
+
+
+ROOT_DIR = __file__.rsplit("/", 3)[0]
+
+# Identifier types validated against the local identifier index
+IDENTIFIER_TYPES = {"PDB_ID", "UNIPROT_ID"}
+
+# Number of identifier checks whose results are kept in memory
+IDENTIFIER_CACHE_SIZE = 65536
+
+# Number of parallel requests when the network fallback checks many identifiers
+NETWORK_CHECK_THREADS = 8
+
+# A PDB ID missing from the index downloads the entry list again if the list is older than this many seconds
+MIN_REFRESH_INTERVAL = 3600
+
+_identifier_index = IdentifierIndex(f"{ROOT_DIR}/modelhub/identifier_index")
+# If True, identifiers missing from the local index are checked online
+_network_fallback = False
+# Maximum age of the PDB entry list in days. None disables the refresh
+_refresh_days = None
+_refresh_lock = threading.Lock()
+_refresh_thread = None
+_schedule_thread = None
+_last_refresh_time = 0
+
+# Definitive results of identifier checks in least recently used order: (detailed_type, value) -> bool
+_identifier_cache = OrderedDict()
+_identifier_cache_lock = threading.Lock()
 
 
 aa_set = {"A", "C", "D", "E", "F", "G", "H", "I", "K", "L", "M", "N", "P", "Q", "R", "S", "T", "U", "V", "W", "Y"}
@@ -41,6 +74,215 @@ uniprot_subsection = {
 }
 
 
+def configure_identifier_check(index_dir: str = None, network_fallback: bool = False, refresh_days: float = None):
+    """
+    Configure how identifiers such as PDB IDs and UniProt accessions are validated
+    Args:
+        index_dir: Directory of the local identifier index. See IdentifierIndex for its files
+
+        network_fallback: If True, identifiers that cannot be confirmed by the local index are checked online
+
+        refresh_days: If set, the PDB entry list is downloaded again in the background whenever it is older than
+            this, and when a PDB ID is missing from a list older than MIN_REFRESH_INTERVAL
+    """
+    global _identifier_index, _network_fallback, _refresh_days, _schedule_thread
+    if index_dir is not None:
+        _identifier_index = IdentifierIndex(index_dir)
+    _network_fallback = network_fallback
+    _refresh_days = refresh_days
+    clear_identifier_cache()
+
+    with _refresh_lock:
+        if refresh_days is not None and (_schedule_thread is None or not _schedule_thread.is_alive()):
+            _schedule_thread = threading.Thread(target=refresh_periodically, daemon=True)
+            _schedule_thread.start()
+
+
+def clear_identifier_cache():
+    with _identifier_cache_lock:
+        _identifier_cache.clear()
+
+
+def refresh_periodically():
+    """
+    Keep the PDB entry list younger than the configured age. Stops when the refresh is disabled
+    """
+    while _refresh_days is not None:
+        if _identifier_index.is_stale(_refresh_days):
+            start_refresh()
+
+        time.sleep(min(_refresh_days * 86400, MIN_REFRESH_INTERVAL))
+
+
+def start_refresh():
+    """
+    Download the PDB entry list in the background, unless it is being downloaded already or the last attempt was
+    less than MIN_REFRESH_INTERVAL ago
+    """
+    global _refresh_thread, _last_refresh_time
+    with _refresh_lock:
+        if _refresh_thread is not None and _refresh_thread.is_alive():
+            return
+
+        if time.time() - _last_refresh_time < MIN_REFRESH_INTERVAL:
+            return
+
+        _last_refresh_time = time.time()
+        _refresh_thread = threading.Thread(target=refresh_identifier_index, daemon=True)
+        _refresh_thread.start()
+
+
+def refresh_identifier_index():
+    """
+    Download the PDB entry list and drop the cached results, which may be outdated
+    """
+    try:
+        _identifier_index.refresh_pdb()
+    except Exception as e:
+        print(f"Failed to refresh the PDB entry list: {e}")
+        return
+
+    clear_identifier_cache()
+
+
+def refresh_on_miss():
+    """
+    Refresh the PDB entry list after a PDB ID was not found in it, since the ID may have been released after the
+    list was downloaded. Recent lists are kept
+    """
+    if _refresh_days is not None and _identifier_index.is_stale(MIN_REFRESH_INTERVAL / 86400):
+        start_refresh()
+
+
+def check_identifier_online(detailed_type: str, value: str):
+    """
+    Check whether an identifier exists by requesting its entry
+    Returns:
+        True or False, or None if the request failed and the identifier could not be checked
+    """
+    import requests
+
+    if detailed_type == "PDB_ID":
+        url = f"https://files.rcsb.org/download/{value}.cif"
+    else:
+        url = f"https://rest.uniprot.org/uniprotkb/{value}.fasta"
+
+    try:
+        response = requests.head(url, timeout=30)
+    except Exception:
+        return None
+
+    if response.status_code in [200, 302, 303, 307]:
+        return True
+
+    if response.status_code in [400, 404, 410]:
+        return False
+
+    # E.g. rate limits and server errors
+    return None
+
+
+def check_identifier(detailed_type: str, value: str) -> bool:
+    """
+    Check an identifier against its format and the local identifier index. Without a local list for the identifier
+    type, only the format is checked unless the network fallback is enabled. Only definitive results are cached, so
+    an identifier that could not be checked online is checked again on its next use
+    Args:
+        detailed_type: Should be one of ["PDB_ID", "UNIPROT_ID"]
+
+        value: The identifier
+    """
+    key = (detailed_type, value)
+    with _identifier_cache_lock:
+        if key in _identifier_cache:
+            _identifier_cache.move_to_end(key)
+            return _identifier_cache[key]
+
+    valid, definitive = _check_identifier(detailed_type, value)
+    if definitive:
+        with _identifier_cache_lock:
+            _identifier_cache[key] = valid
+            while len(_identifier_cache) > IDENTIFIER_CACHE_SIZE:
+                _identifier_cache.popitem(last=False)
+
+    return valid
+
+
+def _check_identifier(detailed_type: str, value: str) -> tuple:
+    """
+    Returns:
+        Whether the identifier is valid, and whether the answer is definitive
+    """
+    if detailed_type == "PDB_ID":
+        value = value.strip().upper()
+        pattern = pdb_pattern
+    else:
+        value = value.strip()
+        pattern = uniprot_pattern
+
+    if not re.match(pattern, value):
+        return False, True
+
+    # The index may be older than the newest entries
+    found = _identifier_index.contains(detailed_type, value)
+    if found is False and detailed_type == "PDB_ID":
+        refresh_on_miss()
+
+    if found or not _network_fallback:
+        return found is not False, True
+
+    # Missing identifiers are confirmed online if allowed. If the request fails, the index decides for now
+    online = check_identifier_online(detailed_type, value)
+    if online is None:
+        return found is not False, False
+
+    return online, True
+
+
+def check_identifiers(detailed_type: str, values: list) -> list:
+    """
+    Check many identifiers at once. Duplicates are checked once, and online checks run in parallel
+    Args:
+        detailed_type: Should be one of ["PDB_ID", "UNIPROT_ID"]
+
+        values: The identifiers
+
+    Returns:
+        A list of booleans, one per value
+    """
+    unique_values = list(dict.fromkeys(values))
+    check = functools.partial(check_identifier, detailed_type)
+    if _network_fallback and len(unique_values) > 1:
+        with ThreadPoolExecutor(NETWORK_CHECK_THREADS) as executor:
+            valid = dict(zip(unique_values, executor.map(check, unique_values)))
+    else:
+        valid = {value: check(value) for value in unique_values}
+
+    return [valid[value] for value in values]
+
+
+def type_check_many(name: str, values: list, detailed_type: str, file_dir: str) -> list:
+    """
+    Check many values of the same type at once
+    Args:
+        name: The name of the parameter
+
+        values: The values to check
+
+        detailed_type: Check whether the values are of the specified type
+
+        file_dir: The directory where the files are located. Used for checking if the files exist
+
+    Returns:
+        A list with the error message of each value, or None if the value is valid
+    """
+    # Check all identifiers in one pass, so that type_check below only hits the cache
+    if detailed_type in IDENTIFIER_TYPES:
+        check_identifiers(detailed_type, [value for value in values if isinstance(value, str)])
+
+    return [type_check(name, value, detailed_type, file_dir) for value in values]
+
+
 def type_check(name: str, value: str, detailed_type: str, file_dir: str) -> str:
     """
     Check if the value is of the specified type
@@ -100,21 +342,8 @@ def type_check(name: str, value: str, detailed_type: str, file_dir: str) -> str:
         elif not os.path.exists(os.path.join(file_dir, value)):
             error_type = "existence"
 
-    elif detailed_type == "PDB_ID":
-        url = f"https://files.rcsb.org/download/{value}.cif"
-        try:
-            response = requests.head(url, timeout=30)
-            if response.status_code in [200, 302, 303, 307]:
-                pass
-            else:
-                error_type = "type"
-        except:
-            error_type = "type"
-        # if not re.match(pdb_pattern, value):
-        #     error_type = "type"
-
-    elif detailed_type == "UNIPROT_ID":
-        if not re.match(uniprot_pattern, value):
+    elif detailed_type in IDENTIFIER_TYPES:
+        if not check_identifier(detailed_type, str(value)):
             error_type = "type"
 
     elif detailed_type == "PFAM_ID":
@@ -125,6 +354,9 @@ def type_check(name: str, value: str, detailed_type: str, file_dir: str) -> str:
         pass
 
     elif detailed_type == "SMILES":
+        # Imported on demand, so that the agent process does not load rdkit unless it checks a SMILES
+        from rdkit import Chem
+
         try:
             Chem.MolFromSmiles(value)
         except Exception:
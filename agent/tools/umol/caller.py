@@ -7,14 +7,12 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
-import biotite.structure.io as bsio
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
+from agent.tools.umol.feature_cache import FeatureCache, normalize_pocket, run_command
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 sys.path.append(BASE_DIR)
 
@@ -29,8 +27,7 @@ class Umol(BaseTool):
     
     def __call__(self, protein_sequence, ligand_sequence, num_recycles=3, protein_pocket="NONE") -> dict:
         id = "umol01"
-        now = datetime.datetime.now()
-        now = now.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         save_path = f"{self.out_dir}/umol/{now}/{id}"
         if not os.path.exists(save_path):
             os.makedirs(save_path)
@@ -39,51 +36,66 @@ class Umol(BaseTool):
         os.environ['PATH'] = '/home/public/miniconda3/envs/umol/bin:' + original_path
 
         pocket_indices = f"{save_path}/{id}_pocket_indices.npy"
-    
-        # Search Uniclust30 with HHblits to generate an MSA (a few minutes)
-        fasta_path = f"{save_path}/examples.fasta"
-        self.sequence_to_fasta(fasta_path, protein_sequence, id)
-        
+        msa_feats = f"{save_path}/msa_features.pkl"
+        ligand_feats = f"{save_path}/ligand_inp_features.pkl"
+        protein_sequence = protein_sequence.replace(" ", "").replace("\n", "")
+
         UNICLUST = f"{ROOT_DIR}/{self.config['UNICLUST']}"
         HHBLITS = f"{ROOT_DIR}/{self.config['HHBLITS']}"
-        
-        try:
+
+        # Features are cached by the sequence, the SMILES and the pocket, so docking related ligands against one
+        # target only builds the features of the new ligands
+        cache = FeatureCache(f"{ROOT_DIR}/{self.config['feature_cache']}")
+
+        def build_msa_feats(out_dir):
+            # Search Uniclust30 with HHblits to generate an MSA (a few minutes)
+            fasta_path = f"{out_dir}/examples.fasta"
+            self.sequence_to_fasta(fasta_path, protein_sequence, id)
             cmd = f"{HHBLITS} -i '{fasta_path}' -d '{UNICLUST}'\
-                -E 0.001 -all -oa3m '{save_path}/{id}.a3m' -o '{save_path}/{id}.hhr'"
-            os.system(cmd)
-            
+                -E 0.001 -all -oa3m '{out_dir}/{id}.a3m' -o '{out_dir}/{id}.hhr'"
+            run_command(cmd, "search the MSA with HHblits")
+
             # Generate input feats (seconds)
             cmd = f"{self.config['python']} {ROOT_DIR}/agent/tools/umol/umol/make_msa_seq_feats.py \
                                                         --input_fasta_path '{fasta_path}' \
-                                                        --input_msas '{save_path}/{id}.a3m' \
-                                                        --outdir '{save_path}'"
-            os.system(cmd)
-            
+                                                        --input_msas '{out_dir}/{id}.a3m' \
+                                                        --outdir '{out_dir}'"
+            run_command(cmd, "build the MSA features")
+
+        def build_ligand_feats(out_dir):
             # SMILES. Alt: --input_sdf 'path_to_input_sdf'
             cmd = f"{self.config['python']} {ROOT_DIR}/agent/tools/umol/umol/make_ligand_feats.py \
                                                         --input_smiles '{ligand_sequence}' \
-                                                        --outdir '{save_path}'"
-            os.system(cmd)
-            
+                                                        --outdir '{out_dir}'"
+            run_command(cmd, "build the ligand features")
+
+        try:
+            cache.link(cache.get("msa", protein_sequence, "msa_features.pkl", build_msa_feats), msa_feats)
+            cache.link(cache.get("ligand", ligand_sequence.strip(), "ligand_inp_features.pkl", build_ligand_feats),
+                       ligand_feats)
+
             if protein_pocket != "NONE":
-                cmd = f"{self.config['python']} {ROOT_DIR}/agent/tools/umol/umol/make_targetpost_npy.py \
-                                                        --outfile '{pocket_indices}' \
-                                                        --target_pos '{protein_pocket}'"
-                os.system(cmd)
-                
+                pocket = normalize_pocket(protein_pocket)
+
+                def build_pocket_indices(out_dir):
+                    cmd = f"{self.config['python']} {ROOT_DIR}/agent/tools/umol/umol/make_targetpost_npy.py \
+                                                        --outfile '{out_dir}/pocket_indices.npy' \
+                                                        --target_pos '{pocket}'"
+                    run_command(cmd, "build the pocket indices")
+
+                cache.link(cache.get("pocket", pocket, "pocket_indices.npy", build_pocket_indices), pocket_indices)
                 ckpt = f"{ROOT_DIR}/{self.config['POCKET_PARAMS']}"
                 
             else:
                 ckpt = f"{ROOT_DIR}/{self.config['NO_POCKET_PARAMS']}"
                 pocket_indices = "NONE"
                 
-            # Predict (a few minutes)
-            msa_feats = f"{save_path}/msa_features.pkl"
-            ligand_feats = f"{save_path}/ligand_inp_features.pkl"
-            
             #Change to no-pocket params if no pocket
             #Then also leave out the target protein_pocket
             
+            # Predict (a few minutes). Inputs are padded to a few crop sizes, so the compiled network in the XLA cache
+            # is reused by inputs of similar size
+            crop_buckets = ",".join(str(size) for size in self.config['crop_buckets'])
             cmd = f"{self.config['python']} {ROOT_DIR}/agent/tools/umol/umol/predict.py \
                                                         --msa_features '{msa_feats}' \
                                                         --ligand_features '{ligand_feats}' \
@@ -91,6 +103,8 @@ class Umol(BaseTool):
                                                         --ckpt_params '{ckpt}' \
                                                         --target_pos '{pocket_indices}' \
                                                         --num_recycles {num_recycles} \
+                                                        --crop_buckets '{crop_buckets}' \
+                                                        --xla_cache_dir '{ROOT_DIR}/{self.config['xla_cache']}' \
                                                         --outdir '{save_path}'"
             os.system(cmd)
             
@@ -130,6 +144,8 @@ class Umol(BaseTool):
             os.system(cmd)
             
             if os.path.exists(f"{save_path}/{id}_relaxed_plddt.pdb"):
+                import biotite.structure.io as bsio
+
                 struct = bsio.load_structure(f"{save_path}/{id}_relaxed_plddt.pdb", extra_fields=["b_factor"])
                 avg_plddt = float(struct.b_factor.mean())
                 print(f"The final relaxed structure can be found at {save_path[len(self.out_dir)+1:]}/{id}_relaxed_plddt.pdb")
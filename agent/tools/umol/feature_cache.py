@@ -0,0 +1,120 @@
+import os
+import shutil
+import hashlib
+
+
+def _link(src: str, dst: str):
+    """
+    Hardlink a file, falling back to a copy across file systems
+    """
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def is_complete(path: str) -> bool:
+    return os.path.isfile(path) and os.path.getsize(path) > 0
+
+
+def run_command(cmd: str, step: str):
+    """
+    Run a shell command of a feature build
+    Args:
+        cmd: Shell command
+
+        step: Description of the step for the error message
+
+    Raises:
+        RuntimeError: If the command fails
+    """
+    status = os.system(cmd)
+    if status != 0:
+        raise RuntimeError(f"Failed to {step} (exit status {os.waitstatus_to_exitcode(status)})")
+
+
+def normalize_pocket(pocket: str) -> str:
+    """
+    Canonical form of a pocket definition, e.g. " 10, 11,12" -> "10,11,12"
+    """
+    return ",".join(str(int(x)) for x in str(pocket).split(",") if x.strip())
+
+
+class FeatureCache:
+    def __init__(self, cache_dir: str):
+        """
+        On-disk cache of Umol input features. MSA features are keyed by the protein sequence, ligand features by the
+        SMILES and pocket indices by the pocket definition, so docking related ligands against one target only builds
+        the features of the new ligands.
+        Args:
+            cache_dir: Directory of the cache
+        """
+        self.cache_dir = cache_dir
+
+    def get_entry_dir(self, kind: str, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return f"{self.cache_dir}/{kind}/{digest[:2]}/{digest}"
+
+    def get(self, kind: str, key: str, file_name: str, build) -> str:
+        """
+        Get a cached feature file, building it on a miss
+        Args:
+            kind: Kind of the feature, e.g. "msa"
+
+            key: Input that determines the feature, e.g. the protein sequence
+
+            file_name: Name of the feature file in the entry
+
+            build: Function that writes the feature file (and any side files) into the directory it is given. It should
+                raise if the build fails, e.g. with "run_command"
+
+        Returns:
+            The path to the cached feature file
+        """
+        entry_dir = self.get_entry_dir(kind, key)
+        path = f"{entry_dir}/{file_name}"
+        if is_complete(path):
+            print(f"Using cached {kind} features from {entry_dir}")
+            return path
+
+        if os.path.exists(entry_dir):
+            # An empty feature file stored before builds were verified. Move it away, since a rename does not replace
+            # a non-empty directory
+            trash_dir = f"{entry_dir}.trash-{os.getpid()}"
+            try:
+                os.rename(entry_dir, trash_dir)
+            except OSError:
+                # Another run replaced it first
+                pass
+            shutil.rmtree(trash_dir, ignore_errors=True)
+
+        # Build in a private directory and move it into place, so concurrent runs never see a partial entry
+        tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        try:
+            # The build raises if one of its commands fails. A missing or empty file is never stored either
+            build(tmp_dir)
+            if not is_complete(f"{tmp_dir}/{file_name}"):
+                raise RuntimeError(f"Failed to build the {kind} features")
+
+            with open(f"{tmp_dir}/key.txt", "w") as w:
+                w.write(key)
+            try:
+                os.rename(tmp_dir, entry_dir)
+            except OSError:
+                # Another run stored the same entry first
+                pass
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        return path
+
+    def link(self, path: str, dst: str) -> str:
+        """
+        Hardlink a cached feature file into a run directory
+        """
+        _link(path, dst)
+        return dst
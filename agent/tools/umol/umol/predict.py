@@ -41,9 +41,37 @@ parser.add_argument('--ckpt_params', nargs=1, type= str, default=sys.stdin, help
 parser.add_argument('--target_pos', nargs=1, type= str, default=sys.stdin, help = 'Positions to target (pocket).')
 parser.add_argument('--num_recycles', nargs=1, type= int, default=sys.stdin, help = 'Number of recycles to use in the prediction.')
 parser.add_argument('--outdir', nargs=1, type= str, default=sys.stdin, help = 'Path to output directory. Include /in end')
+parser.add_argument('--crop_buckets', nargs=1, type= str, default=['256,384,512,640,768,1024,1280,1536,2048'], help = 'Padded input sizes, separated by comma. Inputs are padded to the smallest size that fits, so that runs of similar size reuse the compiled network.')
+parser.add_argument('--xla_cache_dir', nargs=1, type= str, default=[None], help = 'Directory of the persistent XLA compilation cache. Disabled if not given.')
 
 ##############FUNCTIONS##############
 
+def enable_compilation_cache(cache_dir):
+    """Store compiled XLA programs on disk, so that later runs with the same
+    input shapes skip the compilation
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        jax.config.update('jax_compilation_cache_dir', cache_dir)
+        #Cache every program, not only the slow ones
+        jax.config.update('jax_persistent_cache_min_compile_time_secs', 0)
+    except AttributeError:
+        #Older JAX versions
+        from jax.experimental.compilation_cache import compilation_cache as cc
+        cc.initialize_cache(cache_dir)
+    print('Using the XLA compilation cache at', cache_dir)
+
+
+def get_crop_size(tot_len, crop_buckets):
+    """Smallest bucket that fits the input. Longer inputs are rounded up to
+    a multiple of 256
+    """
+    for crop_size in sorted(crop_buckets):
+        if crop_size >= tot_len:
+            return crop_size
+    return int(np.ceil(tot_len / 256) * 256)
+
+
 ##########INPUT DATA#########
 def process_protein_features(raw_features, config, random_seed):
     """Processes features to prepare for feeding them into the model.
@@ -135,7 +163,8 @@ def make_uniform(protein_feats, ligand_feats, crop_size):
     batch_ex['atom14_atom_exists'][protein_len:tot_len,1] = 1 #The CA index is 1 - the ligand atom pos
 
     #Cat and increase indices - will be an offset feature clipped at 32 (check the biggest ligands?)
-    batch_ex['residue_index'] = np.array(range(tot_len), dtype=np.int32)
+    #Padded positions keep index 0
+    batch_ex['residue_index'][:tot_len] = np.array(range(tot_len), dtype=np.int32)
     batch_ex['residue_index'][protein_len:tot_len] += 200
 
     #Assign the ligand feats
@@ -155,9 +184,10 @@ def make_uniform(protein_feats, ligand_feats, crop_size):
 
 
 
-def load_input_feats(pdbid, msa_features, ligand_features, config, pocket_indices):
+def load_input_feats(pdbid, msa_features, ligand_features, config, pocket_indices, crop_buckets=None):
     """
-    Load all input feats.
+    Load all input feats. The protein and ligand are padded to a crop size
+    from crop_buckets, or not padded if it is not given.
     """
 
 
@@ -181,8 +211,10 @@ def load_input_feats(pdbid, msa_features, ligand_features, config, pocket_indice
     #Add in all the ligand feats
     protein_len, ligand_len = len(protein_feats['aatype']), len(ligand_feats['atom_types'])
     tot_len=protein_len+ligand_len
+    crop_size = get_crop_size(tot_len, crop_buckets) if crop_buckets else tot_len
+    print(f'Protein length {protein_len}, ligand atoms {ligand_len}, padded to {crop_size}')
     #Add index
-    batch_ex = make_uniform(protein_feats, ligand_feats, tot_len)
+    batch_ex = make_uniform(protein_feats, ligand_feats, crop_size)
 
     return batch_ex, ligand_feats['atoms']
 
@@ -197,7 +229,8 @@ def predict(config,
           target_pos,
           ckpt_params=None,
           num_recycles=3,
-          outdir=None):
+          outdir=None,
+          crop_buckets=None):
     """Predict a structure
     """
     #Define the forward function
@@ -215,22 +248,26 @@ def predict(config,
     #The forward function is here transformed to apply and init functions which
     #can be called during training and initialisation (JAX needs functions)
     forward = hk.transform(_forward_fn)
-    apply_fwd = forward.apply
+    #Compiled once per crop size. The number of recycles is an input, not a constant
+    apply_fwd = jax.jit(forward.apply)
     #Get a random key
     rng = jax.random.PRNGKey(42)
 
 
     #Load input feats
-    batch, ligand_atoms = load_input_feats(id, msa_features, ligand_features, config, target_pos)
+    batch, ligand_atoms = load_input_feats(id, msa_features, ligand_features, config, target_pos, crop_buckets)
     for key in batch:
         try:
             batch[key] = np.reshape(batch[key], (1, *batch[key].shape))
         except:
             pass
             # print(key)
-    batch['num_iter_recycling'] = [num_recycles]
+    batch['num_iter_recycling'] = np.array([num_recycles], dtype=np.int32)
 
+    start = time.time()
     ret = apply_fwd(ckpt_params, rng, batch)
+    ret['structure_module']['final_atom_positions'].block_until_ready()
+    print(f'Forward pass (including compilation) took {time.time() - start:.1f} s')
     #Save structure
     save_feats = {'aatype':np.argmax(batch['target_feat'],axis=-1)-1,
                   'residue_index':batch['residue_index'],
@@ -273,25 +310,34 @@ def save_structure(save_feats, result, outname):
 
 ##################MAIN#######################
 
-#Parse args
-args = parser.parse_args()
-msa_features = args.msa_features[0]
-ligand_features = args.ligand_features[0]
-id = args.id[0]
-ckpt_params =  np.load(args.ckpt_params[0], allow_pickle=True)
-try:
-    target_pos = np.load(args.target_pos[0])
-except:
-    target_pos = []
-num_recycles = args.num_recycles[0]
-outdir = args.outdir[0]
-
-#Predict
-predict(config.CONFIG,
-            msa_features,
-            ligand_features,
-            id,
-            target_pos,
-            ckpt_params,
-            num_recycles,
-            outdir=outdir)
+def main():
+    #Parse args
+    args = parser.parse_args()
+    msa_features = args.msa_features[0]
+    ligand_features = args.ligand_features[0]
+    id = args.id[0]
+    ckpt_params =  np.load(args.ckpt_params[0], allow_pickle=True)
+    try:
+        target_pos = np.load(args.target_pos[0])
+    except:
+        target_pos = []
+    num_recycles = args.num_recycles[0]
+    outdir = args.outdir[0]
+    crop_buckets = [int(x) for x in args.crop_buckets[0].split(',') if x.strip()]
+    if args.xla_cache_dir[0] is not None:
+        enable_compilation_cache(args.xla_cache_dir[0])
+
+    #Predict
+    predict(config.CONFIG,
+                msa_features,
+                ligand_features,
+                id,
+                target_pos,
+                ckpt_params,
+                num_recycles,
+                outdir=outdir,
+                crop_buckets=crop_buckets)
+
+
+if __name__ == '__main__':
+    main()
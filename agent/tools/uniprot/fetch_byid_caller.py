@@ -8,14 +8,12 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 import json_repair
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -35,8 +33,7 @@ class UniprotFetchByID(BaseTool):
         self.tool_name = tool_name
         
     def __call__(self, uniprot_id, subsection="Function") -> dict:
-        now = datetime.datetime.now()
-        now = now.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         os.makedirs(f"{self.out_dir}/uniprot_fetch_byid/{now}", exist_ok=True)
         
         answers_template = f'{BASE_DIR}/{self.config["answers_template"]}'
@@ -97,8 +94,7 @@ if __name__ == '__main__':
     }
 
     for obs in uniprot_fetch_byid.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
         # uniprot_fetch_sequence.terminate()
     
\ No newline at end of file
@@ -9,14 +9,12 @@ if ROOT_DIR not in sys.path:
     
 import os
 import datetime
-import torch
 import json_repair
 
 from agent.tools.base_tool import BaseTool
 from agent.tools.register import register_tool
 from easydict import EasyDict
 
-torch.backends.cuda.matmul.allow_tf32 = True
 BASE_DIR = os.path.dirname(__file__)
 
 
@@ -36,8 +34,7 @@ class UniprotQuery(BaseTool):
         self.tool_name = tool_name
         
     def __call__(self, keyword, all_results=False) -> dict:
-        now = datetime.datetime.now()
-        now = now.strftime("%Y%m%d_%H%M")
+        now = self.run_id
         os.makedirs(f"{self.out_dir}/uniprot_query/{now}", exist_ok=True)
         json_path = f"{self.out_dir}/uniprot_query/{now}/result.json"
         fasta_path = f"{self.out_dir}/uniprot_query/{now}/result.fasta"
@@ -143,8 +140,7 @@ if __name__ == '__main__':
     }
 
     for obs in uniprot_query.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 
         # uniprot_fetch_sequence.terminate()
     
\ No newline at end of file
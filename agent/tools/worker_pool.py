@@ -0,0 +1,195 @@
+import os
+import sys
+import time
+import atexit
+import queue
+import signal
+import threading
+import multiprocessing as mp
+# Import the atexit hook of multiprocessing first, so that it runs after the workers are closed. Otherwise it would
+# wait forever for the idle workers to exit
+import multiprocessing.util
+
+from agent.tools.result_channel import ResultChannel
+from agent.tools.scheduler import apply_cpu_allocation
+from agent.tools.service import cancel_requests
+from agent.utils.others import kill_process
+
+
+# Idle workers exit after this many seconds unless the tool manager sets another timeout
+DEFAULT_IDLE_TIMEOUT = 1800
+
+# Seconds between two checks of the agent process while a worker waits for jobs
+PARENT_POLL_INTERVAL = 5
+
+# All live workers, so that they can be shut down when the interpreter exits. The references are strong: a worker
+# that is only reachable from a dropped tool must still be closed, or the exit hook of multiprocessing waits for it
+# forever
+_live_workers = set()
+_live_workers_lock = threading.Lock()
+
+
+class ToolWorker:
+    def __init__(self, tool, idle_timeout: float = DEFAULT_IDLE_TIMEOUT, max_jobs: int = None, gpu_ids: list = None):
+        """
+        A process that keeps a tool instance alive between calls. The worker is forked from the tool, so the caller
+        module and everything it imported stay resident, and tools can keep loaded models in memory through
+        ``BaseTool.get_resident``. Jobs are sent through a queue and executed one at a time by ``tool.run``, which
+        sends the log path and results back through the result channel of the worker. Batch jobs are run by
+        ``tool.run_batch`` instead. When the agent process dies, an idle worker exits and a busy one is killed together
+        with the commands it launched, so an orphaned worker never keeps a loaded model or GPU memory.
+        Args:
+            tool: The tool instance to serve
+
+            idle_timeout: The worker exits after being idle for this many seconds. If None, it never times out
+
+            max_jobs: The worker exits after running this many jobs. If None, it serves jobs until it is closed
+
+            gpu_ids: GPUs visible to the worker and the commands it launches. If None, all GPUs are visible
+        """
+        self.jobs = mp.Queue()
+        self.channel = ResultChannel()
+        # The job currently assigned to the worker. Only used by the agent process
+        self.job = None
+        self.gpu_ids = gpu_ids
+
+        self.process = mp.Process(target=self._serve,
+                                  args=(tool, self.jobs, self.channel, idle_timeout, max_jobs, gpu_ids, os.getpid()))
+        self.process.start()
+        with _live_workers_lock:
+            _live_workers.add(self)
+
+    @staticmethod
+    def _serve(tool, jobs: mp.Queue, channel: ResultChannel, idle_timeout: float, max_jobs: int, gpu_ids: list,
+               parent_pid: int):
+        """
+        Main loop of the worker process
+        """
+        # Lead a new process group, so that the worker and every command it launches can be killed at once
+        os.setsid()
+        threading.Thread(target=ToolWorker._watch_parent, args=(parent_pid,), daemon=True).start()
+        signal.signal(signal.SIGTERM, ToolWorker._terminate)
+        tool.in_worker = True
+        tool.channel = channel
+
+        # Set before anything initializes CUDA in the worker
+        if gpu_ids is not None:
+            os.environ["CUDA_VISIBLE_DEVICES"] = ",".join(str(gpu_id) for gpu_id in gpu_ids)
+
+        num_jobs = 0
+        idle_since = time.time()
+        while max_jobs is None or num_jobs < max_jobs:
+            # Wake up regularly to notice the death of the agent process. The worker is then adopted by another
+            # process, so its parent pid changes
+            try:
+                job = jobs.get(timeout=PARENT_POLL_INTERVAL)
+            except queue.Empty:
+                if os.getppid() != parent_pid:
+                    break
+
+                if idle_timeout is not None and time.time() - idle_since > idle_timeout:
+                    break
+
+                continue
+
+            # None is the shutdown signal
+            if job is None:
+                break
+
+            # Set the variables of the job, e.g. "job_id" and "out_dir", on the tool
+            method, job_vars, tool_args = job
+            for name, value in job_vars.items():
+                setattr(tool, name, value)
+
+            # Limit the threads of the job and of the commands it launches to its CPU cores
+            cpu_ids = job_vars["cpu_ids"]
+            if cpu_ids is not None:
+                apply_cpu_allocation(cpu_ids)
+                if "torch" in sys.modules:
+                    sys.modules["torch"].set_num_threads(len(cpu_ids))
+
+            getattr(tool, method)(**tool_args)
+            num_jobs += 1
+            idle_since = time.time()
+
+    @staticmethod
+    def _terminate(signum, frame):
+        """
+        Exit on SIGTERM, e.g. when the job is cancelled. The service requests of the job are cancelled first, since
+        the services keep running after the worker is gone
+        """
+        cancel_requests()
+        os._exit(128 + signum)
+
+    @staticmethod
+    def _watch_parent(parent_pid: int):
+        """
+        Kill the process group of a busy worker once the agent process is gone. The main loop handles idle workers
+        """
+        while os.getppid() == parent_pid:
+            time.sleep(PARENT_POLL_INTERVAL)
+
+        # Give an idle worker the chance to exit cleanly first
+        time.sleep(PARENT_POLL_INTERVAL)
+        os.killpg(os.getpgid(0), signal.SIGKILL)
+
+    def submit(self, job, out_dir: str):
+        """
+        Send a job to the worker
+        Args:
+            job: The ToolJob to run
+
+            out_dir: Output directory of the job
+        """
+        self.job = job
+        job.worker = self
+        allocation = job.allocation
+        job_vars = {
+            "job_id": job.job_id,
+            "out_dir": out_dir,
+            "cache_key": job.cache_key,
+            "cpu_ids": allocation.cpu_ids if allocation is not None else None,
+            "gpu_ids": allocation.gpu_ids if allocation is not None else None,
+        }
+        self.jobs.put((job.method, job_vars, job.tool_args))
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def is_idle(self) -> bool:
+        return self.job is None and self.process.is_alive()
+
+    def kill(self, timeout: float = 5):
+        """
+        Kill the worker and the commands it launched. They get SIGTERM first and SIGKILL after the timeout
+        """
+        kill_process(self.pid, timeout)
+        self.process.join()
+
+    def close(self, timeout: float = 5):
+        """
+        Ask the worker to exit and wait for it. The worker is killed if it does not exit in time
+        """
+        if self.process.is_alive():
+            self.jobs.put(None)
+            self.process.join(timeout)
+
+        if self.process.is_alive():
+            self.kill()
+
+        self.channel.close()
+        with _live_workers_lock:
+            _live_workers.discard(self)
+
+
+@atexit.register
+def _close_live_workers():
+    with _live_workers_lock:
+        workers = list(_live_workers)
+
+    for worker in workers:
+        worker.close(timeout=1)
@@ -40,6 +40,7 @@ INPUT_FLOW_ARG_DESCRIPTION = {
     "FASTA_PATH": "The path to the .fasta file. A FASTA format file containing the protein sequence.",
     "AA_SEQUENCE": "The amino acid sequence of the protein. It should be a string of characters representing the amino acids. Example: 'ACDEFGHIKLMNPQRSTVWY'.",
     "STRUCTURE_PATH": "The path to the .pdb or .cif file. A file containing the 3D structure of the protein.",
+    "STRUCTURE_DIR": "The path to a directory of .pdb or .cif files, each containing the 3D structure of a protein.",
     "FOLDSEEK_SEQUENCE": "The foldseek sequence. It is a string of the protein structure tokens generated by the foldseek tool.",
     "TEXT": "Meaningful keywords or functional descriptions that could be used for searching proteins/literatures/wiki and even text-based protein design",
     "SMILES": "A SMILES(simplified molecular input line entry system) string representing the sequence of the ligand.",
@@ -79,6 +80,7 @@ OUTPUT_FLOW_ARG_DESCRIPTION = {
 TOOL_SPECIFIC_ARG_DESCRIPTION = {
     "PINAL_CSV_PATH": "The detailed results from Pinal.",
     "MPNN_CSV_PATH": "The detailed results from ProteinMPNN",
+    "MPNN_DESIGN_DIR": "The directory containing the sequences designed by ProteinMPNN for each backbone, saved as a FASTA file and a csv table named after the backbone.",
     "CLUSTALW_ALN_PATH": "The resulting multiple sequence alignment of the provided protein sequences.",
     "DIFFAB_RESULT_DIR": "The directory containing the optimized antibody structures saved as PDB files.",
     "HHSUITE_A3M_PATH": "A multiple sequence alignment (MSA) file of homologous sequences identified during the search.",
@@ -86,6 +88,8 @@ TOOL_SPECIFIC_ARG_DESCRIPTION = {
     "INTERPROSCAN_RESULT_DIR": "The main output directory containing all files generated during the InterProScan run. This includes the primary `parsed_tsv` result file, raw InterProScan outputs in other formats (if generated)",
     "MUTATION_SCORE_DICT": "The predicted mutational effect scores of the specific mutant or position. This is a list of scores, each score corresponds to a specific mutation.",
     "MUTATION_SCORE": "The predicted mutational effect score of the specific mutant.",
+    "SAPROT_EMBEDDING_STORE_DIR": "The directory of a SaProt embedding store. It contains the float16 embeddings of the proteins as memory-mapped arrays and a TSV index of their ids and lengths.",
+    "SAPROT_MUTATION_SCAN_PATH": "The table of the predicted mutational effect scores of all 20 amino acids at every position of the protein.",
     "TMSCORE": "The TM-score value representing the structural similarity between the aligned proteins.",
     "CLASSIFICATION_RESULT": "The output of the finetuned saprot model",
     "REGRESSION_RESULT": "The output of the finetuned saprot model",
@@ -103,6 +107,8 @@ TOOL_SPECIFIC_ARG_DESCRIPTION = {
     "HMMER_DOMTBLOUT_PATH": "Path to the per-domain tabular output file. This file lists all significant domain hits found in the query sequences, one hit per line, making it ideal for detailed analysis. Generated via the --domtblout option.",
     "UNIPROT_JSON_PATH": "The path to the JSON file containing the results of the Uniprot query.",
     "FOLDSEEK_TSV_PATH": "The path to the TSV file containing all foldseek search results with detailed alignment information.",
+    "ESMFOLD_STRUCTURE_DIR": "The directory containing the structures predicted by ESMFold for the sequences of a FASTA file, saved as PDB files named after the sequence ids.",
+    "ESMFOLD_SUMMARY_TSV_PATH": "The path to the TSV table with the id, length, mean pLDDT, pTM and PDB file name of each sequence folded by ESMFold.",
 }
 
 # These arguments are detailed and tool-related. For input arguments, these are configurations that describe the detail of the tool call. For output arguments, these are detailed information that the tool will return to the agent. These arguments are not protein entity level restrictions, but rather tool-related configurations.
@@ -1,12 +1,14 @@
-import torch
-import numpy as np
 import random
 import os
+import time
 import signal
 import psutil
 
 
 def setup_seed(seed):
+    import torch
+    import numpy as np
+
     torch.manual_seed(seed)
     torch.cuda.manual_seed_all(seed)
     np.random.seed(seed)
@@ -15,6 +17,9 @@ def setup_seed(seed):
 
 
 def random_seed():
+    import torch
+    import numpy as np
+
     torch.seed()
     torch.cuda.seed()
     np.random.seed()
@@ -22,23 +27,70 @@ def random_seed():
     # torch.backends.cudnn.deterministic = False
 
 
-def kill_process(pid):
+def wait_process_exit(pid, timeout: float) -> bool:
+    """
+    Wait for a process to exit. A zombie process counts as exited, so this also works for child processes that have
+    not been reaped yet
+    Args:
+        pid: Process ID
+
+        timeout: Maximum seconds to wait
+
+    Returns:
+        True if the process exited in time
+    """
+    deadline = time.time() + timeout
+    while True:
+        try:
+            if psutil.Process(pid).status() == psutil.STATUS_ZOMBIE:
+                return True
+        except psutil.NoSuchProcess:
+            return True
+
+        if time.time() >= deadline:
+            return False
+        time.sleep(0.01)
+
+
+def kill_process(pid, timeout: float = 5):
     """
-    Iteratively kill all child processes derived from the given pid, including the pid itself.
+    Kill a process and all processes derived from it. If the process leads its own process group, e.g. a tool worker
+    started with "os.setsid", the whole group is signalled at once, including grandchildren started through shells.
+    Otherwise the process tree is collected in a single pass. The processes get SIGTERM first and SIGKILL if the
+    given process has not exited after the timeout.
     Args:
         pid: Process ID
+
+        timeout: Seconds to wait between SIGTERM and SIGKILL
     """
-    current_pid = pid
-    child_processes = []
-    for process in psutil.process_iter(['pid', 'ppid']):
-        if process.info['ppid'] == current_pid:
-            child_processes.append(process.info['pid'])
-
-    for child_pid in child_processes:
-        kill_process(child_pid)
-    
     try:
-        os.kill(pid, signal.SIGKILL)
-    except Exception as e:
-        print(f"Failed to kill {pid}: {e}")
+        pgid = os.getpgid(pid)
+    except ProcessLookupError:
+        return
+
+    if pgid == pid and pgid != os.getpgrp():
+        def send(sig):
+            try:
+                os.killpg(pgid, sig)
+            except ProcessLookupError:
+                pass
+
+    else:
+        try:
+            process = psutil.Process(pid)
+            pids = [pid] + [child.pid for child in process.children(recursive=True)]
+        except psutil.NoSuchProcess:
+            return
+
+        def send(sig):
+            for target_pid in pids:
+                try:
+                    os.kill(target_pid, sig)
+                except ProcessLookupError:
+                    pass
+
+    send(signal.SIGTERM)
+    wait_process_exit(pid, timeout)
+    # Also kill the processes that ignored SIGTERM or outlived their parent
+    send(signal.SIGKILL)
     
\ No newline at end of file
@@ -177,8 +177,8 @@ class WorkflowManager:
         """
         # Record how can a input type be converted to another type by a tool
         transfer_matrix = {}
-        for tool_name, obj in self.tool_manager.tools.items():
-            doc = obj.config.document
+        for tool_name, spec in self.tool_manager.specs.items():
+            doc = spec.config.document
             input_types = set([param["detailed_type"] for param in doc.required_parameters])
             output_types = set([param["detailed_type"] for param in doc.return_values])
             
@@ -0,0 +1,49 @@
+import sys
+
+sys.path.append(".")
+
+import argparse
+
+from agent.tools.identifier_index import IdentifierIndex, read_ids
+
+
+def run(args):
+    index = IdentifierIndex(args.index_dir)
+
+    if not args.skip_pdb:
+        index.refresh_pdb()
+        print(f"Saved {len(read_ids(index.pdb_path))} PDB entries to {index.pdb_path}")
+
+    if args.uniprot_list is not None:
+        accessions = read_ids(args.uniprot_list)
+        index.build_uniprot(accessions, bloom=args.bloom, error_rate=args.error_rate)
+        print(f"Indexed {len(accessions)} UniProt accessions from {args.uniprot_list}")
+
+    elif args.uniprot_query is not None:
+        index.refresh_uniprot(args.uniprot_query, bloom=args.bloom, error_rate=args.error_rate)
+        print(f"Indexed the UniProt accessions matching \"{args.uniprot_query}\"")
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Build the local index used to validate PDB IDs and UniProt "
+                                                 "accessions without network requests")
+    parser.add_argument("--index_dir", type=str, default="modelhub/identifier_index", help="Directory of the index")
+    parser.add_argument("--skip_pdb", action="store_true", help="Do not download the PDB entry list")
+    parser.add_argument("--uniprot_list", type=str, default=None,
+                        help="Local file with one UniProt accession per line")
+    parser.add_argument("--uniprot_query", type=str, default=None,
+                        help="UniProt query whose accessions are downloaded, e.g. \"reviewed:true\"")
+    parser.add_argument("--bloom", action="store_true",
+                        help="Store the UniProt accessions as a Bloom filter, for lists too large to load as a set")
+    parser.add_argument("--error_rate", type=float, default=0.001, help="False positive rate of the Bloom filter")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    EXAMPLE:
+    python scripts/data_utils/build_identifier_index.py --uniprot_query "reviewed:true"
+    python scripts/data_utils/build_identifier_index.py --skip_pdb --uniprot_list uniprot_accessions.txt --bloom
+    """
+    run(get_args())
@@ -0,0 +1,128 @@
+import sys
+
+sys.path.append(".")
+
+import os
+import time
+import json
+import yaml
+import argparse
+import tempfile
+import subprocess
+import statistics
+import psutil
+
+from agent.tools.base_tool import BaseTool
+
+
+# Shell script that starts "width" copies of itself in the background for "depth" levels
+SPAWN_SCRIPT = """
+if [ "$1" -le 0 ]; then exec sleep 1000; fi
+for i in $(seq "$2"); do sh "$0" $(($1 - 1)) "$2" & done
+wait
+"""
+
+
+class SpawnTool(BaseTool):
+    """
+    A tool that launches a tree of shells, similar to tools that call "os.system"
+    """
+    def __call__(self, depth: int, width: int) -> dict:
+        os.system(f"sh {self.spawn_script} {depth} {width} > {self.log_path} 2>&1")
+        return {}
+
+    def check_input(self, tool_arg: dict) -> list:
+        return []
+
+
+def make_config(config_dir: str) -> str:
+    config = {
+        "document": {
+            "tool_name": "spawn",
+            "tool_description": "Benchmark tool",
+            "required_parameters": [],
+            "optional_parameters": [],
+            "return_values": [],
+        }
+    }
+    config_path = f"{config_dir}/config.yaml"
+    with open(config_path, "w") as w:
+        yaml.dump(config, w)
+
+    return config_path
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tool = SpawnTool(make_config(tmp_dir), out_dir=tmp_dir)
+        tool.spawn_script = f"{tmp_dir}/spawn.sh"
+        with open(tool.spawn_script, "w") as w:
+            w.write(SPAWN_SCRIPT)
+
+        # Idle processes that make the process table of the host bigger
+        background = [subprocess.Popen(["sleep", "1000"]) for _ in range(args.background_processes)]
+
+        latencies = []
+        leaked = 0
+        try:
+            for _ in range(args.repeats):
+                job_id = tool.submit(depth=args.depth, width=args.width)
+                job = tool.get_job(job_id)
+                while job.log_path is None:
+                    tool.dispatch()
+                    job.receive(0.1)
+
+                # Wait for the whole process tree to start
+                worker_pid = job.worker.pid
+                expected = sum(args.width ** level for level in range(1, args.depth + 1))
+                while len(psutil.Process(worker_pid).children(recursive=True)) < expected:
+                    time.sleep(0.05)
+                descendants = psutil.Process(worker_pid).children(recursive=True)
+
+                start = time.time()
+                tool.cancel(job_id)
+                latencies.append(time.time() - start)
+
+                leaked += sum(1 for process in descendants if process.is_running()
+                              and process.status() != psutil.STATUS_ZOMBIE)
+
+        finally:
+            for process in background:
+                process.kill()
+                process.wait()
+            tool.close_workers()
+
+    report = {
+        "repeats": args.repeats,
+        "processes_per_job": sum(args.width ** level for level in range(1, args.depth + 1)) + 1,
+        "background_processes": args.background_processes,
+        "cancel_latency_mean_s": round(statistics.mean(latencies), 4),
+        "cancel_latency_max_s": round(max(latencies), 4),
+        "leaked_processes": leaked,
+    }
+    print(json.dumps(report, indent=4))
+
+    if args.output is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as w:
+            json.dump(report, w, indent=4)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Benchmark the latency of cancelling a running tool job")
+    parser.add_argument("--repeats", type=int, default=5, help="Number of jobs to cancel")
+    parser.add_argument("--depth", type=int, default=2, help="Depth of the shell tree launched by each job")
+    parser.add_argument("--width", type=int, default=3, help="Number of background commands per shell")
+    parser.add_argument("--background_processes", type=int, default=0,
+                        help="Number of idle processes to start, to simulate a busy node")
+    parser.add_argument("--output", type=str, default=None, help="Path to save the report as json")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    EXAMPLE:
+    python scripts/testing/benchmark_cancel.py --background_processes 2000 --output outputs/benchmark/cancel.json
+    """
+    run(get_args())
@@ -0,0 +1,97 @@
+import sys
+
+sys.path.append(".")
+
+import os
+import time
+import json
+import shutil
+import argparse
+import numpy as np
+
+
+def load_labels(input_path: str) -> list:
+    """
+    Load the questions and their tools from an input file of "test_retriever.py". Questions without a tool are skipped
+    """
+    with open(input_path, "r") as r:
+        samples = json.load(r)
+
+    return [(sample["question"], sample["tool"]) for sample in samples if sample.get("tool") is not None]
+
+
+def latency_stats(latencies: list) -> dict:
+    latencies = np.array(latencies) * 1000
+    return {
+        "mean_ms": round(float(latencies.mean()), 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+    }
+
+
+def run(args):
+    from agent.tools.tool_manager import ToolManager, ROOT_DIR
+
+    top_ks = sorted(int(k) for k in args.top_k.split(","))
+    labels = load_labels(args.input)
+
+    tool_manager = ToolManager(prewarm=False)
+    report = {"num_tools": len(tool_manager.specs), "num_questions": len(labels)}
+
+    if args.rebuild:
+        store_dir = tool_manager.config.get("retriever", {}).get("store_dir", "outputs/retriever_cache")
+        shutil.rmtree(f"{ROOT_DIR}/{store_dir}", ignore_errors=True)
+
+    # The first build encodes the documents missing from the store, the second one only loads them
+    start = time.time()
+    tool_manager.initialize_retriever()
+    report["index_build_time_s"] = round(time.time() - start, 3)
+    report["num_encoded"] = tool_manager.embedding_store.num_encoded
+
+    start = time.time()
+    tool_manager.initialize_retriever()
+    report["index_reload_time_s"] = round(time.time() - start, 3)
+
+    # Queries are encoded on the first pass and served from the LRU cache on the second one
+    hits = {k: 0 for k in top_ks}
+    for name in ["query_latency", "cached_query_latency"]:
+        latencies = []
+        for question, tool in labels:
+            start = time.time()
+            retrieved = tool_manager.retrieve(question, top_k=max(top_ks))
+            latencies.append(time.time() - start)
+
+            if name == "query_latency":
+                for k in top_ks:
+                    hits[k] += tool in retrieved[:k]
+
+        report[name] = latency_stats(latencies)
+
+    report["recall"] = {f"top_{k}": round(hits[k] / len(labels), 4) for k in top_ks}
+    print(json.dumps(report, indent=4))
+
+    if args.output is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as w:
+            json.dump(report, w, indent=4)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Benchmark the index build time, query latency and recall of the "
+                                                 "tool retriever")
+    parser.add_argument("--input", type=str, default="examples/inputs/all_input.json",
+                        help="Labelled questions in the input format of test_retriever.py")
+    parser.add_argument("--top_k", type=str, default="1,3,5,10", help="Values of k for top-k recall, separated by comma")
+    parser.add_argument("--rebuild", action="store_true", help="Clear the embedding store to time a full build")
+    parser.add_argument("--output", type=str, default=None, help="Path to save the report as json")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    EXAMPLE:
+    python scripts/testing/benchmark_retriever.py --input examples/inputs/all_input.json --rebuild \
+                                                  --output outputs/benchmark/retriever.json
+    """
+    run(get_args())
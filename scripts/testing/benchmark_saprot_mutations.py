@@ -0,0 +1,94 @@
+import sys
+
+sys.path.append(".")
+
+import time
+import json
+import argparse
+import torch
+import pandas as pd
+
+from agent.tools.saprot_task.saprot.model_interface import ModelInterface
+
+
+def load_model(huggingface_path: str, device: str):
+    config = {"config_path": huggingface_path, "load_pretrained": True}
+    model = ModelInterface.init_model("saprot/saprot_mutation_model", **config)
+    model.eval()
+    model.to(device)
+    return model
+
+
+def timed(func, *args, **kwargs) -> tuple:
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    start = time.time()
+    result = func(*args, **kwargs)
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    return result, time.time() - start
+
+
+def run(args):
+    df = pd.read_csv(args.dms_path)
+    if args.max_mutants is not None:
+        df = df.iloc[:args.max_mutants]
+    mut_infos = df["mutant"].tolist()
+
+    device = args.device if torch.cuda.is_available() else "cpu"
+    model = load_model(args.model_path, device)
+    num_sets = len({tuple(sorted({int(single[1:-1]) for single in mut_info.split(":")})) for mut_info in mut_infos})
+
+    report = {"num_mutants": len(mut_infos), "num_position_sets": num_sets, "device": device}
+
+    # One masked forward pass per unique set of mutated positions
+    scores, elapsed = timed(model.predict_muts, args.sa_seq, mut_infos, batch_size=args.batch_size)
+    report["batched"] = {
+        "forward_passes": num_sets,
+        "time_s": round(elapsed, 3),
+        "mutants_per_s": round(len(mut_infos) / elapsed, 2),
+        "spearman": float(pd.Series(scores).corr(df["DMS_score"], method="spearman")),
+    }
+    print(f"Batched: {len(mut_infos)} mutants in {elapsed:.2f} s with {num_sets} forward passes")
+
+    # One forward pass per mutant, as the single mutation API did
+    if not args.skip_baseline:
+        baseline, elapsed = timed(lambda: [model.predict_mut(args.sa_seq, mut_info) for mut_info in mut_infos])
+        report["per_mutant"] = {
+            "forward_passes": len(mut_infos),
+            "time_s": round(elapsed, 3),
+            "mutants_per_s": round(len(mut_infos) / elapsed, 2),
+            "max_abs_diff": max(abs(a - b) for a, b in zip(scores, baseline)),
+        }
+        report["speedup"] = round(report["per_mutant"]["time_s"] / report["batched"]["time_s"], 2)
+        print(f"Per mutant: {len(mut_infos)} mutants in {elapsed:.2f} s. Speedup: {report['speedup']}x")
+
+    with open(args.output, "w") as w:
+        json.dump(report, w, indent=4)
+    print(f"Report saved to {args.output}")
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Benchmark batched SaProt mutant scoring on a DMS assay")
+    parser.add_argument("--model_path", type=str, required=True, help="Path to the SaProt model")
+    parser.add_argument("--sa_seq", type=str, required=True, help="Structure-aware sequence of the wild type")
+    parser.add_argument("--dms_path", type=str, required=True,
+                        help="ProteinGym style CSV with the columns 'mutant' and 'DMS_score'")
+    parser.add_argument("--device", type=str, default="cuda:0", help="Device to run the model. Default: cuda:0")
+    parser.add_argument("--batch_size", type=int, default=16, help="Number of masked sequences in a forward pass")
+    parser.add_argument("--max_mutants", type=int, default=None, help="Only score the first mutants of the assay")
+    parser.add_argument("--skip_baseline", action="store_true", help="Do not run the per mutant baseline")
+    parser.add_argument("--output", type=str, default="saprot_mutation_benchmark.json", help="Path to the report")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    EXAMPLE:
+    python scripts/testing/benchmark_saprot_mutations.py    --model_path modelhub/SaProt_650M_AF2 \
+                                                            --sa_seq "MdEvVpQpLrVyQdYaKv" \
+                                                            --dms_path example/dms_assay.csv \
+                                                            --max_mutants 2000
+    """
+    run(get_args())
@@ -0,0 +1,80 @@
+import sys
+
+sys.path.append(".")
+
+import os
+import time
+import json
+import argparse
+import psutil
+
+
+def process_tree_stats() -> dict:
+    """
+    Count the child processes of the current process and the total RSS of the process tree
+    """
+    current = psutil.Process()
+    processes = [current] + current.children(recursive=True)
+
+    rss = 0
+    for process in processes:
+        try:
+            rss += process.memory_info().rss
+        except psutil.NoSuchProcess:
+            pass
+
+    return {
+        "num_child_processes": len(processes) - 1,
+        "rss_mb": round(rss / 1024 ** 2, 1),
+    }
+
+
+def run(args):
+    before = process_tree_stats()
+
+    start = time.time()
+    from agent.tools.tool_manager import ToolManager
+    import_time = time.time() - start
+
+    start = time.time()
+    tool_manager = ToolManager()
+    init_time = time.time() - start
+    after = process_tree_stats()
+
+    report = {
+        "num_tools": len(tool_manager.tools),
+        "import_time_s": round(import_time, 3),
+        "init_time_s": round(init_time, 3),
+        "num_child_processes": after["num_child_processes"] - before["num_child_processes"],
+        "rss_before_mb": before["rss_mb"],
+        "rss_after_mb": after["rss_mb"],
+    }
+
+    if args.retriever:
+        start = time.time()
+        tool_manager.initialize_retriever()
+        report["retriever_time_s"] = round(time.time() - start, 3)
+        report["rss_with_retriever_mb"] = process_tree_stats()["rss_mb"]
+
+    print(json.dumps(report, indent=4))
+
+    if args.output is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as w:
+            json.dump(report, w, indent=4)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Benchmark the start-up cost of ToolManager")
+    parser.add_argument("--retriever", action="store_true", help="Also initialize the tool retriever")
+    parser.add_argument("--output", type=str, default=None, help="Path to save the report as json")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    EXAMPLE:
+    python scripts/testing/benchmark_tool_manager.py --output outputs/benchmark/tool_manager.json
+    """
+    run(get_args())
@@ -0,0 +1,195 @@
+import sys
+
+sys.path.append(".")
+
+import os
+import time
+import json
+import argparse
+import psutil
+
+
+# Libraries that should only be imported by the processes that run the tools
+HEAVY_MODULES = ["torch", "tensorflow", "jax", "transformers", "sentence_transformers", "esm", "rdkit", "biotite",
+                 "sklearn", "lightning", "pytorch_lightning", "deepspeed"]
+
+
+class ImportProfiler:
+    def __init__(self):
+        """
+        Measure the import time and the RSS growth of every module imported after "start". It sits at the front of
+        sys.meta_path and wraps the "exec_module" of the loader found by the other finders, so nested imports are
+        measured as well. Modules imported before "start" are not measured.
+        """
+        self.process = psutil.Process()
+        self.modules = {}
+        # Frames of the imports being executed: [name, start time, start RSS, time of the nested imports]
+        self.stack = []
+
+    def start(self):
+        sys.meta_path.insert(0, self)
+
+    def stop(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+
+            spec = finder.find_spec(name, path, target)
+            if spec is None:
+                continue
+
+            # Built-in and frozen modules share a class as loader and are not measured
+            loader = spec.loader
+            if loader is not None and not isinstance(loader, type) and hasattr(loader, "exec_module"):
+                loader.exec_module = self.wrap(name, loader.exec_module)
+            return spec
+
+        return None
+
+    def wrap(self, name: str, exec_module):
+        def profiled_exec_module(module):
+            self.stack.append([name, time.perf_counter(), self.process.memory_info().rss, 0.0])
+            try:
+                exec_module(module)
+            finally:
+                _, start, start_rss, nested = self.stack.pop()
+                cumulative = time.perf_counter() - start
+                if self.stack:
+                    self.stack[-1][3] += cumulative
+
+                self.modules[name] = {
+                    "self_ms": round((cumulative - nested) * 1000, 1),
+                    "cumulative_ms": round(cumulative * 1000, 1),
+                    "rss_delta_mb": round((self.process.memory_info().rss - start_rss) / 1024 ** 2, 1),
+                }
+
+        return profiled_exec_module
+
+
+def start_up(args):
+    """
+    Run the start-up of the agent process that is being profiled
+    """
+    if args.target == "backbone":
+        import agent.agent.backbone
+
+    from agent.tools.tool_manager import ToolManager
+    tool_manager = ToolManager(prewarm=False)
+
+    # Loading a tool imports its caller module, as the first call of the tool does
+    failed_tools = {}
+    if args.load_tools:
+        for tool_name in list(tool_manager.specs):
+            try:
+                tool_manager.load_tool(tool_name)
+            except Exception as e:
+                failed_tools[tool_name] = str(e)
+
+    if args.retriever:
+        tool_manager.initialize_retriever()
+
+    return tool_manager, failed_tools
+
+
+def compare(report: dict, baseline: dict, top: int) -> dict:
+    """
+    Compare a report with a baseline report
+    Args:
+        report: The new report
+
+        baseline: The report of an earlier run
+
+        top: Number of modules with the largest slowdown to list
+    """
+    modules, baseline_modules = report["modules"], baseline["modules"]
+    slower = {
+        name: round(modules[name]["cumulative_ms"] - baseline_modules[name]["cumulative_ms"], 1)
+        for name in modules.keys() & baseline_modules.keys()
+    }
+    slower = sorted(((name, diff) for name, diff in slower.items() if diff > 0), key=lambda x: -x[1])
+
+    return {
+        "import_time_ms": round(report["import_time_ms"] - baseline["import_time_ms"], 1),
+        "rss_delta_mb": round(report["rss_delta_mb"] - baseline["rss_delta_mb"], 1),
+        "new_modules": sorted(modules.keys() - baseline_modules.keys()),
+        "removed_modules": sorted(baseline_modules.keys() - modules.keys()),
+        "new_heavy_modules": sorted(set(report["heavy_modules"]) - set(baseline["heavy_modules"])),
+        "slower_modules_ms": dict(slower[:top]),
+    }
+
+
+def run(args):
+    profiler = ImportProfiler()
+    rss_before = profiler.process.memory_info().rss
+
+    start = time.perf_counter()
+    profiler.start()
+    try:
+        tool_manager, failed_tools = start_up(args)
+    finally:
+        profiler.stop()
+    elapsed = time.perf_counter() - start
+
+    modules = profiler.modules
+    # Self times do not overlap, so their sum is the total import time
+    import_time = sum(stats["self_ms"] for stats in modules.values())
+    report = {
+        "target": args.target,
+        "load_tools": args.load_tools,
+        "start_up_time_ms": round(elapsed * 1000, 1),
+        "import_time_ms": round(import_time, 1),
+        "rss_before_mb": round(rss_before / 1024 ** 2, 1),
+        "rss_delta_mb": round((profiler.process.memory_info().rss - rss_before) / 1024 ** 2, 1),
+        "num_modules": len(modules),
+        "heavy_modules": sorted(name for name in HEAVY_MODULES if name in sys.modules),
+        "failed_tools": failed_tools,
+        "slowest_modules_ms": {name: stats["cumulative_ms"] for name, stats in
+                               sorted(modules.items(), key=lambda x: -x[1]["cumulative_ms"])[:args.top]},
+        "modules": modules,
+    }
+
+    summary = {key: value for key, value in report.items() if key != "modules"}
+    if args.baseline is not None:
+        with open(args.baseline, "r") as r:
+            summary["comparison"] = compare(report, json.load(r), args.top)
+
+    print(json.dumps(summary, indent=4))
+
+    # Keys are sorted, so that reports of two commits can be compared with a plain diff
+    if args.output is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as w:
+            json.dump(report, w, indent=4, sort_keys=True)
+
+    tool_manager.terminate()
+    if args.fail_on_heavy and report["heavy_modules"]:
+        sys.exit(1)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Report the import time and memory of each module imported during "
+                                                 "the start-up of the agent process")
+    parser.add_argument("--target", type=str, default="tool_manager", choices=["tool_manager", "backbone"],
+                        help="Start-up to profile. \"backbone\" also imports the multi-agent backbone")
+    parser.add_argument("--load_tools", action="store_true", help="Load all tools after building the ToolManager")
+    parser.add_argument("--retriever", action="store_true", help="Also initialize the tool retriever")
+    parser.add_argument("--top", type=int, default=20, help="Number of slowest modules to print")
+    parser.add_argument("--baseline", type=str, default=None, help="Report of an earlier run to compare with")
+    parser.add_argument("--fail_on_heavy", action="store_true",
+                        help="Exit with an error if an ML framework is imported during the start-up")
+    parser.add_argument("--output", type=str, default=None, help="Path to save the report as json")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    EXAMPLE:
+    python scripts/testing/profile_startup.py --target backbone --load_tools --output outputs/benchmark/startup.json
+    python scripts/testing/profile_startup.py --load_tools --baseline outputs/benchmark/startup.json --fail_on_heavy
+    """
+    run(get_args())
@@ -0,0 +1,90 @@
+import sys
+
+sys.path.append(".")
+
+import os
+import time
+import json
+import pickle
+import argparse
+import tempfile
+
+from agent.tools.rfdiffusion.runrf import RFExecutor
+from agent.tools.service import ServiceClient
+
+
+def run(args):
+    """
+    Run a tiny unconditional design on a CPU-only RFdiffusion service. It goes through the same executor, service and
+    worker code as the tools, so a broken environment shows up in seconds instead of after a GPU job
+    """
+    args.rf_root = os.path.abspath(args.rf_root)
+    socket_path = f"{tempfile.gettempdir()}/rfdiffusion-smoke-{os.getpid()}.sock"
+    start_cmd = [
+        args.python, "agent/tools/rfdiffusion/server.py",
+        "--socket_path", socket_path,
+        "--rf_root", args.rf_root,
+        "--device", "cpu",
+        "--num_workers", str(args.num_workers),
+        "--idle_timeout", "60",
+    ]
+    service = ServiceClient(socket_path, start_cmd, start_timeout=args.start_timeout)
+
+    report = {"contigs": args.contigs, "iterations": args.iterations, "num_designs": args.num_designs}
+    for run_index in range(args.num_runs):
+        out_dir = f"{args.out_dir}/run_{run_index}"
+        log_path = f"{args.out_dir}/run_{run_index}.log"
+        os.makedirs(out_dir, exist_ok=True)
+
+        start = time.time()
+        executor = RFExecutor(args.rf_root, out_dir, args.python, args.iterations, num_designs=args.num_designs,
+                              service=service)
+        result = executor.run_diffusion(args.contigs, None, log_path)
+        elapsed = time.time() - start
+
+        seeds = []
+        for i in range(args.num_designs):
+            trb_path = f"{out_dir}/design_{i}.trb"
+            if os.path.exists(trb_path):
+                with open(trb_path, "rb") as r:
+                    seeds.append(pickle.load(r)["seed"])
+
+        # The first run loads the checkpoint in the workers, the later ones show the warm latency
+        report[f"run_{run_index}"] = {
+            "time_s": round(elapsed, 3),
+            "error": result.get("error"),
+            "num_saved": len(seeds),
+            "distinct_seeds": len(set(seeds)) == len(seeds),
+        }
+        print(f"Run {run_index}: {len(seeds)}/{args.num_designs} designs in {elapsed:.2f} s")
+
+    report["health"] = service.request("GET", "/health")
+    with open(args.output, "w") as w:
+        json.dump(report, w, indent=4)
+    print(f"Report saved to {args.output}")
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="CPU smoke test of the resident RFdiffusion service")
+    parser.add_argument("--rf_root", type=str, required=True, help="Root of the RFdiffusion repository")
+    parser.add_argument("--python", type=str, default=sys.executable,
+                        help="Python of the RFdiffusion environment, used to start the service")
+    parser.add_argument("--out_dir", type=str, default="outputs/rfdiffusion_smoke", help="Directory of the designs")
+    parser.add_argument("--contigs", type=str, default="20", help="Contigs of the design. Default: a 20-residue monomer")
+    parser.add_argument("--iterations", type=int, default=5, help="Number of diffusion steps")
+    parser.add_argument("--num_designs", type=int, default=2, help="Number of designs of each run")
+    parser.add_argument("--num_runs", type=int, default=2, help="Number of runs. Runs after the first are warm")
+    parser.add_argument("--num_workers", type=int, default=2, help="Number of worker processes of the service")
+    parser.add_argument("--start_timeout", type=float, default=600, help="Seconds to wait for the service to start")
+    parser.add_argument("--output", type=str, default="rfdiffusion_smoke.json", help="Path to the report")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """
+    EXAMPLE:
+    python scripts/testing/smoke_rfdiffusion.py     --rf_root modelhub/RFdiffusion \
+                                                    --python /home/public/miniconda3/envs/SE3nv/bin/python
+    """
+    run(get_args())
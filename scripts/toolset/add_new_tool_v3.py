@@ -363,8 +363,7 @@ if __name__ == '__main__':
     tool = {class_name}(out_dir=BASE_DIR)
     input_args = {{{example_items}}}
     for obs in tool.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 """
 
     python_param_blocks = []
@@ -463,8 +462,7 @@ if __name__ == '__main__':
     tool = {class_name}(out_dir=BASE_DIR)
     input_args = {{{example_items}}}
     for obs in tool.mp_run(**input_args):
-        os.system("clear")
-        print(obs)
+        print(obs, end="")
 """
     # Choose template
     if script_type == ScriptType.SHELL:
@@ -36,9 +36,8 @@ user_confirmation = False
 
 def signal_handler(sig, frame):
     print("\nShutting down gracefully...")
-    # 执行清理操作，如终止工具和进程
-    for tool in prot_agent.tool_manager.tools.values():
-        tool.terminate()
+    # The server process exits, so the jobs of the chat and of direct tool calls are all stopped
+    prot_agent.tool_manager.terminate()
     
     sys.exit(0)
     
@@ -116,6 +115,20 @@ async def chat(out_dir: str, messages: str):
     return StreamingResponse(generate_response(messages), media_type="text/plain")
 
 
+@app.get("/call_tool")
+async def call_tool(tool_name: str, tool_args: str):
+    """
+    Call a tool directly and stream its observations. Tool calls run in the event loop without blocking it, so
+    many of them can be served at the same time
+    Args:
+        tool_name: Name of the tool
+
+        tool_args: Arguments for the tool in json format
+    """
+    tool_args = json.loads(tool_args)
+    return StreamingResponse(prot_agent.tool_manager.async_call(tool_name, tool_args), media_type="text/plain")
+
+
 @app.get("/change_tool_call")
 def change_tool_call(tool_name: str, tool_args: str):
     """
@@ -169,9 +182,8 @@ def terminate():
         global user_confirmation
         user_confirmation = True
         
-        # Terminate the tool
-        for tool in prot_agent.tool_manager.tools.values():
-            tool.terminate()
+        # Only cancel the tool jobs of the chat. Direct tool calls are cancelled when their client disconnects
+        prot_agent.tool_executor.cancel_jobs()
         
         return_dict = {"status": "Success"}
     
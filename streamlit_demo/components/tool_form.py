@@ -135,7 +135,7 @@ def create_tool_call(tool_name: str, agent_kwargs: dict):
                                  key=st.session_state.tool_selectbox_key)
 
     # Tool description
-    doc_dict = tool_manager.get_tool(selected_tool).config.document
+    doc_dict = tool_manager.specs[selected_tool].config.document
     st.markdown(f"*{doc_dict.tool_description}*")
 
     # Input arguments
@@ -9,8 +9,8 @@ from streamlit_demo.backend.frontend_api import sync_toolset
 def show_available_tools():
     # Put each tool in its category
     category2tools = {}
-    for name, obj in st.session_state.tool_manager.tools.items():
-        doc_dict = obj.config.document
+    for name, spec in st.session_state.tool_manager.specs.items():
+        doc_dict = spec.config.document
         if doc_dict.category_name == "chat":
             continue
         category2tools[doc_dict.category_name] = category2tools.get(doc_dict.category_name, []) + [doc_dict.tool_name]
@@ -27,8 +27,7 @@ def show_available_tools():
         tools = category2tools[category]
         with tabs[i]:
             for name in tools:
-                obj = st.session_state.tool_manager.get_tool(name)
-                doc_dict = obj.config.document
+                doc_dict = st.session_state.tool_manager.specs[name].config.document
                 with st.expander(name):
                     st.markdown(f"*{doc_dict.tool_description}*")
                     # List all required arguments
@@ -0,0 +1,5 @@
+import sys
+
+ROOT_DIR = __file__.rsplit("/", 2)[0]
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
@@ -0,0 +1,75 @@
+import numpy as np
+
+from agent.tools.embedding_store import EmbeddingStore, model_fingerprint
+
+
+class Encoder:
+    def __init__(self):
+        self.encoded = []
+
+    def __call__(self, documents: list) -> np.ndarray:
+        self.encoded += documents
+        return np.array([[len(doc), doc.count("a")] for doc in documents], dtype=np.float32)
+
+
+def make_model(path, weights: bytes):
+    path.mkdir(exist_ok=True)
+    (path / "config.json").write_text('{"dim": 2}')
+    (path / "model.bin").write_bytes(weights)
+    return str(path)
+
+
+def test_only_missing_documents_are_encoded(tmp_path):
+    encoder = Encoder()
+    store = EmbeddingStore(str(tmp_path / "store"), "model")
+    embeddings = store.get_embeddings(["a", "bb", "a"], encoder)
+    assert embeddings.tolist() == [[1, 1], [2, 0], [1, 1]]
+    assert encoder.encoded == ["a", "bb"]
+
+    # A new store instance reads the vectors from disk
+    store = EmbeddingStore(str(tmp_path / "store"), "model")
+    store.get_embeddings(["bb", "ccc"], encoder)
+    assert encoder.encoded == ["a", "bb", "ccc"]
+    assert store.num_encoded == 1
+
+
+def test_documents_outside_corpus_are_dropped(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "store"), "model")
+    store.get_embeddings(["a", "bb"], Encoder())
+    store.get_embeddings(["bb"], Encoder())
+
+    assert len(EmbeddingStore(str(tmp_path / "store"), "model").embeddings) == 1
+
+
+def test_changed_model_is_encoded_again(tmp_path):
+    model_path = make_model(tmp_path / "model", b"weights-1")
+    store = EmbeddingStore(str(tmp_path / "store"), "model", model_path)
+    store.get_embeddings(["a"], Encoder())
+
+    encoder = Encoder()
+    EmbeddingStore(str(tmp_path / "store"), "model", model_path).get_embeddings(["a"], encoder)
+    assert encoder.encoded == []
+
+    make_model(tmp_path / "model", b"weights-2")
+    EmbeddingStore(str(tmp_path / "store"), "model", model_path).get_embeddings(["a"], encoder)
+    assert encoder.encoded == ["a"]
+
+
+def test_updates_of_other_processes_are_merged(tmp_path):
+    first = EmbeddingStore(str(tmp_path / "store"), "model")
+    second = EmbeddingStore(str(tmp_path / "store"), "model")
+    first.get_embeddings(["a", "bb"], Encoder())
+
+    encoder = Encoder()
+    second.get_embeddings(["a", "bb", "ccc"], encoder)
+    assert encoder.encoded == ["ccc"]
+
+
+def test_model_fingerprint(tmp_path):
+    model_path = make_model(tmp_path / "model", b"x" * (3 << 20))
+    fingerprint = model_fingerprint(model_path)
+    assert fingerprint == model_fingerprint(model_path)
+
+    make_model(tmp_path / "model", b"x" * (3 << 20) + b"y")
+    assert model_fingerprint(model_path) != fingerprint
+    assert model_fingerprint(str(tmp_path / "missing")) == ""
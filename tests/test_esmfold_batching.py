@@ -0,0 +1,45 @@
+import random
+
+from agent.tools.esmfold.batching import pack_batches, read_fasta, structure_names
+
+
+def test_pack_batches_fits_budget():
+    random.seed(0)
+    lengths = [random.randint(20, 900) for _ in range(200)]
+    batches = pack_batches(lengths, max_tokens=4096, max_batch_size=16)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) <= 16
+        padded_size = len(batch) * max(lengths[i] for i in batch)
+        assert padded_size <= 4096 or len(batch) == 1
+
+
+def test_pack_batches_longest_first():
+    lengths = [100, 300, 200, 300, 50]
+    batches = pack_batches(lengths, max_tokens=600, max_batch_size=8)
+    order = [i for batch in batches for i in batch]
+
+    assert [lengths[i] for i in order] == sorted(lengths, reverse=True)
+    assert [sorted(lengths[i] for i in batch) for batch in batches] == [[300, 300], [50, 100, 200]]
+
+
+def test_pack_batches_long_sequence_alone():
+    batches = pack_batches([5000, 10, 10], max_tokens=1000, max_batch_size=8)
+    assert batches == [[0], [1, 2]]
+
+
+def test_pack_batches_batch_size():
+    batches = pack_batches([10] * 5, max_tokens=10000, max_batch_size=2)
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert pack_batches([], max_tokens=1000, max_batch_size=2) == []
+
+
+def test_read_fasta(tmp_path):
+    path = tmp_path / "seqs.fasta"
+    path.write_text(">a first\nmkv\nLL\n\n>b\nAC\n>\nGG\n")
+    assert read_fasta(str(path)) == [("a", "MKVLL"), ("b", "AC"), ("seq_2", "GG")]
+
+
+def test_structure_names_are_unique():
+    assert structure_names(["sp|P1|X", "sp|P1|X", "a b"]) == ["sp_P1_X.pdb", "sp_P1_X_2.pdb", "a_b.pdb"]
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from agent.tools.umol.feature_cache import FeatureCache, normalize_pocket, run_command
+
+
+def write_features(content: str):
+    def build(out_dir):
+        with open(f"{out_dir}/features.pkl", "w") as w:
+            w.write(content)
+    return build
+
+
+def test_features_are_built_once(tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    builds = []
+
+    def build(out_dir):
+        builds.append(out_dir)
+        write_features("MKV")(out_dir)
+
+    path = cache.get("msa", "MKV", "features.pkl", build)
+    assert cache.get("msa", "MKV", "features.pkl", build) == path
+    assert len(builds) == 1
+    with open(path) as r:
+        assert r.read() == "MKV"
+
+    dst = cache.link(path, str(tmp_path / "run.pkl"))
+    assert os.path.samefile(dst, path)
+
+
+def test_failed_build_is_not_cached(tmp_path):
+    cache = FeatureCache(str(tmp_path))
+
+    def build(out_dir):
+        write_features("partial")(out_dir)
+        run_command("exit 3", "build the features")
+
+    with pytest.raises(RuntimeError, match="exit status 3"):
+        cache.get("msa", "MKV", "features.pkl", build)
+    assert not os.path.exists(cache.get_entry_dir("msa", "MKV"))
+
+    path = cache.get("msa", "MKV", "features.pkl", write_features("MKV"))
+    with open(path) as r:
+        assert r.read() == "MKV"
+
+
+def test_empty_features_are_rebuilt(tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    with pytest.raises(RuntimeError, match="Failed to build the ligand features"):
+        cache.get("ligand", "CCO", "features.pkl", write_features(""))
+    assert not os.path.exists(cache.get_entry_dir("ligand", "CCO"))
+
+    # An empty entry left by an older version is replaced
+    entry_dir = cache.get_entry_dir("ligand", "CCO")
+    os.makedirs(entry_dir)
+    open(f"{entry_dir}/features.pkl", "w").close()
+    path = cache.get("ligand", "CCO", "features.pkl", write_features("CCO"))
+    assert os.path.getsize(path) == 3
+    assert os.listdir(os.path.dirname(entry_dir)) == [os.path.basename(entry_dir)]
+
+
+def test_normalize_pocket():
+    assert normalize_pocket(" 10, 11,12,") == "10,11,12"
+    assert normalize_pocket("010") == "10"
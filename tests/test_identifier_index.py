@@ -0,0 +1,98 @@
+import os
+import time
+
+import pytest
+
+from agent.tools import type_check
+from agent.tools.identifier_index import BloomFilter, IdentifierIndex, write_ids
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = IdentifierIndex(str(tmp_path / "index"))
+    write_ids(index.pdb_path, ["1ABC", "2XYZ"])
+    return index
+
+
+@pytest.fixture
+def configured(index, monkeypatch):
+    monkeypatch.setattr(type_check, "_identifier_index", index)
+    monkeypatch.setattr(type_check, "_network_fallback", True)
+    type_check.clear_identifier_cache()
+    yield index
+    type_check.clear_identifier_cache()
+
+
+def test_bloom_filter_round_trip(tmp_path):
+    bloom_filter = BloomFilter.for_capacity(1000)
+    accessions = [f"P{i:05d}" for i in range(1000)]
+    for accession in accessions:
+        bloom_filter.add(accession)
+
+    bloom_filter.save(str(tmp_path / "ids.bloom"))
+    loaded = BloomFilter.load(str(tmp_path / "ids.bloom"))
+    assert all(accession in loaded for accession in accessions)
+    assert sum(f"Q{i:05d}" in loaded for i in range(1000)) < 20
+
+
+def test_contains(index):
+    assert index.contains("PDB_ID", "1abc")
+    assert index.contains("PDB_ID", "3AAA") is False
+    # No UniProt list, so UniProt accessions cannot be checked locally
+    assert index.contains("UNIPROT_ID", "P12345") is None
+
+
+def test_build_uniprot_bloom(index):
+    index.build_uniprot({"P12345", "Q8N158"}, bloom=True)
+    assert os.path.exists(index.uniprot_bloom_path)
+    assert index.contains("UNIPROT_ID", "P12345")
+    assert not index.contains("UNIPROT_ID", "P99999")
+
+
+def test_is_stale(index):
+    assert not index.is_stale(1)
+    old = time.time() - 2 * 86400
+    os.utime(index.pdb_path, (old, old))
+    assert index.is_stale(1)
+
+
+def test_failed_online_check_is_not_cached(configured, monkeypatch):
+    answers = [None, True]
+    monkeypatch.setattr(type_check, "check_identifier_online", lambda detailed_type, value: answers.pop(0))
+
+    # The index has no UniProt list, so the unconfirmed accession passes on its format
+    assert type_check.check_identifier("UNIPROT_ID", "P12345")
+    assert type_check.check_identifier("UNIPROT_ID", "P12345")
+    assert answers == []
+
+    # The definitive answer is cached
+    assert type_check.check_identifier("UNIPROT_ID", "P12345")
+
+
+def test_online_check_of_missing_pdb_id(configured, monkeypatch):
+    answers = [None, False]
+    monkeypatch.setattr(type_check, "check_identifier_online", lambda detailed_type, value: answers.pop(0))
+
+    assert not type_check.check_identifier("PDB_ID", "3AAA")
+    assert not type_check.check_identifier("PDB_ID", "3AAA")
+    assert not type_check.check_identifier("PDB_ID", "3AAA")
+    assert answers == []
+    assert not type_check.check_identifier("PDB_ID", "3-AA")
+
+
+def test_miss_refreshes_old_list(configured, monkeypatch):
+    monkeypatch.setattr(type_check, "_network_fallback", False)
+    monkeypatch.setattr(type_check, "_refresh_days", 7)
+    monkeypatch.setattr(type_check, "_last_refresh_time", 0)
+    old = time.time() - 2 * 3600
+    os.utime(configured.pdb_path, (old, old))
+
+    def refresh_pdb():
+        write_ids(configured.pdb_path, ["1ABC", "2XYZ", "9NEW"])
+        configured.reload()
+
+    monkeypatch.setattr(configured, "refresh_pdb", refresh_pdb)
+    assert not type_check.check_identifier("PDB_ID", "9NEW")
+
+    type_check._refresh_thread.join(5)
+    assert type_check.check_identifier("PDB_ID", "9NEW")
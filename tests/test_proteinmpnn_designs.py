@@ -0,0 +1,25 @@
+import csv
+
+from agent.tools.proteinmpnn.designs import DesignWriter, list_backbones
+
+
+def test_backbone_named_like_combined_files(tmp_path):
+    with DesignWriter(str(tmp_path)) as writer:
+        writer.write("designs", [(1.0, 0.5, "MKV")])
+        writer.write("mpnn_results", [(2.0, 0.25, "GGA"), (3.0, 0.125, "LLA")])
+
+    assert (tmp_path / "designs.fasta").read_text().count(">") == 3
+    with open(tmp_path / "mpnn_results.csv") as r:
+        rows = list(csv.reader(r))
+    assert rows[0] == ["backbone", "score", "seqid", "protein_sequence"]
+    assert [row[0] for row in rows[1:]] == ["designs", "mpnn_results", "mpnn_results"]
+
+    assert (tmp_path / "backbones" / "designs.fasta").read_text() == ">designs_design0_score:1.000_seqid:0.500\nMKV\n"
+    with open(tmp_path / "backbones" / "mpnn_results.csv") as r:
+        assert len(list(csv.reader(r))) == 3
+
+
+def test_list_backbones(tmp_path):
+    for file_name in ["b.cif", "a.pdb", "notes.txt"]:
+        (tmp_path / file_name).write_text("")
+    assert list_backbones(str(tmp_path)) == [f"{tmp_path}/a.pdb", f"{tmp_path}/b.cif"]
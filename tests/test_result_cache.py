@@ -0,0 +1,100 @@
+import os
+import json
+import time
+
+import pytest
+
+from agent.tools.result_cache import ResultCache
+
+
+CONFIG = {"document": {"optional_parameters": [{"name": "num", "default": 1}]}}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "cache"))
+
+
+def write_output(out_dir, run_id: str, content: str) -> str:
+    path = f"tool/{run_id}/result.txt"
+    os.makedirs(os.path.dirname(os.path.join(out_dir, path)), exist_ok=True)
+    with open(os.path.join(out_dir, path), "w") as w:
+        w.write(content)
+    return path
+
+
+def test_key_ignores_defaults_and_whitespace(cache, tmp_path):
+    key = cache.make_key("tool", CONFIG, {"seq": "MKV"}, str(tmp_path))
+    assert cache.make_key("tool", CONFIG, {"seq": " MKV\n", "num": 1}, str(tmp_path)) == key
+    assert cache.make_key("tool", CONFIG, {"seq": "MKV", "num": 2}, str(tmp_path)) != key
+
+
+def test_key_follows_input_file_content(cache, tmp_path):
+    input_path = tmp_path / "input.fasta"
+    input_path.write_text(">a\nMKV\n")
+    key = cache.make_key("tool", CONFIG, {"fasta": "input.fasta"}, str(tmp_path))
+
+    input_path.write_text(">a\nMKVL\n")
+    assert cache.make_key("tool", CONFIG, {"fasta": "input.fasta"}, str(tmp_path)) != key
+
+
+def test_store_and_materialize(cache, tmp_path):
+    out_dir = str(tmp_path / "out")
+    path = write_output(out_dir, "run1", "result")
+    cache.store("k" * 64, "tool", "run1", out_dir, {"output": path}, "log of run1\n")
+
+    entry = cache.lookup("tool", "k" * 64)
+    results, log = cache.materialize("k" * 64, entry, out_dir, "run2")
+    assert results == {"output": "tool/run2/result.txt"}
+    assert log == "log of run2\n"
+    with open(os.path.join(out_dir, results["output"])) as r:
+        assert r.read() == "result"
+
+    assert cache.get_stats()["tools"]["tool"] == {"hits": 1, "misses": 0}
+
+
+def test_failed_store_leaves_no_temporary_dir(cache, tmp_path, monkeypatch):
+    out_dir = str(tmp_path / "out")
+    path = write_output(out_dir, "run1", "result")
+
+    def fail(*args, **kwargs):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(json, "dump", fail)
+    with pytest.raises(OSError):
+        cache.store("k" * 64, "tool", "run1", out_dir, {"output": path}, "")
+
+    assert os.listdir(f"{cache.entry_dir}/kk") == []
+    assert cache.lookup("tool", "k" * 64) is None
+
+
+def test_expired_entry_is_removed(cache, tmp_path):
+    out_dir = str(tmp_path / "out")
+    cache.store("k" * 64, "tool", "run1", out_dir, {"answer": "42"}, "")
+    assert cache.lookup("tool", "k" * 64, max_age=60) is not None
+
+    meta_path = f"{cache.get_entry_dir('k' * 64)}/meta.json"
+    with open(meta_path) as r:
+        meta = json.load(r)
+    meta["created"] = time.time() - 120
+    with open(meta_path, "w") as w:
+        json.dump(meta, w)
+
+    assert cache.lookup("tool", "k" * 64, max_age=60) is None
+    assert not os.path.exists(cache.get_entry_dir("k" * 64))
+
+    # The expired entry is replaced by the next call
+    cache.store("k" * 64, "tool", "run2", out_dir, {"answer": "43"}, "")
+    assert cache.lookup("tool", "k" * 64, max_age=60)["results"] == {"answer": "43"}
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_size_gb=10 / 1024 ** 3)
+    out_dir = str(tmp_path / "out")
+    for i, key in enumerate(["a" * 64, "b" * 64]):
+        path = write_output(out_dir, f"run{i}", "123456")
+        cache.store(key, "tool", f"run{i}", out_dir, {"output": path}, "")
+
+    assert cache.lookup("tool", "a" * 64) is None
+    assert cache.lookup("tool", "b" * 64) is not None
+    assert cache.get_stats()["num_entries"] == 1
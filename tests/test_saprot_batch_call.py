@@ -0,0 +1,26 @@
+import os
+
+from agent.tools.saprot_task.mutation_scan_caller import SaProtMutationScanCaller
+
+
+def test_batch_items_write_their_own_scan(tmp_path, monkeypatch):
+    caller = SaProtMutationScanCaller()
+    caller.set_out_dir(str(tmp_path))
+    caller.run_id = "run"
+
+    def predict(cmd_args):
+        os.makedirs(os.path.dirname(cmd_args["scan_path"]), exist_ok=True)
+        with open(cmd_args["scan_path"], "w") as w:
+            w.write(cmd_args["sa_seq"])
+        return {"pred": {"top_mutations": [{"mutation": "A1G", "score": 1.0}]}}
+
+    monkeypatch.setattr(caller, "predict", predict)
+    results = dict(caller.batch_call([{"protein_sequence": "MKV"}, {"protein_sequence": "GGA"}]))
+
+    scan_paths = [results[i]["scan_path"] for i in range(2)]
+    assert scan_paths[0] != scan_paths[1]
+    for scan_path, sa_seq in zip(scan_paths, ["M#K#V#", "G#G#A#"]):
+        with open(f"{tmp_path}/{scan_path}") as r:
+            assert r.read() == sa_seq
+
+    assert caller.item_run_id == "run"
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from agent.tools.saprot_task.embedding_store import (EmbeddingStore, EmbeddingWriter, INDEX_FILE, PROTEIN_FILE,
+                                                     RESIDUE_FILE)
+
+
+def embeddings(*lengths):
+    return [np.full((length, 4), length, dtype=np.float32) for length in lengths]
+
+
+def test_write_and_read(tmp_path):
+    with EmbeddingWriter(str(tmp_path), "SaProt_35M", 4, per_residue=True) as writer:
+        writer.write(["a", "b"], embeddings(3, 5))
+        writer.write(["c"], embeddings(2))
+
+    store = EmbeddingStore(str(tmp_path))
+    assert store.ids == ["a", "b", "c"]
+    assert "b" in store and "d" not in store
+    assert store.get("b").tolist() == [5] * 4
+    assert store.get_residues("c").shape == (2, 4)
+    assert store.get_residues("b").tolist() == [[5] * 4] * 5
+
+
+def test_resume_after_interruption(tmp_path):
+    with EmbeddingWriter(str(tmp_path), "SaProt_35M", 4, per_residue=True) as writer:
+        writer.write(["a"], embeddings(3))
+
+    # An interrupted batch wrote its embeddings and part of its index row
+    with open(tmp_path / PROTEIN_FILE, "ab") as w:
+        w.write(np.zeros(4, dtype=np.float16).tobytes())
+    with open(tmp_path / RESIDUE_FILE, "ab") as w:
+        w.write(np.zeros((2, 4), dtype=np.float16).tobytes())
+    with open(tmp_path / INDEX_FILE, "a") as w:
+        w.write("b\t2")
+
+    with EmbeddingWriter(str(tmp_path), "SaProt_35M", 4, per_residue=True) as writer:
+        assert writer.done == {"a"}
+        writer.write(["b"], embeddings(2))
+
+    store = EmbeddingStore(str(tmp_path))
+    assert store.ids == ["a", "b"]
+    assert store.get_residues("b").tolist() == [[2] * 4] * 2
+
+
+def test_model_mismatch(tmp_path):
+    EmbeddingWriter(str(tmp_path), "SaProt_35M", 4).close()
+    with pytest.raises(ValueError, match="does not match"):
+        EmbeddingWriter(str(tmp_path), "SaProt_650M", 4)
+
+    store = EmbeddingStore(str(tmp_path))
+    assert len(store) == 0
+    with pytest.raises(ValueError, match="per-residue"):
+        store.get_residues("a")
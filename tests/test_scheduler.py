@@ -0,0 +1,85 @@
+import os
+import time
+
+import pytest
+
+from agent.tools.scheduler import ResourceScheduler
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = ResourceScheduler(memory_gb=16, gpus=[0, 1], max_backfill_wait=60)
+    # Independent of the cores of the test machine
+    scheduler.cpu_ids = [0, 1, 2, 3]
+    scheduler.free_cpu_ids = [0, 1, 2, 3]
+    return scheduler
+
+
+def test_acquire_and_release(scheduler):
+    allocation = scheduler.acquire("a", {"cpus": 3, "memory_gb": 8, "gpus": 1}, time.time())
+    assert len(allocation.cpu_ids) == 3
+    assert allocation.gpu_ids == [0]
+
+    assert scheduler.acquire("b", {"cpus": 2}, time.time()) is None
+
+    allocation.release()
+    allocation.release()
+    stats = scheduler.get_stats()
+    assert stats["free_cpus"] == 4
+    assert stats["free_memory_gb"] == 16
+    assert stats["free_gpus"] == [0, 1]
+
+
+def test_request_without_cpus_is_not_pinned(scheduler):
+    pinned = scheduler.acquire("a", {"cpus": 4}, time.time())
+    allocation = scheduler.acquire("b", {"memory_gb": 1}, time.time())
+    assert allocation.cpu_ids is None
+
+    allocation.release()
+    pinned.release()
+    assert scheduler.get_stats()["free_cpus"] == 4
+
+
+def test_request_is_fit_to_machine(scheduler):
+    allocation = scheduler.acquire("a", {"cpus": 64, "memory_gb": 100, "gpus": 4}, time.time())
+    assert len(allocation.cpu_ids) == len(scheduler.cpu_ids)
+    assert allocation.memory_gb == 16
+    assert allocation.gpu_ids == []
+
+
+def test_gpus_of_worker(scheduler):
+    allocation = scheduler.acquire("a", {"gpus": 1}, time.time(), gpu_ids=[1])
+    assert allocation.gpu_ids == [1]
+    assert scheduler.acquire("b", {"gpus": 1}, time.time(), gpu_ids=[1]) is None
+
+
+def test_backfill_until_max_wait(scheduler):
+    running = scheduler.acquire("running", {"cpus": 2}, time.time())
+
+    # A smaller job may start ahead of a large job that has not waited long
+    assert scheduler.acquire("large", {"cpus": 4}, time.time() - 10) is None
+    small = scheduler.acquire("small", {"cpus": 1}, time.time())
+    assert small is not None
+
+    # Once the large job has waited too long, it keeps the freed resources
+    scheduler.waiting["large"] = time.time() - 120
+    assert scheduler.acquire("other", {"cpus": 1}, time.time()) is None
+
+    running.release()
+    small.release()
+    assert scheduler.acquire("large", {"cpus": 4}, time.time()) is not None
+
+
+def test_discarded_job_does_not_block(scheduler):
+    scheduler.acquire("running", {"cpus": 4}, time.time())
+    assert scheduler.acquire("old", {"cpus": 4}, time.time() - 120) is None
+    scheduler.discard("old")
+
+    assert scheduler.get_stats()["num_waiting_jobs"] == 0
+    assert scheduler.acquire("new", {"memory_gb": 1}, time.time()) is not None
+
+
+def test_default_cpus_follow_affinity():
+    scheduler = ResourceScheduler(memory_gb=1, gpus=[])
+    if hasattr(os, "sched_getaffinity"):
+        assert scheduler.cpu_ids == sorted(os.sched_getaffinity(0))
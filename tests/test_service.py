@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from agent.tools import service
+from agent.tools.service import (RequestContext, ServiceClient, ServiceError, cancel_requests, current_request,
+                                 serve)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(service, "CANCEL_POLL_INTERVAL", 0.05)
+
+    def wait(body):
+        current_request().wait(threading.Event())
+        return {}
+
+    socket_path = str(tmp_path / "test.sock")
+    routes = {("GET", "/health"): lambda body: {"status": "ok"}, ("POST", "/wait"): wait}
+    threading.Thread(target=serve, args=(socket_path, routes), daemon=True).start()
+
+    client = ServiceClient(socket_path)
+    for _ in range(100):
+        if client.is_alive():
+            break
+        time.sleep(0.05)
+    return client
+
+
+def test_request_times_out(client):
+    start = time.time()
+    with pytest.raises(ServiceError, match="timed out"):
+        client.request("POST", "/wait", {}, timeout=0.3)
+    assert time.time() - start < 2
+
+
+def test_cancel_in_flight_requests(client):
+    errors = []
+
+    def send():
+        try:
+            client.request("POST", "/wait", {})
+        except ServiceError as e:
+            errors.append(str(e))
+
+    thread = threading.Thread(target=send)
+    thread.start()
+    while not service._in_flight:
+        time.sleep(0.01)
+
+    cancel_requests()
+    thread.join(5)
+    assert errors == ["The request was cancelled"]
+    assert not service._in_flight
+
+
+def test_abandoned_request_does_not_get_lock(monkeypatch):
+    monkeypatch.setattr(service, "CANCEL_POLL_INTERVAL", 0.05)
+    lock = threading.Lock()
+    lock.acquire()
+
+    with pytest.raises(ServiceError, match="timed out"):
+        RequestContext(timeout=0.2).acquire(lock)
+
+    context = RequestContext()
+    context.cancelled.set()
+    lock.release()
+    with pytest.raises(ServiceError, match="cancelled"):
+        context.acquire(lock)
+    assert not lock.locked()
+
+    RequestContext().acquire(lock)
+    assert lock.locked()
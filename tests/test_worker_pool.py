@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from agent.tools import worker_pool
+from agent.tools.worker_pool import ToolWorker
+
+
+class SleepTool:
+    def run(self, seconds: float):
+        time.sleep(seconds)
+
+
+class SleepJob:
+    job_id = "job"
+    method = "run"
+    cache_key = None
+    allocation = None
+
+    def __init__(self, seconds: float):
+        self.tool_args = {"seconds": seconds}
+
+
+@pytest.fixture(autouse=True)
+def fast_poll(monkeypatch):
+    # Read by the forked worker, so it has to be set before the worker starts
+    monkeypatch.setattr(worker_pool, "PARENT_POLL_INTERVAL", 0.1)
+
+
+def wait_exit(worker: ToolWorker, timeout: float) -> bool:
+    worker.process.join(timeout)
+    return not worker.is_alive()
+
+
+def test_idle_worker_times_out():
+    worker = ToolWorker(SleepTool(), idle_timeout=0.3)
+    try:
+        assert wait_exit(worker, 5)
+    finally:
+        worker.close()
+
+
+def test_idle_timeout_counts_from_the_last_job():
+    worker = ToolWorker(SleepTool(), idle_timeout=0.5)
+    try:
+        worker.submit(SleepJob(0.8), "/tmp")
+        time.sleep(1)
+        assert worker.is_alive()
+        assert wait_exit(worker, 5)
+    finally:
+        worker.close()
+
+
+def test_close_forgets_the_worker():
+    worker = ToolWorker(SleepTool(), idle_timeout=None)
+    assert worker in worker_pool._live_workers
+
+    worker.close()
+    assert not worker.is_alive()
+    assert worker not in worker_pool._live_workers
+
+
+def test_dropped_worker_is_still_tracked():
+    # A tool dropped without closing its workers must not hang the exit of the interpreter
+    worker = ToolWorker(SleepTool(), idle_timeout=None)
+    pid = worker.pid
+    del worker
+
+    workers = [worker for worker in worker_pool._live_workers if worker.pid == pid]
+    assert workers
+    worker_pool._close_live_workers()
+    assert not workers[0].is_alive()